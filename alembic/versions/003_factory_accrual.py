@@ -0,0 +1,24 @@
+"""Lazy factory production accrual
+
+Revision ID: 003
+Revises: 002
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "003"
+down_revision = "002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("factory_stock", sa.Float(), nullable=True, server_default="0"))
+    op.add_column("users", sa.Column("production_settled_at", sa.DateTime(), nullable=True))
+    op.add_column("users", sa.Column("factory_upgrade_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("users", "factory_upgrade_at")
+    op.drop_column("users", "production_settled_at")
+    op.drop_column("users", "factory_stock")
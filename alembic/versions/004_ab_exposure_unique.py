@@ -0,0 +1,45 @@
+"""One A/B exposure row per user and experiment
+
+Revision ID: 004
+Revises: 003
+"""
+from alembic import op
+
+revision = "004"
+down_revision = "003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Дубликаты прежней записи "строка на каждое воздействие": оставляем
+    # самую раннюю, конверсию переносим на неё
+    op.execute("""
+        WITH ranked AS (
+            SELECT id, test_id, user_id,
+                   row_number() OVER (PARTITION BY test_id, user_id ORDER BY created_at, id) AS rn,
+                   bool_or(converted) OVER (PARTITION BY test_id, user_id) AS any_converted,
+                   sum(conversion_value) OVER (PARTITION BY test_id, user_id) AS total_value
+            FROM ab_test_exposures
+        )
+        UPDATE ab_test_exposures e
+        SET converted = r.any_converted, conversion_value = r.total_value
+        FROM ranked r
+        WHERE e.id = r.id AND r.rn = 1
+    """)
+    op.execute("""
+        DELETE FROM ab_test_exposures e
+        USING ab_test_exposures keep
+        WHERE e.test_id = keep.test_id AND e.user_id = keep.user_id
+          AND (keep.created_at, keep.id) < (e.created_at, e.id)
+    """)
+    op.create_index(
+        "uq_ab_test_exposures_test_user",
+        "ab_test_exposures",
+        ["test_id", "user_id"],
+        unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_ab_test_exposures_test_user", table_name="ab_test_exposures")
@@ -0,0 +1,61 @@
+"""Referral closure table
+
+Revision ID: 005
+Revises: 004
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "005"
+down_revision = "004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "referral_ancestors",
+        sa.Column("ancestor_id", sa.Integer(), sa.ForeignKey("users.user_id"), primary_key=True),
+        sa.Column("descendant_id", sa.Integer(), sa.ForeignKey("users.user_id"), primary_key=True),
+        sa.Column("depth", sa.Integer(), nullable=False),
+    )
+    op.create_index(
+        "ix_referral_ancestors_descendant_depth",
+        "referral_ancestors",
+        ["descendant_id", "depth"]
+    )
+
+    # Заполнение из invited_by_id: все предки каждого пользователя
+    op.execute("""
+        INSERT INTO referral_ancestors (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE upline(ancestor_id, descendant_id, depth, path) AS (
+            SELECT invited_by_id, user_id, 1, ARRAY[user_id]
+            FROM users
+            WHERE invited_by_id IS NOT NULL AND invited_by_id <> user_id
+          UNION ALL
+            SELECT u.invited_by_id, up.descendant_id, up.depth + 1, up.path || u.user_id
+            FROM upline up
+            JOIN users u ON u.user_id = up.ancestor_id
+            WHERE u.invited_by_id IS NOT NULL
+              -- защита от циклов в старых данных
+              AND NOT u.invited_by_id = ANY(up.path || u.user_id)
+        )
+        SELECT ancestor_id, descendant_id, depth FROM upline
+    """)
+
+    # total_referrals - размер поддерева
+    op.execute("""
+        UPDATE users u
+        SET total_referrals = s.size
+        FROM (
+            SELECT ancestor_id, count(*) AS size
+            FROM referral_ancestors
+            GROUP BY ancestor_id
+        ) s
+        WHERE u.user_id = s.ancestor_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_referral_ancestors_descendant_depth", table_name="referral_ancestors")
+    op.drop_table("referral_ancestors")
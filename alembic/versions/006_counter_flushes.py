@@ -0,0 +1,26 @@
+"""Write-behind counter flush log
+
+Revision ID: 006
+Revises: 005
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "006"
+down_revision = "005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "counter_flushes",
+        sa.Column("batch_id", sa.String(32), primary_key=True),
+        sa.Column("flushed_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_counter_flushes_flushed_at", "counter_flushes", ["flushed_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_counter_flushes_flushed_at", table_name="counter_flushes")
+    op.drop_table("counter_flushes")
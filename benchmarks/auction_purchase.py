@@ -0,0 +1,121 @@
+# benchmarks/auction_purchase.py
+"""
+Устойчивая скорость покупок на одном «горячем» аукционе.
+
+Нужны Postgres и Redis из .env (docker-compose.dev.yml). Бенчмарк создаёт
+таблицы при необходимости, аукцион и покупателей с большим балансом.
+
+    python -m benchmarks.auction_purchase --buyers 1000 --concurrency 500 --duration 30
+    python -m benchmarks.auction_purchase --mode row-lock   # наивный вариант для сравнения
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from bot.core.config import config
+from bot.domain.services.auction_service import AuctionService, PurchaseStatus, calculate_price
+from bot.infra.database.models import Auction, Base, Purchase, User
+
+BUYER_ID_OFFSET = 1_900_000_000
+
+
+async def prepare(session_factory, buyers: int) -> str:
+    """Аукцион и покупатели для прогона"""
+    auction_id = str(uuid.uuid4())
+    async with session_factory() as session:
+        async with session.begin():
+            await session.execute(
+                insert(User)
+                .values([
+                    {"user_id": BUYER_ID_OFFSET + i, "first_name": f"bench{i}", "soft_currency": 10 ** 12}
+                    for i in range(buyers)
+                ])
+                .on_conflict_do_update(index_elements=["user_id"], set_={"soft_currency": 10 ** 12})
+            )
+            session.add(Auction(id=auction_id, creator_id=BUYER_ID_OFFSET, base_price=100, current_price=100))
+    return auction_id
+
+
+async def purchase_row_lock(session_factory, user_id: int, auction_id: str, key: str) -> None:
+    """Наивная покупка: блокировка строки аукциона на каждую покупку"""
+    async with session_factory() as session:
+        async with session.begin():
+            auction = (await session.execute(
+                select(Auction).where(Auction.id == auction_id).with_for_update()
+            )).scalar_one()
+            price = calculate_price(auction.base_price, auction.times_purchased)
+            await session.execute(
+                update(User).where(User.user_id == user_id).values(soft_currency=User.soft_currency - price)
+            )
+            session.add(Purchase(user_id=user_id, auction_id=auction_id, price_paid=price, idempotency_key=key))
+            auction.times_purchased += 1
+            auction.current_price = calculate_price(auction.base_price, auction.times_purchased)
+
+
+async def run(args) -> None:
+    engine = create_async_engine(
+        config.DATABASE_URL,
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    auction_id = await prepare(session_factory, args.buyers)
+    service = AuctionService(session_factory)
+    await service.start()
+
+    latencies = []
+    statuses = {}
+    deadline = time.perf_counter() + args.duration
+
+    async def buyer(worker: int) -> None:
+        user_id = BUYER_ID_OFFSET + worker % args.buyers
+        while time.perf_counter() < deadline:
+            key = uuid.uuid4().hex
+            started = time.perf_counter()
+            if args.mode == "engine":
+                status, _ = await service.purchase(user_id, auction_id, key)
+            else:
+                await purchase_row_lock(session_factory, user_id, auction_id, key)
+                status = PurchaseStatus.OK
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(buyer(i) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    await service.stop()
+
+    async with session_factory() as session:
+        auction = (await session.execute(select(Auction).where(Auction.id == auction_id))).scalar_one()
+    await engine.dispose()
+
+    latencies.sort()
+    ok = statuses.get(PurchaseStatus.OK, 0)
+    print(f"mode:          {args.mode}")
+    print(f"purchases:     {ok} in {elapsed:.1f}s -> {ok / elapsed:.0f}/s")
+    print(f"statuses:      {dict((s.value, n) for s, n in statuses.items())}")
+    print(f"latency p50:   {statistics.median(latencies) * 1000:.1f} ms")
+    print(f"latency p99:   {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms")
+    print(f"auction row:   times_purchased={auction.times_purchased} current_price={auction.current_price}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("engine", "row-lock"), default="engine")
+    parser.add_argument("--buyers", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=30)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/broadcast.py
+"""
+Рассылка через OutboundSender в локальную заглушку Bot API.
+
+Показывает фактическую скорость отправки, долю 429 от заглушки (должна
+быть около нуля - значит лимиты соблюдаются), ETA и возобновление после
+остановки. Нужен Redis из .env (общий bucket и прогресс рассылки).
+
+    python -m benchmarks.broadcast --recipients 3000
+    python -m benchmarks.broadcast --recipients 3000 --stop-after 20   # затем запустить с --resume <id>
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.fake_bot_api import FakeBotAPI, start
+from bot.infra.outbound.broadcast import Broadcaster
+from bot.infra.outbound.sender import OutboundSender
+
+
+async def run(args) -> None:
+    api = FakeBotAPI(latency=args.latency)
+    runner = await start(api, port=args.port)
+
+    sender = OutboundSender(api_url=f"http://127.0.0.1:{args.port}", token="0:bench")
+    await sender.start()
+
+    async def recipients(after: int, limit: int):
+        return list(range(after + 1, min(after + limit, args.recipients) + 1))
+
+    async def total() -> int:
+        return args.recipients
+
+    broadcaster = Broadcaster(sender, recipients=recipients, total=total, chunk_size=args.chunk)
+    if args.resume:
+        broadcast_id = args.resume
+        await broadcaster.resume_all()
+    else:
+        broadcast_id = await broadcaster.create("Benchmark broadcast")
+
+    started = time.monotonic()
+    deadline = started + args.stop_after if args.stop_after else None
+    while True:
+        await asyncio.sleep(2)
+        progress = await broadcaster.progress(broadcast_id)
+        print(
+            f"[{time.monotonic() - started:6.1f}s] {progress['status']:9} "
+            f"sent={progress['sent']} failed={progress['failed']}/{progress['total']} "
+            f"rate={progress['rate']:.1f}/s eta={progress['eta_seconds']:.0f}s"
+        )
+        if progress["status"] != "running" or (deadline and time.monotonic() > deadline):
+            break
+
+    await broadcaster.stop()
+    await sender.stop()
+    await runner.cleanup()
+    print(f"broadcast id:   {broadcast_id}")
+    print(f"delivered:      {api.calls['sendMessage']}")
+    print(f"429 from API:   {api.rejected}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipients", type=int, default=3000)
+    parser.add_argument("--chunk", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--stop-after", type=float, default=0)
+    parser.add_argument("--resume", default=None)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/decode.py
+"""
+CPU на разбор тела вебхука до диспетчера, мкс на обновление.
+
+    old       json.loads + Update(**data) + повторная валидация внутри
+              Dispatcher.feed_update (model_dump/model_validate: Update не
+              привязан к боту)
+    envelope  orjson + UpdateEnvelope + Update.model_validate с ботом в
+              контексте - один проход pydantic
+    dropped   только orjson + UpdateEnvelope: обновление отброшено по
+              контексту (бан, повтор update_id) до построения модели
+
+Смесь обновлений - как в нагрузочном тесте (UpdateFactory). Redis и БД
+не нужны.
+
+    python -m benchmarks.decode --updates 5000
+"""
+from typing import Any, Callable, Dict, List
+import argparse
+import json
+import time
+
+from aiogram import Bot
+from aiogram.types import Update
+
+from benchmarks.updates import UpdateFactory
+from bot.infra.webhook.envelope import UpdateEnvelope
+
+
+def measure(cases: Dict[str, Callable[[bytes], Any]], bodies: List[bytes], rounds: int) -> Dict[str, float]:
+    """Лучшее из rounds процессорное время на обновление, мкс"""
+    best = {name: float("inf") for name in cases}
+    for _ in range(rounds):
+        for name, decode in cases.items():
+            started = time.process_time()
+            for body in bodies:
+                decode(body)
+            best[name] = min(best[name], (time.process_time() - started) / len(bodies) * 1_000_000)
+    return best
+
+
+def run(args) -> None:
+    factory = UpdateFactory(users=args.users, seed=args.seed)
+    bodies = [json.dumps(payload).encode() for _, payload in factory.batch(args.updates)]
+    bot = Bot(token="42:benchmark")
+
+    def old(body: bytes) -> Update:
+        update = Update(**json.loads(body))
+        # То, что делал Dispatcher.feed_update с Update без бота
+        return Update.model_validate(update.model_dump(), context={"bot": bot})
+
+    def envelope(body: bytes) -> Update:
+        return UpdateEnvelope.parse(body).update(bot)
+
+    def dropped(body: bytes) -> UpdateEnvelope:
+        return UpdateEnvelope.parse(body)
+
+    results = measure({"old": old, "envelope": envelope, "dropped": dropped}, bodies, args.rounds)
+    print(f"{'path':<12} {'cpu us/update':>14} {'vs old':>8}")
+    for name, us in results.items():
+        print(f"{name:<12} {us:>14.1f} {results['old'] / us:>7.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=1)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# benchmarks/fake_bot_api.py
+"""
+Локальная заглушка Telegram Bot API для бенчмарков и ручной проверки.
+
+Отвечает на любой метод ok=true с задержкой --latency и возвращает 429
+с retry_after, если нарушены лимиты Telegram (глобальный на бота и
+интервал сообщений в один чат), - так видно, соблюдает ли их отправитель.
+
+    python -m benchmarks.fake_bot_api --port 8081
+    TELEGRAM_API_URL=http://127.0.0.1:8081 python -m bot.main
+"""
+import argparse
+import asyncio
+import collections
+import time
+
+from aiohttp import web
+
+
+class FakeBotAPI:
+    """Заглушка Bot API со счётчиками и проверкой лимитов"""
+
+    def __init__(self, latency: float = 0.02, global_rate: int = 30, chat_interval: float = 1.0):
+        self.latency = latency
+        self.global_rate = global_rate
+        self.chat_interval = chat_interval
+        self.calls = collections.Counter()  # метод -> число вызовов
+        self.rejected = 0
+        self._recent = collections.deque()  # времена вызовов за последнюю секунду
+        self._chat_last = {}
+        self._message_id = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        return app
+
+    def _limited(self, chat_id) -> bool:
+        now = time.monotonic()
+        while self._recent and self._recent[0] < now - 1:
+            self._recent.popleft()
+        if len(self._recent) >= self.global_rate:
+            return True
+        if chat_id is not None and now - self._chat_last.get(chat_id, 0) < self.chat_interval:
+            return True
+        self._recent.append(now)
+        if chat_id is not None:
+            self._chat_last[chat_id] = now
+        return False
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        payload = await request.json() if request.can_read_body else {}
+        await asyncio.sleep(self.latency)
+
+        if self._limited(payload.get("chat_id")):
+            self.rejected += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1},
+            })
+
+        self.calls[method] += 1
+        self._message_id += 1
+        return web.json_response({
+            "ok": True,
+            "result": {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": payload.get("chat_id"), "type": "private"},
+                "text": payload.get("text"),
+            },
+        })
+
+
+async def start(api: FakeBotAPI, host: str = "127.0.0.1", port: int = 8081) -> web.AppRunner:
+    """Запустить заглушку в текущем event loop"""
+    runner = web.AppRunner(api.app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    web.run_app(FakeBotAPI(latency=args.latency).app(), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
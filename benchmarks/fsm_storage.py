@@ -0,0 +1,142 @@
+# benchmarks/fsm_storage.py
+"""
+FSM-хранилища: aiogram RedisStorage против CompactRedisStorage.
+
+Каждый шаг диалога делает то же, что типичный обработчик: get_state,
+get_data, update_data, set_state. Меряются шаги в секунду, команды Redis
+на шаг (INFO commandstats) и память на незавершённый диалог
+(MEMORY USAGE). Нужен Redis из .env; ключи пишутся с отдельным
+префиксом и удаляются после прогона.
+
+    python -m benchmarks.fsm_storage --dialogs 2000 --steps 5
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+import argparse
+import asyncio
+import time
+
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from aiogram.fsm.storage.redis import DefaultKeyBuilder, RedisStorage
+
+from bot.core.config import config
+from bot.infra.cache.fsm_storage import FIELDS, CompactRedisStorage
+from bot.infra.cache.redis_client import redis_client
+
+BOT_ID = 42
+PREFIX = "bench_fsm"
+STATES = ("AuctionStates:choose_lot", "AuctionStates:enter_amount", "AuctionStates:confirm")
+
+
+def step_data(step: int) -> Dict[str, Any]:
+    # Похоже на данные диалога покупки: id лота, сумма, id сообщения
+    return {"lot_id": f"lot-{step * 7919 % 1000}", "amount": 100 + step * 10, "message_id": 1000 + step}
+
+
+async def run_step(storage: BaseStorage, key: StorageKey, step: int) -> None:
+    await storage.get_state(key)
+    await storage.get_data(key)
+    await storage.update_data(key, step_data(step))
+    await storage.set_state(key, STATES[step % len(STATES)])
+
+
+async def command_count() -> int:
+    stats = await redis_client.info("commandstats")
+    return sum(value["calls"] for name, value in stats.items() if name != "cmdstat_info")
+
+
+async def measure(
+    name: str,
+    step: Callable[[StorageKey, int], Awaitable[None]],
+    keys: List[StorageKey],
+    steps: int,
+    concurrency: int
+) -> Tuple[str, float, float]:
+    """(случай, шагов/сек, команд Redis на шаг)"""
+    work = iter([(key, i) for i in range(steps) for key in keys])
+
+    async def worker() -> None:
+        for key, i in work:
+            await step(key, i)
+
+    commands = await command_count()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    per_step = (await command_count() - commands) / (len(keys) * steps)
+    return name, len(keys) * steps / elapsed, per_step
+
+
+async def memory_per_dialog(redis_keys: List[str], dialogs: int) -> float:
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for key in redis_keys:
+            pipe.memory_usage(key)
+        sizes = await pipe.execute()
+    return sum(size or 0 for size in sizes) / dialogs
+
+
+async def cleanup() -> None:
+    keys = [key async for key in redis_client.scan_iter(match=f"{PREFIX}*", count=1000)]
+    for i in range(0, len(keys), 1000):
+        await redis_client.delete(*keys[i:i + 1000])
+
+
+async def run(args) -> None:
+    keys = [StorageKey(bot_id=BOT_ID, chat_id=user_id, user_id=user_id) for user_id in range(1, args.dialogs + 1)]
+
+    default = RedisStorage(
+        redis_client,
+        key_builder=DefaultKeyBuilder(prefix=PREFIX),
+        state_ttl=config.FSM_TTL,
+        data_ttl=config.FSM_TTL
+    )
+    compact = CompactRedisStorage(redis_client, ttl=config.FSM_TTL, prefix=f"{PREFIX}c")
+
+    async def default_step(key: StorageKey, i: int) -> None:
+        await run_step(default, key, i)
+
+    async def compact_step(key: StorageKey, i: int) -> None:
+        # Как в боте: одно обновление - один batch
+        async with compact.batch():
+            await run_step(compact, key, i)
+
+    async def compact_prefetched_step(key: StorageKey, i: int) -> None:
+        # ContextLoader читает hash в общем pipeline с остальным контекстом
+        async with compact.batch():
+            state, data = await redis_client.hmget(compact.redis_key(key), FIELDS)
+            compact.prime(key, state, data)
+            await run_step(compact, key, i)
+
+    await cleanup()
+    results = []
+    try:
+        for name, step in (
+            ("RedisStorage", default_step),
+            ("CompactRedisStorage", compact_step),
+            ("Compact + prefetch", compact_prefetched_step),
+        ):
+            results.append(await measure(name, step, keys, args.steps, args.concurrency))
+
+        default_keys = [default.key_builder.build(key, part) for key in keys for part in ("state", "data")]
+        compact_keys = [compact.redis_key(key) for key in keys]
+        default_memory = await memory_per_dialog(default_keys, len(keys))
+        compact_memory = await memory_per_dialog(compact_keys, len(keys))
+    finally:
+        await cleanup()
+
+    print(f"{'storage':<22} {'steps/sec':>10} {'cmds/step':>10}")
+    for name, rate, per_step in results:
+        print(f"{name:<22} {rate:>10.0f} {per_step:>10.1f}")
+    print(f"\nmemory per dialog: RedisStorage {default_memory:.0f} B, CompactRedisStorage {compact_memory:.0f} B")
+    print("(prefetch: HMGET идёт в общем pipeline ContextLoader - отдельной команды в боте нет)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dialogs", type=int, default=2000)
+    parser.add_argument("--steps", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=50)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# benchmarks/hot_counters.py
+"""
+Приращения счётчиков одного «горячего» пользователя: write-behind через
+Redis против UPDATE строки на каждое приращение.
+
+Нужны Postgres и Redis из .env (docker-compose.dev.yml). В конце
+проверяется, что в БД записано ровно столько, сколько начислено.
+
+    python -m benchmarks.hot_counters --concurrency 200 --duration 20
+    python -m benchmarks.hot_counters --mode direct
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from bot.core.config import config
+from bot.infra.cache.counters import HotCounters
+from bot.infra.database.models import Base, User
+
+HOT_USER_ID = 1_900_000_000 - 1
+
+
+async def run(args) -> None:
+    engine = create_async_engine(
+        config.DATABASE_URL,
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with session_factory() as session:
+        async with session.begin():
+            await session.execute(
+                insert(User)
+                .values(user_id=HOT_USER_ID, first_name="hot", soft_currency=0, total_referrals=0)
+                .on_conflict_do_update(index_elements=["user_id"], set_={"soft_currency": 0, "total_referrals": 0})
+            )
+
+    counters = HotCounters(session_factory, flush_interval=args.flush_interval, batch_size=config.COUNTERS_FLUSH_BATCH)
+    await counters.start()
+
+    increments = 0
+    deadline = time.perf_counter() + args.duration
+
+    async def writer() -> None:
+        nonlocal increments
+        while time.perf_counter() < deadline:
+            if args.mode == "write-behind":
+                await counters.incr(HOT_USER_ID, {"soft_currency": 1, "total_referrals": 1})
+            else:
+                async with session_factory() as session:
+                    async with session.begin():
+                        await session.execute(
+                            update(User)
+                            .where(User.user_id == HOT_USER_ID)
+                            .values(
+                                soft_currency=User.soft_currency + 1,
+                                total_referrals=User.total_referrals + 1
+                            )
+                        )
+            increments += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(writer() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    merged = await counters.read(HOT_USER_ID)
+    flush_started = time.perf_counter()
+    await counters.stop()
+    flush_elapsed = time.perf_counter() - flush_started
+
+    async with session_factory() as session:
+        row = (await session.execute(
+            select(User.soft_currency, User.total_referrals).where(User.user_id == HOT_USER_ID)
+        )).one()
+    await engine.dispose()
+
+    print(f"mode:             {args.mode}")
+    print(f"increments:       {increments} in {elapsed:.1f}s -> {increments / elapsed:.0f}/s")
+    print(f"merged read:      soft_currency={merged['soft_currency']}")
+    print(f"final flush:      {flush_elapsed * 1000:.0f} ms")
+    print(f"database:         soft_currency={row.soft_currency} total_referrals={row.total_referrals}")
+    print(f"consistent:       {row.soft_currency == increments and row.total_referrals == increments}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("write-behind", "direct"), default="write-behind")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--flush-interval", type=float, default=config.COUNTERS_FLUSH_INTERVAL)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# benchmarks/middlewares.py
+"""
+Микробенчмарки горячего пути: middleware, предзагрузка контекста,
+RedisTokenBucket, переводы и клавиатуры. Нужен Redis из .env.
+
+    python -m benchmarks.middlewares --iterations 20000
+    python -m benchmarks.middlewares --filter token_bucket
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+import argparse
+import asyncio
+import time
+
+from aiogram import Bot
+from aiogram.types import Update
+
+from benchmarks.updates import UpdateFactory
+from bot.app.context import ContextLoader, UserContext
+from bot.infra.webhook.envelope import UpdateEnvelope
+from bot.app.keyboards.base import get_keyboard, prebuild_keyboards
+from bot.app.keyboards.main import main_menu
+from bot.app.middlewares.auth import AuthMiddleware
+from bot.app.middlewares.i18n import I18nMiddleware
+from bot.app.middlewares.rate_limit import RateLimitMiddleware
+from bot.core.config import config
+from bot.core.i18n import catalogs
+from bot.infra.cache.rate_limiter import LocalPreFilter, RedisTokenBucket
+
+
+async def _noop_handler(event: Any, data: Dict[str, Any]) -> None:
+    return None
+
+
+async def measure(func: Callable[[int], Awaitable[Any]], iterations: int, concurrency: int) -> Tuple[float, float]:
+    """(операций/сек, мкс на операцию) при заданном параллелизме"""
+    counter = iter(range(iterations))
+
+    async def worker() -> None:
+        for i in counter:
+            await func(i)
+
+    # Прогрев: загрузка скриптов в Redis, соединения пула
+    for i in range(min(100, iterations)):
+        await func(i)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return iterations / elapsed, elapsed / iterations * 1_000_000
+
+
+async def run(args) -> None:
+    factory = UpdateFactory(users=args.users, seed=args.seed)
+    # Только сообщения: rate limit проверяется для них
+    updates: List[Update] = [Update(**factory.make("command")) for _ in range(1000)]
+    envelopes = [UpdateEnvelope.from_update(update) for update in updates]
+    bot = Bot(token=config.BOT_TOKEN)
+
+    rate_limit = RateLimitMiddleware(rate=10 ** 6, window=1, prefilter=False)
+    auth = AuthMiddleware()
+    i18n = I18nMiddleware(default_locale=config.DEFAULT_LANGUAGE)
+    loader = ContextLoader(_DispatcherStub(), limiter=rate_limit.limiter)
+
+    def data_for(update: Update, prefetched: bool) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"event_from_user": update.message.from_user}
+        if prefetched:
+            user_ctx = UserContext(update.message.from_user.id, config.DEFAULT_LANGUAGE)
+            user_ctx.rate_allowed = True
+            data["user_ctx"] = user_ctx
+        return data
+
+    def middleware_case(middleware, prefetched: bool) -> Callable[[int], Awaitable[Any]]:
+        async def call(i: int) -> Any:
+            update = updates[i % len(updates)]
+            return await middleware(_noop_handler, update, data_for(update, prefetched))
+        return call
+
+    bucket = RedisTokenBucket(capacity=10 ** 6, refill_rate=10 ** 6)
+    bucket_prefiltered = RedisTokenBucket(capacity=10 ** 6, refill_rate=10 ** 6, prefilter=True)
+    prefilter = LocalPreFilter(capacity=10 ** 6, refill_rate=10 ** 6)
+
+    async def prefilter_allow(i: int) -> bool:
+        return prefilter.allow(str(i % args.users))
+
+    prebuild_keyboards()
+    locales = catalogs.locales
+    translator = catalogs.get("en")
+
+    async def keyboard_build(i: int) -> Any:
+        return main_menu(catalogs.get(locales[i % len(locales)]))
+
+    async def keyboard_prebuilt(i: int) -> Any:
+        return get_keyboard("main_menu", locales[i % len(locales)])
+
+    async def translate_format(i: int) -> str:
+        return translator("🏭 Уровень: {level}", level=i % 50)
+
+    cases: List[Tuple[str, Callable[[int], Awaitable[Any]]]] = [
+        ("rate_limit (redis)", middleware_case(rate_limit, prefetched=False)),
+        ("rate_limit (prefetched)", middleware_case(rate_limit, prefetched=True)),
+        ("auth (redis)", middleware_case(auth, prefetched=False)),
+        ("auth (prefetched)", middleware_case(auth, prefetched=True)),
+        ("i18n (redis)", middleware_case(i18n, prefetched=False)),
+        ("i18n (prefetched)", middleware_case(i18n, prefetched=True)),
+        ("context_loader.load", lambda i: loader.load(bot, envelopes[i % len(envelopes)])),
+        ("token_bucket.is_allowed", lambda i: bucket.is_allowed(str(i % args.users))),
+        ("token_bucket + prefilter", lambda i: bucket_prefiltered.is_allowed(str(i % args.users))),
+        ("local_prefilter.allow", prefilter_allow),
+        ("keyboard (build)", keyboard_build),
+        ("keyboard (prebuilt)", keyboard_prebuilt),
+        ("i18n format (cached)", translate_format),
+    ]
+
+    print(f"{'case':<28} {'ops/sec':>12} {'us/op':>10}")
+    for name, func in cases:
+        if args.filter and args.filter not in name:
+            continue
+        ops, per_op = await measure(func, args.iterations, args.concurrency)
+        print(f"{name:<28} {ops:>12.0f} {per_op:>10.1f}")
+
+    await bot.session.close()
+
+
+class _DispatcherStub:
+    """Минимум Dispatcher для ContextLoader без FSM-хранилища"""
+    storage = None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--filter", default=None, help="запустить только случаи, содержащие подстроку")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
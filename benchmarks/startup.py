@@ -0,0 +1,184 @@
+# benchmarks/startup.py
+"""
+Холодный старт воркера: время импорта и время до первого обновления.
+
+    imports   импорт модуля в чистом интерпретаторе, мс (лучшее из --runs):
+              что воркер импортирует до открытия порта (startup) и что -
+              в фоне (handler: aiogram, диспетчер, сервисы)
+    startup   настоящий воркер (python -m bot.main --workers 1) с локальной
+              заглушкой Bot API; от запуска процесса до ответа /healthz,
+              /readyz и до первого обработанного обновления (200 на вебхук;
+              503 "Starting" повторяется, как это делает Telegram).
+              background - порт сразу, eager - порт после прогрева (как
+              было до двухэтапного запуска)
+
+Для startup нужны Redis и Postgres из .env (docker-compose.dev.yml).
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --only imports
+"""
+from typing import Dict, List
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from aiohttp import ClientError, ClientSession
+
+from benchmarks.fake_bot_api import FakeBotAPI, start
+from benchmarks.updates import UpdateFactory
+from bot.core.config import config
+
+IMPORT_MODULES = (
+    "bot.core.config",
+    "bot.infra.webhook.startup",
+    "bot.infra.webhook.handler",
+    "bot.app.routers.admin",
+)
+
+MODES = ("background", "eager")
+POLL_INTERVAL = 0.005
+
+
+def import_time(module: str) -> float:
+    """Секунды на import module в новом процессе"""
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_imports(runs: int) -> Dict[str, float]:
+    return {module: min(import_time(module) for _ in range(runs)) * 1000 for module in IMPORT_MODULES}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_worker(session: ClientSession, mode: str, api_port: int, body: str, timeout: float) -> Dict[str, float]:
+    """Секунды от запуска процесса до healthz, readyz и первого обновления"""
+    port = free_port()
+    env = dict(
+        os.environ,
+        WEB_HOST="127.0.0.1",
+        WEBHOOK_PORT=str(port),
+        METRICS_PORT=str(free_port()),
+        TELEGRAM_API_URL=f"http://127.0.0.1:{api_port}",
+        WEBHOOK_STARTUP=mode,
+        WEBHOOK_FAST_ACK="false",
+        WEB_WORKERS="1",
+    )
+    base = f"http://127.0.0.1:{port}"
+    headers = {"Content-Type": "application/json"}
+    if config.WEBHOOK_SECRET:
+        headers["X-Telegram-Bot-Api-Secret-Token"] = config.WEBHOOK_SECRET
+
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "bot.main", "--workers", "1"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    marks: Dict[str, float] = {}
+
+    async def poll(name: str, path: str) -> None:
+        while name not in marks:
+            try:
+                async with session.get(base + path) as response:
+                    if response.status == 200:
+                        marks[name] = time.perf_counter() - started
+                        return
+            except ClientError:
+                pass
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def first_update() -> None:
+        # Как Telegram: шлём, пока не получим 200
+        while True:
+            try:
+                async with session.post(base + config.WEBHOOK_PATH, data=body, headers=headers) as response:
+                    if response.status == 200:
+                        marks["first_update"] = time.perf_counter() - started
+                        return
+            except ClientError:
+                pass
+            await asyncio.sleep(POLL_INTERVAL)
+
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(poll("healthz", "/healthz"), poll("readyz", "/readyz"), first_update()),
+            timeout,
+        )
+    finally:
+        process.terminate()
+        process.wait()
+    return marks
+
+
+async def measure_startup(args) -> Dict[str, Dict[str, float]]:
+    from benchmarks.webhook_load import prepare_database
+
+    api = FakeBotAPI(latency=0.0, global_rate=10 ** 6)
+    api_runner = await start(api, port=args.api_port)
+    await prepare_database()
+
+    # update_id от времени запуска: прошлые прогоны не считаются повторами
+    factory = UpdateFactory(users=args.users, seed=args.seed, first_update_id=time.time_ns() // 1000)
+    results: Dict[str, Dict[str, float]] = {}
+    try:
+        async with ClientSession() as session:
+            for mode in MODES:
+                runs: Dict[str, List[float]] = {}
+                for _ in range(args.runs):
+                    _, update = factory.batch(1)[0]
+                    marks = await start_worker(session, mode, args.api_port, json.dumps(update), args.timeout)
+                    for name, seconds in marks.items():
+                        runs.setdefault(name, []).append(seconds * 1000)
+                results[mode] = {name: statistics.median(samples) for name, samples in runs.items()}
+    finally:
+        await api_runner.cleanup()
+    return results
+
+
+def print_imports(results: Dict[str, float]) -> None:
+    print(f"{'import':<30} {'ms':>8}")
+    for module, ms in results.items():
+        print(f"{module:<30} {ms:>8.0f}")
+
+
+def print_startup(results: Dict[str, Dict[str, float]]) -> None:
+    row = "{:<12} {:>10} {:>10} {:>14}"
+    print(row.format("mode", "healthz", "readyz", "first update"))
+    for mode, marks in results.items():
+        cells = (f"{marks.get(name, float('nan')):.0f} ms" for name in ("healthz", "readyz", "first_update"))
+        print(row.format(mode, *cells))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--only", choices=("imports", "startup"))
+    parser.add_argument("--timeout", type=float, default=60.0, help="секунд на один запуск воркера")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--api-port", type=int, default=8081)
+    args = parser.parse_args()
+
+    if args.only != "startup":
+        print_imports(measure_imports(args.runs))
+    if args.only != "imports":
+        if args.only is None:
+            print()
+        print_startup(asyncio.run(measure_startup(args)))
+
+
+if __name__ == "__main__":
+    main()
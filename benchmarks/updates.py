@@ -0,0 +1,113 @@
+# benchmarks/updates.py
+"""
+Генератор синтетических обновлений Telegram для нагрузочных тестов.
+
+Смесь близка к реальному трафику: команды, нажатия inline-кнопок,
+покупки на аукционе и переходы по реферальным ссылкам. Генерация
+детерминирована (seed), поэтому прогоны сравнимы между собой.
+"""
+from typing import Any, Dict, Iterator, List, Tuple
+import itertools
+import random
+import time
+
+# Пользователи бенчмарков не пересекаются с реальными (int4 в users.user_id)
+USER_ID_OFFSET = 1_800_000_000
+
+COMMANDS = ("/start", "/profile", "/factory", "/auction", "/help", "/top")
+CALLBACKS = ("factory:collect", "factory:upgrade", "profile:open", "auction:list:0", "lang:en", "lang:ru")
+LANGUAGES = ("ru", "ru", "ru", "en")
+
+# (вид обновления, вес)
+DEFAULT_MIX: Tuple[Tuple[str, int], ...] = (
+    ("command", 40),
+    ("callback", 35),
+    ("auction_buy", 15),
+    ("referral_start", 5),
+    ("text", 5),
+)
+
+
+class UpdateFactory:
+    """Синтетические payload'ы обновлений (dict в формате Bot API)"""
+
+    def __init__(
+        self,
+        users: int = 10_000,
+        auctions: int = 50,
+        seed: int = 1,
+        mix: Tuple[Tuple[str, int], ...] = DEFAULT_MIX,
+        first_update_id: int = 1
+    ):
+        """first_update_id: повторные прогоны против того же Redis должны
+        начинать с новых id - иначе вебхук отбросит их как повторы"""
+        self.users = users
+        self.auctions = auctions
+        self.random = random.Random(seed)
+        self.kinds = [kind for kind, _ in mix]
+        self.weights = [weight for _, weight in mix]
+        self._update_ids = itertools.count(first_update_id)
+        self._message_ids = itertools.count(1)
+
+    def _user(self) -> Dict[str, Any]:
+        user_id = USER_ID_OFFSET + self.random.randrange(self.users)
+        return {
+            "id": user_id,
+            "is_bot": False,
+            "first_name": f"Bench{user_id - USER_ID_OFFSET}",
+            "language_code": LANGUAGES[user_id % len(LANGUAGES)],
+        }
+
+    def _message(self, user: Dict[str, Any], text: str) -> Dict[str, Any]:
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": user["id"], "type": "private", "first_name": user["first_name"]},
+            "from": user,
+            "text": text,
+        }
+        if text.startswith("/"):
+            command = text.split(" ", 1)[0]
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+        return message
+
+    def _callback(self, user: Dict[str, Any], data: str) -> Dict[str, Any]:
+        # Кнопка под сообщением бота в личном чате с пользователем
+        message = self._message(user, "menu")
+        message["from"] = {"id": 1, "is_bot": True, "first_name": "Bot"}
+        return {
+            "id": str(self.random.getrandbits(63)),
+            "from": user,
+            "chat_instance": str(user["id"]),
+            "message": message,
+            "data": data,
+        }
+
+    def make(self, kind: str) -> Dict[str, Any]:
+        """Одно обновление заданного вида"""
+        user = self._user()
+        update: Dict[str, Any] = {"update_id": next(self._update_ids)}
+
+        if kind == "command":
+            update["message"] = self._message(user, self.random.choice(COMMANDS))
+        elif kind == "callback":
+            update["callback_query"] = self._callback(user, self.random.choice(CALLBACKS))
+        elif kind == "auction_buy":
+            auction_id = 1 + self.random.randrange(self.auctions)
+            key = self.random.getrandbits(48)
+            update["callback_query"] = self._callback(user, f"auction:buy:{auction_id}:{key:x}")
+        elif kind == "referral_start":
+            referrer = USER_ID_OFFSET + self.random.randrange(self.users)
+            update["message"] = self._message(user, f"/start ref_{referrer}")
+        else:
+            update["message"] = self._message(user, "привет")
+        return update
+
+    def stream(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Бесконечный поток (вид, обновление) согласно весам смеси"""
+        while True:
+            kind = self.random.choices(self.kinds, self.weights)[0]
+            yield kind, self.make(kind)
+
+    def batch(self, count: int) -> List[Tuple[str, Dict[str, Any]]]:
+        return list(itertools.islice(self.stream(), count))
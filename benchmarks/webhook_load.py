@@ -0,0 +1,253 @@
+# benchmarks/webhook_load.py
+"""
+Сквозная нагрузка на вебхук: синтетические обновления через настоящее
+приложение setup_webhook_app() с локальной заглушкой Bot API.
+
+Нужны Redis и Postgres из .env (docker-compose.dev.yml). Отчёт: p50/p95/p99
+задержки ответа, обновлений/сек и разбивка по этапам (предзагрузка
+контекста, диспетчер с middleware и хендлерами, вызовы Bot API).
+
+    python -m benchmarks.webhook_load --updates 20000 --concurrency 200
+    python -m benchmarks.webhook_load --fast-ack --save main
+    python -m benchmarks.webhook_load --compare main        # сравнить с сохранённым прогоном
+"""
+from typing import Any, Awaitable, Callable, Dict, List
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+
+from aiohttp import ClientSession, TCPConnector, web
+from aiohttp.test_utils import TestServer
+
+from benchmarks.fake_bot_api import FakeBotAPI, start
+from benchmarks.updates import UpdateFactory
+from bot.core.config import config
+
+BASELINES_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 в миллисекундах"""
+    if not samples:
+        return {"count": 0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000
+
+    return {"count": len(ordered), "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
+
+
+class StageTimer:
+    """Время этапов обработки: оборачивает методы живого приложения"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+
+    def record(self, stage: str, seconds: float) -> None:
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def wrap(self, stage: str, func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - started)
+        return timed
+
+    def middleware(self):
+        @web.middleware
+        async def server_time(request: web.Request, handler):
+            started = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                self.record("server", time.perf_counter() - started)
+        return server_time
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        return {stage: percentiles(samples) for stage, samples in self.samples.items()}
+
+
+async def build_app(timer: StageTimer) -> web.Application:
+    """Настоящее приложение вебхука с замером ответа сервера"""
+    # Импорт после настройки config: синглтоны читают его при импорте
+    from bot.infra.webhook.startup import setup_webhook_app
+
+    app = await setup_webhook_app()
+    app.middlewares.append(timer.middleware())
+    return app
+
+
+async def instrument(app: web.Application, timer: StageTimer) -> None:
+    """Замеры этапов; диспетчер появляется после фонового запуска воркера"""
+    startup = app["startup"]
+    if not await startup.wait():
+        raise RuntimeError("Webhook app failed to start") from startup.error
+    dp = startup.dp
+    loader = dp["context_loader"]
+    loader.load = timer.wrap("context", loader.load)
+    dp.feed_update = timer.wrap("dispatch", dp.feed_update)
+
+
+async def prepare_database() -> None:
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from bot.infra.database.models import Base
+
+    engine = create_async_engine(config.DATABASE_URL)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await engine.dispose()
+
+
+async def run(args) -> Dict[str, Any]:
+    api = FakeBotAPI(latency=args.api_latency, global_rate=10 ** 6)
+    api_runner = await start(api, port=args.api_port)
+
+    # Приложение ходит в заглушку, а не в api.telegram.org
+    config.TELEGRAM_API_URL = f"http://127.0.0.1:{args.api_port}"
+    config.WEBHOOK_FAST_ACK = args.fast_ack
+    await prepare_database()
+
+    timer = StageTimer()
+    server = TestServer(await build_app(timer))
+    await server.start_server()
+    await instrument(server.app, timer)
+
+    # update_id от времени запуска: прошлые прогоны не считаются повторами
+    factory = UpdateFactory(users=args.users, seed=args.seed, first_update_id=time.time_ns() // 1000)
+    updates = factory.batch(args.updates)
+    headers = {"Content-Type": "application/json"}
+    if config.WEBHOOK_SECRET:
+        headers["X-Telegram-Bot-Api-Secret-Token"] = config.WEBHOOK_SECRET
+    url = str(server.make_url(config.WEBHOOK_PATH))
+
+    latencies: List[float] = []
+    by_kind: Dict[str, List[float]] = {}
+    statuses: Dict[int, int] = {}
+    pending = iter(updates)
+    interval = 1 / args.rate if args.rate else 0
+
+    async with ClientSession(connector=TCPConnector(limit=args.concurrency)) as session:
+
+        async def client() -> None:
+            for kind, update in pending:
+                body = json.dumps(update)
+                started = time.perf_counter()
+                async with session.post(url, data=body, headers=headers) as response:
+                    await response.read()
+                elapsed = time.perf_counter() - started
+                latencies.append(elapsed)
+                by_kind.setdefault(kind, []).append(elapsed)
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+                if interval:
+                    await asyncio.sleep(max(0.0, interval * args.concurrency - elapsed))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(args.concurrency)))
+        acked = time.perf_counter() - started
+
+    # Fast-ack: ответ раньше обработки - дожидаемся, пока очередь опустеет
+    await server.close()
+    elapsed = time.perf_counter() - started
+    await api_runner.cleanup()
+
+    return {
+        "meta": {
+            "updates": args.updates,
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "fast_ack": args.fast_ack,
+            "users": args.users,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "timestamp": int(time.time()),
+        },
+        "throughput": args.updates / elapsed,
+        "ack_throughput": args.updates / acked,
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "latency": percentiles(latencies),
+        "latency_by_kind": {kind: percentiles(samples) for kind, samples in by_kind.items()},
+        "stages": timer.report(),
+        "bot_api_calls": dict(api.calls),
+    }
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    row = "{:<22} {:>8} {:>10} {:>10} {:>10}"
+    print(f"updates/sec:        {result['throughput']:.0f} (acked {result['ack_throughput']:.0f}/s)")
+    print(f"HTTP statuses:      {result['statuses']}")
+    print(f"Bot API calls:      {result['bot_api_calls']}")
+    print()
+    print(row.format("", "count", "p50 ms", "p95 ms", "p99 ms"))
+    sections = [("response", result["latency"])]
+    sections += [(f"  {kind}", stats) for kind, stats in sorted(result["latency_by_kind"].items())]
+    sections += [(f"stage: {stage}", stats) for stage, stats in sorted(result["stages"].items())]
+    for name, stats in sections:
+        print(row.format(name, stats["count"], f"{stats['p50']:.2f}", f"{stats['p95']:.2f}", f"{stats['p99']:.2f}"))
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> bool:
+    """Сравнение с базовым прогоном; False - есть регрессия больше threshold %"""
+    ok = True
+    print()
+    print(f"vs baseline ({time.strftime('%Y-%m-%d %H:%M', time.localtime(baseline['meta']['timestamp']))}):")
+
+    def line(name: str, old: float, new: float, higher_is_better: bool) -> None:
+        nonlocal ok
+        change = (new - old) / old * 100 if old else 0.0
+        worse = -change if higher_is_better else change
+        mark = ""
+        if worse > threshold:
+            mark = "  REGRESSION"
+            ok = False
+        print(f"  {name:<24} {old:>10.2f} -> {new:>10.2f}  {change:+6.1f}%{mark}")
+
+    line("updates/sec", baseline["throughput"], result["throughput"], True)
+    for q in ("p50", "p95", "p99"):
+        line(f"response {q} ms", baseline["latency"][q], result["latency"][q], False)
+    for stage, stats in sorted(result["stages"].items()):
+        if stage in baseline["stages"]:
+            line(f"{stage} p95 ms", baseline["stages"][stage]["p95"], stats["p95"], False)
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=0, help="обновлений/сек (0 - без ограничения)")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--fast-ack", action="store_true")
+    parser.add_argument("--api-latency", type=float, default=0.02)
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--save", metavar="NAME", help="сохранить результат как базовый")
+    parser.add_argument("--compare", metavar="NAME", help="сравнить с сохранённым результатом")
+    parser.add_argument("--threshold", type=float, default=10.0, help="допустимое ухудшение, %%")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+
+    if args.save:
+        os.makedirs(BASELINES_DIR, exist_ok=True)
+        path = os.path.join(BASELINES_DIR, f"{args.save}.json")
+        with open(path, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nsaved baseline: {path}")
+
+    if args.compare:
+        with open(os.path.join(BASELINES_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)
+        if not compare(result, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+# bot/app/context.py
+
+from typing import Any, Optional
+from contextvars import ContextVar
+from aiogram import Bot, Dispatcher
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.redis import RedisStorage
+from aiogram.types import Update
+from redis.exceptions import NoScriptError, RedisError
+from bot.core.config import config
+from bot.infra.cache.fsm_storage import FIELDS as FSM_FIELDS, CompactRedisStorage
+from bot.infra.cache.leaderboard import leaderboards
+from bot.infra.cache.redis_client import redis_client
+from bot.infra.cache.rate_limiter import RateLimiter
+from bot.infra.metrics.instrumentation import current_trace, new_trace, stage
+from bot.infra.metrics.prometheus import webhook_updates_filtered_total
+from bot.infra.webhook.envelope import UpdateEnvelope
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Ключи пользователя в Redis
+USER_LANG_KEY = "user_lang:{}"
+USER_BANNED_KEY = "user_banned:{}"
+USER_PREMIUM_KEY = "user_premium:{}"
+USER_LANG_TTL = 86400
+UPDATE_SEEN_KEY = "update_seen:{}:{}"  # bot_id, update_id - повторная доставка
+
+# Контекст текущего обновления (для storage и кода вне data)
+current_context: ContextVar[Optional["UserContext"]] = ContextVar("user_ctx", default=None)
+
+
+class UserContext:
+    """Данные пользователя, прочитанные одним round trip перед диспетчером"""
+
+    __slots__ = (
+        "user_id", "language", "is_banned", "is_premium",
+        "rate_allowed", "retry_after", "fsm_key", "fsm_state", "duplicate"
+    )
+
+    def __init__(self, user_id: int, language: str):
+        self.user_id = user_id
+        self.language = language
+        self.is_banned = False
+        self.is_premium = False
+        self.rate_allowed: Optional[bool] = None  # None - лимит не проверялся
+        self.retry_after = 0.0
+        self.fsm_key: Optional[StorageKey] = None
+        self.fsm_state: Optional[str] = None
+        self.duplicate = False  # update_id уже обрабатывался (повтор доставки)
+
+
+class ContextLoader:
+    """Предзагрузка контекста пользователя: один pipeline в Redis на обновление
+
+    Читает язык, флаги бана и премиума, FSM-состояние (с CompactRedisStorage -
+    и данные) и списывает rate limit (для сообщений) за один round trip. Результат попадает в data["user_ctx"],
+    middleware и фильтры читают его оттуда вместо отдельных запросов.
+    """
+
+    def __init__(self, dp: Dispatcher, limiter: Optional[RateLimiter] = None):
+        self.dp = dp
+        self.storage = dp.storage
+        self.limiter = limiter
+        self.supported_languages = frozenset(config.SUPPORTED_LANGUAGES)
+
+    async def feed_update(self, bot: Bot, update: Update) -> Any:
+        """Загрузить контекст и передать готовый Update диспетчеру"""
+        return await self.feed(bot, UpdateEnvelope.from_update(update))
+
+    async def feed(self, bot: Bot, envelope: UpdateEnvelope, dedup: bool = False) -> Any:
+        """Загрузить контекст и передать обновление диспетчеру
+
+        Модель Update строится только если обновление не отброшено по
+        контексту: бан или (dedup) повторная доставка update_id.
+        """
+        # Трассу обычно начинает вебхук (со стадией разбора JSON), иначе - здесь
+        trace = None
+        if current_trace.get() is None:
+            trace = new_trace()
+        if trace is None:
+            return await self._feed_batched(bot, envelope, dedup)
+
+        token = current_trace.set(trace)
+        try:
+            return await self._feed_batched(bot, envelope, dedup)
+        finally:
+            current_trace.reset(token)
+            trace.finish()
+
+    async def _feed_batched(self, bot: Bot, envelope: UpdateEnvelope, dedup: bool) -> Any:
+        if isinstance(self.storage, CompactRedisStorage):
+            # Изменения FSM за обновление - одна запись в конце
+            async with self.storage.batch():
+                return await self._feed(bot, envelope, dedup)
+        return await self._feed(bot, envelope, dedup)
+
+    async def _feed(self, bot: Bot, envelope: UpdateEnvelope, dedup: bool) -> Any:
+        with stage("context"):
+            user_ctx = await self.load(bot, envelope, dedup=dedup)
+
+        if user_ctx is not None and (user_ctx.duplicate or user_ctx.is_banned):
+            # AuthMiddleware отбросил бы его так же - без валидации Update
+            reason = "duplicate" if user_ctx.duplicate else "banned"
+            webhook_updates_filtered_total.labels(reason=reason).inc()
+            logger.debug(f"Dropped update {envelope.update_id}: {reason}")
+            return None
+
+        with stage("update"):
+            update = envelope.update(bot)
+
+        token = current_context.set(user_ctx)
+        started = time.perf_counter()
+        try:
+            return await self.dp.feed_update(bot, update, user_ctx=user_ctx)
+        except Exception:
+            if dedup and user_ctx is not None:
+                # Telegram повторит доставку - повтор должен обработаться
+                await redis_client.delete(UPDATE_SEEN_KEY.format(bot.id, envelope.update_id))
+            raise
+        finally:
+            current_context.reset(token)
+            trace = current_trace.get()
+            if trace is not None:
+                # Маршрутизация и фильтры - всё, что не middleware и не обработчик
+                nested = sum(
+                    seconds for name, seconds in trace.stages.items()
+                    if name == "handler" or name.startswith("middleware:")
+                )
+                trace.add("routing", max(0.0, time.perf_counter() - started - nested))
+
+    async def load(self, bot: Bot, envelope: UpdateEnvelope, dedup: bool = False) -> Optional[UserContext]:
+        """Прочитать все ключи пользователя одним pipeline
+
+        dedup: заодно отметить update_id (SET NX) - повтор получит duplicate
+        """
+        if envelope.user_id is None:
+            return None
+
+        user_id = envelope.user_id
+        user_ctx = UserContext(user_id, config.DEFAULT_LANGUAGE)
+
+        keys = [
+            USER_LANG_KEY.format(user_id),
+            USER_BANNED_KEY.format(user_id),
+            USER_PREMIUM_KEY.format(user_id),
+        ]
+        has_chat = envelope.chat_id is not None
+        compact_fsm = has_chat and isinstance(self.storage, CompactRedisStorage)
+        if compact_fsm:
+            user_ctx.fsm_key = StorageKey(bot_id=bot.id, chat_id=envelope.chat_id, user_id=user_id)
+        elif has_chat and isinstance(self.storage, RedisStorage):
+            user_ctx.fsm_key = StorageKey(bot_id=bot.id, chat_id=envelope.chat_id, user_id=user_id)
+            keys.append(self.storage.key_builder.build(user_ctx.fsm_key, "state"))
+
+        # Rate limit - только для сообщений, как в RateLimitMiddleware
+        check_rate = self.limiter is not None and envelope.is_message
+        if check_rate and self.limiter.prefilter and not self.limiter.prefilter.allow(str(user_id)):
+            user_ctx.rate_allowed, user_ctx.retry_after = False, self.limiter.period
+            check_rate = False
+
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.mget(keys)
+                if compact_fsm:
+                    pipe.hmget(self.storage.redis_key(user_ctx.fsm_key), FSM_FIELDS)
+                if check_rate:
+                    rate_key = self.limiter.key(str(user_id))
+                    rate_args = self.limiter.args()
+                    pipe.evalsha(self.limiter.script.sha, 1, rate_key, *rate_args)
+                if dedup:
+                    seen_key = UPDATE_SEEN_KEY.format(bot.id, envelope.update_id)
+                    pipe.set(seen_key, 1, nx=True, ex=config.WEBHOOK_DEDUP_TTL)
+                results = await pipe.execute(raise_on_error=False)
+        except RedisError as e:
+            # Без контекста middleware перейдут на собственные запросы
+            logger.warning(f"User context prefetch failed: {e}")
+            return None
+
+        values = results[0]
+        if isinstance(values, Exception):
+            logger.warning(f"User context prefetch failed: {values}")
+            return None
+        extra = iter(results[1:])
+
+        language, banned, premium = values[:3]
+        user_ctx.is_banned = banned is not None
+        user_ctx.is_premium = premium is not None
+        if compact_fsm:
+            fsm_values = next(extra)
+            if not isinstance(fsm_values, Exception):
+                state, data = fsm_values
+                user_ctx.fsm_state = state.decode() if state is not None else None
+                self.storage.prime(user_ctx.fsm_key, state, data)
+        elif user_ctx.fsm_key is not None and values[3] is not None:
+            user_ctx.fsm_state = values[3].decode()
+
+        if language is not None:
+            user_ctx.language = language.decode()
+        else:
+            # Новый пользователь: язык Telegram, если поддерживается
+            if envelope.language_code in self.supported_languages:
+                user_ctx.language = envelope.language_code
+            await redis_client.setex(keys[0], USER_LANG_TTL, user_ctx.language)
+            # Языковые таблицы лидеров - по тому же языку
+            await leaderboards.set_language(user_id, user_ctx.language)
+
+        if check_rate:
+            rate_result = next(extra)
+            if isinstance(rate_result, NoScriptError):
+                # Скрипт ещё не загружен на этот сервер (первый вызов)
+                rate_result = await self.limiter.script([rate_key], rate_args)
+            if not isinstance(rate_result, Exception):
+                user_ctx.rate_allowed, user_ctx.retry_after = self.limiter.parse(rate_result)
+
+        if dedup:
+            # None - ключ уже был: это повторная доставка
+            user_ctx.duplicate = next(extra) is None
+
+        return user_ctx
+
+
+class PrefetchedRedisStorage(RedisStorage):
+    """RedisStorage, отдающий FSM-состояние из предзагруженного контекста"""
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        user_ctx = current_context.get()
+        if user_ctx is not None and user_ctx.fsm_key == key:
+            return user_ctx.fsm_state
+        return await super().get_state(key)
+
+    async def set_state(self, key: StorageKey, state=None) -> None:
+        await super().set_state(key, state)
+        user_ctx = current_context.get()
+        if user_ctx is not None and user_ctx.fsm_key == key:
+            user_ctx.fsm_state = state.state if isinstance(state, State) else state
+
+
+async def cache_user_flags(user_id: int, is_banned: bool, is_premium: bool) -> None:
+    """Записать флаги пользователя в Redis (вызывать при их изменении в БД)"""
+    async with redis_client.pipeline(transaction=False) as pipe:
+        banned_key = USER_BANNED_KEY.format(user_id)
+        premium_key = USER_PREMIUM_KEY.format(user_id)
+        if is_banned:
+            pipe.set(banned_key, 1)
+        else:
+            pipe.delete(banned_key)
+        if is_premium:
+            pipe.set(premium_key, 1)
+        else:
+            pipe.delete(premium_key)
+        await pipe.execute()
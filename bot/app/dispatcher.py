@@ -0,0 +1,119 @@
+# bot/app/dispatcher.py
+
+from aiogram import Dispatcher
+from bot.app.context import ContextLoader, PrefetchedRedisStorage
+from bot.app.filters.is_admin import IsAdmin
+from bot.app.keyboards.base import prebuild_keyboards
+from bot.app.lazy_router import LazyRouter
+from bot.app.middlewares.anti_abuse import AbuseDetector, AntiAbuseMiddleware
+from bot.app.middlewares.auth import AuthMiddleware
+from bot.app.middlewares.db_session import DbSessionMiddleware
+from bot.app.middlewares.i18n import I18nMiddleware
+from bot.app.middlewares.metrics import HandlerMetricsMiddleware, StageMiddleware
+from bot.app.middlewares.rate_limit import RateLimitMiddleware
+from bot.core.config import config
+from bot.domain.repositories.referral_repository import ReferralRepository
+from bot.domain.services.ab_test_service import ABTestService
+from bot.domain.services.auction_feed_service import AuctionFeedService
+from bot.domain.services.auction_service import AuctionService
+from bot.domain.services.economy_service import EconomyService
+from bot.domain.services.leaderboard_service import LeaderboardService
+from bot.domain.services.referral_service import ReferralService
+from bot.infra.cache.counters import hot_counters
+from bot.infra.cache.fsm_storage import CompactRedisStorage
+from bot.infra.cache.redis_client import redis_client
+from bot.infra.database.engine import database
+import importlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Роутеры в порядке приоритета (модуль bot.app.routers.<name> экспортирует router)
+ROUTERS = ("start", "onboarding", "profile", "factory", "auction", "leaderboard")
+
+# Редкие роутеры: модуль импортируется при первом обновлении, прошедшем фильтр
+LAZY_ROUTERS = {
+    "admin": IsAdmin,
+}
+
+async def create_dispatcher() -> Dispatcher:
+    """Создать диспетчер с middleware и роутерами"""
+    
+    if config.FSM_STORAGE == "compact":
+        storage = CompactRedisStorage(redis_client, ttl=config.FSM_TTL)
+    else:
+        storage = PrefetchedRedisStorage(redis_client, state_ttl=config.FSM_TTL, data_ttl=config.FSM_TTL)
+    dp = Dispatcher(storage=storage)
+    
+    rate_limit = RateLimitMiddleware(
+        rate=config.RATE_LIMIT_REQUESTS,
+        window=config.RATE_LIMIT_WINDOW,
+        policy=config.RATE_LIMIT_POLICY,
+        prefilter=config.RATE_LIMIT_PREFILTER
+    )
+    
+    def outer_middleware(name: str, middleware) -> None:
+        # Время каждой middleware - отдельная стадия в метриках обновления
+        if config.INSTRUMENTATION_ENABLED:
+            middleware = StageMiddleware(name, middleware)
+        dp.update.outer_middleware(middleware)
+    
+    # Порядок важен: rate limit первым, дальше бан, анти-абьюз и язык;
+    # сессия БД - последней, чтобы отброшенные обновления её даже не создавали
+    outer_middleware("rate_limit", rate_limit)
+    outer_middleware("auth", AuthMiddleware())
+    if config.ABUSE_ENABLED:
+        detector = AbuseDetector(
+            callback_threshold=config.ABUSE_CALLBACK_THRESHOLD,
+            callback_half_life=config.ABUSE_CALLBACK_HALF_LIFE,
+            referral_threshold=config.ABUSE_REFERRAL_THRESHOLD,
+            referral_window=config.ABUSE_REFERRAL_WINDOW,
+            ban_ttl=config.ABUSE_BAN_TTL,
+            sync_interval=config.ABUSE_SYNC_INTERVAL,
+            width=config.ABUSE_SKETCH_WIDTH,
+            depth=config.ABUSE_SKETCH_DEPTH,
+            max_codes=config.ABUSE_MAX_CODES,
+            exempt=tuple(config.ADMIN_IDS)
+        )
+        outer_middleware("anti_abuse", AntiAbuseMiddleware(detector))
+        # Синхронизацию скетчей запускает веб-приложение
+        dp["abuse_detector"] = detector
+    outer_middleware("i18n", I18nMiddleware(default_locale=config.DEFAULT_LANGUAGE))
+    outer_middleware("db_session", DbSessionMiddleware(database.session_factory))
+    
+    # Имя, время и ошибки обработчика; inner middleware диспетчера
+    # действуют и во вложенных роутерах
+    handler_metrics = HandlerMetricsMiddleware()
+    for name, observer in dp.observers.items():
+        if name not in ("update", "error"):
+            observer.middleware(handler_metrics)
+    
+    for name in ROUTERS:
+        module = importlib.import_module(f"bot.app.routers.{name}")
+        router = getattr(module, "router", None)
+        if router is None:
+            # Модуль ещё не реализован - не мешаем запуску остальных
+            logger.warning(f"Router module bot.app.routers.{name} has no router, skipping")
+            continue
+        dp.include_router(router)
+    for name, match in LAZY_ROUTERS.items():
+        dp.include_router(LazyRouter(f"bot.app.routers.{name}", match(), name=name))
+    
+    # Сервисы, которые обработчики получают аргументами
+    dp["auction_feed"] = AuctionFeedService(database.session_factory, database.read_session)
+    dp["leaderboards"] = LeaderboardService(database.session_factory, database.read_session)
+    dp["economy"] = EconomyService(database.session_factory, counters=hot_counters)
+    dp["referrals"] = ReferralService(
+        ReferralRepository(database.session_factory, database.read_session, counters=hot_counters)
+    )
+    # Запускаются и останавливаются воркером (start_worker)
+    dp["auction_service"] = AuctionService(database.session_factory, counters=hot_counters)
+    dp["ab_tests"] = ABTestService(database.session_factory)
+    
+    # Статические клавиатуры - готовые объекты на каждый язык
+    logger.info(f"Prebuilt {prebuild_keyboards()} keyboards")
+    
+    # Предзагрузка контекста - перед диспетчером, один round trip в Redis
+    dp["context_loader"] = ContextLoader(dp, limiter=rate_limit.limiter)
+    
+    return dp
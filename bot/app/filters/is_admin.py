@@ -0,0 +1,15 @@
+# bot/app/filters/is_admin.py
+
+from typing import Optional
+from aiogram.filters import BaseFilter
+from aiogram.types import User
+from bot.core.config import config
+
+class IsAdmin(BaseFilter):
+    """Фильтр: пользователь - администратор (из ADMIN_IDS, без обращения к Redis)"""
+    
+    def __init__(self):
+        self.admin_ids = frozenset(config.ADMIN_IDS)
+    
+    async def __call__(self, event, event_from_user: Optional[User] = None) -> bool:
+        return event_from_user is not None and event_from_user.id in self.admin_ids
@@ -0,0 +1,11 @@
+# bot/app/filters/is_premium.py
+
+from typing import Optional
+from aiogram.filters import BaseFilter
+from bot.app.context import UserContext
+
+class IsPremium(BaseFilter):
+    """Фильтр: у пользователя премиум (флаг из предзагруженного контекста)"""
+    
+    async def __call__(self, event, user_ctx: Optional[UserContext] = None) -> bool:
+        return user_ctx is not None and user_ctx.is_premium
@@ -0,0 +1,11 @@
+# bot/app/filters/is_user.py
+
+from typing import Optional
+from aiogram.filters import BaseFilter
+from bot.app.context import UserContext
+
+class IsUser(BaseFilter):
+    """Фильтр: обычный активный пользователь (не забанен)"""
+    
+    async def __call__(self, event, user_ctx: Optional[UserContext] = None) -> bool:
+        return user_ctx is not None and not user_ctx.is_banned
@@ -0,0 +1,20 @@
+# bot/app/keyboards/admin.py
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from bot.app.keyboards.base import static_keyboard
+from bot.core.i18n import Translator
+
+
+@static_keyboard("admin_menu")
+def admin_menu(_: Translator) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text=_("📊 Статистика"), callback_data="admin:stats"),
+            InlineKeyboardButton(text=_("📣 Рассылка"), callback_data="admin:broadcast"),
+        ],
+        [
+            InlineKeyboardButton(text=_("🚫 Бан пользователя"), callback_data="admin:ban"),
+            InlineKeyboardButton(text=_("🔨 Аукционы"), callback_data="admin:auctions"),
+        ],
+        [InlineKeyboardButton(text=_("◀️ Назад"), callback_data="menu:main")],
+    ])
@@ -0,0 +1,56 @@
+# bot/app/keyboards/auction.py
+
+from typing import List, Optional
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from bot.app.keyboards.base import static_keyboard
+from bot.core.i18n import Translator
+
+
+@static_keyboard("auction_menu")
+def auction_menu(_: Translator) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=_("🔥 Активные лоты"), callback_data="auction:list")],
+        [InlineKeyboardButton(text=_("🧾 Мои покупки"), callback_data="auction:purchases")],
+        [InlineKeyboardButton(text=_("◀️ Назад"), callback_data="menu:main")],
+    ])
+
+
+@static_keyboard("purchase_confirm")
+def purchase_confirm(_: Translator) -> InlineKeyboardMarkup:
+    # Лот берётся из сообщения с карточкой, клавиатура одна на всех
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text=_("✅ Купить"), callback_data="auction:confirm"),
+            InlineKeyboardButton(text=_("❌ Отмена"), callback_data="auction:cancel"),
+        ],
+    ])
+
+
+FEED_CALLBACK_PREFIX = "af:"  # af:<порядок>:<курсор>; курсор пустой - первая страница
+
+
+def feed_callback(sort: str, cursor: Optional[str] = None) -> str:
+    return f"{FEED_CALLBACK_PREFIX}{sort}:{cursor or ''}"
+
+
+def feed_navigation(
+    _: Translator,
+    sort: str,
+    cursor: Optional[str],
+    next_cursor: Optional[str]
+) -> InlineKeyboardMarkup:
+    """Навигация по ленте; зависит от курсора, поэтому не статическая"""
+    rows: List[List[InlineKeyboardButton]] = []
+    navigation = []
+    if cursor:
+        navigation.append(InlineKeyboardButton(text=_("⏮ В начало"), callback_data=feed_callback(sort)))
+    if next_cursor:
+        navigation.append(InlineKeyboardButton(text=_("▶️ Дальше"), callback_data=feed_callback(sort, next_cursor)))
+    if navigation:
+        rows.append(navigation)
+    if sort == "new":
+        rows.append([InlineKeyboardButton(text=_("💸 Сначала дешёвые"), callback_data=feed_callback("price"))])
+    else:
+        rows.append([InlineKeyboardButton(text=_("🆕 Сначала новые"), callback_data=feed_callback("new"))])
+    rows.append([InlineKeyboardButton(text=_("◀️ Назад"), callback_data="menu:auction")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
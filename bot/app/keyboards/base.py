@@ -0,0 +1,53 @@
+# bot/app/keyboards/base.py
+
+from typing import Callable, Dict, Tuple
+from aiogram.types import InlineKeyboardMarkup
+from bot.core.i18n import Translator, catalogs
+import importlib
+
+# Модули со статическими клавиатурами (регистрируются при импорте)
+KEYBOARD_MODULES = ("main", "auction", "admin")
+
+Builder = Callable[[Translator], InlineKeyboardMarkup]
+
+_builders: Dict[str, Builder] = {}
+_built: Dict[Tuple[str, str], InlineKeyboardMarkup] = {}
+
+
+def static_keyboard(name: str) -> Callable[[Builder], Builder]:
+    """Зарегистрировать клавиатуру, которая зависит только от языка
+
+    Клавиатура собирается один раз на язык и дальше отдаётся готовым
+    объектом - изменять его нельзя, он общий для всех ответов.
+    """
+
+    def decorator(builder: Builder) -> Builder:
+        if name in _builders:
+            raise ValueError(f"Keyboard {name} is already registered")
+        _builders[name] = builder
+        return builder
+
+    return decorator
+
+
+def get_keyboard(name: str, locale: str) -> InlineKeyboardMarkup:
+    """Готовая клавиатура для языка (неизвестный язык - язык по умолчанию)"""
+    markup = _built.get((name, locale))
+    if markup is None:
+        translator = catalogs.get(locale)
+        markup = _built.get((name, translator.locale))
+        if markup is None:
+            markup = _builders[name](translator)
+            _built[(name, translator.locale)] = markup
+        _built[(name, locale)] = markup
+    return markup
+
+
+def prebuild_keyboards() -> int:
+    """Собрать все статические клавиатуры для всех языков (на старте)"""
+    for module in KEYBOARD_MODULES:
+        importlib.import_module(f"bot.app.keyboards.{module}")
+    for locale in catalogs.locales:
+        for name in _builders:
+            get_keyboard(name, locale)
+    return len(_built)
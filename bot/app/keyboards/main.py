@@ -0,0 +1,44 @@
+# bot/app/keyboards/main.py
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from bot.app.keyboards.base import static_keyboard
+from bot.core.i18n import Translator
+
+
+@static_keyboard("main_menu")
+def main_menu(_: Translator) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text=_("🏭 Завод"), callback_data="menu:factory"),
+            InlineKeyboardButton(text=_("🔨 Аукцион"), callback_data="menu:auction"),
+        ],
+        [
+            InlineKeyboardButton(text=_("👤 Профиль"), callback_data="menu:profile"),
+            InlineKeyboardButton(text=_("🤝 Рефералы"), callback_data="menu:referrals"),
+        ],
+        [InlineKeyboardButton(text=_("🏆 Топ игроков"), callback_data="menu:leaderboard")],
+    ])
+
+
+@static_keyboard("factory")
+def factory_menu(_: Translator) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=_("📦 Собрать продукцию"), callback_data="factory:collect")],
+        [
+            InlineKeyboardButton(text=_("👷 Нанять рабочих"), callback_data="factory:hire"),
+            InlineKeyboardButton(text=_("⬆️ Улучшить завод"), callback_data="factory:upgrade"),
+        ],
+        [InlineKeyboardButton(text=_("◀️ Назад"), callback_data="menu:main")],
+    ])
+
+
+@static_keyboard("leaderboard")
+def leaderboard_menu(_: Translator) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text=_("🏭 Уровень"), callback_data="top:factory_level"),
+            InlineKeyboardButton(text=_("💰 Монеты"), callback_data="top:soft_currency"),
+            InlineKeyboardButton(text=_("🤝 Рефералы"), callback_data="top:total_referrals"),
+        ],
+        [InlineKeyboardButton(text=_("◀️ Назад"), callback_data="menu:main")],
+    ])
@@ -0,0 +1,44 @@
+# bot/app/lazy_router.py
+
+from typing import Any, Optional
+from aiogram import Router
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.dispatcher.event.handler import FilterObject
+from aiogram.types import TelegramObject
+import importlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LazyRouter(Router):
+    """Роутер редко используемого модуля: импорт при первом подходящем обновлении
+
+    Пока модуль не загружен, обновление проверяется фильтром (тем же, что
+    у хендлеров модуля, например IsAdmin) - не прошедшие фильтр обновления
+    модуль так и не загружают. Загрузка синхронная и однократная: после
+    неё роутер модуля - обычный вложенный роутер.
+    """
+
+    def __init__(self, module: str, match: Any, name: Optional[str] = None):
+        super().__init__(name=name or module)
+        self.module = module
+        self.match = FilterObject(callback=match)
+        self.loaded = False
+
+    async def propagate_event(self, update_type: str, event: TelegramObject, **kwargs: Any) -> Any:
+        if not self.loaded:
+            if not await self.match.call(event, **kwargs):
+                return UNHANDLED
+            self.load()
+        return await super().propagate_event(update_type, event, **kwargs)
+
+    def load(self) -> None:
+        module = importlib.import_module(self.module)
+        router = getattr(module, "router", None)
+        if router is None:
+            logger.warning(f"Router module {self.module} has no router, skipping")
+        else:
+            self.include_router(router)
+            logger.info(f"Loaded router {self.module} on first matching update")
+        self.loaded = True
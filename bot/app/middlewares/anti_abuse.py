@@ -0,0 +1,255 @@
+# bot/app/middlewares/anti_abuse.py
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from aiogram import BaseMiddleware, types
+from redis.exceptions import RedisError
+from bot.app.context import USER_BANNED_KEY
+from bot.domain.services.referral_service import REFERRAL_FROZEN_KEY
+from bot.infra.cache.redis_client import redis_client
+from bot.infra.cache.sketches import CountMinSketch, HyperLogLog
+from bot.infra.metrics.prometheus import abuse_flags_total
+import asyncio
+import logging
+import os
+import socket
+import time
+
+logger = logging.getLogger(__name__)
+
+SKETCHES_KEY = "abuse:cms"  # node -> "время снимка\nснимок"
+REFERRAL_HLL_KEY = "abuse:ref:{}:{}"  # окно, реф-код -> HyperLogLog Redis
+FLAGGED_KEY = "abuse:flagged"  # user_id / ref:<код> -> причина (для админов)
+
+MAX_PENDING_REFERRALS = 50000  # приглашений в буфере до синхронизации
+
+
+class AbuseDetector:
+    """Потоковый детектор злоупотреблений на скетчах в памяти процесса
+
+    Нажатия кнопок - count-min sketch с затуханием по user_id: частота
+    пользователя за последние минуты без ключа на пользователя. Различные
+    приглашённые по реф-коду за окно - HyperLogLog на код. Проверка не
+    ходит в Redis: раз в sync_interval процесс публикует свой скетч,
+    забирает скетчи остальных воркеров и досылает приглашения в
+    HyperLogLog Redis (PFADD), так что пороги действуют на весь кластер
+    с задержкой не больше интервала синхронизации.
+
+    Спам кнопками - временный бан через флаг user_banned (его читают
+    ContextLoader и AuthMiddleware). Накрутка рефералов замораживает
+    код: приглашения засчитываются, бонусы - нет.
+    """
+
+    def __init__(
+        self,
+        callback_threshold: float,
+        callback_half_life: float,
+        referral_threshold: int,
+        referral_window: int,
+        ban_ttl: int,
+        sync_interval: float = 5.0,
+        width: int = 4096,
+        depth: int = 4,
+        max_codes: int = 10000,
+        exempt: Tuple[int, ...] = ()
+    ):
+        self.callback_threshold = callback_threshold
+        self.referral_threshold = referral_threshold
+        self.referral_window = referral_window
+        self.ban_ttl = ban_ttl
+        self.sync_interval = sync_interval
+        self.max_codes = max_codes
+        self.exempt = frozenset(exempt)
+        self.node = f"{socket.gethostname()}:{os.getpid()}"
+
+        self.callbacks = CountMinSketch(width, depth, callback_half_life)
+        # реф-код -> (окно, HLL); вытесняются давно не встречавшиеся коды
+        self._referrals: "OrderedDict[str, Tuple[int, HyperLogLog]]" = OrderedDict()
+        self._cluster_referrals: Dict[str, Tuple[int, int]] = {}  # код -> (окно, оценка Redis)
+        self._pending: Dict[Tuple[int, str], List[int]] = {}
+        self._pending_count = 0
+        # Уже помеченные (до истечения) - не пишем в Redis повторно
+        self._flagged: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="abuse-sync")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            # Приглашения последнего интервала - в общий HyperLogLog,
+            # скетч процесса - из общего вида
+            try:
+                await self.sync()
+                await redis_client.hdel(SKETCHES_KEY, self.node)
+            except RedisError as e:
+                logger.warning(f"Final anti-abuse sync failed: {e}")
+
+    def observe_callback(self, user_id: int) -> bool:
+        """Учесть нажатие кнопки; True - порог превышен"""
+        if user_id in self.exempt:
+            return False
+        estimate = self.callbacks.add(str(user_id))
+        if estimate < self.callback_threshold:
+            return False
+        # Завышение count-min не должно банить: порог с запасом на ошибку
+        return estimate - self.callbacks.error_bound() >= self.callback_threshold
+
+    def observe_referral(self, code: str, user_id: int) -> bool:
+        """Учесть переход по реф-коду; True - код похож на накрутку"""
+        window = int(time.time() // self.referral_window)
+        entry = self._referrals.get(code)
+        if entry is None or entry[0] != window:
+            if entry is None and len(self._referrals) >= self.max_codes:
+                self._referrals.popitem(last=False)
+            entry = self._referrals[code] = (window, HyperLogLog())
+        self._referrals.move_to_end(code)
+
+        if self._pending_count < MAX_PENDING_REFERRALS:
+            self._pending.setdefault((window, code), []).append(user_id)
+            self._pending_count += 1
+
+        changed = entry[1].add(str(user_id))
+        cluster_window, cluster_count = self._cluster_referrals.get(code, (window, 0))
+        if cluster_window == window and cluster_count >= self.referral_threshold:
+            return True
+        return changed and entry[1].count() >= self.referral_threshold
+
+    async def ban_user(self, user_id: int, reason: str) -> None:
+        """Временный бан через флаг user_banned"""
+        await self._flag(str(user_id), USER_BANNED_KEY.format(user_id), self.ban_ttl, reason)
+
+    async def freeze_code(self, code: str, reason: str) -> None:
+        """Остановить бонусы по реф-коду до конца окна"""
+        await self._flag(f"ref:{code}", REFERRAL_FROZEN_KEY.format(code), self.referral_window, reason)
+
+    async def _flag(self, key: str, flag_key: str, ttl: int, reason: str) -> None:
+        now = time.monotonic()
+        if self._flagged.get(key, 0) > now:
+            return
+        self._flagged[key] = now + ttl
+        abuse_flags_total.labels(signal=reason).inc()
+        logger.warning(f"Flagged {key} for {ttl}s: {reason}")
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.set(flag_key, 1, ex=ttl)
+                pipe.hset(FLAGGED_KEY, key, f"{reason} {int(time.time())}")
+                await pipe.execute()
+        except RedisError:
+            # Не записалось - повторить при следующем срабатывании
+            self._flagged.pop(key, None)
+            raise
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Без синхронизации проверки работают по данным процесса
+                logger.warning(f"Anti-abuse sync failed: {e}")
+
+    async def sync(self) -> None:
+        """Обменяться скетчами с другими воркерами одним pipeline"""
+        pending, self._pending, self._pending_count = self._pending, {}, 0
+        now = time.time()
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.hset(SKETCHES_KEY, self.node, f"{now}\n".encode() + self.callbacks.snapshot())
+                pipe.hgetall(SKETCHES_KEY)
+                for (window, code), user_ids in pending.items():
+                    key = REFERRAL_HLL_KEY.format(window, code)
+                    pipe.pfadd(key, *user_ids)
+                    pipe.expire(key, self.referral_window * 2)
+                    pipe.pfcount(key)
+                results = await pipe.execute()
+        except BaseException:
+            # Не отправлено - в следующую синхронизацию
+            self._requeue(pending)
+            raise
+
+        snapshots, stale = [], []
+        for node, raw in results[1].items():
+            node = node.decode()
+            stamp, _, snapshot = raw.partition(b"\n")
+            age = now - float(stamp)
+            if age > self.sync_interval * 3:
+                # Воркер остановлен или завис - его вклад больше не учитывается
+                stale.append(node)
+            elif node != self.node:
+                snapshots.append((age, snapshot))
+        self.callbacks.merge(snapshots)
+        if stale:
+            await redis_client.hdel(SKETCHES_KEY, *stale)
+
+        for i, (window, code) in enumerate(pending):
+            self._cluster_referrals[code] = (window, results[2 + i * 3 + 2])
+        current = int(now // self.referral_window)
+        self._cluster_referrals = {
+            code: value for code, value in self._cluster_referrals.items() if value[0] == current
+        }
+        monotonic = time.monotonic()
+        self._flagged = {key: until for key, until in self._flagged.items() if until > monotonic}
+
+    def _requeue(self, pending: Dict[Tuple[int, str], List[int]]) -> None:
+        """Вернуть приглашения в буфер (к пришедшим за время отправки)"""
+        for key, user_ids in pending.items():
+            room = MAX_PENDING_REFERRALS - self._pending_count
+            if room <= 0:
+                break
+            self._pending.setdefault(key, []).extend(user_ids[:room])
+            self._pending_count += min(room, len(user_ids))
+
+
+class AntiAbuseMiddleware(BaseMiddleware):
+    """Проверки AbuseDetector до обработчиков: без обращений к Redis"""
+
+    def __init__(self, detector: AbuseDetector):
+        self.detector = detector
+        super().__init__()
+
+    async def __call__(
+        self,
+        handler: Callable[[types.Update, Dict[str, Any]], Awaitable[Any]],
+        event: types.Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        """Учесть событие; спамящих кнопками - бан и отбросить"""
+
+        if event.callback_query is not None:
+            user_id = event.callback_query.from_user.id
+            if self.detector.observe_callback(user_id):
+                await self._ban(user_id, data)
+                logger.debug(f"Dropped update {event.update_id}: callback spam")
+                return
+
+        elif event.message is not None and event.message.text and event.message.from_user:
+            # Переход по реф-ссылке: /start <код>
+            command, _, code = event.message.text.partition(" ")
+            code = code.strip()
+            if command == "/start" and code:
+                if self.detector.observe_referral(code, event.message.from_user.id):
+                    await self._freeze(code)
+
+        return await handler(event, data)
+
+    async def _ban(self, user_id: int, data: Dict[str, Any]) -> None:
+        user_ctx = data.get("user_ctx")
+        if user_ctx is not None:
+            user_ctx.is_banned = True
+        try:
+            await self.detector.ban_user(user_id, "callback_spam")
+        except RedisError as e:
+            logger.warning(f"Failed to ban user {user_id}: {e}")
+
+    async def _freeze(self, code: str) -> None:
+        try:
+            await self.detector.freeze_code(code, "referral_farming")
+        except RedisError as e:
+            logger.warning(f"Failed to freeze referral code {code}: {e}")
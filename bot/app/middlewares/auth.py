@@ -0,0 +1,36 @@
+# bot/app/middlewares/auth.py
+
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware, types
+from bot.app.context import USER_BANNED_KEY
+from bot.infra.cache.redis_client import redis_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+class AuthMiddleware(BaseMiddleware):
+    """Middleware авторизации: отбрасывает обновления забаненных пользователей"""
+    
+    async def __call__(
+        self,
+        handler: Callable[[types.Update, Dict[str, Any]], Awaitable[Any]],
+        event: types.Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        """Пропустить обновление, если пользователь не забанен"""
+        
+        user_ctx = data.get("user_ctx")
+        if user_ctx is not None:
+            # Флаг уже прочитан при предзагрузке контекста
+            is_banned = user_ctx.is_banned
+        else:
+            user = data.get("event_from_user")
+            if user is None:
+                return await handler(event, data)
+            is_banned = bool(await redis_client.exists(USER_BANNED_KEY.format(user.id)))
+        
+        if is_banned:
+            logger.debug(f"Dropped update {event.update_id} from banned user")
+            return
+        
+        return await handler(event, data)
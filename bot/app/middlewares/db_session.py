@@ -0,0 +1,33 @@
+# bot/app/middlewares/db_session.py
+
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware, types
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from bot.infra.database.session import LazySession
+
+class DbSessionMiddleware(BaseMiddleware):
+    """Сессия БД на обновление: data["session"], открывается лениво"""
+    
+    def __init__(self, session_factory: async_sessionmaker):
+        self.session_factory = session_factory
+        super().__init__()
+    
+    async def __call__(
+        self,
+        handler: Callable[[types.Update, Dict[str, Any]], Awaitable[Any]],
+        event: types.Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        """Передать сессию хендлеру и закрыть после обработки"""
+        
+        session = LazySession(self.session_factory)
+        data["session"] = session
+        try:
+            result = await handler(event, data)
+        except BaseException:
+            await session.finish(commit=False)
+            raise
+        
+        # Изменения хендлера фиксируются, если он не сделал этого сам
+        await session.finish(commit=True)
+        return result
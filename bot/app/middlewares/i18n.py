@@ -1,29 +1,23 @@
 # bot/app/middlewares/i18n.py
 
-from typing import Callable, Dict, Any, Awaitable
+from typing import Callable, Dict, Any, Awaitable, Optional
 from aiogram import BaseMiddleware, types
-from aiogram.types import Message
+from bot.core.i18n import Catalogs, catalogs
 from bot.infra.cache.redis_client import redis_client
-import gettext
-import os
 
 class I18nMiddleware(BaseMiddleware):
-    """Middleware для многоязычности (i18n)"""
+    """Middleware для многоязычности (i18n)
     
-    def __init__(self, default_locale: str = "ru", locales_dir: str = "bot/locales"):
+    Переводчики общие на процесс (bot.core.i18n.catalogs): каталоги
+    компилируются и читаются один раз, а не в каждом экземпляре.
+    """
+    
+    def __init__(self, default_locale: str = "ru", translations: Optional[Catalogs] = None):
         self.default_locale = default_locale
-        self.locales_dir = locales_dir
-        self.translations = {}
-        self._load_translations()
+        self.catalogs = translations or catalogs
+        self.catalogs.load()
         super().__init__()
     
-    def _load_translations(self):
-        """Загружаем все переводы"""
-        for lang in os.listdir(self.locales_dir):
-            lang_path = os.path.join(self.locales_dir, lang, "LC_MESSAGES", "messages.mo")
-            if os.path.exists(lang_path):
-                self.translations[lang] = gettext.GNUTranslations(open(lang_path, "rb"))
-    
     async def __call__(
         self,
         handler: Callable[[types.Message, Dict[str, Any]], Awaitable[Any]],
@@ -32,21 +26,25 @@ class I18nMiddleware(BaseMiddleware):
     ) -> Any:
         """Установить язык в контекст"""
         
-        message = event.message or event.callback_query.message
-        user_id = message.from_user.id
-        
-        # Получить язык из кэша
-        cached_lang = await redis_client.get(f"user_lang:{user_id}")
-        if cached_lang:
-            language = cached_lang.decode()
+        user_ctx = data.get("user_ctx")
+        if user_ctx is not None:
+            # Язык уже прочитан при предзагрузке контекста
+            language = user_ctx.language
         else:
-            # Использовать язык Telegram пользователя или по умолчанию
-            language = message.from_user.language_code or self.default_locale
-            await redis_client.setex(f"user_lang:{user_id}", 86400, language)
+            message = event.message or event.callback_query.message
+            user_id = message.from_user.id
+            
+            # Получить язык из кэша
+            cached_lang = await redis_client.get(f"user_lang:{user_id}")
+            if cached_lang:
+                language = cached_lang.decode()
+            else:
+                # Использовать язык Telegram пользователя или по умолчанию
+                language = message.from_user.language_code or self.default_locale
+                await redis_client.setex(f"user_lang:{user_id}", 86400, language)
         
         # Установить переводчик в данные
-        translator = self.translations.get(language, self.translations.get(self.default_locale))
         data["locale"] = language
-        data["i18n"] = translator
+        data["i18n"] = self.catalogs.get(language)
         
         return await handler(event, data)
@@ -0,0 +1,86 @@
+# bot/app/middlewares/metrics.py
+
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware, types
+from bot.infra.metrics.instrumentation import current_trace
+from bot.infra.metrics.prometheus import bot_errors_total
+import time
+
+
+class StageMiddleware(BaseMiddleware):
+    """Обёртка outer middleware: её собственное время - стадия middleware:<name>
+
+    Время дальнейшей цепочки (следующие middleware, обработчик) из
+    стадии вычитается.
+    """
+
+    def __init__(self, name: str, middleware: BaseMiddleware):
+        self.stage = f"middleware:{name}"
+        self.middleware = middleware
+        super().__init__()
+
+    async def __call__(
+        self,
+        handler: Callable[[types.Update, Dict[str, Any]], Awaitable[Any]],
+        event: types.Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        trace = current_trace.get()
+        if trace is None:
+            return await self.middleware(handler, event, data)
+
+        downstream = 0.0
+
+        async def timed_handler(event: types.Update, data: Dict[str, Any]) -> Any:
+            nonlocal downstream
+            started = time.perf_counter()
+            try:
+                return await handler(event, data)
+            finally:
+                downstream += time.perf_counter() - started
+
+        started = time.perf_counter()
+        try:
+            return await self.middleware(timed_handler, event, data)
+        finally:
+            trace.add(self.stage, time.perf_counter() - started - downstream)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware: имя обработчика для меток, его время и ошибки"""
+
+    def __init__(self):
+        self._names: Dict[Callable, str] = {}
+        super().__init__()
+
+    def _name(self, callback: Callable) -> str:
+        name = self._names.get(callback)
+        if name is None:
+            module = getattr(callback, "__module__", "") or ""
+            name = self._names[callback] = (
+                f"{module.rpartition('.')[2]}.{getattr(callback, '__qualname__', repr(callback))}"
+            )
+        return name
+
+    async def __call__(
+        self,
+        handler: Callable[[types.TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: types.TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = self._name(handler_object.callback) if handler_object is not None else "unknown"
+        trace = current_trace.get()
+        if trace is not None:
+            trace.handler = name
+
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            bot_errors_total.labels(error_type=type(e).__name__, handler=name).inc()
+            raise
+        finally:
+            if trace is not None:
+                trace.add("handler", time.perf_counter() - started)
+
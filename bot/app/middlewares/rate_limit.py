@@ -3,24 +3,33 @@
 from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware, types
 from aiogram.types import Message
-from bot.infra.cache.redis_client import redis_client
-import time
+from redis.exceptions import RedisError
+from bot.infra.cache.rate_limiter import RateLimiter
 import logging
 
 logger = logging.getLogger(__name__)
 
 class RateLimitMiddleware(BaseMiddleware):
-    """Middleware для rate limiting (Token Bucket)"""
-    
-    def __init__(self, rate: int = 30, window: int = 1):
+    """Middleware для rate limiting (атомарный скрипт в Redis + локальный пре-фильтр)"""
+
+    def __init__(
+        self,
+        rate: int = 30,
+        window: int = 1,
+        policy: str = "token_bucket",
+        prefilter: bool = True
+    ):
         """
         rate: количество запросов
         window: временное окно в секундах
+        policy: token_bucket или sliding_window
+        prefilter: отсекать явный флуд без обращения к Redis
         """
         self.rate = rate
         self.window = window
+        self.limiter = RateLimiter(rate, window, policy=policy, prefilter=prefilter)
         super().__init__()
-    
+
     async def __call__(
         self,
         handler: Callable[[types.Message, Dict[str, Any]], Awaitable[Any]],
@@ -28,29 +37,43 @@ class RateLimitMiddleware(BaseMiddleware):
         data: Dict[str, Any]
     ) -> Any:
         """Проверить rate limit перед обработкой"""
-        
+
         message = event.message
         if not message:
             return await handler(event, data)
-        
+
         user_id = message.from_user.id
-        key = f"rate_limit:{user_id}"
-        
-        # Получить текущее количество токенов
-        current = await redis_client.get(key)
-        if current is None:
-            # Первый запрос - устанавливаем максимум токенов
-            await redis_client.setex(key, self.window, self.rate - 1)
+
+        # Лимит уже списан при предзагрузке контекста
+        user_ctx = data.get("user_ctx")
+        if user_ctx is not None and user_ctx.rate_allowed is not None:
+            return await self._check(user_ctx.rate_allowed, user_ctx.retry_after, handler, event, data)
+
+        # Один round trip: рефилл и списание атомарно на стороне Redis
+        try:
+            allowed, retry_after = await self.limiter.acquire(str(user_id))
+        except RedisError as e:
+            # Redis недоступен - не блокируем пользователей
+            logger.warning(f"Rate limiter unavailable, skipping check: {e}")
             return await handler(event, data)
-        
-        tokens = int(current)
-        if tokens <= 0:
+
+        return await self._check(allowed, retry_after, handler, event, data)
+
+    async def _check(
+        self,
+        allowed: bool,
+        retry_after: float,
+        handler: Callable[[types.Message, Dict[str, Any]], Awaitable[Any]],
+        event: types.Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not allowed:
             # Лимит превышен
-            logger.warning(f"Rate limit exceeded for user {user_id}")
-            await message.answer("⏱️ Вы отправляете сообщения слишком быстро. Попробуйте позже.")
+            logger.warning(
+                f"Rate limit exceeded for user {event.message.from_user.id}, "
+                f"retry after {retry_after:.1f}s"
+            )
+            await event.message.answer("⏱️ Вы отправляете сообщения слишком быстро. Попробуйте позже.")
             return
-        
-        # Уменьшаем количество токенов
-        await redis_client.decr(key)
-        
+
         return await handler(event, data)
@@ -0,0 +1,49 @@
+# bot/app/routers/auction.py
+
+from typing import Optional
+from aiogram import F, Router
+from aiogram.types import CallbackQuery
+from bot.app.keyboards.auction import FEED_CALLBACK_PREFIX, feed_navigation
+from bot.core.i18n import Translator
+from bot.domain.services.auction_feed_service import AuctionFeedService
+from bot.infra.cache.auction_feed import SORTS
+
+router = Router(name="auction")
+
+
+async def _show_feed(
+    callback: CallbackQuery,
+    feed: AuctionFeedService,
+    locale: str,
+    i18n: Translator,
+    sort: str,
+    cursor: Optional[str]
+) -> None:
+    page = await feed.page(locale, sort, cursor)
+    await callback.message.edit_text(page["text"], reply_markup=feed_navigation(i18n, sort, cursor, page["next"]))
+    await callback.answer()
+
+
+@router.callback_query(F.data == "auction:list")
+async def auction_list(
+    callback: CallbackQuery,
+    auction_feed: AuctionFeedService,
+    locale: str,
+    i18n: Translator
+) -> None:
+    """Первая страница ленты активных лотов"""
+    await _show_feed(callback, auction_feed, locale, i18n, "new", None)
+
+
+@router.callback_query(F.data.startswith(FEED_CALLBACK_PREFIX))
+async def auction_feed_page(
+    callback: CallbackQuery,
+    auction_feed: AuctionFeedService,
+    locale: str,
+    i18n: Translator
+) -> None:
+    """Страница ленты по курсору из кнопки (без Postgres, если индекс построен)"""
+    _, sort, cursor = callback.data.split(":", 2)
+    if sort not in SORTS:
+        sort = "new"
+    await _show_feed(callback, auction_feed, locale, i18n, sort, cursor or None)
@@ -0,0 +1,39 @@
+# bot/app/routers/leaderboard.py
+
+from aiogram import F, Router
+from aiogram.types import CallbackQuery
+from bot.app.keyboards.base import get_keyboard
+from bot.core.i18n import Translator
+from bot.domain.services.leaderboard_service import LeaderboardService, render_top
+from bot.infra.cache.leaderboard import METRICS
+
+router = Router(name="leaderboard")
+
+TOP_CALLBACK_PREFIX = "top:"
+
+
+@router.callback_query(F.data == "menu:leaderboard")
+async def leaderboard_menu(callback: CallbackQuery, locale: str, i18n: Translator) -> None:
+    """Выбор таблицы лидеров"""
+    await callback.message.edit_text(i18n("🏆 Топ игроков"), reply_markup=get_keyboard("leaderboard", locale))
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith(TOP_CALLBACK_PREFIX))
+async def leaderboard_top(
+    callback: CallbackQuery,
+    leaderboards: LeaderboardService,
+    locale: str,
+    i18n: Translator
+) -> None:
+    """Первая страница топа по метрике и место пользователя"""
+    metric = callback.data[len(TOP_CALLBACK_PREFIX):]
+    if metric not in METRICS:
+        await callback.answer()
+        return
+    entries = await leaderboards.top_page(metric)
+    position = await leaderboards.position(callback.from_user.id, metric)
+    await callback.message.edit_text(
+        render_top(i18n, metric, entries, position), reply_markup=get_keyboard("leaderboard", locale)
+    )
+    await callback.answer()
@@ -15,20 +15,70 @@ class BotConfig(BaseSettings):
     WEBHOOK_PATH: str = Field("/webhook", description="Путь webhook")
     WEBHOOK_SECRET: Optional[str] = Field(None, description="Секрет для валидации")
     
+    # Webhook: быстрый ответ Telegram и обработка из очереди
+    WEBHOOK_FAST_ACK: bool = False
+    WEBHOOK_QUEUE_SIZE: int = 10000  # максимум обновлений в очереди процесса
+    WEBHOOK_QUEUE_WORKERS: int = 64
+    WEBHOOK_OVERFLOW_POLICY: str = "reject"  # reject (503, Telegram повторит), shed (200, отбросить)
+    WEBHOOK_DRAIN_TIMEOUT: float = 10.0  # секунды на дообработку очереди при остановке
+    WEBHOOK_DEDUP_TTL: int = 3600  # секунды памяти об update_id (повторные доставки Telegram)
+    
+    # Запуск воркера: порт и /healthz сразу, /readyz - после прогрева пулов
+    WEBHOOK_STARTUP: str = "background"  # background; eager - порт открывается только готовым воркером
+    STARTUP_WAIT: float = 5.0  # секунды, которые обновление ждёт готовности, потом 503 (Telegram повторит)
+    STARTUP_REDIS_CONNECTIONS: int = 8  # соединений Redis, открываемых до готовности
+    
+    # Процессы: N воркеров на одном порту (SO_REUSEPORT)
+    WEB_HOST: str = "0.0.0.0"
+    WEB_WORKERS: int = 1  # 1 - один процесс без супервизора
+    METRICS_PORT: int = 9100  # /metrics, агрегированные по всем воркерам
+    PROMETHEUS_MULTIPROC_DIR: str = "/tmp/zavod_prometheus"
+    
+    # Исходящие сообщения (лимиты Telegram Bot API)
+    TELEGRAM_API_URL: str = "https://api.telegram.org"
+    TELEGRAM_GLOBAL_RATE: int = 30  # сообщений/сек на бота (общий для всех процессов)
+    TELEGRAM_CHAT_INTERVAL: float = 1.0  # секунд между сообщениями в личный чат
+    TELEGRAM_GROUP_INTERVAL: float = 3.0  # секунд между сообщениями в группу (20/мин)
+    OUTBOUND_CONCURRENCY: int = 50  # одновременных запросов к Bot API
+    BROADCAST_CHUNK_SIZE: int = 1000
+    
     # Database
     DATABASE_URL: str = Field(..., description="PostgreSQL DSN")
     DB_POOL_SIZE: int = 20
     DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 5.0  # секунды ожидания свободного соединения
+    DB_POOL_RECYCLE: int = 1800  # пересоздавать соединения старше (секунды)
+    DB_STATEMENT_CACHE_SIZE: int = 500  # prepared statements asyncpg на соединение
+    DATABASE_REPLICA_URL: Optional[str] = None  # реплика для чтения (по умолчанию - primary)
+    DB_REPLICA_RETRY: float = 30.0  # секунды до новой попытки после сбоя реплики
     
     # Redis
     REDIS_URL: str = Field(..., description="Redis DSN")
     REDIS_DB: int = 0
     
+    # FSM (диалоги)
+    FSM_STORAGE: str = "compact"  # compact (один hash на диалог, msgpack), redis (aiogram RedisStorage)
+    FSM_TTL: int = 86400  # секунды без изменений, после которых брошенный диалог удаляется
+    
     # RQ
     RQ_REDIS_URL: Optional[str] = None
     RQ_JOB_TIMEOUT: int = 300
     RQ_RESULT_TTL: int = 500
     
+    # Асинхронная очередь задач (Redis Streams, python -m bot.infra.queue.worker)
+    JOBS_CONCURRENCY: int = 32  # пачек в обработке одновременно на процесс
+    JOBS_BATCH_SIZE: int = 100  # задач одного типа в пачке (по умолчанию)
+    JOBS_BLOCK_MS: int = 1000  # ожидание новых задач в XREADGROUP
+    JOBS_TIMEOUT: float = 60.0  # секунды на пачку
+    JOBS_MAX_ATTEMPTS: int = 5  # после стольких неудач - в поток мёртвых задач
+    JOBS_RETRY_BASE: float = 1.0  # пауза перед повтором: база * 2^(попытка-1), с разбросом
+    JOBS_RETRY_MAX: float = 300.0
+    JOBS_CLAIM_IDLE: int = 120000  # мс без подтверждения, после которых задачу забирает другой воркер
+    JOBS_POLL_INTERVAL: float = 0.5  # секунды между переносами отложенных задач
+    JOBS_DEAD_MAXLEN: int = 100000
+    JOBS_STOP_TIMEOUT: float = 10.0  # секунды на начатые пачки при остановке
+    JOBS_METRICS_PORT: int = 9102  # /metrics процесса-обработчика
+    
     # Environment
     ENVIRONMENT: str = "development"  # development, staging, production
     DEBUG: bool = True
@@ -42,13 +92,75 @@ class BotConfig(BaseSettings):
     ENABLE_AUCTIONS: bool = True
     ENABLE_FACTORY_UPGRADES: bool = True
     
+    # Рефералы
+    REFERRAL_BONUS: int = 50  # бонус прямому пригласившему
+    REFERRAL_LEVEL_PERCENTS: list[int] = [100, 20, 5]  # % от бонуса по уровням аплайна
+    REFERRAL_WELCOME_PERCENT: int = 50  # приветственный бонус новичку, % от бонуса
+    REFERRAL_DAILY_CAP: int = 100  # бонусных приглашений на пользователя в сутки
+    
+    # Завод (ленивое начисление производства)
+    FACTORY_BASE_RATE: float = 10.0  # единиц в час на уровне 1 без рабочих
+    FACTORY_BASE_CAPACITY: int = 10
+    FACTORY_LEVEL_GROWTH: float = 1.5  # множитель скорости и вместимости за уровень
+    FACTORY_UPGRADE_SECONDS: int = 3600  # длительность улучшения за уровень
+    FACTORY_UPGRADE_BASE_COST: int = 100
+    
+    # Аукционы
+    AUCTION_PRICE_STEP_PERCENT: int = 10  # рост цены за покупку, % от базовой
+    AUCTION_BATCH_SIZE: int = 200  # покупок в одной транзакции
+    AUCTION_FLUSH_INTERVAL: float = 0.02  # секунды ожидания набора пачки
+    PURCHASE_IDEMPOTENCY_TTL: int = 86400
+    AUCTION_FEED_PAGE_SIZE: int = 5  # карточек на странице ленты
+    AUCTION_FEED_PAGE_TTL: float = 5.0  # секунды кэша отрисованной страницы
+    AUCTION_FEED_REBUILD_CHUNK: int = 5000  # аукционов на пачку при пересборке индекса
+    
+    # Счётчики пользователей (write-behind через Redis)
+    COUNTERS_FLUSH_INTERVAL: float = 1.0  # секунды между записями в Postgres
+    COUNTERS_FLUSH_BATCH: int = 1000  # пользователей в одной пачке
+    
+    # Лидерборды (sorted set в Redis)
+    LEADERBOARD_PAGE_SIZE: int = 10
+    LEADERBOARD_PAGE_TTL: float = 10.0  # секунды кэша готовой страницы топа
+    LEADERBOARD_WEEKS_KEPT: int = 2  # недельные таблицы хранятся столько недель
+    LEADERBOARD_REBUILD_CHUNK: int = 5000  # пользователей на пачку при пересборке
+    
+    # A/B тесты
+    AB_REFRESH_INTERVAL: float = 60.0  # секунды между перечитыванием активных экспериментов
+    AB_FLUSH_SIZE: int = 500  # событий в одной отправке в очередь задач
+    AB_FLUSH_INTERVAL: float = 2.0  # секунды между отправками
+    AB_BUFFER_MAX: int = 100000  # больше - старые события отбрасываются (очередь недоступна)
+    
+    # Анти-абьюз (скетчи в памяти процесса, синхронизация через Redis)
+    ABUSE_ENABLED: bool = True
+    ABUSE_CALLBACK_THRESHOLD: float = 300.0  # затухающее число нажатий; ~3.5/сек дольше минуты
+    ABUSE_CALLBACK_HALF_LIFE: float = 60.0  # секунды
+    ABUSE_REFERRAL_THRESHOLD: int = 100  # разных приглашённых по коду за окно
+    ABUSE_REFERRAL_WINDOW: int = 3600  # секунды; столько же код остаётся замороженным
+    ABUSE_BAN_TTL: int = 3600  # секунды временного бана за спам кнопками
+    ABUSE_SYNC_INTERVAL: float = 5.0  # секунды между обменом скетчами
+    ABUSE_SKETCH_WIDTH: int = 4096
+    ABUSE_SKETCH_DEPTH: int = 4
+    ABUSE_MAX_CODES: int = 10000  # реф-кодов в памяти процесса (LRU)
+    
+    # Инструментирование горячего пути
+    INSTRUMENTATION_ENABLED: bool = True  # время стадий обновления по обработчикам
+    INSTRUMENTATION_SAMPLE_RATE: float = 0.2  # доля замеряемых обновлений (~30 мкс на замеряемое)
+    LOOP_LAG_INTERVAL: float = 0.5  # секунды между замерами задержки event loop
+    SLOW_CALLBACK_THRESHOLD: float = 0.1  # блокировка loop дольше (секунды) - стек в лог
+    PROFILER_ENABLED: bool = False  # /debug/profile в каждом воркере
+    PROFILER_TOKEN: Optional[str] = None  # заголовок X-Profiler-Token (обязателен, если задан)
+    
     # I18n
     DEFAULT_LANGUAGE: str = "ru"
     SUPPORTED_LANGUAGES: list[str] = ["ru", "en"]
+    LOCALES_DIR: str = "bot/locales"  # <lang>/messages.po, собранные .mo - в <lang>/LC_MESSAGES
+    I18N_FORMAT_CACHE_SIZE: int = 10000  # отформатированных строк на язык
     
     # Rate limiting
     RATE_LIMIT_REQUESTS: int = 30
     RATE_LIMIT_WINDOW: int = 1  # секунды
+    RATE_LIMIT_POLICY: str = "token_bucket"  # token_bucket, sliding_window
+    RATE_LIMIT_PREFILTER: bool = True  # отсекать явный флуд без обращения к Redis
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,244 @@
+# bot/core/i18n.py
+"""
+Каталоги переводов: .po компилируются в .mo один раз (при сборке или на
+старте, если .mo устарел) и загружаются в память процесса один раз -
+общие для всех middleware, клавиатур и сервисов.
+
+    python -m bot.core.i18n            # скомпилировать bot/locales/*/messages.po
+"""
+from typing import Any, Dict, Hashable, List, Optional
+from bot.core.config import config
+import ast
+import logging
+import os
+import struct
+
+logger = logging.getLogger(__name__)
+
+MO_MAGIC = 0x950412de
+MO_MAGIC_SWAPPED = 0xde120495  # файл с другим порядком байт
+DOMAIN = "messages"
+
+
+def parse_po(path: str) -> Dict[str, str]:
+    """msgid -> msgstr из .po; непереведённые и fuzzy пропускаются
+
+    Поддерживаются msgid/msgstr с многострочными значениями; msgctxt и
+    формы множественного числа не используются в проекте.
+    """
+    messages: Dict[str, str] = {}
+    entry: Dict[str, List[str]] = {}
+    section: Optional[str] = None
+    fuzzy = False
+
+    def flush() -> None:
+        if "msgid" in entry and "msgstr" in entry and not fuzzy:
+            msgid, msgstr = "".join(entry["msgid"]), "".join(entry["msgstr"])
+            if msgstr:
+                messages[msgid] = msgstr
+        entry.clear()
+
+    with open(path, encoding="utf-8") as file:
+        for number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("#"):
+                if "msgid" in entry and "msgstr" in entry:
+                    flush()
+                    fuzzy = False
+                if line.startswith("#,") and "fuzzy" in line:
+                    fuzzy = True
+                continue
+
+            keyword, _, value = line.partition(" ")
+            if keyword in ("msgid", "msgstr"):
+                if keyword == "msgid" and "msgid" in entry:
+                    flush()
+                    fuzzy = False
+                section = keyword
+                entry[section] = []
+            elif line.startswith('"') and section is not None:
+                value = line
+            else:
+                raise ValueError(f"{path}:{number}: unsupported line: {line}")
+            entry[section].append(ast.literal_eval(value))
+    flush()
+    return messages
+
+
+def write_mo(messages: Dict[str, str], path: str) -> None:
+    """Записать каталог в формате GNU .mo (ключи отсортированы)"""
+    keys = sorted(messages)
+    ids = strs = b""
+    offsets = []
+    for key in keys:
+        msgid, msgstr = key.encode(), messages[key].encode()
+        offsets.append((len(ids), len(msgid), len(strs), len(msgstr)))
+        ids += msgid + b"\0"
+        strs += msgstr + b"\0"
+
+    key_start = 7 * 4 + 16 * len(keys)
+    value_start = key_start + len(ids)
+    key_offsets: List[int] = []
+    value_offsets: List[int] = []
+    for id_offset, id_length, str_offset, str_length in offsets:
+        key_offsets += [id_length, id_offset + key_start]
+        value_offsets += [str_length, str_offset + value_start]
+
+    header = struct.pack("<Iiiiiii", MO_MAGIC, 0, len(keys), 7 * 4, 7 * 4 + len(keys) * 8, 0, 0)
+    table = key_offsets + value_offsets
+    with open(path, "wb") as file:
+        file.write(header + struct.pack(f"<{len(table)}I", *table) + ids + strs)
+
+
+def read_mo(path: str) -> Dict[str, str]:
+    """Прочитать .mo целиком в словарь (файл закрывается сразу)"""
+    with open(path, "rb") as file:
+        data = file.read()
+
+    magic = struct.unpack("<I", data[:4])[0]
+    if magic == MO_MAGIC:
+        order = "<"
+    elif magic == MO_MAGIC_SWAPPED:
+        order = ">"
+    else:
+        raise ValueError(f"{path}: not a .mo file")
+
+    _, count, ids_offset, strs_offset = struct.unpack(f"{order}4I", data[4:20])
+    messages: Dict[str, str] = {}
+    for i in range(count):
+        id_length, id_offset = struct.unpack_from(f"{order}2I", data, ids_offset + i * 8)
+        str_length, str_offset = struct.unpack_from(f"{order}2I", data, strs_offset + i * 8)
+        msgid = data[id_offset:id_offset + id_length].decode()
+        if msgid:  # "" - заголовок каталога
+            messages[msgid] = data[str_offset:str_offset + str_length].decode()
+    return messages
+
+
+def compile_catalogs(locales_dir: str, force: bool = False) -> List[str]:
+    """Скомпилировать <lang>/messages.po в <lang>/LC_MESSAGES/messages.mo
+
+    Без force пропускает каталоги, у которых .mo новее .po. Возвращает
+    языки, которые были скомпилированы.
+    """
+    compiled = []
+    for lang in sorted(os.listdir(locales_dir)):
+        po_path = _po_path(locales_dir, lang)
+        if po_path is None:
+            continue
+        mo_path = os.path.join(locales_dir, lang, "LC_MESSAGES", f"{DOMAIN}.mo")
+        if not force and os.path.exists(mo_path) and os.path.getmtime(mo_path) >= os.path.getmtime(po_path):
+            continue
+        os.makedirs(os.path.dirname(mo_path), exist_ok=True)
+        # Через временный файл: другой процесс не прочитает недописанный .mo
+        tmp_path = f"{mo_path}.{os.getpid()}.tmp"
+        write_mo(parse_po(po_path), tmp_path)
+        os.replace(tmp_path, mo_path)
+        compiled.append(lang)
+    return compiled
+
+
+def _po_path(locales_dir: str, lang: str) -> Optional[str]:
+    for path in (
+        os.path.join(locales_dir, lang, f"{DOMAIN}.po"),
+        os.path.join(locales_dir, lang, "LC_MESSAGES", f"{DOMAIN}.po"),
+    ):
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+class Translator:
+    """Переводы одного языка с кэшем отформатированных строк
+
+    Совместим с gettext.GNUTranslations в части gettext/ngettext;
+    вызов translator(msgid, **kwargs) - перевод и format с кэшем.
+    """
+
+    def __init__(self, locale: str, messages: Dict[str, str], cache_size: int = 10000):
+        self.locale = locale
+        self.messages = messages
+        self.cache_size = cache_size
+        self._formatted: Dict[Hashable, str] = {}
+
+    def gettext(self, msgid: str) -> str:
+        return self.messages.get(msgid, msgid)
+
+    def ngettext(self, singular: str, plural: str, n: int) -> str:
+        return self.gettext(singular if n == 1 else plural)
+
+    def __call__(self, msgid: str, **kwargs: Any) -> str:
+        if not kwargs:
+            return self.messages.get(msgid, msgid)
+
+        key = (msgid, *kwargs.items())
+        try:
+            return self._formatted[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # Нехэшируемые аргументы - без кэша
+            return self.gettext(msgid).format(**kwargs)
+
+        text = self.gettext(msgid).format(**kwargs)
+        if len(self._formatted) >= self.cache_size:
+            self._formatted.pop(next(iter(self._formatted)))
+        self._formatted[key] = text
+        return text
+
+
+class Catalogs:
+    """Переводчики всех языков; загружаются один раз на процесс"""
+
+    def __init__(self, locales_dir: str, default_locale: str, cache_size: int = 10000):
+        self.locales_dir = locales_dir
+        self.default_locale = default_locale
+        self.cache_size = cache_size
+        self._translators: Optional[Dict[str, Translator]] = None
+
+    def load(self) -> Dict[str, Translator]:
+        """Скомпилировать устаревшие .mo и загрузить все языки"""
+        if self._translators is not None:
+            return self._translators
+
+        try:
+            compiled = compile_catalogs(self.locales_dir)
+            if compiled:
+                logger.info(f"Compiled translations: {', '.join(compiled)}")
+        except OSError as e:
+            # Каталог только для чтения - используем уже собранные .mo
+            logger.warning(f"Failed to compile translations: {e}")
+
+        translators = {}
+        for lang in sorted(os.listdir(self.locales_dir)):
+            mo_path = os.path.join(self.locales_dir, lang, "LC_MESSAGES", f"{DOMAIN}.mo")
+            if os.path.exists(mo_path):
+                translators[lang] = Translator(lang, read_mo(mo_path), self.cache_size)
+        if self.default_locale not in translators:
+            # Язык исходных строк: перевод - сам msgid
+            translators[self.default_locale] = Translator(self.default_locale, {}, self.cache_size)
+
+        self._translators = translators
+        return translators
+
+    @property
+    def locales(self) -> List[str]:
+        return list(self.load())
+
+    def get(self, locale: Optional[str]) -> Translator:
+        """Переводчик языка; неизвестный язык - язык по умолчанию"""
+        translators = self._translators or self.load()
+        translator = translators.get(locale)
+        if translator is None:
+            translator = translators[self.default_locale]
+        return translator
+
+
+catalogs = Catalogs(config.LOCALES_DIR, config.DEFAULT_LANGUAGE, config.I18N_FORMAT_CACHE_SIZE)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    languages = compile_catalogs(config.LOCALES_DIR, force=True)
+    print(f"Compiled: {', '.join(languages) or 'nothing'}")
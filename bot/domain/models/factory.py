@@ -0,0 +1,68 @@
+# bot/domain/models/factory.py
+
+from typing import Optional
+from datetime import datetime
+from bot.core.config import config
+
+def production_rate(level: int, workers: int) -> float:
+    """Производство в секунду при данном уровне и числе рабочих"""
+    per_hour = config.FACTORY_BASE_RATE * (1 + workers) * config.FACTORY_LEVEL_GROWTH ** (level - 1)
+    return per_hour / 3600
+
+def level_capacity(level: int) -> int:
+    """Вместимость склада завода на уровне"""
+    return int(config.FACTORY_BASE_CAPACITY * config.FACTORY_LEVEL_GROWTH ** (level - 1))
+
+class FactoryState:
+    """Состояние производства: параметры и момент последнего расчёта
+    
+    Хранится только то, что есть в строке users; произведённое считается
+    в замкнутой форме на момент запроса, без периодических задач.
+    """
+    
+    __slots__ = ("level", "capacity", "workers", "stock", "settled_at", "upgrade_at")
+    
+    def __init__(
+        self,
+        level: int,
+        capacity: int,
+        workers: int,
+        stock: float,
+        settled_at: datetime,
+        upgrade_at: Optional[datetime] = None
+    ):
+        """
+        stock: произведено и не собрано на момент settled_at
+        upgrade_at: когда завершится улучшение до level + 1 (если идёт)
+        """
+        self.level = level
+        self.capacity = capacity
+        self.workers = workers
+        self.stock = stock
+        self.settled_at = settled_at
+        self.upgrade_at = upgrade_at
+    
+    def _fill(self, until: datetime) -> None:
+        # Склад заполняется с постоянной скоростью и упирается в вместимость
+        seconds = (until - self.settled_at).total_seconds()
+        if seconds > 0:
+            produced = production_rate(self.level, self.workers) * seconds
+            self.stock = min(float(self.capacity), self.stock + produced)
+            self.settled_at = until
+    
+    def settle(self, now: datetime) -> "FactoryState":
+        """Досчитать производство до now (с улучшением посреди интервала)"""
+        if self.upgrade_at is not None and self.upgrade_at <= now:
+            # До завершения улучшения - старые параметры, после - новые
+            self._fill(self.upgrade_at)
+            self.level += 1
+            self.capacity = max(self.capacity, level_capacity(self.level))
+            self.upgrade_at = None
+        self._fill(now)
+        return self
+    
+    def take(self) -> int:
+        """Забрать целые единицы со склада, дробный остаток остаётся"""
+        units = int(self.stock)
+        self.stock -= units
+        return units
@@ -0,0 +1,18 @@
+# bot/domain/models/referral.py
+
+from typing import Dict, List
+from bot.core.config import config
+
+def level_rewards(bonus: int, percents: List[int] = None) -> Dict[int, int]:
+    """Бонус каждому уровню аплайна: {глубина: сумма}, нулевые уровни опущены"""
+    percents = config.REFERRAL_LEVEL_PERCENTS if percents is None else percents
+    rewards = {}
+    for depth, percent in enumerate(percents, start=1):
+        amount = bonus * percent // 100
+        if amount > 0:
+            rewards[depth] = amount
+    return rewards
+
+def welcome_bonus(bonus: int) -> int:
+    """Приветственный бонус приглашённому"""
+    return bonus * config.REFERRAL_WELCOME_PERCENT // 100
@@ -0,0 +1,227 @@
+# bot/domain/repositories/referral_repository.py
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import Integer, and_, column, exists, func, literal, select, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from redis.exceptions import RedisError
+from bot.core.config import config
+from bot.infra.cache.counters import HotCounters
+from bot.infra.database.models import ReferralAncestor, User
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ReferralRepository:
+    """Реферальные коды и дерево приглашений (closure table referral_ancestors)"""
+    
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        read_session_factory: Optional[Callable] = None,
+        counters: Optional[HotCounters] = None
+    ):
+        """
+        read_session_factory: сессии только для чтения (Database.read_session -
+                              реплика с откатом на primary)
+        counters: write-behind счётчики для начислений аплайну; без них
+                  строки обновляются в транзакции привязки
+        """
+        self.session_factory = session_factory
+        self.read_session_factory = read_session_factory or session_factory
+        self.counters = counters
+    
+    @staticmethod
+    def _as_referral(user_id: int, referral_code: str) -> Dict[str, Any]:
+        return {
+            "user_id": user_id,
+            "referral_code": referral_code,
+            "bonus_amount": config.REFERRAL_BONUS,
+        }
+    
+    async def get_by_user_id(self, user_id: int) -> Optional[Dict[str, Any]]:
+        async with self.read_session_factory() as session:
+            code = (await session.execute(
+                select(User.referral_code)
+                .where(User.user_id == user_id)
+                .execution_options(query_type="referral_by_user")
+            )).scalar_one_or_none()
+        if code is None:
+            return None
+        return self._as_referral(user_id, code)
+    
+    async def get_by_code(self, referral_code: str) -> Optional[Dict[str, Any]]:
+        async with self.read_session_factory() as session:
+            user_id = (await session.execute(
+                select(User.user_id)
+                .where(User.referral_code == referral_code)
+                .execution_options(query_type="referral_by_code")
+            )).scalar_one_or_none()
+        if user_id is None:
+            return None
+        return self._as_referral(user_id, referral_code)
+    
+    async def create(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Сохранить реф-код пользователя (если его ещё нет)"""
+        async with self.session_factory() as session:
+            async with session.begin():
+                code = (await session.execute(
+                    update(User)
+                    .where(User.user_id == data["user_id"])
+                    .values(referral_code=func.coalesce(User.referral_code, data["referral_code"]))
+                    .returning(User.referral_code)
+                )).scalar_one()
+        return self._as_referral(data["user_id"], code)
+    
+    async def update_balance(self, user_id: int, amount: int) -> None:
+        if self.counters is not None and amount >= 0:
+            await self.counters.incr(user_id, {"soft_currency": amount})
+            return
+        async with self.session_factory() as session:
+            async with session.begin():
+                await session.execute(
+                    update(User).where(User.user_id == user_id).values(soft_currency=User.soft_currency + amount)
+                )
+    
+    async def get_upline(self, user_id: int, max_depth: Optional[int] = None) -> List[Tuple[int, int]]:
+        """Предки пользователя одним запросом: [(ancestor_id, depth)] от ближнего"""
+        query = (
+            select(ReferralAncestor.ancestor_id, ReferralAncestor.depth)
+            .where(ReferralAncestor.descendant_id == user_id)
+            .order_by(ReferralAncestor.depth)
+            .execution_options(query_type="referral_upline")
+        )
+        if max_depth is not None:
+            query = query.where(ReferralAncestor.depth <= max_depth)
+        async with self.read_session_factory() as session:
+            return [(row.ancestor_id, row.depth) for row in await session.execute(query)]
+    
+    async def join(
+        self,
+        user_id: int,
+        referrer_id: int,
+        rewards: Dict[int, int],
+        welcome: int = 0
+    ) -> List[Tuple[int, int, int]]:
+        """Привязать нового пользователя к пригласившему и начислить бонусы
+        
+        Одна транзакция: invited_by_id, строки closure table (копия аплайна
+        пригласившего плюс он сам), total_referrals всего аплайна и бонусы
+        всем уровням из rewards ({глубина: сумма}) и новичку. Со счётчиками
+        total_referrals и бонусы уходят в них после коммита: строки аплайна
+        (верхние уровни общие для многих привязок) не блокируются.
+        Возвращает [(получатель, глубина, сумма)] для всего аплайна (сумма
+        может быть 0) и новичка (глубина 0); пусто, если пользователь уже
+        был привязан (или привязка создала бы цикл).
+        """
+        if user_id == referrer_id:
+            return []
+        
+        async with self.session_factory() as session:
+            async with session.begin():
+                attached = (await session.execute(
+                    update(User)
+                    .where(
+                        User.user_id == user_id,
+                        User.invited_by_id.is_(None),
+                        # Новичок не может оказаться предком пригласившего
+                        ~exists().where(and_(
+                            ReferralAncestor.ancestor_id == user_id,
+                            ReferralAncestor.descendant_id == referrer_id
+                        ))
+                    )
+                    .values(invited_by_id=referrer_id)
+                    .returning(User.user_id)
+                )).scalar_one_or_none()
+                if attached is None:
+                    return []
+                
+                upline = (
+                    select(
+                        ReferralAncestor.ancestor_id,
+                        literal(user_id).label("descendant_id"),
+                        (ReferralAncestor.depth + 1).label("depth")
+                    )
+                    .where(ReferralAncestor.descendant_id == referrer_id)
+                    .union_all(select(literal(referrer_id), literal(user_id), literal(1)))
+                )
+                ancestors = (await session.execute(
+                    insert(ReferralAncestor)
+                    .from_select(["ancestor_id", "descendant_id", "depth"], upline)
+                    .returning(ReferralAncestor.ancestor_id, ReferralAncestor.depth)
+                )).all()
+                
+                # Счётчик поддерева и бонус уровня всему аплайну
+                credits = [
+                    (ancestor_id, depth, rewards.get(depth, 0))
+                    for ancestor_id, depth in ancestors
+                ]
+                changes = [(ancestor_id, 1, amount) for ancestor_id, _, amount in credits]
+                if welcome:
+                    changes.append((user_id, 0, welcome))
+                    credits.append((user_id, 0, welcome))
+                
+                if self.counters is None:
+                    await self._apply_changes(session, changes)
+        
+        if self.counters is not None:
+            try:
+                await self.counters.incr_many({
+                    changed_id: {
+                        name: value
+                        for name, value in (("total_referrals", referrals), ("soft_currency", amount))
+                        if value
+                    }
+                    for changed_id, referrals, amount in changes
+                })
+            except RedisError as e:
+                # Привязка уже записана - начисляем напрямую, а не теряем
+                logger.warning(f"Counters unavailable, crediting upline of {user_id} in the database: {e}")
+                async with self.session_factory() as session:
+                    async with session.begin():
+                        await self._apply_changes(session, changes)
+        return credits
+    
+    @staticmethod
+    async def _apply_changes(session: AsyncSession, changes: List[Tuple[int, int, int]]) -> None:
+        """Одно обновление на весь аплайн: (user_id, +рефералов, +монет)"""
+        delta = values(
+            column("user_id", Integer), column("referrals", Integer), column("amount", Integer),
+            name="delta"
+        ).data(sorted(changes))
+        await session.execute(
+            update(User)
+            .where(User.user_id == delta.c.user_id)
+            .values(
+                total_referrals=User.total_referrals + delta.c.referrals,
+                soft_currency=User.soft_currency + delta.c.amount
+            )
+        )
+    
+    async def subtree_stats(self, user_id: int) -> Dict[int, int]:
+        """Размер поддерева пользователя по уровням: {глубина: число рефералов}"""
+        async with self.read_session_factory() as session:
+            result = await session.execute(
+                select(ReferralAncestor.depth, func.count())
+                .where(ReferralAncestor.ancestor_id == user_id)
+                .group_by(ReferralAncestor.depth)
+                .order_by(ReferralAncestor.depth)
+                .execution_options(query_type="referral_subtree")
+            )
+            return {depth: count for depth, count in result.all()}
+    
+    async def recount_total_referrals(self) -> int:
+        """Пересчитать users.total_referrals по closure table (ремонт счётчиков)"""
+        sizes = (
+            select(ReferralAncestor.ancestor_id, func.count().label("size"))
+            .group_by(ReferralAncestor.ancestor_id)
+            .subquery()
+        )
+        async with self.session_factory() as session:
+            async with session.begin():
+                result = await session.execute(
+                    update(User)
+                    .where(User.user_id == sizes.c.ancestor_id, User.total_referrals != sizes.c.size)
+                    .values(total_referrals=sizes.c.size)
+                )
+        return result.rowcount
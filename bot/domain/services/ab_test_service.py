@@ -0,0 +1,236 @@
+# bot/domain/services/ab_test_service.py
+
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from bot.core.config import config
+from bot.infra.database.models import ABTest
+from bot.infra.metrics.prometheus import ab_events_total, purchases_daily
+from bot.infra.queue import tasks
+from bot.infra.queue.tasks import EventKey
+import asyncio
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = ("A", "B")
+
+
+def assign_variant(experiment_key: str, user_id: int) -> str:
+    """Вариант пользователя: детерминированный хэш, без чтения из БД
+
+    Один и тот же пользователь всегда получает один вариант эксперимента
+    в любом процессе; разные эксперименты распределяют независимо.
+    """
+    digest = hashlib.blake2b(f"{experiment_key}:{user_id}".encode(), digest_size=8).digest()
+    return VARIANTS[int.from_bytes(digest, "big") % len(VARIANTS)]
+
+
+class ExperimentCache:
+    """Активные эксперименты в памяти процесса, перечитываются по таймеру"""
+
+    def __init__(self, session_factory: async_sessionmaker, refresh_interval: float = 60.0):
+        self.session_factory = session_factory
+        self.refresh_interval = refresh_interval
+        self.active: Dict[str, str] = {}  # experiment_key -> test_id
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        await self.refresh()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="ab-experiments-refresh")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def refresh(self) -> None:
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(ABTest.experiment_key, ABTest.id).where(ABTest.is_active.is_(True))
+            )
+            # Замена целиком: читатели видят либо старый, либо новый набор
+            self.active = {key: test_id for key, test_id in result.all()}
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                # Работаем со старым набором до следующей попытки
+                logger.warning(f"Failed to refresh A/B experiments: {e}")
+
+
+class ExposureBuffer:
+    """Буфер воздействий и конверсий перед очередью задач
+
+    variant() вызывается на горячем пути обработчиков, поэтому события
+    сначала копятся в памяти, без round trip в Redis на каждое: повторные
+    события одного пользователя в эксперименте схлопываются здесь же, а
+    по размеру или таймеру буфер уходит в очередь (tasks.log_exposures /
+    log_conversions) одним pipeline. В БД пишет воркер очереди - с
+    повторами и мёртвыми задачами. При остановке буфер отправляется
+    целиком.
+    """
+
+    def __init__(
+        self,
+        flush_size: int = 500,
+        flush_interval: float = 2.0,
+        max_size: int = 100000
+    ):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self._exposures: Dict[EventKey, str] = {}  # -> variant
+        self._conversions: Dict[EventKey, Tuple[str, Optional[float]]] = {}  # -> (variant, сумма)
+        self._flushed: Dict[EventKey, None] = {}  # уже отправленные воздействия (FIFO)
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    def __len__(self) -> int:
+        return len(self._exposures) + len(self._conversions)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run(), name="ab-exposure-writer")
+
+    async def stop(self) -> None:
+        """Отправить накопленное и остановиться"""
+        if self._task is not None:
+            self._closing = True
+            self._full.set()
+            await self._task
+            self._task = None
+
+    def add_exposure(self, test_id: str, user_id: int, variant: str) -> None:
+        key = (test_id, user_id)
+        if key in self._exposures or key in self._flushed:
+            return
+        self._exposures[key] = variant
+        self._added("exposure")
+
+    def add_conversion(self, test_id: str, user_id: int, variant: str, value: Optional[float]) -> None:
+        key = (test_id, user_id)
+        event = (variant, value)
+        if key in self._conversions:
+            event = tasks.merge_conversion(self._conversions[key], event)
+        self._conversions[key] = event
+        self._added("conversion")
+
+    def _added(self, kind: str) -> None:
+        if len(self) > self.max_size:
+            # Redis долго недоступен - жертвуем старыми событиями, а не памятью
+            events = self._exposures if kind == "exposure" else self._conversions
+            events.pop(next(iter(events)))
+            ab_events_total.labels(kind=kind, status="dropped").inc()
+        if len(self) >= self.flush_size:
+            self._full.set()
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+
+        await self.flush()
+        if len(self):
+            logger.error(f"Lost {len(self)} A/B events on shutdown: job queue unavailable")
+
+    async def flush(self) -> None:
+        """Отправить всё накопленное в очередь пачками по flush_size"""
+        exposures, self._exposures = self._exposures, {}
+        conversions, self._conversions = self._conversions, {}
+
+        exposure_items = list(exposures.items())
+        conversion_items = list(conversions.items())
+        for i in range(0, len(exposure_items), self.flush_size):
+            chunk = exposure_items[i:i + self.flush_size]
+            if await self._send(tasks.log_exposures, chunk, "exposure"):
+                self._remember(key for key, _ in chunk)
+            else:
+                self._restore(self._exposures, chunk)
+        for i in range(0, len(conversion_items), self.flush_size):
+            chunk = conversion_items[i:i + self.flush_size]
+            if not await self._send(tasks.log_conversions, chunk, "conversion"):
+                self._restore(self._conversions, chunk)
+
+    @staticmethod
+    async def _send(log, chunk: List, kind: str) -> bool:
+        """False - пачку нужно повторить позже"""
+        try:
+            await log(chunk)
+        except Exception as e:
+            logger.warning(f"Failed to enqueue {len(chunk)} A/B {kind} events, will retry: {e}")
+            return False
+
+        ab_events_total.labels(kind=kind, status="flushed").inc(len(chunk))
+        return True
+
+    def _restore(self, events: Dict, chunk: List) -> None:
+        # Неотправленная пачка возвращается в буфер перед новыми событиями
+        newer = dict(events)
+        events.clear()
+        events.update(chunk)
+        for key, value in newer.items():
+            if key in events and events is self._conversions:
+                events[key] = tasks.merge_conversion(events[key], value)
+            else:
+                events.setdefault(key, value)
+
+    def _remember(self, keys) -> None:
+        for key in keys:
+            self._flushed[key] = None
+        while len(self._flushed) > self.max_size:
+            self._flushed.pop(next(iter(self._flushed)))
+
+
+class ABTestService:
+    """A/B тесты без записи в БД на горячем пути
+
+    Вариант вычисляется хэшем, активные эксперименты берутся из кэша
+    процесса, воздействия и конверсии уходят через буфер в очередь задач.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker):
+        self.experiments = ExperimentCache(session_factory, config.AB_REFRESH_INTERVAL)
+        self.buffer = ExposureBuffer(
+            flush_size=config.AB_FLUSH_SIZE,
+            flush_interval=config.AB_FLUSH_INTERVAL,
+            max_size=config.AB_BUFFER_MAX
+        )
+
+    async def start(self) -> None:
+        await self.experiments.start()
+        await self.buffer.start()
+
+    async def stop(self) -> None:
+        await self.experiments.stop()
+        await self.buffer.stop()
+
+    def variant(self, experiment_key: str, user_id: int) -> Optional[str]:
+        """Вариант пользователя с фиксацией воздействия; None - эксперимент не активен"""
+        test_id = self.experiments.active.get(experiment_key)
+        if test_id is None:
+            return None
+        variant = assign_variant(experiment_key, user_id)
+        self.buffer.add_exposure(test_id, user_id, variant)
+        return variant
+
+    def track_conversion(self, experiment_key: str, user_id: int, value: Optional[float] = None) -> None:
+        """Засчитать конверсию (покупку) пользователю в эксперименте"""
+        test_id = self.experiments.active.get(experiment_key)
+        if test_id is None:
+            return
+        variant = assign_variant(experiment_key, user_id)
+        self.buffer.add_conversion(test_id, user_id, variant, value)
+        purchases_daily.labels(variant=f"{experiment_key}:{variant}").inc()
@@ -0,0 +1,105 @@
+# bot/domain/services/auction_feed_service.py
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from bot.core.config import config
+from bot.core.i18n import Translator, catalogs
+from bot.infra.cache.auction_feed import (
+    SORTS, FeedEntry, auction_feed_index, card_fields, created_key, parse_cursor, price_key
+)
+from bot.infra.cache.decorators import cached
+from bot.infra.database.models import Auction
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def render_page(_: Translator, entries: List[FeedEntry], first: bool) -> str:
+    """Текст страницы ленты на языке переводчика"""
+    if not entries:
+        return _("Активных лотов пока нет") if first else _("Больше лотов нет")
+    lines = [_("🔥 Активные лоты")]
+    for entry in entries:
+        lines.append("")
+        lines.append(entry.card["description"] or _("Без описания"))
+        lines.append(_("💰 Цена: {price}", price=entry.price))
+    return "\n".join(lines)
+
+
+class AuctionFeedService:
+    """Лента активных аукционов: keyset-страницы из индекса в Redis
+
+    Отрисованная страница кэшируется на AUCTION_FEED_PAGE_TTL секунд по
+    (язык, порядок, курсор); промах - один вызов скрипта Redis. Postgres
+    читается, только пока индекс не построен, и тоже keyset, без OFFSET.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        read_session_factory: Optional[Callable] = None
+    ):
+        self.session_factory = session_factory
+        self.read_session_factory = read_session_factory or session_factory
+
+    async def page(self, locale: str, sort: str = "new", cursor: Optional[str] = None) -> Dict[str, Any]:
+        """Страница ленты: {text, next}; next - курсор следующей страницы или None"""
+        if sort not in SORTS:
+            sort = "new"
+        if cursor and parse_cursor(cursor) is None:
+            # Подделанный callback - первая страница, а не лишний ключ в кэше
+            cursor = None
+        return await self._rendered_page(catalogs.get(locale).locale, sort, cursor or None)
+
+    @cached(
+        namespace="auction_feed_page",
+        ttl=config.AUCTION_FEED_PAGE_TTL,
+        l1_ttl=config.AUCTION_FEED_PAGE_TTL / 2,
+        negative_ttl=None
+    )
+    async def _rendered_page(self, locale: str, sort: str, cursor: Optional[str]) -> Dict[str, Any]:
+        size = config.AUCTION_FEED_PAGE_SIZE
+        found = await auction_feed_index.page(sort, cursor, size)
+        if found is None:
+            found = await self._page_from_db(sort, cursor, size)
+        entries, next_cursor = found
+        return {"text": render_page(catalogs.get(locale), entries, first=cursor is None), "next": next_cursor}
+
+    async def _page_from_db(
+        self,
+        sort: str,
+        cursor: Optional[str],
+        limit: int
+    ) -> Tuple[List[FeedEntry], Optional[str]]:
+        """Та же страница из Postgres (индекс в Redis ещё не построен)"""
+        query = (
+            select(Auction.id, Auction.created_at, Auction.current_price, Auction.description)
+            .where(Auction.is_active.is_(True), Auction.is_sold_out.is_(False))
+        )
+        after = parse_cursor(cursor) if cursor else None
+        if sort == "new":
+            if after is not None:
+                created_at = EPOCH + timedelta(microseconds=int(after[0]))
+                query = query.where(tuple_(Auction.created_at, Auction.id) < (created_at, after[1]))
+            query = query.order_by(Auction.created_at.desc(), Auction.id.desc())
+        else:
+            if after is not None:
+                query = query.where(tuple_(Auction.current_price, Auction.id) > (int(after[0]), after[1]))
+            query = query.order_by(Auction.current_price, Auction.id)
+
+        async with self.read_session_factory() as session:
+            rows = (await session.execute(
+                query.limit(limit + 1).execution_options(query_type="auction_feed_page")
+            )).all()
+
+        entries = [FeedEntry(row.id, row.current_price, card_fields(row)) for row in rows[:limit]]
+        if len(rows) <= limit:
+            return entries, None
+        last = rows[limit - 1]
+        key = created_key(last.created_at) if sort == "new" else price_key(last.current_price)
+        return entries, f"{key}:{last.id}"
+
+    async def rebuild(self) -> int:
+        """Пересобрать индекс из Postgres (после потери данных в Redis)"""
+        return await auction_feed_index.rebuild(self.read_session_factory)
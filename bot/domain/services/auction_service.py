@@ -0,0 +1,430 @@
+# bot/domain/services/auction_service.py
+
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+from enum import Enum
+from sqlalchemy import Integer, String, column, delete, func, select, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from redis.exceptions import RedisError
+from bot.core.config import config
+from bot.infra.cache.auction_feed import auction_feed_index
+from bot.infra.cache.counters import HotCounters
+from bot.infra.cache.leaderboard import leaderboards
+from bot.infra.cache.redis_client import LuaScript, redis_client
+from bot.infra.database.models import Auction, Purchase, User
+from bot.infra.metrics.prometheus import auction_purchases_total, auction_purchase_batch_size
+import asyncio
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+AUCTION_STATE_KEY = "auction:{}:state"
+PURCHASE_IDEMPOTENCY_KEY = "purchase_idem:{}"
+
+# Резерв покупки: проверка идемпотентности и номер покупки атомарно.
+# Номер задаёт порядок покупок аукциона внутри пачки; цену считает
+# запись пачки по числу оплаченных покупок.
+# KEYS: state, idempotency; ARGV: idempotency ttl
+# -> {n, base_price} | {-1} дубликат | {-2} нет состояния | {-3} продано
+RESERVE_SCRIPT = LuaScript("""
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {-2}
+end
+if redis.call('HGET', KEYS[1], 'sold_out') == '1' then
+    return {-3}
+end
+if not redis.call('SET', KEYS[2], 'pending', 'NX', 'EX', ARGV[1]) then
+    return {-1}
+end
+local n = redis.call('HINCRBY', KEYS[1], 'sold', 1) - 1
+return {n, tonumber(redis.call('HGET', KEYS[1], 'base_price'))}
+""")
+
+# Отмена резерва: номер возвращается, только если после нас не резервировали
+# (на цену номер не влияет - только на порядок)
+# KEYS: state, idempotency; ARGV: n, 1 - оставить ключ идемпотентности
+RELEASE_SCRIPT = LuaScript("""
+if ARGV[2] ~= '1' then
+    redis.call('DEL', KEYS[2])
+end
+if tonumber(redis.call('HGET', KEYS[1], 'sold')) == tonumber(ARGV[1]) + 1 then
+    redis.call('HINCRBY', KEYS[1], 'sold', -1)
+    return 1
+end
+return 0
+""")
+
+
+class PurchaseStatus(str, Enum):
+    OK = "ok"
+    DUPLICATE = "duplicate"
+    SOLD_OUT = "sold_out"
+    NOT_FOUND = "not_found"
+    INSUFFICIENT_FUNDS = "insufficient_funds"
+
+
+def calculate_price(base_price: int, times_purchased: int) -> int:
+    """Цена после times_purchased покупок: линейный рост от базовой"""
+    step = max(1, base_price * config.AUCTION_PRICE_STEP_PERCENT // 100)
+    return base_price + times_purchased * step
+
+
+class _PendingPurchase:
+    __slots__ = ("user_id", "auction_id", "idempotency_key", "seq", "price", "next_price", "future")
+
+    def __init__(self, user_id: int, auction_id: str, idempotency_key: str, seq: int):
+        self.user_id = user_id
+        self.auction_id = auction_id
+        self.idempotency_key = idempotency_key
+        self.seq = seq  # порядок покупок аукциона
+        # Заполняются при записи пачки
+        self.price: Optional[int] = None
+        self.next_price: Optional[int] = None
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class PurchaseBatchWriter:
+    """Групповая запись покупок в Postgres
+
+    Покупки копятся до batch_size или flush_interval и пишутся одной
+    транзакцией: цены по числу оплаченных покупок, списание у покупателей,
+    вставка покупок, одно обновление строки каждого аукциона на пачку.
+    Вызывающий ждёт коммита своей пачки.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        batch_size: int = 200,
+        flush_interval: float = 0.02,
+        counters: Optional[HotCounters] = None
+    ):
+        """
+        counters: write-behind счётчики; незаписанные начисления покупателей
+                  дописываются перед проверкой баланса
+        """
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.counters = counters
+        self._pending: List[_PendingPurchase] = []
+        self._has_pending = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run(), name="purchase-writer")
+
+    async def stop(self) -> None:
+        """Записать накопленное и остановиться"""
+        if self._task is not None:
+            self._closing = True
+            self._has_pending.set()
+            self._batch_full.set()
+            await self._task
+            self._task = None
+
+    async def submit(self, purchase: _PendingPurchase) -> PurchaseStatus:
+        """Поставить покупку в пачку и дождаться коммита"""
+        self._pending.append(purchase)
+        self._has_pending.set()
+        if len(self._pending) >= self.batch_size:
+            self._batch_full.set()
+        return await purchase.future
+
+    async def _run(self) -> None:
+        while True:
+            await self._has_pending.wait()
+            # Даём пачке набраться, но не дольше flush_interval
+            try:
+                await asyncio.wait_for(self._batch_full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self._flush()
+
+            if self._closing:
+                while self._pending:
+                    await self._flush()
+                return
+            if len(self._pending) < self.batch_size:
+                self._batch_full.clear()
+            if not self._pending:
+                self._has_pending.clear()
+
+    async def _flush(self) -> None:
+        batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+        if not batch:
+            return
+
+        try:
+            if self.counters is not None:
+                await self.counters.flush_users({p.user_id for p in batch})
+            async with self.session_factory() as session:
+                async with session.begin():
+                    statuses = await self._write(session, batch)
+        except Exception as e:
+            logger.exception(f"Purchase batch of {len(batch)} failed: {e}")
+            for purchase in batch:
+                if not purchase.future.done():
+                    purchase.future.set_exception(e)
+            return
+
+        auction_purchase_batch_size.observe(len(batch))
+        for purchase in batch:
+            if not purchase.future.done():
+                purchase.future.set_result(statuses[purchase.idempotency_key])
+
+    async def _write(self, session: AsyncSession, batch: List[_PendingPurchase]) -> Dict[str, PurchaseStatus]:
+        """Записать пачку, вернуть статус каждой покупки по ключу идемпотентности"""
+        # Уникальный ключ в БД - страховка на случай потери ключа в Redis;
+        # цена записывается ниже, когда известен номер покупки
+        result = await session.execute(
+            insert(Purchase)
+            .values([
+                {
+                    "user_id": p.user_id,
+                    "auction_id": p.auction_id,
+                    "idempotency_key": p.idempotency_key,
+                }
+                for p in batch
+            ])
+            .on_conflict_do_nothing(index_elements=["idempotency_key"])
+            .returning(Purchase.idempotency_key)
+        )
+        inserted = set(result.scalars())
+        statuses = {p.idempotency_key: PurchaseStatus.DUPLICATE for p in batch}
+        batch = [p for p in batch if p.idempotency_key in inserted]
+        if not batch:
+            return statuses
+
+        # Строки аукционов и покупателей пачки - под блокировкой до коммита;
+        # порядок по ключу одинаков во всех процессах (без взаимоблокировок)
+        result = await session.execute(
+            select(Auction.id, Auction.base_price, Auction.times_purchased)
+            .where(Auction.id.in_({p.auction_id for p in batch}))
+            .order_by(Auction.id)
+            .with_for_update()
+        )
+        auctions = {row.id: row for row in result}
+        result = await session.execute(
+            select(User.user_id, User.soft_currency)
+            .where(User.user_id.in_({p.user_id for p in batch}))
+            .order_by(User.user_id)
+            .with_for_update()
+        )
+        balances = {user_id: balance or 0 for user_id, balance in result.all()}
+
+        # Цена - по числу оплаченных покупок, а не по номеру резерва в Redis:
+        # отменённый резерв не сдвигает шаг цены, times_purchased совпадает
+        # с числом покупок
+        sold = {auction_id: row.times_purchased or 0 for auction_id, row in auctions.items()}
+        totals: Dict[int, int] = {}
+        paid: List[_PendingPurchase] = []
+        unpaid: List[str] = []
+        for p in sorted(batch, key=lambda p: (p.auction_id, p.seq)):
+            auction = auctions.get(p.auction_id)
+            if auction is None:
+                statuses[p.idempotency_key] = PurchaseStatus.NOT_FOUND
+                unpaid.append(p.idempotency_key)
+                continue
+            price = calculate_price(auction.base_price, sold[p.auction_id])
+            if balances.get(p.user_id, 0) < price:
+                statuses[p.idempotency_key] = PurchaseStatus.INSUFFICIENT_FUNDS
+                unpaid.append(p.idempotency_key)
+                continue
+            balances[p.user_id] -= price
+            totals[p.user_id] = totals.get(p.user_id, 0) + price
+            sold[p.auction_id] += 1
+            p.price = price
+            p.next_price = calculate_price(auction.base_price, sold[p.auction_id])
+            statuses[p.idempotency_key] = PurchaseStatus.OK
+            paid.append(p)
+
+        if unpaid:
+            await session.execute(delete(Purchase).where(Purchase.idempotency_key.in_(unpaid)))
+        if not paid:
+            return statuses
+
+        prices = values(
+            column("idempotency_key", String), column("price", Integer), name="prices"
+        ).data([(p.idempotency_key, p.price) for p in paid])
+        await session.execute(
+            update(Purchase)
+            .where(Purchase.idempotency_key == prices.c.idempotency_key)
+            .values(price_paid=prices.c.price)
+        )
+
+        # Одна строка на покупателя и на аукцион за пачку
+        debits = values(
+            column("user_id", Integer), column("total", Integer), name="debits"
+        ).data(sorted(totals.items()))
+        await session.execute(
+            update(User)
+            .where(User.user_id == debits.c.user_id)
+            .values(soft_currency=User.soft_currency - debits.c.total)
+        )
+
+        progress = values(
+            column("id", String), column("times", Integer), column("price", Integer), name="progress"
+        ).data(sorted(
+            (auction_id, sold[auction_id], calculate_price(auctions[auction_id].base_price, sold[auction_id]))
+            for auction_id in {p.auction_id for p in paid}
+        ))
+        await session.execute(
+            update(Auction)
+            .where(Auction.id == progress.c.id)
+            .values(times_purchased=progress.c.times, current_price=progress.c.price)
+        )
+        return statuses
+
+
+class AuctionService:
+    """Сервис аукционов: строка аукциона блокируется раз на пачку покупок"""
+
+    def __init__(self, session_factory: async_sessionmaker, counters: Optional[HotCounters] = None):
+        """
+        counters: write-behind счётчики для статистики покупателя
+                  (total_purchases, total_revenue); перед списанием
+                  пачки его начисления дописываются в БД
+        """
+        self.session_factory = session_factory
+        self.counters = counters
+        self.writer = PurchaseBatchWriter(
+            session_factory,
+            batch_size=config.AUCTION_BATCH_SIZE,
+            flush_interval=config.AUCTION_FLUSH_INTERVAL,
+            counters=counters
+        )
+
+    async def start(self) -> None:
+        await self.writer.start()
+
+    async def stop(self) -> None:
+        await self.writer.stop()
+
+    async def create(
+        self,
+        creator_id: int,
+        description: str,
+        base_price: int,
+        characteristics: Optional[Dict[str, Any]] = None,
+        photo_file_id: Optional[str] = None
+    ) -> Auction:
+        """Выставить карточку на аукцион и добавить её в ленту"""
+        auction = Auction(
+            id=str(uuid.uuid4()),
+            creator_id=creator_id,
+            description=description,
+            characteristics=characteristics or {},
+            photo_file_id=photo_file_id,
+            base_price=base_price,
+            current_price=base_price,
+            is_active=True,
+            is_sold_out=False,
+            created_at=datetime.utcnow()
+        )
+        async with self.session_factory() as session:
+            async with session.begin():
+                session.add(auction)
+        await auction_feed_index.add(auction)
+        return auction
+
+    async def purchase(
+        self,
+        user_id: int,
+        auction_id: str,
+        idempotency_key: str
+    ) -> Tuple[PurchaseStatus, Optional[int]]:
+        """Купить карточку: (статус, уплаченная цена)"""
+        state_key = AUCTION_STATE_KEY.format(auction_id)
+        idempotency = PURCHASE_IDEMPOTENCY_KEY.format(idempotency_key)
+        keys = [state_key, idempotency]
+
+        result = await RESERVE_SCRIPT(keys, [config.PURCHASE_IDEMPOTENCY_TTL])
+        if result[0] == -2:
+            # Первая покупка после старта/вытеснения - поднимаем состояние из БД
+            if not await self._load_state(auction_id):
+                return self._done(PurchaseStatus.NOT_FOUND)
+            result = await RESERVE_SCRIPT(keys, [config.PURCHASE_IDEMPOTENCY_TTL])
+
+        if result[0] == -1:
+            return self._done(PurchaseStatus.DUPLICATE)
+        if result[0] == -3:
+            return self._done(PurchaseStatus.SOLD_OUT)
+
+        pending = _PendingPurchase(user_id, auction_id, idempotency_key, result[0])
+
+        try:
+            status = await self.writer.submit(pending)
+        except Exception:
+            await RELEASE_SCRIPT(keys, [pending.seq, 0])
+            raise
+
+        if status in (PurchaseStatus.INSUFFICIENT_FUNDS, PurchaseStatus.NOT_FOUND):
+            await RELEASE_SCRIPT(keys, [pending.seq, 0])
+        elif status == PurchaseStatus.DUPLICATE:
+            # Покупка уже есть в БД: ключ идемпотентности оставляем
+            await RELEASE_SCRIPT(keys, [pending.seq, 1])
+
+        if status != PurchaseStatus.OK:
+            return self._done(status)
+
+        await leaderboards.incr(user_id, "soft_currency", -pending.price)
+        # Цена следующей покупки - в индекс ленты (порядок по цене)
+        await auction_feed_index.set_price(auction_id, pending.next_price)
+        if self.counters is not None:
+            try:
+                await self.counters.incr(user_id, {"total_purchases": 1, "total_revenue": pending.price})
+            except RedisError as e:
+                # Покупка уже записана - статистика не должна её отменять
+                logger.warning(f"Failed to count purchase of user {user_id}: {e}")
+        return self._done(PurchaseStatus.OK, pending.price)
+
+    def _done(
+        self,
+        status: PurchaseStatus,
+        price: Optional[int] = None
+    ) -> Tuple[PurchaseStatus, Optional[int]]:
+        auction_purchases_total.labels(status=status.value).inc()
+        return status, price
+
+    async def _load_state(self, auction_id: str) -> bool:
+        """Загрузить счётчик покупок аукциона из БД в Redis"""
+        async with self.session_factory() as session:
+            row = (await session.execute(
+                select(Auction.base_price, Auction.is_active, Auction.is_sold_out, Auction.times_purchased)
+                .where(Auction.id == auction_id)
+            )).one_or_none()
+
+            if row is None:
+                return False
+
+            # Покупки, записанные до потери состояния (times_purchased мог отстать)
+            purchased = (await session.execute(
+                select(func.count()).select_from(Purchase).where(Purchase.auction_id == auction_id)
+            )).scalar_one()
+
+        state_key = AUCTION_STATE_KEY.format(auction_id)
+        sold_out = row.is_sold_out or not row.is_active
+        async with redis_client.pipeline(transaction=True) as pipe:
+            # HSETNX: параллельная загрузка не затрёт уже идущие покупки
+            pipe.hsetnx(state_key, "base_price", row.base_price)
+            pipe.hsetnx(state_key, "sold", max(row.times_purchased, purchased))
+            pipe.hsetnx(state_key, "sold_out", int(sold_out))
+            await pipe.execute()
+        return True
+
+    async def set_sold_out(self, auction_id: str) -> None:
+        """Снять аукцион с продажи (в БД и в Redis)"""
+        async with self.session_factory() as session:
+            async with session.begin():
+                await session.execute(
+                    update(Auction).where(Auction.id == auction_id).values(is_sold_out=True)
+                )
+        await redis_client.hset(AUCTION_STATE_KEY.format(auction_id), "sold_out", 1)
+        await auction_feed_index.remove(auction_id)
@@ -0,0 +1,230 @@
+# bot/domain/services/economy_service.py
+
+from typing import Callable, Optional, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from bot.core.config import config
+from redis.exceptions import RedisError
+from bot.domain.models.factory import FactoryState
+from bot.infra.cache.counters import HotCounters
+from bot.infra.cache.leaderboard import leaderboards
+from bot.infra.database.models import User
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Повторы при конкурентном изменении той же строки (оптимистичная блокировка)
+MAX_RETRIES = 5
+
+
+class EconomyError(Exception):
+    """Операция экономики невозможна"""
+
+
+class InsufficientFunds(EconomyError):
+    pass
+
+
+class EconomyService:
+    """Экономика завода: ленивое начисление производства
+
+    Вместо периодического пересчёта всех пользователей в строке хранится
+    момент последнего расчёта и параметры производства. Произведённое
+    досчитывается в замкнутой форме, когда пользователь смотрит завод или
+    тратит валюту, поэтому стоимость пропорциональна активным, а не всем
+    пользователям. Любое изменение параметров сначала фиксирует накопленное
+    по старым параметрам.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, counters: Optional[HotCounters] = None):
+        """
+        counters: write-behind счётчики; начисления уходят в них, а перед
+                  проверкой баланса незаписанные дельты дописываются в БД
+        """
+        self.session_factory = session_factory
+        self.counters = counters
+
+    async def _load(self, session: AsyncSession, user_id: int) -> Tuple[FactoryState, int, Optional[datetime]]:
+        """(состояние завода, баланс, сохранённый момент расчёта)"""
+        row = (await session.execute(
+            select(
+                User.factory_level, User.factory_capacity, User.workers_count,
+                User.factory_stock, User.production_settled_at, User.factory_upgrade_at,
+                User.soft_currency
+            ).where(User.user_id == user_id)
+        )).one_or_none()
+        if row is None:
+            raise EconomyError(f"User {user_id} not found")
+
+        state = FactoryState(
+            level=row.factory_level,
+            capacity=row.factory_capacity,
+            workers=row.workers_count,
+            stock=row.factory_stock or 0.0,
+            settled_at=row.production_settled_at or datetime.utcnow(),
+            upgrade_at=row.factory_upgrade_at
+        )
+        return state, row.soft_currency, row.production_settled_at
+
+    async def get_factory(self, user_id: int) -> FactoryState:
+        """Состояние завода на текущий момент (только чтение, без записи)"""
+        async with self.session_factory() as session:
+            state, _, _ = await self._load(session, user_id)
+        return state.settle(datetime.utcnow())
+
+    async def _apply(
+        self,
+        user_id: int,
+        change: Callable[[FactoryState, int], int]
+    ) -> Tuple[FactoryState, int]:
+        """Досчитать производство, применить изменение и записать строку
+
+        change меняет состояние завода и возвращает изменение баланса.
+        Запись условная (по production_settled_at): если завод параллельно
+        изменил другой запрос, расчёт повторяется на свежих данных. Баланс
+        меняется относительно - другие списания (аукцион) не теряются; если
+        после них денег не хватает, это InsufficientFunds, а не повтор.
+        """
+        for _ in range(MAX_RETRIES):
+            if self.counters is not None:
+                # Иначе проверка баланса не увидит незаписанных начислений
+                try:
+                    await self.counters.flush_user(user_id)
+                except RedisError as e:
+                    logger.warning(f"Failed to flush counters of user {user_id}: {e}")
+
+            async with self.session_factory() as session:
+                async with session.begin():
+                    state, balance, settled_at = await self._load(session, user_id)
+                    level_before = state.level
+                    delta = change(state.settle(datetime.utcnow()), balance)
+                    # Начисление - в счётчики после коммита, строку меняет только списание
+                    credit = delta if self.counters is not None and delta > 0 else 0
+                    debit = delta - credit
+
+                    if settled_at is None:
+                        same_state = User.production_settled_at.is_(None)
+                    else:
+                        same_state = User.production_settled_at == settled_at
+
+                    result = await session.execute(
+                        update(User)
+                        .where(
+                            User.user_id == user_id,
+                            same_state,
+                            User.soft_currency + debit >= 0
+                        )
+                        .values(
+                            factory_level=state.level,
+                            factory_capacity=state.capacity,
+                            workers_count=state.workers,
+                            factory_stock=state.stock,
+                            production_settled_at=state.settled_at,
+                            factory_upgrade_at=state.upgrade_at,
+                            soft_currency=User.soft_currency + debit
+                        )
+                        .returning(User.soft_currency)
+                    )
+                    new_balance = result.scalar_one_or_none()
+
+                    if new_balance is None:
+                        # Гонка проиграна: если завод не менялся, помешало
+                        # параллельное списание - повтор ничего не даст
+                        current = (await session.execute(
+                            select(User.soft_currency, User.production_settled_at)
+                            .where(User.user_id == user_id)
+                        )).one_or_none()
+                        if (
+                            current is not None
+                            and current.production_settled_at == settled_at
+                            and current.soft_currency + debit < 0
+                        ):
+                            raise InsufficientFunds(
+                                f"User {user_id} has {current.soft_currency}, change is {debit}"
+                            )
+
+            if new_balance is not None:
+                if credit:
+                    await self._credit(user_id, credit)
+                    new_balance += credit
+                # После коммита: в таблицах лидеров только записанное
+                await leaderboards.record([
+                    ("soft_currency", user_id, "set", new_balance, max(delta, 0)),
+                    ("factory_level", user_id, "set", state.level, state.level - level_before),
+                ])
+                return state, new_balance
+
+            logger.debug(f"Concurrent factory update for user {user_id}, retrying")
+
+        raise EconomyError(f"Too much contention on user {user_id}")
+
+    async def _credit(self, user_id: int, amount: int) -> None:
+        try:
+            await self.counters.incr(user_id, {"soft_currency": amount})
+        except RedisError as e:
+            # Завод уже записан - начисляем напрямую, а не теряем
+            logger.warning(f"Counters unavailable, crediting user {user_id} in the database: {e}")
+            async with self.session_factory() as session:
+                async with session.begin():
+                    await session.execute(
+                        update(User).where(User.user_id == user_id).values(soft_currency=User.soft_currency + amount)
+                    )
+
+    async def collect(self, user_id: int) -> int:
+        """Забрать произведённое в мягкую валюту. Возвращает собранное"""
+        collected = 0
+
+        def change(state: FactoryState, balance: int) -> int:
+            nonlocal collected
+            collected = state.take()
+            return collected
+
+        await self._apply(user_id, change)
+        return collected
+
+    async def spend(self, user_id: int, amount: int) -> int:
+        """Потратить валюту с учётом несобранного производства. Возвращает баланс"""
+
+        def change(state: FactoryState, balance: int) -> int:
+            collected = state.take()
+            if balance + collected < amount:
+                raise InsufficientFunds(f"User {user_id} has {balance + collected}, needs {amount}")
+            return collected - amount
+
+        _, balance = await self._apply(user_id, change)
+        return balance
+
+    async def hire_workers(self, user_id: int, count: int, cost_per_worker: int) -> FactoryState:
+        """Нанять рабочих: производство до найма считается по старой скорости"""
+
+        def change(state: FactoryState, balance: int) -> int:
+            collected = state.take()
+            cost = count * cost_per_worker
+            if balance + collected < cost:
+                raise InsufficientFunds(f"User {user_id} has {balance + collected}, needs {cost}")
+            state.workers += count
+            return collected - cost
+
+        state, _ = await self._apply(user_id, change)
+        return state
+
+    async def start_upgrade(self, user_id: int) -> Optional[datetime]:
+        """Начать улучшение завода; новый уровень вступит в силу позже
+
+        Улучшение, завершающееся посреди интервала между расчётами,
+        учитывается кусочно: до завершения - старая скорость, после - новая.
+        """
+
+        def change(state: FactoryState, balance: int) -> int:
+            if state.upgrade_at is not None:
+                raise EconomyError("Upgrade already in progress")
+            collected = state.take()
+            cost = config.FACTORY_UPGRADE_BASE_COST * state.level
+            if balance + collected < cost:
+                raise InsufficientFunds(f"User {user_id} has {balance + collected}, needs {cost}")
+            state.upgrade_at = state.settled_at + timedelta(seconds=config.FACTORY_UPGRADE_SECONDS * state.level)
+            return collected - cost
+
+        state, _ = await self._apply(user_id, change)
+        return state.upgrade_at
@@ -0,0 +1,102 @@
+# bot/domain/services/leaderboard_service.py
+
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from bot.core.config import config
+from bot.core.i18n import Translator
+from bot.infra.cache.decorators import cached
+from bot.infra.cache.leaderboard import leaderboards
+from bot.infra.database.models import User
+
+# Заголовки топов по метрике (msgid)
+METRIC_TITLES = {
+    "factory_level": "🏭 Топ по уровню завода",
+    "soft_currency": "💰 Топ по монетам",
+    "total_referrals": "🤝 Топ по рефералам",
+}
+
+
+def render_top(
+    _: Translator,
+    metric: str,
+    entries: List[Dict[str, Any]],
+    position: Optional[Dict[str, Any]]
+) -> str:
+    """Текст страницы топа с местом пользователя"""
+    lines = [_(METRIC_TITLES[metric]), ""]
+    if not entries:
+        lines.append(_("В топе пока никого нет"))
+    for entry in entries:
+        lines.append(_("{rank}. {name} — {score}", rank=entry["rank"], name=entry["name"], score=entry["score"]))
+    if position is not None:
+        lines.append("")
+        lines.append(_("Ваше место: {rank} из {total}", rank=position["rank"], total=position["total"]))
+    return "\n".join(lines)
+
+
+class LeaderboardService:
+    """Топы игроков: страницы из sorted set Redis с именами из БД
+
+    Готовая страница кэшируется на LEADERBOARD_PAGE_TTL секунд - частые
+    просмотры топа не ходят ни в Redis, ни в Postgres. Место
+    пользователя не кэшируется (ZREVRANK - O(log N)).
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        read_session_factory: Optional[Callable] = None
+    ):
+        self.session_factory = session_factory
+        self.read_session_factory = read_session_factory or session_factory
+
+    @cached(
+        namespace="leaderboard_page",
+        ttl=config.LEADERBOARD_PAGE_TTL,
+        l1_ttl=config.LEADERBOARD_PAGE_TTL / 2,
+        negative_ttl=None
+    )
+    async def top_page(
+        self,
+        metric: str,
+        scope: str = "global",
+        lang: Optional[str] = None,
+        page: int = 0
+    ) -> List[Dict[str, Any]]:
+        """Страница топа: [{rank, user_id, name, score}]"""
+        size = config.LEADERBOARD_PAGE_SIZE
+        entries = await leaderboards.top(metric, scope, lang, offset=page * size, limit=size)
+        if not entries:
+            return []
+
+        async with self.read_session_factory() as session:
+            result = await session.execute(
+                select(User.user_id, User.username, User.first_name)
+                .where(User.user_id.in_([user_id for user_id, _ in entries]))
+                .execution_options(query_type="leaderboard_names")
+            )
+            names = {row.user_id: row.first_name or row.username or str(row.user_id) for row in result}
+
+        return [
+            {"rank": page * size + i + 1, "user_id": user_id, "name": names.get(user_id, str(user_id)), "score": score}
+            for i, (user_id, score) in enumerate(entries)
+        ]
+
+    async def position(
+        self,
+        user_id: int,
+        metric: str,
+        scope: str = "global",
+        lang: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Место пользователя: {rank, score, total}; None - не в таблице"""
+        found = await leaderboards.rank(metric, user_id, scope, lang)
+        if found is None:
+            return None
+        rank, score, total = found
+        return {"rank": rank, "score": score, "total": total}
+
+    async def rebuild(self) -> int:
+        """Пересобрать таблицы из Postgres (после потери данных в Redis)"""
+        return await leaderboards.rebuild(self.read_session_factory)
@@ -1,11 +1,27 @@
 # bot/domain/services/referral_service.py
 
 from typing import Optional, Dict, Any
-from bot.domain.models.referral import ReferralModel
+from datetime import datetime
+from redis.exceptions import RedisError
+from bot.core.config import config
+from bot.domain.models.referral import level_rewards, welcome_bonus
 from bot.domain.repositories.referral_repository import ReferralRepository
+from bot.infra.cache.decorators import cached
+from bot.infra.cache.leaderboard import leaderboards
 from bot.infra.cache.redis_client import redis_client
+from bot.infra.metrics.prometheus import referral_conversions
+from bot.infra.queue import tasks
 import secrets
 import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Бонусные приглашения пользователя за сутки (UTC)
+REFERRAL_DAILY_KEY = "referral_daily:{}:{}"
+REFERRAL_DAILY_TTL = 2 * 86400
+# Код заморожен детектором накрутки (bot.app.middlewares.anti_abuse)
+REFERRAL_FROZEN_KEY = "referral_frozen:{}"
 
 class ReferralService:
     """Сервис управления реферальной системой"""
@@ -20,13 +36,9 @@ class ReferralService:
         code = hashlib.md5(f"{user_id}{random_part}".encode()).hexdigest()[:16]
         return code.upper()
     
+    @cached(namespace="referral_link", ttl=3600, l1_ttl=300)
     async def get_referral_link(self, user_id: int) -> str:
-        """Получить реф-ссылку пользователя"""
-        # Проверяем кэш
-        cached = await redis_client.get(f"referral_link:{user_id}")
-        if cached:
-            return cached.decode()
-        
+        """Получить реф-ссылку пользователя (кэш: память процесса, затем Redis)"""
         # Получаем из БД
         referral = await self.repository.get_by_user_id(user_id)
         if not referral:
@@ -37,39 +49,71 @@ class ReferralService:
                 'bonus_amount': 50
             })
         
-        link = f"https://t.me/zavod_empire_bot?start={referral['referral_code']}"
-        
-        # Кэшируем на 1 час
-        await redis_client.setex(f"referral_link:{user_id}", 3600, link)
-        
-        return link
+        return f"https://t.me/zavod_empire_bot?start={referral['referral_code']}"
     
     async def process_referral_bonus(self, referral_code: str, new_user_id: int) -> int:
-        """Обработать реф-бонус при присоединении нового пользователя"""
+        """Обработать реф-бонус при присоединении нового пользователя
+        
+        Привязка к дереву и бонусы всем уровням аплайна - одна транзакция.
+        Возвращает бонус прямому пригласившему.
+        """
         # Получить реферера
         referrer = await self.repository.get_by_code(referral_code)
         if not referrer:
             return 0
         
-        # Проверить лимиты (например, максимум 100 рефералов за день)
-        daily_count = await self.repository.count_referrals_today(referrer['user_id'])
-        if daily_count >= 100:
-            return 0  # Лимит достигнут
+        # Лимит бонусных приглашений в сутки - счётчик в Redis вместо COUNT
+        daily_key = REFERRAL_DAILY_KEY.format(referrer['user_id'], datetime.utcnow().strftime("%Y%m%d"))
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.incr(daily_key)
+            pipe.expire(daily_key, REFERRAL_DAILY_TTL)
+            pipe.exists(REFERRAL_FROZEN_KEY.format(referral_code))
+            daily_count, _, frozen = await pipe.execute()
+        
+        if daily_count > config.REFERRAL_DAILY_CAP or frozen:
+            # Лимит достигнут или код заморожен: в дерево попадает, бонусов нет
+            rewards, welcome = {}, 0
+        else:
+            rewards = level_rewards(referrer['bonus_amount'])
+            welcome = welcome_bonus(referrer['bonus_amount'])
+        
+        try:
+            credits = await self.repository.join(new_user_id, referrer['user_id'], rewards, welcome)
+        except Exception:
+            await redis_client.decr(daily_key)
+            raise
         
-        bonus = referrer['bonus_amount']
+        if not credits and rewards:
+            # Уже был приглашён - приглашение не засчитываем
+            await redis_client.decr(daily_key)
         
-        # Отправить бонус реферу
-        await self._credit_user(referrer['user_id'], bonus)
+        bonus = 0
+        for user_id, depth, amount in credits:
+            if amount <= 0:
+                continue
+            if depth == 1:
+                bonus = amount
+            if depth > 0:
+                referral_conversions.labels(level=str(depth)).inc()
+            await self._notify_credit(user_id, amount)
         
-        # Отправить приветственный бонус новому пользователю
-        welcome_bonus = int(bonus * 0.5)  # 50% от реф-бонуса
-        await self._credit_user(new_user_id, welcome_bonus)
+        if credits:
+            await leaderboards.record(
+                [("total_referrals", user_id, "incr", 1, 1) for user_id, depth, _ in credits if depth > 0]
+                + [("soft_currency", user_id, "incr", amount, amount) for user_id, _, amount in credits if amount > 0]
+            )
         
         return bonus
     
-    async def _credit_user(self, user_id: int, amount: int) -> None:
-        """Начислить валюту пользователю"""
-        await self.repository.update_balance(user_id, amount)
-        
-        # Отправить уведомление
-        # await telegram_notifications.send_bonus_notification(user_id, amount)
+    async def get_referral_stats(self, user_id: int) -> Dict[str, Any]:
+        """Рефералы пользователя по уровням (из closure table)"""
+        by_level = await self.repository.subtree_stats(user_id)
+        return {"total": sum(by_level.values()), "by_level": by_level}
+    
+    async def _notify_credit(self, user_id: int, amount: int) -> None:
+        """Уведомить о начислении через очередь задач (отправит воркер очереди с повторами)"""
+        try:
+            await tasks.notify(user_id, f"🎁 Вам начислено {amount} монет за реферальную программу!")
+        except RedisError as e:
+            # Бонус уже начислен - без уведомления он не пропадёт
+            logger.warning(f"Failed to enqueue referral notification for {user_id}: {e}")
@@ -0,0 +1,277 @@
+# bot/infra/cache/auction_feed.py
+
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from bot.core.config import config
+from bot.infra.cache.redis_client import LuaScript, redis_client
+from bot.infra.database.models import Auction
+import json
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# Порядки ленты: new - сначала новые, price - сначала дешёвые
+SORTS = ("new", "price")
+
+FEED_PREFIX = "auction_feed:"
+READY_KEY = "auction_feed:ready"  # нет ключа - индекс потерян, лента читает Postgres
+REBUILD_LOCK_KEY = "auction_feed:rebuild_lock"
+REBUILD_LOCK_TTL = 600
+
+DESCRIPTION_MAX = 200  # символов описания в снимке карточки
+
+# Элементы индексов - "<ключ сортировки фиксированной ширины>:<id>" с
+# одинаковым score: ZRANGEBYLEX от курсора даёт точную keyset-страницу
+# без OFFSET и без проблемы равных значений (одинаковые цены)
+CURSOR_RE = re.compile(r"^(\d{16}|\d{10}):([0-9a-f-]{36})$")
+
+# Добавить или заменить аукцион во всех индексах
+# KEYS: new, price, keys, cards; ARGV: id, created, price, карточка (JSON)
+UPSERT_SCRIPT = LuaScript("""
+local old = redis.call('HGET', KEYS[3], ARGV[1])
+if old then
+    local created, price = string.match(old, '^(%d+):(%d+)$')
+    redis.call('ZREM', KEYS[1], created .. ':' .. ARGV[1])
+    redis.call('ZREM', KEYS[2], price .. ':' .. ARGV[1])
+end
+redis.call('ZADD', KEYS[1], 0, ARGV[2] .. ':' .. ARGV[1])
+redis.call('ZADD', KEYS[2], 0, ARGV[3] .. ':' .. ARGV[1])
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[2] .. ':' .. ARGV[3])
+redis.call('HSET', KEYS[4], ARGV[1], ARGV[4])
+return 1
+""")
+
+# Новая цена; только рост - покупки коммитятся пачками не по порядку
+# KEYS: price, keys; ARGV: id, цена
+PRICE_SCRIPT = LuaScript("""
+local entry = redis.call('HGET', KEYS[2], ARGV[1])
+if not entry then
+    return 0
+end
+local created, price = string.match(entry, '^(%d+):(%d+)$')
+if ARGV[2] <= price then
+    return 0
+end
+redis.call('ZREM', KEYS[1], price .. ':' .. ARGV[1])
+redis.call('ZADD', KEYS[1], 0, ARGV[2] .. ':' .. ARGV[1])
+redis.call('HSET', KEYS[2], ARGV[1], created .. ':' .. ARGV[2])
+return 1
+""")
+
+# Снять аукцион с ленты
+# KEYS: new, price, keys, cards; ARGV: id
+REMOVE_SCRIPT = LuaScript("""
+local entry = redis.call('HGET', KEYS[3], ARGV[1])
+if not entry then
+    return 0
+end
+local created, price = string.match(entry, '^(%d+):(%d+)$')
+redis.call('ZREM', KEYS[1], created .. ':' .. ARGV[1])
+redis.call('ZREM', KEYS[2], price .. ':' .. ARGV[1])
+redis.call('HDEL', KEYS[3], ARGV[1])
+redis.call('HDEL', KEYS[4], ARGV[1])
+return 1
+""")
+
+# Страница за один round trip: элементы индекса, цены и карточки
+# KEYS: индекс, keys, cards, ready; ARGV: команда, от, до, сколько
+# -> false (индекс не построен) | {элемент, "created:price", карточка, ...}
+PAGE_SCRIPT = LuaScript("""
+if redis.call('EXISTS', KEYS[4]) == 0 then
+    return false
+end
+local members = redis.call(ARGV[1], KEYS[1], ARGV[2], ARGV[3], 'LIMIT', 0, ARGV[4])
+local out = {}
+for _, member in ipairs(members) do
+    local id = string.match(member, '^%d+:(.+)$')
+    out[#out + 1] = member
+    out[#out + 1] = redis.call('HGET', KEYS[2], id) or ''
+    out[#out + 1] = redis.call('HGET', KEYS[3], id) or ''
+end
+return out
+""")
+
+
+def created_key(created_at: Optional[datetime]) -> str:
+    """Ключ сортировки по времени создания: микросекунды, 16 цифр"""
+    created_at = created_at or datetime.utcnow()
+    return f"{int((created_at - datetime(1970, 1, 1)).total_seconds() * 1_000_000):016d}"
+
+
+def price_key(price: int) -> str:
+    return f"{max(0, price):010d}"
+
+
+def card_fields(auction: Any) -> Dict[str, Any]:
+    """Поля карточки для ленты; цена хранится отдельно и обновляется чаще"""
+    return {"description": (auction.description or "")[:DESCRIPTION_MAX]}
+
+
+def card_snapshot(auction: Any) -> str:
+    return json.dumps(card_fields(auction), ensure_ascii=False)
+
+
+class FeedEntry:
+    __slots__ = ("auction_id", "price", "card")
+
+    def __init__(self, auction_id: str, price: int, card: Dict[str, Any]):
+        self.auction_id = auction_id
+        self.price = price
+        self.card = card
+
+
+class AuctionFeedIndex:
+    """Упорядоченный индекс активных аукционов в Redis
+
+    Два индекса (по времени создания и по цене) и снимки карточек
+    обновляются инкрементально: создание, рост цены после покупки,
+    снятие с продажи. Страница ленты - keyset от курсора (последний
+    элемент предыдущей страницы), O(log N + размер страницы) на любой
+    глубине. Если Redis потерял индекс, он пересобирается из Postgres
+    (rebuild), а до тех пор лента читается из БД тем же keyset.
+    """
+
+    def __init__(self, prefix: str = FEED_PREFIX):
+        self.prefix = prefix
+        self.keys_key = f"{prefix}keys"  # id -> "created:price"
+        self.cards_key = f"{prefix}cards"  # id -> снимок карточки
+
+    def index_key(self, sort: str) -> str:
+        if sort not in SORTS:
+            raise ValueError(f"Unknown auction feed sort: {sort}")
+        return f"{self.prefix}{sort}"
+
+    async def add(self, auction: Any) -> None:
+        """Аукцион появился в ленте (создан или снова активен)"""
+        await self._run(
+            UPSERT_SCRIPT,
+            [self.index_key("new"), self.index_key("price"), self.keys_key, self.cards_key],
+            [auction.id, created_key(auction.created_at), price_key(auction.current_price), card_snapshot(auction)]
+        )
+
+    async def set_price(self, auction_id: str, price: int) -> None:
+        await self._run(PRICE_SCRIPT, [self.index_key("price"), self.keys_key], [auction_id, price_key(price)])
+
+    async def remove(self, auction_id: str) -> None:
+        await self._run(
+            REMOVE_SCRIPT,
+            [self.index_key("new"), self.index_key("price"), self.keys_key, self.cards_key],
+            [auction_id]
+        )
+
+    async def _run(self, script: LuaScript, keys: List[str], args: List[Any]) -> None:
+        try:
+            await script(keys, args)
+        except RedisError as e:
+            # Расхождение исправит пересборка
+            logger.warning(f"Failed to update auction feed ({args[0]}): {e}")
+
+    async def page(
+        self,
+        sort: str = "new",
+        cursor: Optional[str] = None,
+        limit: int = 10
+    ) -> Optional[Tuple[List[FeedEntry], Optional[str]]]:
+        """([записи], курсор следующей страницы); None - индекс не построен"""
+        if sort == "new":
+            command, start, end = "ZREVRANGEBYLEX", f"({cursor}" if cursor else "+", "-"
+        else:
+            command, start, end = "ZRANGEBYLEX", f"({cursor}" if cursor else "-", "+"
+
+        rows = await PAGE_SCRIPT(
+            [self.index_key(sort), self.keys_key, self.cards_key, READY_KEY],
+            [command, start, end, limit + 1]
+        )
+        if rows is None:
+            return None
+
+        has_more = len(rows) > limit * 3
+        rows = rows[:limit * 3]
+        entries: List[FeedEntry] = []
+        for i in range(0, len(rows), 3):
+            member, keys, card = rows[i].decode(), rows[i + 1].decode(), rows[i + 2]
+            if keys and card:
+                # Пусто - индекс и хэши разошлись (прерванная пересборка)
+                entries.append(FeedEntry(member.partition(":")[2], int(keys.partition(":")[2]), json.loads(card)))
+
+        next_cursor = rows[-3].decode() if has_more else None
+        return entries, next_cursor
+
+    async def is_ready(self) -> bool:
+        return bool(await redis_client.exists(READY_KEY))
+
+    async def ensure_built(self, session_factory) -> bool:
+        """Пересобрать индекс, если его нет (один процесс на кластер)"""
+        if await self.is_ready():
+            return False
+        if not await redis_client.set(REBUILD_LOCK_KEY, 1, nx=True, ex=REBUILD_LOCK_TTL):
+            return False
+        try:
+            await self.rebuild(session_factory)
+        finally:
+            await redis_client.delete(REBUILD_LOCK_KEY)
+        return True
+
+    async def rebuild(self, session_factory, chunk_size: Optional[int] = None) -> int:
+        """Собрать индекс из Postgres во временные ключи и подменить атомарно
+
+        Изменения во время пересборки могут потеряться при подмене - их
+        исправит следующее изменение аукциона. Возвращает число аукционов.
+        """
+        chunk_size = chunk_size or config.AUCTION_FEED_REBUILD_CHUNK
+        live = [self.index_key(sort) for sort in SORTS] + [self.keys_key, self.cards_key]
+        tmp = {key: f"{self.prefix}rebuild:{key}" for key in live}
+        started = time.monotonic()
+        count = 0
+
+        await redis_client.delete(*tmp.values())
+        async with session_factory() as session:
+            result = await session.stream(
+                select(Auction.id, Auction.created_at, Auction.current_price, Auction.description)
+                .where(Auction.is_active.is_(True), Auction.is_sold_out.is_(False))
+                .execution_options(yield_per=chunk_size, query_type="auction_feed_rebuild")
+            )
+            async for partition in result.partitions(chunk_size):
+                new: Dict[str, int] = {}
+                by_price: Dict[str, int] = {}
+                keys: Dict[str, str] = {}
+                cards: Dict[str, str] = {}
+                for row in partition:
+                    created, price = created_key(row.created_at), price_key(row.current_price)
+                    new[f"{created}:{row.id}"] = 0
+                    by_price[f"{price}:{row.id}"] = 0
+                    keys[row.id] = f"{created}:{price}"
+                    cards[row.id] = card_snapshot(row)
+
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    pipe.zadd(tmp[self.index_key("new")], new)
+                    pipe.zadd(tmp[self.index_key("price")], by_price)
+                    pipe.hset(tmp[self.keys_key], mapping=keys)
+                    pipe.hset(tmp[self.cards_key], mapping=cards)
+                    await pipe.execute()
+                count += len(partition)
+
+        async with redis_client.pipeline(transaction=True) as pipe:
+            for key, tmp_key in tmp.items():
+                if count:
+                    pipe.rename(tmp_key, key)
+                else:
+                    pipe.delete(key)
+            pipe.set(READY_KEY, int(time.time()))
+            await pipe.execute()
+
+        logger.info(f"Auction feed rebuilt: {count} auctions in {time.monotonic() - started:.1f}s")
+        return count
+
+
+def parse_cursor(cursor: str) -> Optional[Tuple[str, str]]:
+    """(ключ сортировки, id) из курсора; None - курсор подделан или устарел"""
+    match = CURSOR_RE.match(cursor)
+    return match.groups() if match else None
+
+
+auction_feed_index = AuctionFeedIndex()
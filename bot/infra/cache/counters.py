@@ -0,0 +1,345 @@
+# bot/infra/cache/counters.py
+
+from typing import Dict, Iterable, Optional, Union
+from sqlalchemy import Float, Integer, column, delete, select, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from bot.core.config import config
+from bot.infra.cache.redis_client import LuaScript, redis_client
+from bot.infra.database.engine import database
+from bot.infra.database.models import CounterFlush, User
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+Number = Union[int, float]
+
+# Колонки users, которые можно наращивать через счётчики
+COUNTER_COLUMNS: Dict[str, type] = {
+    "total_referrals": int,
+    "total_purchases": int,
+    "total_revenue": float,
+    "soft_currency": int,
+    "hard_currency": int,
+}
+
+COUNTERS_KEY = "counters:user:"  # + user_id -> hash колонка -> дельта
+DIRTY_KEY = "counters:dirty"  # пользователи с незаписанными дельтами
+BATCHES_KEY = "counters:batches"  # пачки, забранные на запись и ещё не подтверждённые
+BATCH_KEY = "counters:batch:{}"  # пачка: "user_id:колонка" -> дельта
+
+STALE_BATCH_AGE = 30  # секунд; старше - пачку упавшего процесса дописывает любой
+FLUSH_LOG_RETENTION = timedelta(days=1)
+
+# Забрать дельты на запись: атомарно переносит хэши пользователей в
+# пачку и регистрирует её. Пока пачка не подтверждена, данные живут в
+# Redis - падение процесса посреди записи их не теряет.
+# KEYS: dirty, batches, batch; ARGV: batch_id, count, prefix, [user_id...]
+CLAIM_SCRIPT = LuaScript("""
+local ids = {}
+if #ARGV > 3 then
+    for i = 4, #ARGV do
+        if redis.call('SREM', KEYS[1], ARGV[i]) == 1 then
+            ids[#ids + 1] = ARGV[i]
+        end
+    end
+else
+    ids = redis.call('SPOP', KEYS[1], ARGV[2])
+end
+if #ids == 0 then
+    return 0
+end
+for _, id in ipairs(ids) do
+    local key = ARGV[3] .. id
+    local data = redis.call('HGETALL', key)
+    for i = 1, #data, 2 do
+        redis.call('HSET', KEYS[3], id .. ':' .. data[i], data[i + 1])
+    end
+    redis.call('DEL', key)
+end
+redis.call('SADD', KEYS[2], ARGV[1])
+return #ids
+""")
+
+
+def _parse(name: str, raw: Union[bytes, str]) -> Number:
+    return COUNTER_COLUMNS[name](float(raw))
+
+
+class HotCounters:
+    """Write-behind счётчики колонок users
+
+    Приращения копятся в Redis (HINCRBY, без блокировки строки в
+    Postgres) и периодически записываются одним UPDATE ... FROM VALUES на
+    пачку пользователей. Запись идемпотентна: id пачки фиксируется в
+    counter_flushes в той же транзакции, поэтому повтор после сбоя не
+    удваивает значения. Чтение складывает значение из БД и незаписанные
+    дельты.
+
+    Для списаний, которые должны быть точными (не уйти в минус), есть
+    строгий режим: дельты пользователя сначала дописываются, затем
+    изменение выполняется условным UPDATE напрямую в БД.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        flush_interval: float = 1.0,
+        batch_size: int = 1000
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._last_cleanup = 0.0
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run(), name="counters-flush")
+
+    async def stop(self) -> None:
+        """Записать накопленное и остановиться"""
+        if self._task is not None:
+            # Без отмены: пачка, забранная посреди записи, должна дописаться
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+    async def incr(self, user_id: int, deltas: Dict[str, Number], strict: bool = False) -> Optional[Dict[str, Number]]:
+        """Нарастить колонки пользователя
+
+        strict: записать сразу в БД с проверкой, что значения не уходят в
+                минус; возвращает новые значения или None, если не хватает.
+                Без strict возвращает None (значения станут видны при чтении).
+        """
+        if strict:
+            self._check(deltas)
+            return await self._apply_strict(user_id, deltas)
+
+        await self.incr_many({user_id: deltas})
+        return None
+
+    async def incr_many(self, changes: Dict[int, Dict[str, Number]]) -> None:
+        """Нарастить колонки нескольких пользователей за один round trip"""
+        for deltas in changes.values():
+            self._check(deltas)
+
+        async with redis_client.pipeline(transaction=True) as pipe:
+            for user_id, deltas in changes.items():
+                key = f"{COUNTERS_KEY}{user_id}"
+                for name, delta in deltas.items():
+                    if COUNTER_COLUMNS[name] is float:
+                        pipe.hincrbyfloat(key, name, delta)
+                    else:
+                        pipe.hincrby(key, name, delta)
+                pipe.sadd(DIRTY_KEY, user_id)
+            await pipe.execute()
+
+    @staticmethod
+    def _check(deltas: Dict[str, Number]) -> None:
+        for name in deltas:
+            if name not in COUNTER_COLUMNS:
+                raise ValueError(f"Unknown counter column: {name}")
+
+    async def pending(self, user_id: int) -> Dict[str, Number]:
+        """Незаписанные дельты пользователя (в т.ч. в пачках на записи)"""
+        batch_ids = await redis_client.smembers(BATCHES_KEY)
+        fields = [f"{user_id}:{name}" for name in COUNTER_COLUMNS]
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.hgetall(f"{COUNTERS_KEY}{user_id}")
+            for batch_id in batch_ids:
+                pipe.hmget(BATCH_KEY.format(batch_id.decode()), fields)
+            results = await pipe.execute()
+
+        totals: Dict[str, Number] = {}
+        for name, raw in results[0].items():
+            name = name.decode()
+            totals[name] = totals.get(name, 0) + _parse(name, raw)
+        # Пачка между коммитом и удалением из Redis может быть учтена
+        # дважды - окно в один round trip
+        for batch in results[1:]:
+            for name, raw in zip(COUNTER_COLUMNS, batch):
+                if raw is not None:
+                    totals[name] = totals.get(name, 0) + _parse(name, raw)
+        return totals
+
+    async def read(self, user_id: int) -> Optional[Dict[str, Number]]:
+        """Значения колонок: БД плюс незаписанные дельты"""
+        async with self.session_factory() as session:
+            row = (await session.execute(
+                select(*(getattr(User, name) for name in COUNTER_COLUMNS)).where(User.user_id == user_id)
+            )).one_or_none()
+        if row is None:
+            return None
+
+        result = {name: value or 0 for name, value in zip(COUNTER_COLUMNS, row)}
+        for name, delta in (await self.pending(user_id)).items():
+            result[name] += delta
+        return result
+
+    async def flush_user(self, user_id: int) -> None:
+        """Записать дельты одного пользователя немедленно"""
+        await self.flush_users([user_id])
+
+    async def flush_users(self, user_ids: Iterable[int]) -> None:
+        """Записать дельты пользователей немедленно, одной пачкой
+
+        Вызывается перед проверкой баланса на списание: иначе проверка
+        не увидит незаписанных начислений.
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        batch_id = self._new_batch_id()
+        claimed = await CLAIM_SCRIPT(
+            [DIRTY_KEY, BATCHES_KEY, BATCH_KEY.format(batch_id)],
+            [batch_id, len(user_ids), COUNTERS_KEY, *user_ids]
+        )
+        if claimed:
+            await self._write_batch(batch_id)
+
+    async def flush(self) -> int:
+        """Записать всё накопленное; возвращает число пользователей"""
+        await self._retry_stale()
+
+        flushed = 0
+        while True:
+            batch_id = self._new_batch_id()
+            claimed = await CLAIM_SCRIPT(
+                [DIRTY_KEY, BATCHES_KEY, BATCH_KEY.format(batch_id)],
+                [batch_id, self.batch_size, COUNTERS_KEY]
+            )
+            if not claimed:
+                return flushed
+            if not await self._write_batch(batch_id):
+                # БД недоступна - пачка останется в Redis до следующей попытки
+                return flushed
+            flushed += claimed
+            if claimed < self.batch_size:
+                return flushed
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+                if time.monotonic() - self._last_cleanup > 3600:
+                    await self._cleanup_log()
+                    self._last_cleanup = time.monotonic()
+            except Exception as e:
+                logger.exception(f"Counter flush failed: {e}")
+
+    @staticmethod
+    def _new_batch_id() -> str:
+        # Время создания в id - по нему находятся пачки упавших процессов
+        return f"{int(time.time())}-{uuid.uuid4().hex[:16]}"
+
+    async def _retry_stale(self) -> None:
+        """Дописать пачки, забранные и не подтверждённые (упавший процесс)"""
+        threshold = time.time() - STALE_BATCH_AGE
+        for raw in await redis_client.smembers(BATCHES_KEY):
+            batch_id = raw.decode()
+            if int(batch_id.split("-", 1)[0]) < threshold:
+                await self._write_batch(batch_id)
+
+    async def _write_batch(self, batch_id: str) -> bool:
+        """Записать пачку в БД и удалить из Redis. False - не удалось, повторить позже"""
+        batch_key = BATCH_KEY.format(batch_id)
+        raw = await redis_client.hgetall(batch_key)
+
+        rows: Dict[int, Dict[str, Number]] = {}
+        for field, value in raw.items():
+            user_id, name = field.decode().split(":", 1)
+            rows.setdefault(int(user_id), {})[name] = _parse(name, value)
+
+        try:
+            if rows:
+                await self._apply_batch(batch_id, rows)
+        except Exception as e:
+            logger.warning(f"Counter batch {batch_id} of {len(rows)} users not written, will retry: {e}")
+            return False
+
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.delete(batch_key)
+            pipe.srem(BATCHES_KEY, batch_id)
+            await pipe.execute()
+        return True
+
+    async def _apply_batch(self, batch_id: str, rows: Dict[int, Dict[str, Number]]) -> None:
+        names = list(COUNTER_COLUMNS)
+        delta = values(
+            column("user_id", Integer),
+            *(column(name, Float if COUNTER_COLUMNS[name] is float else Integer) for name in names),
+            name="delta"
+        ).data([
+            (user_id, *(changes.get(name, 0) for name in names))
+            for user_id, changes in sorted(rows.items())
+        ])
+
+        async with self.session_factory() as session:
+            async with session.begin():
+                # Журнал первым: повтор уже записанной пачки ничего не меняет
+                logged = (await session.execute(
+                    insert(CounterFlush)
+                    .values(batch_id=batch_id)
+                    .on_conflict_do_nothing(index_elements=["batch_id"])
+                    .returning(CounterFlush.batch_id)
+                )).scalar_one_or_none()
+                if logged is None:
+                    logger.info(f"Counter batch {batch_id} already written, dropping")
+                    return
+
+                await session.execute(
+                    update(User)
+                    .where(User.user_id == delta.c.user_id)
+                    .values({
+                        name: getattr(User, name) + getattr(delta.c, name)
+                        for name in names
+                    })
+                )
+
+    async def _apply_strict(self, user_id: int, deltas: Dict[str, Number]) -> Optional[Dict[str, Number]]:
+        # Сначала незаписанные начисления, иначе проверка увидит старый баланс
+        await self.flush_user(user_id)
+
+        columns = [getattr(User, name) for name in deltas]
+        async with self.session_factory() as session:
+            async with session.begin():
+                row = (await session.execute(
+                    update(User)
+                    .where(
+                        User.user_id == user_id,
+                        *(getattr(User, name) + delta >= 0 for name, delta in deltas.items())
+                    )
+                    .values({name: getattr(User, name) + delta for name, delta in deltas.items()})
+                    .returning(*columns)
+                )).one_or_none()
+        if row is None:
+            return None
+        return dict(zip(deltas, row))
+
+    async def _cleanup_log(self) -> None:
+        async with self.session_factory() as session:
+            async with session.begin():
+                await session.execute(
+                    delete(CounterFlush).where(CounterFlush.flushed_at < datetime.utcnow() - FLUSH_LOG_RETENTION)
+                )
+
+
+# Счётчики процесса; запись запускает воркер (start_worker)
+hot_counters = HotCounters(
+    database.session_factory,
+    flush_interval=config.COUNTERS_FLUSH_INTERVAL,
+    batch_size=config.COUNTERS_FLUSH_BATCH
+)
@@ -0,0 +1,52 @@
+# bot/infra/cache/decorators.py
+
+from typing import Any, Awaitable, Callable, Optional
+from bot.infra.cache.key_builder import key_builder
+from bot.infra.cache.two_tier import TwoTierCache
+import functools
+import inspect
+
+def cached(
+    namespace: Optional[str] = None,
+    ttl: float = 300,
+    l1_ttl: float = 30,
+    l1_maxsize: int = 10000,
+    negative_ttl: Optional[float] = 60,
+    key: Optional[Callable[..., str]] = None
+):
+    """Кэшировать результат корутины в L1 (память) и L2 (Redis)
+    
+    namespace: пространство имён ключей (по умолчанию - имя функции)
+    ttl / l1_ttl: время жизни в Redis / в памяти процесса
+    negative_ttl: время жизни закэшированного None (None - не кэшировать)
+    key: своя функция ключа с той же сигнатурой, что у обёрнутой
+    
+    Результат должен сериализоваться в JSON. Инвалидация:
+    await func.invalidate(*args, **kwargs)
+    """
+    
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        name = namespace or func.__qualname__
+        cache = TwoTierCache(name, ttl=ttl, l1_ttl=l1_ttl, l1_maxsize=l1_maxsize, negative_ttl=negative_ttl)
+        signature = inspect.signature(func)
+        
+        def make_key(*args, **kwargs) -> str:
+            if key is not None:
+                return key_builder.build(name, key(*args, **kwargs))
+            return key_builder.for_call(name, signature, args, kwargs)
+        
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await cache.get_or_load(
+                make_key(*args, **kwargs),
+                lambda: func(*args, **kwargs)
+            )
+        
+        async def invalidate(*args, **kwargs) -> None:
+            await cache.invalidate(make_key(*args, **kwargs))
+        
+        wrapper.cache = cache
+        wrapper.invalidate = invalidate
+        return wrapper
+    
+    return decorator
@@ -0,0 +1,175 @@
+# bot/infra/cache/fsm_storage.py
+
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import DEFAULT_DESTINY, BaseStorage, StateType, StorageKey
+from redis.asyncio import Redis
+import msgpack
+
+# Поля hash диалога
+STATE_FIELD = "s"
+DATA_FIELD = "d"
+FIELDS = (STATE_FIELD, DATA_FIELD)
+
+_UNKNOWN = object()  # поле ещё не читалось из Redis
+
+
+class _Entry:
+    """Состояние диалога в пределах одного обновления"""
+
+    __slots__ = ("state", "data", "dirty")
+
+    def __init__(self, state: Any = _UNKNOWN, data: Any = _UNKNOWN):
+        self.state = state
+        self.data = data
+        self.dirty: Set[str] = set()
+
+
+# Диалоги, затронутые текущим обновлением (см. CompactRedisStorage.batch)
+_current_batch: ContextVar[Optional[Dict[StorageKey, _Entry]]] = ContextVar("fsm_batch", default=None)
+
+
+def pack_data(data: Dict[str, Any]) -> bytes:
+    return msgpack.packb(data, use_bin_type=True)
+
+
+def unpack_data(raw: Optional[bytes]) -> Dict[str, Any]:
+    if not raw:
+        return {}
+    return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+
+
+class CompactRedisStorage(BaseStorage):
+    """FSM-хранилище: один hash на диалог, данные в msgpack
+
+    fsm:<chat>[:<thread>]:<user>[:<destiny>] -> {s: состояние, d: данные}
+
+    Состояние и данные читаются одним HMGET, запись - одна транзакция с
+    EXPIRE: брошенный на середине диалог исчезает через ttl секунд.
+    Внутри batch() (одно обновление) прочитанное держится в памяти,
+    get_state/get_data/update_data не ходят в Redis повторно, а все
+    изменения пишутся одной транзакцией в конце обработки. Между
+    обновлениями ничего не кэшируется - следующее обновление чата может
+    прийти в другой воркер.
+    """
+
+    def __init__(self, redis: Redis, ttl: Optional[int] = None, prefix: str = "fsm"):
+        self.redis = redis
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def redis_key(self, key: StorageKey) -> str:
+        parts = [self.prefix, str(key.chat_id)]
+        if key.thread_id:
+            parts.append(str(key.thread_id))
+        parts.append(str(key.user_id))
+        if key.destiny != DEFAULT_DESTINY:
+            parts.append(key.destiny)
+        return ":".join(parts)
+
+    @asynccontextmanager
+    async def batch(self) -> AsyncIterator[None]:
+        """Кэш текущего шага и одна запись изменений на выходе"""
+        token = _current_batch.set({})
+        try:
+            yield
+        finally:
+            entries = _current_batch.get()
+            _current_batch.reset(token)
+            # Запись и при ошибке обработчика: состояние уже сменилось
+            # для пользователя так же, как без batch
+            await self._write({key: entry for key, entry in entries.items() if entry.dirty})
+
+    def prime(self, key: StorageKey, state: Optional[bytes], data: Optional[bytes]) -> None:
+        """Подложить значения, прочитанные заранее (ContextLoader)"""
+        entries = _current_batch.get()
+        if entries is not None and key not in entries:
+            entries[key] = _Entry(state.decode() if state is not None else None, unpack_data(data))
+
+    async def _entry(self, key: StorageKey) -> _Entry:
+        entries = _current_batch.get()
+        entry = entries.get(key) if entries is not None else None
+        if entry is None or entry.state is _UNKNOWN or entry.data is _UNKNOWN:
+            state, data = await self.redis.hmget(self.redis_key(key), FIELDS)
+            if entry is None:
+                entry = _Entry()
+                if entries is not None:
+                    entries[key] = entry
+            # Уже изменённое в этом обновлении не перетираем
+            if entry.state is _UNKNOWN:
+                entry.state = state.decode() if state is not None else None
+            if entry.data is _UNKNOWN:
+                entry.data = unpack_data(data)
+        return entry
+
+    def _pending(self, key: StorageKey) -> Optional[_Entry]:
+        """Запись в текущем batch (создаётся без чтения из Redis)"""
+        entries = _current_batch.get()
+        if entries is None:
+            return None
+        entry = entries.get(key)
+        if entry is None:
+            entry = entries[key] = _Entry()
+        return entry
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._entry(key)).state
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return dict((await self._entry(key)).data)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        entry = self._pending(key)
+        if entry is None:
+            entry = _Entry(state=value)
+            entry.dirty.add(STATE_FIELD)
+            await self._write({key: entry})
+            return
+        entry.state = value
+        entry.dirty.add(STATE_FIELD)
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        entry = self._pending(key)
+        if entry is None:
+            entry = _Entry(data=dict(data))
+            entry.dirty.add(DATA_FIELD)
+            await self._write({key: entry})
+            return
+        entry.data = dict(data)
+        entry.dirty.add(DATA_FIELD)
+
+    async def _write(self, entries: Dict[StorageKey, _Entry]) -> None:
+        """Изменённые поля всех диалогов одной транзакцией"""
+        if not entries:
+            return
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for key, entry in entries.items():
+                redis_key = self.redis_key(key)
+                mapping: Dict[str, Any] = {}
+                removed: List[str] = []
+                if STATE_FIELD in entry.dirty:
+                    if entry.state is None:
+                        removed.append(STATE_FIELD)
+                    else:
+                        mapping[STATE_FIELD] = entry.state
+                if DATA_FIELD in entry.dirty:
+                    if entry.data:
+                        mapping[DATA_FIELD] = pack_data(entry.data)
+                    else:
+                        removed.append(DATA_FIELD)
+                # Hash без полей Redis удаляет сам
+                if removed:
+                    pipe.hdel(redis_key, *removed)
+                if mapping:
+                    pipe.hset(redis_key, mapping=mapping)
+                    if self.ttl:
+                        pipe.expire(redis_key, self.ttl)
+                entry.dirty.clear()
+            await pipe.execute()
+
+    async def close(self) -> None:
+        # Клиент Redis общий для всего бота - закрывается не здесь
+        pass
@@ -0,0 +1,33 @@
+# bot/infra/cache/key_builder.py
+
+from typing import Any, Dict, Tuple
+import inspect
+
+class KeyBuilder:
+    """Построение ключей кэша: <prefix>:<namespace>:<arg1>:<arg2>..."""
+    
+    def __init__(self, prefix: str = "cache", separator: str = ":"):
+        self.prefix = prefix
+        self.separator = separator
+    
+    def build(self, namespace: str, *parts: Any) -> str:
+        """Ключ из пространства имён и частей"""
+        return self.separator.join((self.prefix, namespace, *map(str, parts)))
+    
+    def for_call(
+        self,
+        namespace: str,
+        signature: inspect.Signature,
+        args: Tuple[Any, ...],
+        kwargs: Dict[str, Any]
+    ) -> str:
+        """Ключ для вызова функции (self/cls не входят в ключ)"""
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        parts = [
+            value for name, value in bound.arguments.items()
+            if name not in ("self", "cls")
+        ]
+        return self.build(namespace, *parts)
+
+key_builder = KeyBuilder()
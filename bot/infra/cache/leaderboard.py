@@ -0,0 +1,282 @@
+# bot/infra/cache/leaderboard.py
+
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from datetime import datetime, timedelta
+from redis.exceptions import RedisError
+from sqlalchemy import func, select
+from bot.core.config import config
+from bot.infra.cache.redis_client import LuaScript, redis_client
+from bot.infra.database.models import ReferralAncestor, User
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+Number = Union[int, float]
+
+# Колонки users, по которым ведутся таблицы
+METRICS: Tuple[str, ...] = ("factory_level", "soft_currency", "total_referrals")
+SCOPES = ("global", "weekly", "lang")
+
+LEADERBOARD_PREFIX = "lb:"
+LANG_KEY = "lb:lang"  # user_id -> язык (в какой языковой таблице пользователь)
+READY_KEY = "lb:ready"  # время последней пересборки; нет ключа - таблицы потеряны
+REBUILD_LOCK_KEY = "lb:rebuild_lock"
+REBUILD_LOCK_TTL = 3600
+
+# Изменение (metric, user_id, mode, value, weekly_gain); mode: set - новое
+# значение, incr - приращение. weekly_gain > 0 идёт в недельную таблицу
+Change = Tuple[str, int, str, Number, Number]
+
+# Применить изменения ко всем таблицам пользователя за один round trip
+# KEYS: lang; ARGV: prefix, неделя, ttl недели, затем по 5 на изменение
+UPDATE_SCRIPT = LuaScript("""
+local langs = {}
+for i = 4, #ARGV, 5 do
+    local prefix, id, value, gain = ARGV[1] .. ARGV[i], ARGV[i + 1], ARGV[i + 3], tonumber(ARGV[i + 4])
+    if langs[id] == nil then
+        langs[id] = redis.call('HGET', KEYS[1], id)
+    end
+    local boards = {prefix .. ':global'}
+    if langs[id] then
+        boards[2] = prefix .. ':lang:' .. langs[id]
+    end
+    for _, key in ipairs(boards) do
+        if ARGV[i + 2] == 'set' then
+            redis.call('ZADD', key, value, id)
+        else
+            redis.call('ZINCRBY', key, value, id)
+        end
+    end
+    if gain > 0 then
+        local weekly = prefix .. ':week:' .. ARGV[2]
+        redis.call('ZINCRBY', weekly, gain, id)
+        redis.call('EXPIRE', weekly, ARGV[3])
+    end
+end
+return 1
+""")
+
+# Перенести пользователя в таблицы другого языка с текущими очками
+# KEYS: lang; ARGV: prefix, user_id, язык, метрики...
+LANG_SCRIPT = LuaScript("""
+local old = redis.call('HGET', KEYS[1], ARGV[2])
+if old == ARGV[3] then
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[2], ARGV[3])
+for i = 4, #ARGV do
+    local prefix = ARGV[1] .. ARGV[i]
+    if old then
+        redis.call('ZREM', prefix .. ':lang:' .. old, ARGV[2])
+    end
+    local score = redis.call('ZSCORE', prefix .. ':global', ARGV[2])
+    if score then
+        redis.call('ZADD', prefix .. ':lang:' .. ARGV[3], score, ARGV[2])
+    end
+end
+return 1
+""")
+
+
+def current_week(now: Optional[datetime] = None) -> str:
+    year, week, _ = (now or datetime.utcnow()).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def week_start(now: Optional[datetime] = None) -> datetime:
+    now = now or datetime.utcnow()
+    return datetime(now.year, now.month, now.day) - timedelta(days=now.weekday())
+
+
+class Leaderboards:
+    """Таблицы лидеров на sorted set Redis
+
+    На каждую метрику - общая таблица, таблица по языку и таблица текущей
+    недели (прирост за неделю). Таблицы обновляются инкрементально из тех
+    же мест, что меняют колонки в БД; место и страница топа - O(log N).
+    Если Redis потерял данные, таблицы пересобираются из Postgres
+    (rebuild): недельные - только для рефералов, прирост уровня и валюты
+    за неделю в БД не хранится.
+    """
+
+    def __init__(self, prefix: str = LEADERBOARD_PREFIX):
+        self.prefix = prefix
+
+    def key(self, metric: str, scope: str = "global", lang: Optional[str] = None, week: Optional[str] = None) -> str:
+        if metric not in METRICS:
+            raise ValueError(f"Unknown leaderboard metric: {metric}")
+        if scope == "global":
+            return f"{self.prefix}{metric}:global"
+        if scope == "weekly":
+            return f"{self.prefix}{metric}:week:{week or current_week()}"
+        if scope == "lang":
+            return f"{self.prefix}{metric}:lang:{lang or config.DEFAULT_LANGUAGE}"
+        raise ValueError(f"Unknown leaderboard scope: {scope}")
+
+    async def record(self, changes: Sequence[Change]) -> None:
+        """Применить изменения; ошибка Redis не прерывает игровую операцию"""
+        if not changes:
+            return
+        args: List[Union[str, Number]] = [self.prefix, current_week(), config.LEADERBOARD_WEEKS_KEPT * 7 * 86400]
+        for metric, user_id, mode, value, gain in changes:
+            args.extend((metric, user_id, mode, value, gain))
+        try:
+            await UPDATE_SCRIPT([LANG_KEY], args)
+        except RedisError as e:
+            # Расхождение исправит пересборка
+            logger.warning(f"Failed to update leaderboards ({len(changes)} changes): {e}")
+
+    async def set(self, user_id: int, metric: str, value: Number, gained: Number = 0) -> None:
+        await self.record([(metric, user_id, "set", value, gained)])
+
+    async def incr(self, user_id: int, metric: str, delta: Number) -> None:
+        """Приращение; положительное засчитывается и в недельную таблицу"""
+        await self.record([(metric, user_id, "incr", delta, max(delta, 0))])
+
+    async def incr_many(self, metric: str, deltas: Dict[int, Number]) -> None:
+        await self.record([
+            (metric, user_id, "incr", delta, max(delta, 0))
+            for user_id, delta in deltas.items()
+        ])
+
+    async def set_language(self, user_id: int, lang: str) -> None:
+        try:
+            await LANG_SCRIPT([LANG_KEY], [self.prefix, user_id, lang, *METRICS])
+        except RedisError as e:
+            logger.warning(f"Failed to move user {user_id} to {lang} leaderboards: {e}")
+
+    async def rank(
+        self,
+        metric: str,
+        user_id: int,
+        scope: str = "global",
+        lang: Optional[str] = None
+    ) -> Optional[Tuple[int, Number, int]]:
+        """(место с 1, очки, всего в таблице); None - пользователя нет в таблице"""
+        key = self.key(metric, scope, lang)
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.zrevrank(key, user_id)
+            pipe.zscore(key, user_id)
+            pipe.zcard(key)
+            rank, score, total = await pipe.execute()
+        if rank is None:
+            return None
+        return rank + 1, _score(score), total
+
+    async def top(
+        self,
+        metric: str,
+        scope: str = "global",
+        lang: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 10
+    ) -> List[Tuple[int, Number]]:
+        """[(user_id, очки)] по убыванию, начиная с места offset + 1"""
+        entries = await redis_client.zrevrange(
+            self.key(metric, scope, lang), offset, offset + limit - 1, withscores=True
+        )
+        return [(int(member), _score(score)) for member, score in entries]
+
+    async def is_ready(self) -> bool:
+        return bool(await redis_client.exists(READY_KEY))
+
+    async def ensure_built(self, session_factory) -> bool:
+        """Пересобрать таблицы, если их нет (один процесс на кластер)"""
+        if await self.is_ready():
+            return False
+        if not await redis_client.set(REBUILD_LOCK_KEY, 1, nx=True, ex=REBUILD_LOCK_TTL):
+            return False
+        try:
+            await self.rebuild(session_factory)
+        finally:
+            await redis_client.delete(REBUILD_LOCK_KEY)
+        return True
+
+    async def rebuild(self, session_factory, chunk_size: Optional[int] = None) -> int:
+        """Собрать таблицы из Postgres во временные ключи и подменить атомарно
+
+        Изменения, пришедшие во время пересборки, могут потеряться при
+        подмене - их исправит следующая пересборка или следующее изменение
+        значения. Возвращает число пользователей.
+        """
+        chunk_size = chunk_size or config.LEADERBOARD_REBUILD_CHUNK
+        tmp = f"{self.prefix}rebuild:"
+        built: Dict[str, str] = {}  # живой ключ -> временный
+        started = time.monotonic()
+        count = 0
+
+        def target(key: str) -> str:
+            return built.setdefault(key, tmp + key)
+
+        # Остатки прерванной пересборки
+        await self._delete_matching(f"{tmp}*")
+
+        async with session_factory() as session:
+            result = await session.stream(
+                select(User.user_id, User.language, *(getattr(User, metric) for metric in METRICS))
+                .execution_options(yield_per=chunk_size, query_type="leaderboard_rebuild")
+            )
+            async for partition in result.partitions(chunk_size):
+                boards: Dict[str, Dict[int, Number]] = {}
+                langs: Dict[int, str] = {}
+                for row in partition:
+                    lang = row.language or config.DEFAULT_LANGUAGE
+                    langs[row.user_id] = lang
+                    for metric in METRICS:
+                        score = getattr(row, metric) or 0
+                        boards.setdefault(self.key(metric), {})[row.user_id] = score
+                        boards.setdefault(self.key(metric, "lang", lang), {})[row.user_id] = score
+
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    for key, scores in boards.items():
+                        pipe.zadd(target(key), scores)
+                    pipe.hset(target(LANG_KEY), mapping=langs)
+                    await pipe.execute()
+                count += len(partition)
+
+            # Недельная таблица рефералов: новые пользователи в поддереве за неделю
+            weekly = (await session.execute(
+                select(ReferralAncestor.ancestor_id, func.count())
+                .join(User, User.user_id == ReferralAncestor.descendant_id)
+                .where(User.created_at >= week_start())
+                .group_by(ReferralAncestor.ancestor_id)
+                .execution_options(query_type="leaderboard_rebuild_weekly")
+            )).all()
+            if weekly:
+                key = self.key("total_referrals", "weekly")
+                await redis_client.zadd(target(key), dict(weekly))
+
+        # Языковые таблицы, в которых больше никого нет, удаляются
+        stale = [
+            key.decode() async for key in redis_client.scan_iter(match=f"{self.prefix}*:lang:*", count=1000)
+            if key.decode() not in built and not key.decode().startswith(tmp)
+        ]
+        async with redis_client.pipeline(transaction=True) as pipe:
+            for key, tmp_key in built.items():
+                pipe.rename(tmp_key, key)
+            weekly_key = self.key("total_referrals", "weekly")
+            if weekly_key in built:
+                pipe.expire(weekly_key, config.LEADERBOARD_WEEKS_KEPT * 7 * 86400)
+            if stale:
+                pipe.delete(*stale)
+            pipe.set(READY_KEY, int(time.time()))
+            await pipe.execute()
+
+        logger.info(f"Leaderboards rebuilt: {count} users in {time.monotonic() - started:.1f}s")
+        return count
+
+    @staticmethod
+    async def _delete_matching(pattern: str) -> None:
+        keys = [key async for key in redis_client.scan_iter(match=pattern, count=1000)]
+        if keys:
+            await redis_client.delete(*keys)
+
+
+def _score(raw: Optional[float]) -> Number:
+    if raw is None:
+        return 0
+    return int(raw) if float(raw).is_integer() else raw
+
+
+leaderboards = Leaderboards()
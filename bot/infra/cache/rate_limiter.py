@@ -1,52 +1,204 @@
 # bot/infra/cache/rate_limiter.py
 
-from bot.infra.cache.redis_client import redis_client
+from typing import Optional, Tuple
+from collections import OrderedDict
+from bot.infra.cache.redis_client import LuaScript
 import time
 
+# Token bucket: атомарный рефилл и списание токенов
+# KEYS[1] - bucket; ARGV: capacity, refill_rate (токен/сек), now (мс), cost
+TOKEN_BUCKET_SCRIPT = LuaScript("""
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+
+local state = redis.call('HMGET', KEYS[1], 't', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+if now < ts then
+    now = ts
+end
+
+tokens = math.min(capacity, tokens + (now - ts) * rate / 1000)
+
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = math.ceil((cost - tokens) * 1000 / rate)
+end
+
+redis.call('HSET', KEYS[1], 't', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+return {allowed, retry_after}
+""")
+
+# Sliding window (счётчики текущего и прошлого окна с интерполяцией)
+# KEYS[1] - счётчик; ARGV: limit, window (мс), now (мс), cost
+SLIDING_WINDOW_SCRIPT = LuaScript("""
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local current = math.floor(now / window)
+
+local state = redis.call('HMGET', KEYS[1], 'w', 'c', 'p')
+local w = tonumber(state[1]) or current
+local count = tonumber(state[2]) or 0
+local previous = tonumber(state[3]) or 0
+if w < current then
+    if w == current - 1 then
+        previous = count
+    else
+        previous = 0
+    end
+    count = 0
+    w = current
+end
+
+local elapsed = (now - current * window) / window
+if previous * (1 - elapsed) + count + cost > limit then
+    local retry_after
+    if count + cost > limit or previous == 0 then
+        retry_after = (current + 1) * window - now
+    else
+        retry_after = math.ceil((1 - (limit - count - cost) / previous - elapsed) * window)
+    end
+    return {0, math.max(1, retry_after)}
+end
+
+count = count + cost
+redis.call('HSET', KEYS[1], 'w', w, 'c', count, 'p', previous)
+redis.call('PEXPIRE', KEYS[1], window * 2)
+return {1, 0}
+""")
+
+POLICIES = ("token_bucket", "sliding_window")
+
+
+class LocalPreFilter:
+    """In-process token bucket перед Redis
+
+    Процесс видит только часть запросов пользователя, поэтому если даже
+    локальный (более щедрый) bucket пуст, глобальный лимит тем более
+    исчерпан - такой запрос отклоняется без похода в Redis.
+    """
+
+    def __init__(self, capacity: float, refill_rate: float, max_keys: int = 100_000):
+        """
+        capacity: максимум токенов в локальном bucket
+        refill_rate: токены/сек
+        max_keys: сколько ключей держать в памяти (LRU)
+        """
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def allow(self, key: str, cost: int = 1) -> bool:
+        """Списать токены локально. False - явный флуд"""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._buckets.popitem(last=False)
+            self._buckets[key] = [self.capacity - cost, now]
+            return True
+
+        self._buckets.move_to_end(key)
+        tokens = min(self.capacity, bucket[0] + (now - bucket[1]) * self.refill_rate)
+        bucket[1] = now
+        if tokens < cost:
+            bucket[0] = tokens
+            return False
+
+        bucket[0] = tokens - cost
+        return True
+
+
+class RateLimiter:
+    """Атомарный rate limiter: одна проверка - один вызов скрипта в Redis"""
+
+    def __init__(
+        self,
+        limit: int,
+        period: float,
+        policy: str = "token_bucket",
+        prefilter: bool = False,
+        prefilter_factor: float = 2.0,
+        prefix: str = "rate_limit"
+    ):
+        """
+        limit: количество запросов (ёмкость bucket / лимит окна)
+        period: период в секундах
+        policy: token_bucket или sliding_window
+        prefilter: отсекать явный флуд локально, без Redis
+        prefilter_factor: во сколько раз локальный bucket щедрее глобального
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown rate limit policy: {policy}")
+
+        self.limit = limit
+        self.period = period
+        self.policy = policy
+        self.prefix = f"{prefix}:{'tb' if policy == 'token_bucket' else 'sw'}"
+
+        if policy == "token_bucket":
+            self.script = TOKEN_BUCKET_SCRIPT
+            self._args = (limit, limit / period)
+        else:
+            self.script = SLIDING_WINDOW_SCRIPT
+            self._args = (limit, int(period * 1000))
+
+        self.prefilter: Optional[LocalPreFilter] = None
+        if prefilter:
+            self.prefilter = LocalPreFilter(limit * prefilter_factor, limit / period)
+
+    def key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def args(self, cost: int = 1) -> Tuple:
+        """Аргументы скрипта (для вызова в составе pipeline)"""
+        return (*self._args, int(time.time() * 1000), cost)
+
+    @staticmethod
+    def parse(result) -> Tuple[bool, float]:
+        """Ответ скрипта -> (разрешено, через сколько секунд повторить)"""
+        allowed, retry_after_ms = result
+        return bool(allowed), int(retry_after_ms) / 1000
+
+    async def acquire(self, key: str, cost: int = 1) -> Tuple[bool, float]:
+        """Проверить и списать лимит: (разрешено, retry_after в секундах)"""
+        if self.prefilter and not self.prefilter.allow(key, cost):
+            return False, self.period
+
+        result = await self.script([self.key(key)], self.args(cost))
+        return self.parse(result)
+
+
 class RedisTokenBucket:
     """Token Bucket rate limiter с Redis"""
-    
-    def __init__(self, capacity: int, refill_rate: float):
+
+    def __init__(self, capacity: int, refill_rate: float, prefilter: bool = False):
         """
         capacity: максимум токенов в bucket
         refill_rate: токены/сек
+        prefilter: отсекать явный флуд локально, без Redis
         """
         self.capacity = capacity
         self.refill_rate = refill_rate
-    
+        self.limiter = RateLimiter(
+            capacity,
+            capacity / refill_rate,
+            policy="token_bucket",
+            prefilter=prefilter
+        )
+
     async def is_allowed(self, key: str) -> bool:
         """Проверить, разрешён ли запрос"""
-        
-        now = time.time()
-        data = await redis_client.get(f"rate_limit:{key}")
-        
-        if not data:
-            # Первый запрос
-            await redis_client.set(
-                f"rate_limit:{key}",
-                f"{self.capacity - 1},{now}",
-                ex=int(self.capacity / self.refill_rate) + 1
-            )
-            return True
-        
-        # Парсим данные
-        tokens_str, last_refill_str = data.decode().split(',')
-        tokens = int(tokens_str)
-        last_refill = float(last_refill_str)
-        
-        # Рефиллим токены
-        elapsed = now - last_refill
-        refilled = int(elapsed * self.refill_rate)
-        tokens = min(self.capacity, tokens + refilled)
-        
-        if tokens > 0:
-            # Даём токен
-            tokens -= 1
-            await redis_client.set(
-                f"rate_limit:{key}",
-                f"{tokens},{now}",
-                ex=int(self.capacity / self.refill_rate) + 1
-            )
-            return True
-        
-        return False
+        allowed, _ = await self.limiter.acquire(key)
+        return allowed
@@ -0,0 +1,82 @@
+# bot/infra/cache/redis_client.py
+
+from typing import Any, Optional, Sequence
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import NoScriptError, RedisError
+from bot.core.config import config
+from bot.infra.metrics.instrumentation import current_trace
+import asyncio
+import hashlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentedRedis(Redis):
+    """Redis, добавляющий время команд и pipeline к стадии redis обновления"""
+
+    async def execute_command(self, *args, **options):
+        trace = current_trace.get()
+        if trace is None:
+            return await super().execute_command(*args, **options)
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            trace.add("redis", time.perf_counter() - started)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> Pipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        trace = current_trace.get()
+        if trace is None:
+            return await super().execute(raise_on_error)
+        started = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            trace.add("redis", time.perf_counter() - started)
+
+
+# Общий клиент Redis (пул соединений на процесс)
+redis_client: Redis = InstrumentedRedis.from_url(config.REDIS_URL, db=config.REDIS_DB)
+
+
+async def warm_up_redis(connections: int) -> None:
+    """Открыть соединения пула заранее, чтобы первые обновления не ждали connect"""
+    try:
+        await asyncio.gather(*(redis_client.ping() for _ in range(connections)))
+    except RedisError as e:
+        # Не мешаем старту: пул доберёт соединения по требованию
+        logger.warning(f"Redis pool warm-up failed: {e}")
+
+
+class LuaScript:
+    """Lua-скрипт Redis: EVALSHA с откатом на EVAL при NOSCRIPT
+
+    В отличие от redis-py Script, SHA известен заранее и скрипт можно
+    поставить в pipeline без дополнительного SCRIPT EXISTS.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.sha = hashlib.sha1(source.encode()).hexdigest()
+
+    async def __call__(
+        self,
+        keys: Sequence[str],
+        args: Sequence[Any],
+        client: Redis = None
+    ) -> Any:
+        """Выполнить скрипт за один round trip (два - при первом вызове на сервере)"""
+        client = client or redis_client
+        try:
+            return await client.evalsha(self.sha, len(keys), *keys, *args)
+        except NoScriptError:
+            # EVAL заодно кэширует скрипт на сервере
+            return await client.eval(self.source, len(keys), *keys, *args)
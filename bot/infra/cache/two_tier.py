@@ -0,0 +1,251 @@
+# bot/infra/cache/two_tier.py
+
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from collections import OrderedDict
+from redis.exceptions import RedisError
+from bot.infra.cache.redis_client import redis_client
+from bot.infra.metrics.prometheus import cache_hits_total, cache_misses_total, cache_evictions_total
+import asyncio
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Маркер закэшированного None (negative caching)
+_NONE = object()
+_NONE_L2 = b""  # пустая строка не бывает валидным JSON
+
+
+class LRUCache:
+    """Ограниченный in-process кэш: LRU + TTL"""
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        on_evict: Optional[Callable[[str], None]] = None
+    ):
+        """
+        maxsize: максимум записей
+        ttl: время жизни записи по умолчанию (секунды)
+        on_evict: вызывается с причиной вытеснения (size, ttl)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """(найдено, значение)"""
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            if self.on_evict:
+                self.on_evict("ttl")
+            return False, None
+
+        self._data.move_to_end(key)
+        return True, value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            if self.on_evict:
+                self.on_evict("size")
+
+    def delete(self, key: str) -> bool:
+        return self._data.pop(key, None) is not None
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class TwoTierCache:
+    """Двухуровневый кэш: L1 в памяти процесса поверх L2 в Redis
+
+    Промахи по одному ключу схлопываются (single-flight): источник
+    вызывается один раз, остальные ждут его результат. Инвалидация
+    рассылается всем воркерам через Redis pub/sub.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float = 300,
+        l1_ttl: float = 30,
+        l1_maxsize: int = 10000,
+        negative_ttl: Optional[float] = 60
+    ):
+        """
+        name: имя кэша (метки метрик, маршрутизация инвалидации)
+        ttl: время жизни в Redis (L2)
+        l1_ttl: время жизни в памяти процесса (L1), не больше ttl
+        negative_ttl: время жизни закэшированного None; None - не кэшировать
+        """
+        self.name = name
+        self.ttl = ttl
+        self.l1_ttl = min(l1_ttl, ttl)
+        self.negative_ttl = negative_ttl
+        self.l1 = LRUCache(l1_maxsize, self.l1_ttl, on_evict=self._on_evict)
+
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._epoch = 0  # растёт при каждой инвалидации
+
+        self._l1_hits = cache_hits_total.labels(cache=name, tier="l1")
+        self._l2_hits = cache_hits_total.labels(cache=name, tier="l2")
+        self._misses = cache_misses_total.labels(cache=name)
+
+        invalidator.register(self)
+
+    def _on_evict(self, reason: str) -> None:
+        cache_evictions_total.labels(cache=self.name, reason=reason).inc()
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Значение из L1, затем L2, иначе из источника (один раз на ключ)"""
+        found, value = self.l1.get(key)
+        if found:
+            self._l1_hits.inc()
+            return None if value is _NONE else value
+
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._load(key, loader)
+        except Exception as e:
+            future.set_exception(e)
+            # Исключение получат ожидающие; если их нет - не логировать как потерянное
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        epoch = self._epoch
+
+        try:
+            raw = await redis_client.get(key)
+        except RedisError as e:
+            logger.warning(f"Cache {self.name}: L2 unavailable: {e}")
+            raw = None
+
+        if raw is not None:
+            self._l2_hits.inc()
+            value = None if raw == _NONE_L2 else json.loads(raw)
+            self._store_l1(key, value, epoch)
+            return value
+
+        self._misses.inc()
+        value = await loader()
+
+        if value is None and self.negative_ttl is None:
+            return None
+
+        await self._store_l2(key, value, epoch)
+        self._store_l1(key, value, epoch)
+        return value
+
+    async def _store_l2(self, key: str, value: Any, epoch: int) -> None:
+        # Значение уже загружено - ошибка кэша не должна доходить до вызывающего
+        try:
+            raw, ttl = (_NONE_L2, self.negative_ttl) if value is None else (json.dumps(value), self.ttl)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Cache {self.name}: value for {key} is not JSON-serializable: {e}")
+            return
+        # Пока грузили, ключ инвалидировали (здесь или в другом воркере) -
+        # не записываем устаревшее значение поверх
+        if epoch != self._epoch:
+            return
+        try:
+            await redis_client.set(key, raw, ex=int(ttl))
+        except RedisError as e:
+            logger.warning(f"Cache {self.name}: L2 write failed: {e}")
+
+    def _store_l1(self, key: str, value: Any, epoch: int) -> None:
+        # Пока значение грузилось, пришла инвалидация - не кладём устаревшее
+        if epoch != self._epoch:
+            return
+        if value is None:
+            self.l1.set(key, _NONE, ttl=min(self.negative_ttl, self.l1_ttl))
+        else:
+            self.l1.set(key, value)
+
+    def evict_local(self, key: Optional[str] = None) -> None:
+        """Удалить ключ (или всё) из L1 этого процесса"""
+        self._epoch += 1
+        if key is None:
+            self.l1.clear()
+        elif self.l1.delete(key):
+            self._on_evict("invalidate")
+
+    async def invalidate(self, key: str) -> None:
+        """Удалить ключ из L2 и из L1 всех воркеров"""
+        self.evict_local(key)
+        await redis_client.delete(key)
+        await redis_client.publish(INVALIDATION_CHANNEL, f"{self.name}\n{key}")
+
+
+class CacheInvalidator:
+    """Подписка на канал инвалидации: одна на процесс для всех кэшей"""
+
+    def __init__(self):
+        self._caches: Dict[str, TwoTierCache] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, cache: TwoTierCache) -> None:
+        self._caches[cache.name] = cache
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen(), name="cache-invalidator")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with redis_client.pubsub() as pubsub:
+                    await pubsub.subscribe(INVALIDATION_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "subscribe":
+                            # (Пере)подключились: могли пропустить инвалидации
+                            for cache in self._caches.values():
+                                cache.evict_local()
+                        elif message["type"] == "message":
+                            name, _, key = message["data"].decode().partition("\n")
+                            cache = self._caches.get(name)
+                            if cache is not None:
+                                cache.evict_local(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener failed, reconnecting: {e}")
+                await asyncio.sleep(1)
+
+
+invalidator = CacheInvalidator()
@@ -0,0 +1,153 @@
+# bot/infra/database/engine.py
+
+from typing import Optional
+from sqlalchemy import event, text
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from bot.core.config import config
+from bot.infra.metrics.instrumentation import record
+from bot.infra.metrics.prometheus import db_pool_active, db_query_time
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Размер кэша скомпилированных SQLAlchemy-запросов (на engine)
+QUERY_CACHE_SIZE = 1200
+
+
+def _query_type(statement: str, execution_options) -> str:
+    """Метка запроса: query_type из execution_options или первое слово SQL"""
+    query_type = execution_options.get("query_type")
+    if query_type:
+        return query_type
+    head = statement.lstrip()[:16].split(None, 1)
+    return head[0].lower() if head else "unknown"
+
+
+def _instrument(engine: AsyncEngine) -> None:
+    """Метрики пула и времени запросов"""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        db_pool_active.inc()
+
+    @event.listens_for(sync_engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        db_pool_active.dec()
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_query_started", None)
+        if started is not None:
+            elapsed = time.perf_counter() - started
+            db_query_time.labels(
+                query_type=_query_type(statement, context.execution_options)
+            ).observe(elapsed)
+            # contextvars обновления видны и внутри greenlet SQLAlchemy
+            record("db", elapsed)
+
+
+def create_engine(url: str) -> AsyncEngine:
+    """Async engine с настроенным пулом asyncpg и кэшем prepared statements"""
+    engine = create_async_engine(
+        url,
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+        pool_recycle=config.DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+        query_cache_size=QUERY_CACHE_SIZE,
+        connect_args={
+            # Повторяющиеся запросы репозиториев выполняются как
+            # подготовленные, без разбора SQL на сервере каждый раз
+            "prepared_statement_cache_size": config.DB_STATEMENT_CACHE_SIZE,
+            "server_settings": {"application_name": "zavod_empire_bot"},
+        }
+    )
+    _instrument(engine)
+    return engine
+
+
+class Database:
+    """Primary и (необязательная) реплика для чтения
+
+    session_factory - запись и чтение, которому нужна свежесть;
+    read_session - только чтение, идёт на реплику. Если реплика
+    недоступна, чтение уходит на primary, а реплика пробуется снова через
+    DB_REPLICA_RETRY секунд.
+    """
+
+    def __init__(self, url: str, replica_url: Optional[str] = None):
+        self.engine = create_engine(url)
+        self.session_factory = async_sessionmaker(self.engine, expire_on_commit=False)
+
+        self.replica_engine: Optional[AsyncEngine] = None
+        self.replica_session_factory: Optional[async_sessionmaker] = None
+        if replica_url:
+            self.replica_engine = create_engine(replica_url)
+            self.replica_session_factory = async_sessionmaker(self.replica_engine, expire_on_commit=False)
+        self._replica_down_until = 0.0
+
+    async def warm_up(self) -> None:
+        """Открыть соединения пула заранее, чтобы первые обновления не ждали connect"""
+        for engine in filter(None, (self.engine, self.replica_engine)):
+            try:
+                await asyncio.gather(*(
+                    self._ping(engine) for _ in range(config.DB_POOL_SIZE)
+                ))
+            except Exception as e:
+                # Не мешаем старту: пул доберёт соединения по требованию
+                logger.warning(f"Database pool warm-up failed for {engine.url.host}: {e}")
+
+    @staticmethod
+    async def _ping(engine: AsyncEngine) -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    def read_session(self):
+        """Сессия только для чтения: реплика, если доступна, иначе primary"""
+        if self.replica_session_factory is None or time.monotonic() < self._replica_down_until:
+            return self.session_factory()
+        return _ReplicaSession(self)
+
+    def replica_failed(self, error: Exception) -> None:
+        logger.warning(f"Read replica unavailable, using primary for {config.DB_REPLICA_RETRY:.0f}s: {error}")
+        self._replica_down_until = time.monotonic() + config.DB_REPLICA_RETRY
+
+    async def dispose(self) -> None:
+        await self.engine.dispose()
+        if self.replica_engine is not None:
+            await self.replica_engine.dispose()
+
+
+class _ReplicaSession:
+    """async with: сессия реплики с откатом на primary при ошибке соединения"""
+
+    def __init__(self, database: Database):
+        self.database = database
+        self.session = None
+
+    async def __aenter__(self):
+        session = self.database.replica_session_factory()
+        try:
+            # Соединение берётся сразу: сбой реплики виден до запросов
+            await session.connection()
+        except (OSError, asyncio.TimeoutError, OperationalError, InterfaceError) as e:
+            await session.close()
+            self.database.replica_failed(e)
+            session = self.database.session_factory()
+        self.session = session
+        return session
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+
+
+database = Database(config.DATABASE_URL, config.DATABASE_REPLICA_URL)
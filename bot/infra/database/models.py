@@ -1,8 +1,8 @@
 # bot/infra/database/models.py
 
-from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey, Boolean, Text, JSON
+from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey, Boolean, Text, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import backref, relationship
 from datetime import datetime
 import uuid
 
@@ -26,6 +26,9 @@ class User(Base):
     factory_level = Column(Integer, default=1)
     factory_capacity = Column(Integer, default=10)
     workers_count = Column(Integer, default=0)
+    factory_stock = Column(Float, default=0.0)  # Произведено и не собрано на production_settled_at
+    production_settled_at = Column(DateTime, default=datetime.utcnow)
+    factory_upgrade_at = Column(DateTime, nullable=True)  # Завершение улучшения до следующего уровня
     
     # Валюта
     soft_currency = Column(Integer, default=0)  # Мягкая валюта
@@ -45,10 +48,26 @@ class User(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Отношения
-    referrals = relationship("User", remote_side=[invited_by_id], backref="inviter")
+    referrals = relationship("User", backref=backref("inviter", remote_side=[user_id]))
     auctions = relationship("Auction", back_populates="creator")
     purchases = relationship("Purchase", back_populates="user")
 
+class ReferralAncestor(Base):
+    """Реферальное дерево (closure table): строка на каждую пару предок-потомок
+    
+    depth = 1 - прямой пригласивший. Весь аплайн пользователя и всё его
+    поддерево читаются одним запросом без рекурсии.
+    """
+    __tablename__ = "referral_ancestors"
+    
+    ancestor_id = Column(Integer, ForeignKey("users.user_id"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("users.user_id"), primary_key=True)
+    depth = Column(Integer, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_referral_ancestors_descendant_depth", "descendant_id", "depth"),
+    )
+
 class Auction(Base):
     """Модель аукциона"""
     __tablename__ = "auctions"
@@ -134,3 +153,19 @@ class ABTestExposure(Base):
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
     
     test = relationship("ABTest", back_populates="exposures")
+    
+    # Одна строка на пользователя в эксперименте (запись пачками с ON CONFLICT)
+    __table_args__ = (
+        Index("uq_ab_test_exposures_test_user", "test_id", "user_id", unique=True),
+    )
+
+class CounterFlush(Base):
+    """Журнал записанных пачек счётчиков (write-behind)
+    
+    Строка пишется в той же транзакции, что и дельты пачки: повторная
+    запись после сбоя распознаётся и не удваивает значения.
+    """
+    __tablename__ = "counter_flushes"
+    
+    batch_id = Column(String(32), primary_key=True)
+    flushed_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -0,0 +1,38 @@
+# bot/infra/database/session.py
+
+from typing import Any, Optional
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+
+class LazySession:
+    """AsyncSession, создаваемая при первом обращении
+
+    Хендлер, который не ходит в БД, не создаёт сессию и не берёт
+    соединение из пула. Соединение берётся только при первом запросе.
+    """
+
+    __slots__ = ("_factory", "_session")
+
+    def __init__(self, factory: async_sessionmaker):
+        self._factory = factory
+        self._session: Optional[AsyncSession] = None
+
+    @property
+    def opened(self) -> bool:
+        return self._session is not None
+
+    def __getattr__(self, name: str) -> Any:
+        if self._session is None:
+            self._session = self._factory()
+        return getattr(self._session, name)
+
+    async def finish(self, commit: bool) -> None:
+        """Завершить сессию: зафиксировать начатую транзакцию или откатить"""
+        session, self._session = self._session, None
+        if session is None:
+            return
+        try:
+            if commit and session.in_transaction():
+                await session.commit()
+        finally:
+            await session.close()
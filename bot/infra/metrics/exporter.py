@@ -0,0 +1,40 @@
+# bot/infra/metrics/exporter.py
+
+from aiohttp import web
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+from prometheus_client import multiprocess
+import os
+
+
+def multiprocess_enabled() -> bool:
+    """Метрики пишутся в файлы (воркеры под супервизором)"""
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def create_metrics_app() -> web.Application:
+    """Приложение с /metrics
+
+    В многопроцессном режиме метрики всех воркеров собираются из
+    PROMETHEUS_MULTIPROC_DIR, поэтому endpoint обслуживает супервизор,
+    а не один из воркеров (иначе каждый отдавал бы только свои значения).
+    """
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    async def metrics(request: web.Request) -> web.Response:
+        response = web.Response(body=generate_latest(registry))
+        response.headers["Content-Type"] = CONTENT_TYPE_LATEST
+        return response
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    return app
+
+
+def mark_process_dead(pid: int) -> None:
+    """Убрать live-gauge завершившегося воркера из агрегации"""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,110 @@
+# bot/infra/metrics/instrumentation.py
+"""
+Время обновления по стадиям: разбор JSON, создание Update, очередь,
+предзагрузка контекста, каждая middleware, маршрутизация, обработчик, а
+также суммарное время вызовов Redis, БД и Bot API внутри обновления.
+
+Стадии копятся в UpdateTrace текущего обновления (contextvar) и пишутся
+в гистограмму один раз, в конце обработки, с меткой обработчика. Без
+трассы (инструментирование выключено или обновление не попало в
+выборку) замеры сводятся к одному ContextVar.get().
+"""
+from typing import Dict, Optional, Tuple
+from contextvars import ContextVar
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from bot.core.config import config
+from bot.infra.metrics.prometheus import update_stage_duration
+import random
+import time
+
+UNROUTED = "unrouted"  # обработчик не найден или обновление отброшено раньше
+
+current_trace: ContextVar[Optional["UpdateTrace"]] = ContextVar("update_trace", default=None)
+
+# (стадия, обработчик) -> дочерняя гистограмма: labels() на каждое
+# наблюдение заметно дороже самого observe
+_histograms: Dict[Tuple[str, str], object] = {}
+
+
+def _histogram(stage: str, handler: str):
+    child = _histograms.get((stage, handler))
+    if child is None:
+        child = _histograms[(stage, handler)] = update_stage_duration.labels(stage=stage, handler=handler)
+    return child
+
+
+class UpdateTrace:
+    """Накопленное время стадий одного обновления"""
+
+    __slots__ = ("handler", "stages", "started")
+
+    def __init__(self):
+        self.handler = UNROUTED
+        self.stages: Dict[str, float] = {}
+        self.started = time.perf_counter()
+
+    def add(self, stage: str, seconds: float) -> None:
+        stages = self.stages
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+    def finish(self) -> None:
+        """Записать стадии и полное время в гистограммы"""
+        handler = self.handler
+        for stage, seconds in self.stages.items():
+            _histogram(stage, handler).observe(seconds)
+        _histogram("total", handler).observe(time.perf_counter() - self.started)
+
+
+def new_trace() -> Optional[UpdateTrace]:
+    """Трасса для нового обновления; None - не замеряем"""
+    if not config.INSTRUMENTATION_ENABLED:
+        return None
+    if config.INSTRUMENTATION_SAMPLE_RATE < 1.0 and random.random() >= config.INSTRUMENTATION_SAMPLE_RATE:
+        return None
+    return UpdateTrace()
+
+
+def record(stage: str, seconds: float) -> None:
+    """Добавить время к стадии текущего обновления (если оно замеряется)"""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+class stage:
+    """async with / with stage("context"): время блока - в текущую трассу"""
+
+    __slots__ = ("name", "trace", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> "stage":
+        self.trace = current_trace.get()
+        if self.trace is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.trace is not None:
+            self.trace.add(self.name, time.perf_counter() - self.started)
+
+    async def __aenter__(self) -> "stage":
+        return self.__enter__()
+
+    async def __aexit__(self, *exc) -> None:
+        self.__exit__()
+
+
+class BotApiTimingMiddleware(BaseRequestMiddleware):
+    """Middleware сессии aiogram: вызовы Bot API из обработчика - стадия bot_api"""
+
+    async def __call__(self, make_request, bot, method):
+        trace = current_trace.get()
+        if trace is None:
+            return await make_request(bot, method)
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            trace.add("bot_api", time.perf_counter() - started)
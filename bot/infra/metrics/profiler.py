@@ -0,0 +1,131 @@
+# bot/infra/metrics/profiler.py
+
+from typing import Dict, List, Optional
+from collections import Counter
+from types import FrameType
+from bot.infra.metrics.prometheus import event_loop_blocked_total, event_loop_lag
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+
+logger = logging.getLogger(__name__)
+
+MAX_PROFILE_SECONDS = 60.0
+MIN_PROFILE_INTERVAL = 0.001
+
+
+def _fold(frame: Optional[FrameType]) -> str:
+    """Стек в формате folded (корень первым) - вход для flamegraph"""
+    names: List[str] = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """Сэмплирующий профилировщик потока event loop
+
+    Отдельный поток раз в interval снимает стек потока loop через
+    sys._current_frames() - без sys.setprofile и без замедления кода
+    между снимками. Ожидание в select (простой loop) тоже попадает в
+    выборку, доля таких стеков - доля простоя.
+    """
+
+    def __init__(self):
+        self._running = False
+
+    async def profile(self, seconds: float, interval: float = 0.005) -> Dict[str, int]:
+        """Собрать стеки за seconds секунд: {folded stack: число снимков}"""
+        if self._running:
+            raise RuntimeError("Profiling is already in progress")
+        seconds = min(seconds, MAX_PROFILE_SECONDS)
+        interval = max(interval, MIN_PROFILE_INTERVAL)
+        loop_thread = threading.get_ident()
+        stacks: Counter = Counter()
+        stop = threading.Event()
+
+        def sample() -> None:
+            while not stop.wait(interval):
+                frame = sys._current_frames().get(loop_thread)
+                if frame is not None:
+                    stacks[_fold(frame)] += 1
+
+        self._running = True
+        thread = threading.Thread(target=sample, name="loop-profiler", daemon=True)
+        thread.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            stop.set()
+            thread.join()
+            self._running = False
+        return dict(stacks)
+
+
+class LoopMonitor:
+    """Задержка event loop и поиск блокирующего кода
+
+    Корутина-пульс просыпается раз в interval и пишет опоздание в
+    event_loop_lag. Сторожевой поток следит за пульсом: если loop не
+    отвечает дольше threshold, в лог пишется стек потока loop в этот
+    момент - то есть сам блокирующий callback, а не его последствия.
+    """
+
+    def __init__(self, interval: float = 0.5, threshold: float = 0.1):
+        self.interval = interval
+        self.threshold = threshold
+        self._beat = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat(), name="loop-monitor")
+        self._watchdog = threading.Thread(
+            target=self._watch, args=(threading.get_ident(),), name="loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stop.set()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._watchdog.join()
+        self._watchdog = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            event_loop_lag.observe(max(0.0, now - expected))
+            self._beat = now
+
+    def _watch(self, loop_thread: int) -> None:
+        reported = None  # пульс, на котором блокировка уже записана
+        while not self._stop.wait(self.threshold / 2):
+            beat = self._beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked < self.threshold or beat == reported:
+                continue
+            reported = beat
+            event_loop_blocked_total.inc()
+            frame = sys._current_frames().get(loop_thread)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "(no frame)"
+            logger.warning(f"Event loop blocked for {blocked:.3f}s, loop thread stack:\n{stack}")
+
+
+profiler = SamplingProfiler()
@@ -1,4 +1,9 @@
 # bot/infra/metrics/prometheus.py
+#
+# В многопроцессном режиме значения пишутся в PROMETHEUS_MULTIPROC_DIR
+# и суммируются при сборе (см. exporter.py). Для Gauge задан
+# multiprocess_mode: livesum - сумма по живым воркерам, max - одно
+# значение на весь бот.
 
 from prometheus_client import Counter, Histogram, Gauge
 import time
@@ -28,7 +33,8 @@ bot_errors_total = Counter(
 queue_size = Gauge(
     'queue_size',
     'Number of jobs in queue',
-    ['queue_name']
+    ['queue_name'],
+    multiprocess_mode='max'
 )
 
 queue_processing_time = Histogram(
@@ -37,6 +43,13 @@ queue_processing_time = Histogram(
     ['queue_name']
 )
 
+# Асинхронная очередь задач (Redis Streams): задачи по исходу пачки
+jobs_processed_total = Counter(
+    'jobs_processed_total',
+    'Stream jobs by outcome',
+    ['queue_name', 'status']  # done, retried, dead
+)
+
 # БД метрики
 db_query_time = Histogram(
     'db_query_time_seconds',
@@ -46,19 +59,22 @@ db_query_time = Histogram(
 
 db_pool_active = Gauge(
     'db_pool_active',
-    'Active database connections'
+    'Active database connections',
+    multiprocess_mode='livesum'
 )
 
 # Бизнес метрики
 users_total = Gauge(
     'users_total',
     'Total users count',
-    ['country']
+    ['country'],
+    multiprocess_mode='max'
 )
 
 auctions_active = Gauge(
     'auctions_active',
-    'Active auctions count'
+    'Active auctions count',
+    multiprocess_mode='max'
 )
 
 purchases_daily = Counter(
@@ -72,3 +88,130 @@ referral_conversions = Counter(
     'Referral conversions',
     ['level']  # уровень реферального дерева
 )
+
+# Очередь входящих обновлений (fast-ack webhook)
+webhook_queue_depth = Gauge(
+    'webhook_queue_depth',
+    'Updates waiting in the in-process queue',
+    multiprocess_mode='livesum'
+)
+
+webhook_queue_wait_time = Histogram(
+    'webhook_queue_wait_seconds',
+    'Time an update spent in the queue before processing',
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+webhook_updates_dropped_total = Counter(
+    'webhook_updates_dropped_total',
+    'Updates dropped or rejected because the queue is full',
+    ['policy']
+)
+
+webhook_updates_filtered_total = Counter(
+    'webhook_updates_filtered_total',
+    'Updates dropped before building the Update model',
+    ['reason']
+)
+
+# Кэш (L1 - память процесса, L2 - Redis)
+cache_hits_total = Counter(
+    'cache_hits_total',
+    'Cache hits',
+    ['cache', 'tier']
+)
+
+cache_misses_total = Counter(
+    'cache_misses_total',
+    'Cache misses loaded from the source',
+    ['cache']
+)
+
+cache_evictions_total = Counter(
+    'cache_evictions_total',
+    'L1 cache evictions',
+    ['cache', 'reason']  # size, ttl, invalidate
+)
+
+# Покупки на аукционах
+auction_purchases_total = Counter(
+    'auction_purchases_total',
+    'Auction purchase attempts',
+    ['status']
+)
+
+auction_purchase_batch_size = Histogram(
+    'auction_purchase_batch_size',
+    'Purchases committed per database transaction',
+    buckets=(1, 5, 10, 25, 50, 100, 200, 500)
+)
+
+# Исходящие сообщения
+outbound_messages_total = Counter(
+    'outbound_messages_total',
+    'Outbound Bot API calls',
+    ['priority', 'status']  # status: ok, retry_after, error
+)
+
+outbound_send_duration = Histogram(
+    'outbound_send_duration_seconds',
+    'Bot API call latency',
+    ['method'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+outbound_queue_size = Gauge(
+    'outbound_queue_size',
+    'Outbound messages waiting to be sent',
+    multiprocess_mode='livesum'
+)
+
+broadcast_eta_seconds = Gauge(
+    'broadcast_eta_seconds',
+    'Estimated time to finish a broadcast',
+    ['broadcast'],
+    multiprocess_mode='livemax'  # пишет только процесс-владелец рассылки
+)
+
+# A/B тесты
+ab_events_total = Counter(
+    'ab_events_total',
+    'A/B exposure and conversion events',
+    ['kind', 'status']  # kind: exposure, conversion; status: flushed, dropped
+)
+
+# Анти-абьюз
+abuse_flags_total = Counter(
+    'abuse_flags_total',
+    'Users banned and referral codes frozen by the anti-abuse detector',
+    ['signal']  # callback_spam, referral_farming
+)
+
+# Стадии обработки обновления (см. bot/infra/metrics/instrumentation.py)
+update_stage_duration = Histogram(
+    'update_stage_duration_seconds',
+    'Time spent in each stage of update handling',
+    ['stage', 'handler'],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+# Event loop
+event_loop_lag = Histogram(
+    'event_loop_lag_seconds',
+    'Delay of a periodic event loop tick behind schedule',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+event_loop_blocked_total = Counter(
+    'event_loop_blocked_total',
+    'Times the event loop was blocked longer than SLOW_CALLBACK_THRESHOLD'
+)
+
+# Запуск воркера: секунды от старта процесса до этапа (import, dispatcher,
+# pools, ready, bind, first_update)
+worker_startup_seconds = Histogram(
+    'worker_startup_seconds',
+    'Worker startup time by stage',
+    ['stage'],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0, 60.0)
+)
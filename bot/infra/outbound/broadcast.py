@@ -0,0 +1,240 @@
+# bot/infra/outbound/broadcast.py
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from redis.exceptions import RedisError
+from bot.core.config import config
+from bot.infra.cache.redis_client import redis_client
+from bot.infra.database.models import User
+from bot.infra.metrics.prometheus import broadcast_eta_seconds
+from bot.infra.outbound.scheduler import Priority
+from bot.infra.outbound.sender import OutboundSender
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_KEY = "broadcast:{}"
+BROADCASTS_ACTIVE_KEY = "broadcasts:active"
+BROADCAST_OWNER_KEY = "broadcast:{}:owner"
+OWNER_TTL = 120  # секунд; продлевается фоновой задачей владельца
+OWNER_HEARTBEAT = OWNER_TTL / 4
+# Как часто подбирать рассылки, владелец которых пропал (ключ истёк)
+RESUME_INTERVAL = OWNER_TTL / 2
+
+# (после какого user_id, сколько) -> получатели по возрастанию user_id
+RecipientSource = Callable[[int, int], Awaitable[List[int]]]
+
+
+class Broadcaster:
+    """Массовая рассылка с сохранением прогресса в Redis
+
+    Получатели идут чанками по возрастанию user_id; после каждого чанка
+    курсор сохраняется, поэтому после рестарта рассылка продолжается с
+    места остановки (повторно может уйти только незавершённый чанк).
+    Рассылку упавшего воркера подхватывает другой, когда истечёт ключ
+    владельца (периодический resume_all, см. start).
+    """
+
+    def __init__(
+        self,
+        sender: OutboundSender,
+        session_factory: Optional[async_sessionmaker] = None,
+        recipients: Optional[RecipientSource] = None,
+        total: Optional[Callable[[], Awaitable[int]]] = None,
+        chunk_size: Optional[int] = None
+    ):
+        """
+        recipients / total: свой источник получателей (по умолчанию - таблица users)
+        """
+        self.sender = sender
+        self.session_factory = session_factory
+        self.recipients = recipients or self._db_recipients
+        self.total = total or self._db_total
+        self.chunk_size = chunk_size or config.BROADCAST_CHUNK_SIZE
+        self.resume_interval = RESUME_INTERVAL
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._watcher: Optional[asyncio.Task] = None
+
+    async def _db_recipients(self, after: int, limit: int) -> List[int]:
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(User.user_id)
+                .where(User.user_id > after, User.is_banned.is_(False))
+                .order_by(User.user_id)
+                .limit(limit)
+            )
+            return list(result.scalars())
+
+    async def _db_total(self) -> int:
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(func.count()).select_from(User).where(User.is_banned.is_(False))
+            )
+            return result.scalar_one()
+
+    async def create(self, text: str, **params: Any) -> str:
+        """Создать рассылку и запустить её. Возвращает id"""
+        broadcast_id = uuid.uuid4().hex[:12]
+        await redis_client.hset(BROADCAST_KEY.format(broadcast_id), mapping={
+            "payload": json.dumps({"text": text, **params}),
+            "cursor": 0,
+            "sent": 0,
+            "failed": 0,
+            "total": await self.total(),
+            "active_seconds": 0,
+            "status": "running",
+        })
+        await redis_client.sadd(BROADCASTS_ACTIVE_KEY, broadcast_id)
+        self._spawn(broadcast_id)
+        return broadcast_id
+
+    async def resume_all(self) -> List[str]:
+        """Продолжить рассылки, прерванные рестартом"""
+        resumed = []
+        for raw in await redis_client.smembers(BROADCASTS_ACTIVE_KEY):
+            broadcast_id = raw.decode()
+            if broadcast_id not in self._tasks:
+                self._spawn(broadcast_id)
+                resumed.append(broadcast_id)
+        return resumed
+
+    async def start(self) -> None:
+        """Периодически подбирать рассылки без владельца"""
+        if self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch(), name="broadcast-watcher")
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.resume_interval)
+            try:
+                await self.resume_all()
+            except RedisError as e:
+                logger.warning(f"Failed to check broadcasts: {e}")
+
+    async def cancel(self, broadcast_id: str) -> None:
+        await redis_client.hset(BROADCAST_KEY.format(broadcast_id), "status", "cancelled")
+        await redis_client.srem(BROADCASTS_ACTIVE_KEY, broadcast_id)
+        task = self._tasks.pop(broadcast_id, None)
+        if task is not None:
+            task.cancel()
+
+    async def stop(self) -> None:
+        """Остановить все рассылки процесса (прогресс остаётся в Redis)"""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+
+    def _spawn(self, broadcast_id: str) -> None:
+        task = asyncio.create_task(self._run(broadcast_id), name=f"broadcast-{broadcast_id}")
+        task.add_done_callback(lambda _: self._tasks.pop(broadcast_id, None))
+        self._tasks[broadcast_id] = task
+
+    async def _run(self, broadcast_id: str) -> None:
+        key = BROADCAST_KEY.format(broadcast_id)
+        state = await redis_client.hgetall(key)
+        if not state or state[b"status"] != b"running":
+            await redis_client.srem(BROADCASTS_ACTIVE_KEY, broadcast_id)
+            return
+
+        # Рассылку ведёт один процесс: остальные воркеры её пропускают и
+        # пробуют снова в следующий resume_all
+        owner_key = BROADCAST_OWNER_KEY.format(broadcast_id)
+        if not await redis_client.set(owner_key, 1, nx=True, ex=OWNER_TTL):
+            return
+
+        # Продление из отдельной задачи: долгий чанк (медленный Bot API,
+        # очередь планировщика) не отдаёт рассылку второму процессу
+        heartbeat = asyncio.create_task(self._heartbeat(owner_key), name=f"broadcast-owner-{broadcast_id}")
+        try:
+            await self._send_chunks(broadcast_id, state)
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+            await redis_client.delete(owner_key)
+            # Серия на рассылку - только пока она идёт в этом процессе
+            try:
+                broadcast_eta_seconds.remove(broadcast_id)
+            except KeyError:
+                pass
+
+    @staticmethod
+    async def _heartbeat(owner_key: str) -> None:
+        while True:
+            await asyncio.sleep(OWNER_HEARTBEAT)
+            try:
+                await redis_client.expire(owner_key, OWNER_TTL)
+            except RedisError as e:
+                logger.warning(f"Failed to extend {owner_key}: {e}")
+
+    async def _send_chunks(self, broadcast_id: str, state: Dict[bytes, bytes]) -> None:
+        key = BROADCAST_KEY.format(broadcast_id)
+        payload = json.loads(state[b"payload"])
+        cursor = int(state[b"cursor"])
+        logger.info(f"Broadcast {broadcast_id} running from user {cursor}")
+
+        while True:
+            chat_ids = await self.recipients(cursor, self.chunk_size)
+            if not chat_ids:
+                break
+
+            started = time.monotonic()
+            results = await asyncio.gather(
+                *(self.sender.submit(chat_id, "sendMessage", payload, Priority.BULK) for chat_id in chat_ids),
+                return_exceptions=True
+            )
+            failed = sum(1 for result in results if isinstance(result, Exception))
+            cursor = chat_ids[-1]
+
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.hset(key, "cursor", cursor)
+                pipe.hincrby(key, "sent", len(chat_ids) - failed)
+                pipe.hincrby(key, "failed", failed)
+                pipe.hincrbyfloat(key, "active_seconds", time.monotonic() - started)
+                await pipe.execute()
+
+            progress = await self.progress(broadcast_id)
+            if not progress:
+                # Состояние удалено из Redis - рассылку не продолжить
+                logger.warning(f"Broadcast {broadcast_id} state is gone, stopping")
+                await redis_client.srem(BROADCASTS_ACTIVE_KEY, broadcast_id)
+                return
+            broadcast_eta_seconds.labels(broadcast=broadcast_id).set(progress["eta_seconds"])
+            if progress["status"] != "running":
+                # Отменена из другого процесса
+                return
+
+        await redis_client.hset(key, "status", "done")
+        await redis_client.srem(BROADCASTS_ACTIVE_KEY, broadcast_id)
+        logger.info(f"Broadcast {broadcast_id} finished")
+
+    async def progress(self, broadcast_id: str) -> Dict[str, Any]:
+        """Прогресс рассылки: отправлено, ошибки, скорость и оценка времени"""
+        state = await redis_client.hgetall(BROADCAST_KEY.format(broadcast_id))
+        if not state:
+            return {}
+
+        sent = int(state[b"sent"])
+        failed = int(state[b"failed"])
+        total = int(state[b"total"])
+        active_seconds = float(state[b"active_seconds"])
+        processed = sent + failed
+        rate = processed / active_seconds if active_seconds else 0.0
+
+        return {
+            "status": state[b"status"].decode(),
+            "sent": sent,
+            "failed": failed,
+            "total": total,
+            "rate": rate,  # сообщений/сек
+            "eta_seconds": max(0, total - processed) / rate if rate else 0.0,
+        }
@@ -0,0 +1,182 @@
+# bot/infra/outbound/scheduler.py
+
+from typing import Any, Dict, List, Optional, Tuple
+from enum import IntEnum
+from redis.exceptions import RedisError
+from bot.core.config import config
+from bot.infra.cache.rate_limiter import RateLimiter
+from bot.infra.metrics.prometheus import outbound_queue_size
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Приоритет отправки: меньше - раньше"""
+    INTERACTIVE = 0  # ответы пользователю
+    NOTIFICATION = 1  # уведомления (бонусы и т.п.)
+    BULK = 2  # массовые рассылки
+
+
+class OutboundMessage:
+    """Запрос к Bot API в очереди отправки"""
+
+    __slots__ = ("chat_id", "method", "payload", "priority", "attempts", "future")
+
+    def __init__(self, chat_id: int, method: str, payload: Dict[str, Any], priority: Priority):
+        self.chat_id = chat_id
+        self.method = method
+        self.payload = payload
+        self.priority = priority
+        self.attempts = 0
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class GlobalTokens:
+    """Глобальный лимит бота, общий для всех процессов
+
+    Токены берутся из общего bucket в Redis пачками (lease), чтобы не
+    ходить в Redis на каждое сообщение.
+    """
+
+    def __init__(self, rate: int, lease: int = 5):
+        self.rate = rate
+        self.lease = min(lease, rate)
+        self.limiter = RateLimiter(rate, 1, policy="token_bucket", prefix="tg_send")
+        self._tokens = 0
+        self._lock = asyncio.Lock()
+
+    async def take(self) -> None:
+        """Дождаться одного токена"""
+        async with self._lock:
+            while self._tokens <= 0:
+                try:
+                    allowed, retry_after = await self.limiter.acquire("global", cost=self.lease)
+                except RedisError as e:
+                    # Без Redis - локальный темп, чтобы не превысить лимит в одиночку
+                    logger.warning(f"Global send limiter unavailable: {e}")
+                    await asyncio.sleep(self.lease / self.rate)
+                    allowed, retry_after = True, 0
+                if allowed:
+                    self._tokens = self.lease
+                else:
+                    await asyncio.sleep(retry_after)
+            self._tokens -= 1
+
+
+class SendScheduler:
+    """Планировщик отправки: приоритеты, глобальный лимит и лимиты чатов
+
+    Сообщение чата, у которого не истёк интервал, откладывается до его
+    окна и не блокирует сообщения других чатов.
+    """
+
+    def __init__(
+        self,
+        global_rate: int = 30,
+        chat_interval: float = 1.0,
+        group_interval: float = 3.0
+    ):
+        self.chat_interval = chat_interval
+        self.group_interval = group_interval
+        self.tokens = GlobalTokens(global_rate)
+
+        self._counter = itertools.count()
+        self._ready: List[Tuple[int, int, OutboundMessage]] = []  # (priority, seq, msg)
+        self._delayed: List[Tuple[float, int, OutboundMessage]] = []  # (ready_at, seq, msg)
+        self._chat_next: Dict[int, float] = {}  # чат -> когда можно следующее
+        self._bulk_paused_until = 0.0
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ready) + len(self._delayed)
+
+    def put(self, message: OutboundMessage, delay: float = 0) -> None:
+        """Поставить сообщение в очередь (с задержкой - для повторов)"""
+        if delay > 0:
+            heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._counter), message))
+        else:
+            heapq.heappush(self._ready, (message.priority, next(self._counter), message))
+        outbound_queue_size.set(len(self))
+        self._wakeup.set()
+
+    def pause_chat(self, chat_id: int, seconds: float) -> None:
+        """Не писать в чат seconds секунд (429 от Telegram)"""
+        self._chat_next[chat_id] = max(self._chat_next.get(chat_id, 0), time.monotonic() + seconds)
+
+    def pause_bulk(self, seconds: float) -> None:
+        """Приостановить массовые рассылки; интерактивные ответы идут дальше"""
+        self._bulk_paused_until = max(self._bulk_paused_until, time.monotonic() + seconds)
+
+    def _interval(self, chat_id: int) -> float:
+        return self.group_interval if chat_id < 0 else self.chat_interval
+
+    def _promote_delayed(self, now: float) -> None:
+        while self._delayed and self._delayed[0][0] <= now:
+            _, seq, message = heapq.heappop(self._delayed)
+            heapq.heappush(self._ready, (message.priority, seq, message))
+
+    def _next_wakeup(self, now: float) -> Optional[float]:
+        """Через сколько секунд может появиться готовое сообщение"""
+        candidates = []
+        if self._delayed:
+            candidates.append(self._delayed[0][0] - now)
+        if self._ready and self._bulk_paused_until > now:
+            candidates.append(self._bulk_paused_until - now)
+        return max(0.0, min(candidates)) if candidates else None
+
+    async def next(self) -> OutboundMessage:
+        """Следующее сообщение, которое можно отправить прямо сейчас"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._promote_delayed(now)
+                message = self._pop_sendable(now)
+                if message is not None:
+                    break
+
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self._next_wakeup(now))
+                except asyncio.TimeoutError:
+                    pass
+
+            await self.tokens.take()
+            self._chat_next[message.chat_id] = time.monotonic() + self._interval(message.chat_id)
+            if len(self._chat_next) > 100_000:
+                self._prune(time.monotonic())
+            outbound_queue_size.set(len(self))
+            return message
+
+    def _pop_sendable(self, now: float) -> Optional[OutboundMessage]:
+        bulk_paused = self._bulk_paused_until > now
+        while self._ready:
+            item = heapq.heappop(self._ready)
+            message = item[2]
+            if bulk_paused and message.priority == Priority.BULK:
+                # Дальше в куче только BULK - ждём конца паузы
+                heapq.heappush(self._ready, item)
+                return None
+            chat_ready_at = self._chat_next.get(message.chat_id, 0)
+            if chat_ready_at > now:
+                # Чат ещё в интервале - ждём его окна отдельно
+                heapq.heappush(self._delayed, (chat_ready_at, item[1], message))
+                continue
+            return message
+        return None
+
+    def _prune(self, now: float) -> None:
+        self._chat_next = {chat_id: t for chat_id, t in self._chat_next.items() if t > now}
+
+
+def create_scheduler() -> SendScheduler:
+    return SendScheduler(
+        global_rate=config.TELEGRAM_GLOBAL_RATE,
+        chat_interval=config.TELEGRAM_CHAT_INTERVAL,
+        group_interval=config.TELEGRAM_GROUP_INTERVAL
+    )
@@ -0,0 +1,178 @@
+# bot/infra/outbound/sender.py
+
+from typing import Any, Dict, List, Optional
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector
+from bot.core.config import config
+from bot.infra.outbound.scheduler import OutboundMessage, Priority, SendScheduler, create_scheduler
+from bot.infra.metrics.instrumentation import record
+from bot.infra.metrics.prometheus import outbound_messages_total, outbound_send_duration
+import asyncio
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+
+
+class TelegramAPIError(Exception):
+    """Ошибка Bot API"""
+
+    def __init__(self, error_code: int, description: str):
+        super().__init__(f"{error_code}: {description}")
+        self.error_code = error_code
+        self.description = description
+
+
+class RetryAfter(TelegramAPIError):
+    """429 Too Many Requests"""
+
+    def __init__(self, description: str, retry_after: float):
+        super().__init__(429, description)
+        self.retry_after = retry_after
+
+
+def _log_failure(future: asyncio.Future) -> None:
+    # Уведомления и рассылки не ждут результата - ошибка не должна теряться молча
+    # (debug: при рассылке заблокировавших бота тысячи)
+    if not future.cancelled() and future.exception() is not None:
+        logger.debug(f"Outbound message failed: {future.exception()}")
+
+
+class OutboundSender:
+    """Исходящие запросы к Bot API через общий планировщик
+
+    Одна пулированная aiohttp-сессия на процесс; все отправки проходят
+    через SendScheduler, который соблюдает глобальный лимит бота, лимиты
+    чатов и приоритеты (ответы пользователям раньше рассылок).
+    """
+
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        api_url: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        scheduler: Optional[SendScheduler] = None
+    ):
+        """
+        api_url: адрес Bot API (в тестах - локальная заглушка)
+        concurrency: одновременных запросов к Bot API
+        """
+        self.base_url = f"{(api_url or config.TELEGRAM_API_URL).rstrip('/')}/bot{token or config.BOT_TOKEN}"
+        self.concurrency = concurrency or config.OUTBOUND_CONCURRENCY
+        self._scheduler = scheduler
+        self.session: Optional[ClientSession] = None
+        self._workers: List[asyncio.Task] = []
+
+    @property
+    def scheduler(self) -> SendScheduler:
+        # Планировщик создаётся внутри работающего event loop
+        if self._scheduler is None:
+            self._scheduler = create_scheduler()
+        return self._scheduler
+
+    async def start(self) -> None:
+        if self.session is not None:
+            return
+        self.session = ClientSession(
+            connector=TCPConnector(limit=self.concurrency, keepalive_timeout=60),
+            timeout=ClientTimeout(total=30),
+            json_serialize=json.dumps
+        )
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"outbound-{i}")
+            for i in range(self.concurrency)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def call(self, method: str, payload: Dict[str, Any]) -> Any:
+        """Вызвать метод Bot API напрямую (без планировщика)"""
+        started = time.perf_counter()
+        try:
+            async with self.session.post(f"{self.base_url}/{method}", json=payload) as response:
+                body = await response.json(content_type=None)
+        finally:
+            elapsed = time.perf_counter() - started
+            outbound_send_duration.labels(method=method).observe(elapsed)
+            # Прямой вызов из обработчика (воркеры планировщика трассы не имеют)
+            record("bot_api", elapsed)
+
+        if body.get("ok"):
+            return body.get("result")
+
+        description = body.get("description", "")
+        retry_after = (body.get("parameters") or {}).get("retry_after")
+        if body.get("error_code") == 429 and retry_after is not None:
+            raise RetryAfter(description, retry_after)
+        raise TelegramAPIError(body.get("error_code", 0), description)
+
+    def submit(
+        self,
+        chat_id: int,
+        method: str,
+        payload: Dict[str, Any],
+        priority: Priority = Priority.INTERACTIVE
+    ) -> asyncio.Future:
+        """Поставить запрос в очередь; future завершится результатом Bot API"""
+        message = OutboundMessage(chat_id, method, {"chat_id": chat_id, **payload}, priority)
+        message.future.add_done_callback(_log_failure)
+        self.scheduler.put(message)
+        return message.future
+
+    async def send_message(
+        self,
+        chat_id: int,
+        text: str,
+        priority: Priority = Priority.INTERACTIVE,
+        **params: Any
+    ) -> Any:
+        """Отправить сообщение с соблюдением лимитов и дождаться результата"""
+        return await self.submit(chat_id, "sendMessage", {"text": text, **params}, priority)
+
+    async def _worker(self) -> None:
+        while True:
+            message = await self.scheduler.next()
+            if message.future.cancelled():
+                continue
+            await self._send(message)
+
+    async def _send(self, message: OutboundMessage) -> None:
+        message.attempts += 1
+        priority = message.priority.name.lower()
+
+        try:
+            result = await self.call(message.method, message.payload)
+        except RetryAfter as e:
+            outbound_messages_total.labels(priority=priority, status="retry_after").inc()
+            # Telegram не говорит, чей лимит исчерпан: притормаживаем чат и рассылки
+            self.scheduler.pause_chat(message.chat_id, e.retry_after)
+            self.scheduler.pause_bulk(e.retry_after)
+            self.scheduler.put(message)
+            return
+        except (ClientError, asyncio.TimeoutError, ValueError, TelegramAPIError) as e:
+            # 400/403 (чат не найден, бот заблокирован) повторять бессмысленно,
+            # сетевые ошибки и 5xx - с экспоненциальной задержкой
+            retryable = not isinstance(e, TelegramAPIError) or e.error_code >= 500
+            if retryable and message.attempts < MAX_ATTEMPTS:
+                self.scheduler.put(message, delay=2 ** message.attempts)
+                return
+            outbound_messages_total.labels(priority=priority, status="error").inc()
+            if not message.future.done():
+                message.future.set_exception(e)
+            return
+
+        outbound_messages_total.labels(priority=priority, status="ok").inc()
+        if not message.future.done():
+            message.future.set_result(result)
+
+
+outbound_sender = OutboundSender()
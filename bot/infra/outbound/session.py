@@ -0,0 +1,69 @@
+# bot/infra/outbound/session.py
+
+from typing import Any, Dict, Optional, cast
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.exceptions import TelegramNetworkError
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiohttp import ClientError, ClientSession
+from bot.infra.outbound.scheduler import Priority
+from bot.infra.outbound.sender import OutboundSender, TelegramAPIError, outbound_sender
+import asyncio
+import json
+
+
+class ScheduledSession(AiohttpSession):
+    """Сессия aiogram поверх OutboundSender
+
+    Запросы обработчиков в чат (answer, edit_text, ...) идут через общий
+    планировщик с приоритетом INTERACTIVE, то есть под те же лимиты бота
+    и чатов, что уведомления и рассылки. Запросы без chat_id
+    (answerCallbackQuery, setWebhook, inline-сообщения) и загрузки файлов
+    уходят сразу, но через ту же пулированную сессию отправителя. Пока
+    отправитель не запущен - обычная сессия aiogram.
+    """
+
+    def __init__(self, sender: OutboundSender = outbound_sender, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.sender = sender
+
+    async def create_session(self) -> ClientSession:
+        if self.sender.session is not None and not self.sender.session.closed:
+            return self.sender.session
+        return await super().create_session()
+
+    def build_payload(self, bot: Bot, method: TelegramMethod[TelegramType]) -> Optional[Dict[str, Any]]:
+        """JSON-тело запроса; None - есть файлы (нужен multipart)"""
+        files: Dict[str, Any] = {}
+        payload = {}
+        for key, value in method.model_dump(warnings=False).items():
+            value = self.prepare_value(value, bot=bot, files=files, _dumps_json=False)
+            if value is not None:
+                payload[key] = value
+        return None if files else payload
+
+    async def make_request(
+        self,
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+        timeout: Optional[int] = None
+    ) -> TelegramType:
+        payload = self.build_payload(bot, method) if self.sender.session is not None else None
+        chat_id = payload.get("chat_id") if payload is not None else None
+        if not isinstance(chat_id, int):
+            return await super().make_request(bot, method, timeout)
+
+        try:
+            result = await self.sender.submit(chat_id, method.__api_method__, payload, Priority.INTERACTIVE)
+        except TelegramAPIError as e:
+            # Исключение aiogram по коду ответа (TelegramBadRequest и т.д.)
+            content = json.dumps({"ok": False, "error_code": e.error_code, "description": e.description})
+            self.check_response(bot=bot, method=method, status_code=e.error_code, content=content)
+            raise
+        except (ClientError, asyncio.TimeoutError, ValueError) as e:
+            raise TelegramNetworkError(method=method, message=f"{type(e).__name__}: {e}")
+        response = self.check_response(
+            bot=bot, method=method, status_code=200, content=json.dumps({"ok": True, "result": result})
+        )
+        return cast(TelegramType, response.result)
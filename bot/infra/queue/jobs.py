@@ -0,0 +1,16 @@
+# bot/infra/queue/jobs.py
+#
+# Задачи RQ - синхронные функции; асинхронный код запускается в своём
+# event loop на время задачи.
+
+from typing import Any, Dict
+import asyncio
+
+STATS_QUEUE = "stats"
+
+def recalculate_stats_shard(
+    shard: int, shards: int, incremental: bool = False, chunk_size: int = 1000
+) -> Dict[str, Any]:
+    """Пересчёт статистики одного шарда пользователей (user_id % shards == shard)"""
+    from bot.scripts.recalculate_stats import run_shard
+    return asyncio.run(run_shard(shard, shards, incremental=incremental, chunk_size=chunk_size))
@@ -0,0 +1,24 @@
+# bot/infra/queue/rq_client.py
+
+from typing import Optional
+from redis import Redis
+from rq import Queue
+from bot.core.config import config
+
+# RQ работает с синхронным клиентом (отдельно от redis.asyncio бота)
+_connection: Optional[Redis] = None
+
+def get_connection() -> Redis:
+    global _connection
+    if _connection is None:
+        _connection = Redis.from_url(config.RQ_REDIS_URL or config.REDIS_URL)
+    return _connection
+
+def get_queue(name: str = "default") -> Queue:
+    """Очередь RQ с таймаутами из конфига"""
+    return Queue(
+        name,
+        connection=get_connection(),
+        default_timeout=config.RQ_JOB_TIMEOUT,
+        result_ttl=config.RQ_RESULT_TTL
+    )
@@ -0,0 +1,377 @@
+# bot/infra/queue/streams.py
+#
+# Асинхронная очередь задач на Redis Streams - рядом с RQ, а не вместо:
+# RQ остаётся для долгих синхронных задач (пересчёт статистики), здесь -
+# много мелких асинхронных (уведомления, запись событий), которые один
+# процесс выполняет одновременно и пачками.
+
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from redis.exceptions import RedisError, ResponseError
+from bot.core.config import config
+from bot.infra.cache.redis_client import LuaScript, redis_client
+from bot.infra.metrics.prometheus import jobs_processed_total, queue_processing_time, queue_size
+import asyncio
+import logging
+import orjson
+import os
+import random
+import socket
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+STREAM_PREFIX = "jobs:stream:"  # + тип задачи
+DELAYED_KEY = "jobs:delayed"  # ZSET: задача -> время запуска, мс
+DEAD_KEY = "jobs:dead"  # задачи, исчерпавшие попытки
+GROUP = "workers"
+
+# Перенести наступившие отложенные задачи в потоки своих типов
+# KEYS: delayed; ARGV: сейчас (мс), сколько, префикс потока
+PROMOTE_SCRIPT = LuaScript("""
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(due) do
+    local job = cjson.decode(member)
+    redis.call('XADD', ARGV[3] .. job.type, '*',
+        'payload', job.payload, 'attempts', job.attempts, 'enqueued', job.enqueued)
+    redis.call('ZREM', KEYS[1], member)
+end
+return #due
+""")
+
+
+class Job:
+    """Задача из потока: payload - то, что передали в enqueue"""
+
+    __slots__ = ("id", "type", "payload", "attempts", "enqueued", "error")
+
+    def __init__(self, job_id: str, job_type: str, payload: Any, attempts: int, enqueued: int):
+        self.id = job_id
+        self.type = job_type
+        self.payload = payload
+        self.attempts = attempts  # неудачных попыток до этой
+        self.enqueued = enqueued  # мс, время первой постановки
+        self.error: Optional[str] = None
+
+    @classmethod
+    def from_entry(cls, job_type: str, entry_id: bytes, fields: Dict[bytes, bytes]) -> "Job":
+        return cls(
+            entry_id.decode(),
+            job_type,
+            orjson.loads(fields[b"payload"]),
+            int(fields.get(b"attempts", 0)),
+            int(fields.get(b"enqueued", 0))
+        )
+
+
+# Обработчик получает пачку задач одного типа; возвращает задачи, которые
+# нужно повторить (None - все выполнены). Исключение - повторить всю пачку.
+JobHandler = Callable[[List[Job]], Awaitable[Optional[Iterable[Job]]]]
+
+
+class HandlerSpec:
+    __slots__ = ("func", "batch_size", "max_attempts", "timeout")
+
+    def __init__(self, func: JobHandler, batch_size: int, max_attempts: int, timeout: float):
+        self.func = func
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+
+
+def stream_key(job_type: str) -> str:
+    return f"{STREAM_PREFIX}{job_type}"
+
+
+def retry_delay(attempts: int) -> float:
+    """Пауза перед повтором: экспонента от числа попыток с разбросом в половину"""
+    delay = min(config.JOBS_RETRY_MAX, config.JOBS_RETRY_BASE * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class JobQueue:
+    """Очередь задач на Redis Streams с группой потребителей
+
+    Поток на тип задачи; воркеры - потребители одной группы, каждая задача
+    достаётся одному из них. Воркер читает все свои типы одним XREADGROUP
+    и отдаёт обработчику пачку задач одного типа; пачек в работе
+    одновременно - до JOBS_CONCURRENCY. Выполненные задачи подтверждаются
+    и удаляются из потока, поэтому длина потока - глубина очереди.
+
+    Упавшая пачка повторяется через отложенные задачи (ZSET со временем
+    запуска) с экспоненциальной паузой; после max_attempts задача уходит
+    в поток мёртвых задач. Задачи упавшего воркера забирает другой
+    (XAUTOCLAIM), когда они пролежали без подтверждения JOBS_CLAIM_IDLE.
+    """
+
+    def __init__(self, consumer: Optional[str] = None):
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.handlers: Dict[str, HandlerSpec] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._batches: set = set()
+        self._tasks: List[asyncio.Task] = []
+        self._closing = False
+
+    # Постановка задач (любой процесс, обработчик не нужен)
+
+    async def enqueue(self, job_type: str, payload: Any, delay: float = 0.0) -> None:
+        await self.enqueue_many(job_type, [payload], delay)
+
+    async def enqueue_many(self, job_type: str, payloads: Sequence[Any], delay: float = 0.0) -> None:
+        """Поставить задачи одним pipeline; delay - секунд до запуска"""
+        if not payloads:
+            return
+        enqueued = _now_ms()
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for payload in payloads:
+                self._put(pipe, job_type, orjson.dumps(payload), 0, enqueued, delay)
+            await pipe.execute()
+
+    @staticmethod
+    def _put(pipe, job_type: str, payload: bytes, attempts: int, enqueued: int, delay: float) -> None:
+        if delay <= 0:
+            pipe.xadd(stream_key(job_type), {"payload": payload, "attempts": attempts, "enqueued": enqueued})
+            return
+        member = orjson.dumps({
+            "id": uuid.uuid4().hex,  # одинаковые задачи - разные элементы ZSET
+            "type": job_type,
+            "payload": payload.decode(),
+            "attempts": attempts,
+            "enqueued": enqueued,
+        })
+        pipe.zadd(DELAYED_KEY, {member: _now_ms() + int(delay * 1000)})
+
+    # Регистрация обработчиков
+
+    def handler(
+        self,
+        job_type: str,
+        batch_size: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> Callable[[JobHandler], JobHandler]:
+        """Декоратор обработчика пачек задач типа job_type"""
+        def register(func: JobHandler) -> JobHandler:
+            self.handlers[job_type] = HandlerSpec(
+                func,
+                batch_size or config.JOBS_BATCH_SIZE,
+                max_attempts or config.JOBS_MAX_ATTEMPTS,
+                timeout or config.JOBS_TIMEOUT
+            )
+            return func
+        return register
+
+    # Выполнение
+
+    async def start(self) -> None:
+        if self._tasks or not self.handlers:
+            return
+        self._closing = False
+        self._slots = asyncio.Semaphore(config.JOBS_CONCURRENCY)
+        for job_type in self.handlers:
+            try:
+                await redis_client.xgroup_create(stream_key(job_type), GROUP, id="0", mkstream=True)
+            except ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+        self._tasks = [
+            asyncio.create_task(self._consume(), name="jobs-consume"),
+            asyncio.create_task(self._maintain(), name="jobs-maintain"),
+        ]
+        logger.info(f"Job consumer {self.consumer}: {', '.join(self.handlers)}")
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """Перестать читать и дождаться начатых пачек
+
+        Не успевшие за timeout остаются неподтверждёнными - их заберёт
+        другой воркер после JOBS_CLAIM_IDLE.
+        """
+        if not self._tasks:
+            return
+        self._closing = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._batches:
+            done, pending = await asyncio.wait(self._batches, timeout=timeout or config.JOBS_STOP_TIMEOUT)
+            for task in pending:
+                task.cancel()
+            if pending:
+                logger.warning(f"Job consumer stopped with {len(pending)} unfinished batches")
+
+    async def _consume(self) -> None:
+        streams = {stream_key(job_type): ">" for job_type in self.handlers}
+        count = max(spec.batch_size for spec in self.handlers.values())
+        while not self._closing:
+            # Читаем, только когда есть свободный слот
+            await self._slots.acquire()
+            self._slots.release()
+            try:
+                response = await redis_client.xreadgroup(
+                    GROUP, self.consumer, streams, count=count, block=config.JOBS_BLOCK_MS
+                )
+            except RedisError as e:
+                logger.warning(f"Failed to read jobs: {e}")
+                await asyncio.sleep(1)
+                continue
+            for stream, entries in response or ():
+                await self._dispatch(stream.decode()[len(STREAM_PREFIX):], entries)
+
+    async def _dispatch(
+        self, job_type: str, entries: List[Tuple[bytes, Optional[Dict[bytes, bytes]]]], claimed: bool = False
+    ) -> None:
+        """Разбить на пачки по batch_size и запустить, каждую в своём слоте"""
+        spec = self.handlers[job_type]
+        jobs: List[Job] = []
+        broken: List[str] = []
+        for entry_id, fields in entries:
+            if not fields or b"payload" not in fields:
+                # Удалена из потока, пока числилась за упавшим воркером
+                broken.append(entry_id.decode())
+                continue
+            job = Job.from_entry(job_type, entry_id, fields)
+            if claimed:
+                # Прошлая доставка не завершилась (воркер упал или завис)
+                job.attempts += 1
+                job.error = "claimed after worker timeout"
+            jobs.append(job)
+        if broken:
+            await self._ack(job_type, broken)
+
+        for i in range(0, len(jobs), spec.batch_size):
+            await self._slots.acquire()
+            task = asyncio.create_task(self._process(job_type, spec, jobs[i:i + spec.batch_size]))
+            self._batches.add(task)
+            task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, task: asyncio.Task) -> None:
+        self._batches.discard(task)
+        self._slots.release()
+
+    async def _process(self, job_type: str, spec: HandlerSpec, jobs: List[Job]) -> None:
+        exhausted = [job for job in jobs if job.attempts >= spec.max_attempts]
+        runnable = [job for job in jobs if job.attempts < spec.max_attempts]
+        failed: List[Job] = []
+        started = time.perf_counter()
+        if runnable:
+            try:
+                result = await asyncio.wait_for(spec.func(runnable), spec.timeout)
+                failed = list(result or ())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Job batch {job_type} ({len(runnable)}) failed: {e!r}")
+                for job in runnable:
+                    job.error = repr(e)
+                failed = runnable
+            queue_processing_time.labels(queue_name=job_type).observe(time.perf_counter() - started)
+
+        try:
+            await self._finish(job_type, jobs, failed + exhausted, spec.max_attempts)
+        except RedisError as e:
+            # Без подтверждения пачку повторно выполнит XAUTOCLAIM
+            logger.warning(f"Failed to acknowledge {len(jobs)} {job_type} jobs: {e}")
+
+    async def _finish(self, job_type: str, jobs: List[Job], failed: List[Job], max_attempts: int) -> None:
+        """Подтвердить пачку и разложить неудачные: повтор или мёртвые - атомарно"""
+        retried = dead = 0
+        async with redis_client.pipeline(transaction=True) as pipe:
+            for job in failed:
+                attempts = job.attempts + 1 if job.attempts < max_attempts else job.attempts
+                payload = orjson.dumps(job.payload)
+                if attempts < max_attempts:
+                    self._put(pipe, job_type, payload, attempts, job.enqueued, retry_delay(attempts))
+                    retried += 1
+                else:
+                    pipe.xadd(DEAD_KEY, {
+                        "type": job_type,
+                        "payload": payload,
+                        "attempts": attempts,
+                        "enqueued": job.enqueued,
+                        "failed": _now_ms(),
+                        "error": (job.error or "")[:1000],
+                    }, maxlen=config.JOBS_DEAD_MAXLEN, approximate=True)
+                    dead += 1
+            ids = [job.id for job in jobs]
+            pipe.xack(stream_key(job_type), GROUP, *ids)
+            pipe.xdel(stream_key(job_type), *ids)
+            await pipe.execute()
+
+        if dead:
+            logger.error(f"{dead} {job_type} jobs moved to {DEAD_KEY} after {max_attempts} attempts")
+        done = len(jobs) - retried - dead
+        for status, count in (("done", done), ("retried", retried), ("dead", dead)):
+            if count:
+                jobs_processed_total.labels(queue_name=job_type, status=status).inc(count)
+
+    async def _ack(self, job_type: str, ids: List[str]) -> None:
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.xack(stream_key(job_type), GROUP, *ids)
+            pipe.xdel(stream_key(job_type), *ids)
+            await pipe.execute()
+
+    async def _maintain(self) -> None:
+        """Отложенные задачи, задачи упавших воркеров и глубина очередей"""
+        last_claim = 0.0
+        while not self._closing:
+            try:
+                while await PROMOTE_SCRIPT([DELAYED_KEY], [_now_ms(), 1000, STREAM_PREFIX]) == 1000:
+                    pass
+                if time.monotonic() - last_claim >= config.JOBS_CLAIM_IDLE / 1000 / 2:
+                    last_claim = time.monotonic()
+                    await self._claim()
+                await self._report()
+            except RedisError as e:
+                logger.warning(f"Job queue maintenance failed: {e}")
+            await asyncio.sleep(config.JOBS_POLL_INTERVAL)
+
+    async def _claim(self) -> None:
+        for job_type, spec in self.handlers.items():
+            start = "0-0"
+            while True:
+                response = await redis_client.xautoclaim(
+                    stream_key(job_type), GROUP, self.consumer,
+                    min_idle_time=config.JOBS_CLAIM_IDLE, start_id=start, count=spec.batch_size
+                )
+                start, entries = response[0], response[1]
+                if entries:
+                    logger.warning(f"Claimed {len(entries)} stalled {job_type} jobs")
+                    await self._dispatch(job_type, entries, claimed=True)
+                if start in (b"0-0", "0-0"):
+                    break
+
+    async def _report(self) -> None:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for job_type in self.handlers:
+                pipe.xlen(stream_key(job_type))
+            pipe.zcard(DELAYED_KEY)
+            pipe.xlen(DEAD_KEY)
+            sizes = await pipe.execute()
+        for name, size in zip([*self.handlers, "delayed", "dead"], sizes):
+            queue_size.labels(queue_name=f"jobs:{name}").set(size)
+
+    # Мёртвые задачи
+
+    async def requeue_dead(self, limit: int = 1000) -> int:
+        """Вернуть мёртвые задачи в их потоки с нулём попыток (после исправления)"""
+        entries = await redis_client.xrange(DEAD_KEY, count=limit)
+        if not entries:
+            return 0
+        async with redis_client.pipeline(transaction=True) as pipe:
+            for entry_id, fields in entries:
+                pipe.xadd(stream_key(fields[b"type"].decode()), {
+                    "payload": fields[b"payload"],
+                    "attempts": 0,
+                    "enqueued": fields.get(b"enqueued", 0),
+                })
+                pipe.xdel(DEAD_KEY, entry_id)
+            await pipe.execute()
+        return len(entries)
+
+
+job_queue = JobQueue()
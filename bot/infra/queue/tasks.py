@@ -0,0 +1,152 @@
+# bot/infra/queue/tasks.py
+#
+# Обработчики асинхронной очереди (streams.py); задачи RQ - в jobs.py.
+# Обработчик получает пачку задач одного типа и возвращает те, что нужно
+# повторить.
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from bot.infra.database.engine import database
+from bot.infra.database.models import ABTestExposure
+from bot.infra.outbound.scheduler import Priority
+from bot.infra.outbound.sender import TelegramAPIError, outbound_sender
+from bot.infra.queue.streams import Job, job_queue
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+NOTIFY = "notify"
+AB_EXPOSURE = "ab_exposure"
+AB_CONVERSION = "ab_conversion"
+
+# (test_id, user_id)
+EventKey = Tuple[str, int]
+
+# Ошибки Bot API, которые не пройдут и при повторе (бот заблокирован,
+# чат удалён, неверный запрос)
+PERMANENT_ERRORS = (400, 403)
+
+
+async def notify(chat_id: int, text: str, delay: float = 0.0, **params: Any) -> None:
+    """Уведомление пользователю через очередь (бонусы и т.п.)"""
+    await job_queue.enqueue(NOTIFY, {"chat_id": chat_id, "text": text, **params}, delay)
+
+
+async def log_exposure(test_id: str, user_id: int, variant: str) -> None:
+    await log_exposures([((test_id, user_id), variant)])
+
+
+async def log_exposures(events: Iterable[Tuple[EventKey, str]]) -> None:
+    """Воздействия A/B пачкой - один round trip (ExposureBuffer)"""
+    await job_queue.enqueue_many(AB_EXPOSURE, [
+        {"test_id": test_id, "user_id": user_id, "variant": variant}
+        for (test_id, user_id), variant in events
+    ])
+
+
+async def log_conversions(events: Iterable[Tuple[EventKey, Tuple[str, Optional[float]]]]) -> None:
+    await job_queue.enqueue_many(AB_CONVERSION, [
+        {"test_id": test_id, "user_id": user_id, "variant": variant, "value": value}
+        for (test_id, user_id), (variant, value) in events
+    ])
+
+
+def exposure_statement(chunk: List[Tuple[EventKey, str]]):
+    """Многострочный INSERT воздействий; уже записанные пропускаются"""
+    return (
+        insert(ABTestExposure)
+        .values([
+            {"test_id": test_id, "user_id": user_id, "variant": variant}
+            for (test_id, user_id), variant in chunk
+        ])
+        .on_conflict_do_nothing(index_elements=["test_id", "user_id"])
+    )
+
+
+def conversion_statement(chunk: List[Tuple[EventKey, Tuple[str, Optional[float]]]]):
+    statement = insert(ABTestExposure).values([
+        {
+            "test_id": test_id,
+            "user_id": user_id,
+            "variant": variant,
+            "converted": True,
+            "conversion_value": value,
+        }
+        for (test_id, user_id), (variant, value) in chunk
+    ])
+    # Конверсия без записанного воздействия создаёт строку; значение
+    # суммируется с уже записанным (NULL + x = x)
+    return statement.on_conflict_do_update(
+        index_elements=["test_id", "user_id"],
+        set_={
+            "converted": True,
+            "conversion_value": func.coalesce(
+                ABTestExposure.conversion_value + statement.excluded.conversion_value,
+                ABTestExposure.conversion_value,
+                statement.excluded.conversion_value
+            ),
+        }
+    )
+
+
+def merge_conversion(
+    older: Tuple[str, Optional[float]],
+    newer: Tuple[str, Optional[float]]
+) -> Tuple[str, Optional[float]]:
+    if older[1] is None:
+        return newer
+    return newer[0], older[1] + (newer[1] or 0)
+
+
+@job_queue.handler(NOTIFY, batch_size=200)
+async def send_notifications(jobs: List[Job]) -> List[Job]:
+    """Вся пачка - в планировщик отправки сразу; он соблюдает лимиты Bot API"""
+    futures = [
+        outbound_sender.submit(job.payload["chat_id"], "sendMessage", job.payload, Priority.NOTIFICATION)
+        for job in jobs
+    ]
+    failed = []
+    for job, result in zip(jobs, await asyncio.gather(*futures, return_exceptions=True)):
+        if not isinstance(result, Exception):
+            continue
+        if isinstance(result, TelegramAPIError) and result.error_code in PERMANENT_ERRORS:
+            logger.debug(f"Dropping notification to {job.payload['chat_id']}: {result}")
+            continue
+        job.error = repr(result)
+        failed.append(job)
+    return failed
+
+
+@job_queue.handler(AB_EXPOSURE, batch_size=1000)
+async def write_exposures(jobs: List[Job]) -> Optional[List[Job]]:
+    """Одна вставка на пачку; повторы одного пользователя схлопываются"""
+    chunk: Dict[EventKey, str] = {}
+    for job in jobs:
+        chunk.setdefault((job.payload["test_id"], job.payload["user_id"]), job.payload["variant"])
+    await _write_ab_events(exposure_statement(list(chunk.items())), "exposures", len(chunk))
+    return None
+
+
+@job_queue.handler(AB_CONVERSION, batch_size=1000)
+async def write_conversions(jobs: List[Job]) -> Optional[List[Job]]:
+    """Одна вставка на пачку; конверсии одного пользователя суммируются"""
+    chunk: Dict[EventKey, Tuple[str, Optional[float]]] = {}
+    for job in jobs:
+        key = (job.payload["test_id"], job.payload["user_id"])
+        event = (job.payload["variant"], job.payload["value"])
+        chunk[key] = merge_conversion(chunk[key], event) if key in chunk else event
+    await _write_ab_events(conversion_statement(list(chunk.items())), "conversions", len(chunk))
+    return None
+
+
+async def _write_ab_events(statement, kind: str, count: int) -> None:
+    try:
+        async with database.session_factory() as session:
+            async with session.begin():
+                await session.execute(statement)
+    except IntegrityError as e:
+        # Ошибка данных (удалённый эксперимент) не пройдёт и при повторе
+        logger.error(f"Dropping {count} A/B {kind}: {e}")
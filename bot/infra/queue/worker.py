@@ -0,0 +1,75 @@
+# bot/infra/queue/worker.py
+"""
+Процесс-обработчик асинхронной очереди задач (Redis Streams). Процессов
+может быть сколько угодно - они делят задачи через группу потребителей.
+
+    python -m bot.infra.queue.worker
+    python -m bot.infra.queue.worker --requeue-dead 1000   # вернуть мёртвые задачи
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+from bot.core.config import config
+
+logger = logging.getLogger(__name__)
+
+
+async def run(metrics_port: int) -> None:
+    # Импорт здесь: метрики процесса - в памяти, не в файлах супервизора
+    from aiohttp import web
+    from bot.infra.cache.redis_client import redis_client
+    from bot.infra.database.engine import database
+    from bot.infra.metrics.exporter import create_metrics_app
+    from bot.infra.outbound.sender import outbound_sender
+    from bot.infra.queue.streams import job_queue
+    import bot.infra.queue.tasks  # noqa: F401 - регистрирует обработчики
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    metrics_runner = web.AppRunner(create_metrics_app())
+    await metrics_runner.setup()
+    await web.TCPSite(metrics_runner, config.WEB_HOST, metrics_port).start()
+
+    await outbound_sender.start()
+    await job_queue.start()
+    await stop.wait()
+
+    logger.info(f"Job worker {os.getpid()} stopping")
+    await job_queue.stop()
+    await outbound_sender.stop()
+    await metrics_runner.cleanup()
+    await database.dispose()
+    await redis_client.aclose()
+
+
+async def requeue_dead(limit: int) -> None:
+    from bot.infra.cache.redis_client import redis_client
+    from bot.infra.queue.streams import job_queue
+
+    try:
+        print(f"Requeued {await job_queue.requeue_dead(limit)} dead jobs")
+    finally:
+        await redis_client.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ZAVOD EMPIRE BOT - job worker")
+    parser.add_argument("--metrics-port", type=int, default=config.JOBS_METRICS_PORT)
+    parser.add_argument("--requeue-dead", type=int, metavar="N", help="вернуть до N мёртвых задач и выйти")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=config.LOG_LEVEL)
+    os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    if args.requeue_dead:
+        asyncio.run(requeue_dead(args.requeue_dead))
+    else:
+        asyncio.run(run(args.metrics_port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# bot/infra/webhook/envelope.py
+
+from typing import Any, Dict, Optional
+from aiogram import Bot
+from aiogram.types import Update
+import orjson
+
+
+class UpdateEnvelope:
+    """Обновление до валидации: поля маршрутизации и исходный dict
+
+    Тело вебхука разбирается orjson один раз; для предзагрузки контекста,
+    фильтров (бан, повтор update_id) и упорядочивания в очереди хватает
+    update_id, вида обновления, отправителя и чата. Модель Update (полная
+    валидация pydantic) строится только для обновлений, которые дойдут до
+    диспетчера, и сразу с привязкой к боту - без повторной валидации
+    внутри Dispatcher.feed_update.
+    """
+
+    __slots__ = ("update_id", "kind", "user_id", "chat_id", "language_code", "data", "_update")
+
+    def __init__(
+        self,
+        update_id: int,
+        kind: Optional[str],
+        user_id: Optional[int] = None,
+        chat_id: Optional[int] = None,
+        language_code: Optional[str] = None,
+        data: Optional[Dict[str, Any]] = None,
+        update: Optional[Update] = None
+    ):
+        self.update_id = update_id
+        self.kind = kind
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.language_code = language_code
+        self.data = data
+        self._update = update
+
+    @classmethod
+    def parse(cls, body: bytes) -> "UpdateEnvelope":
+        """Разобрать тело вебхука; ValueError - не JSON-объект"""
+        data = orjson.loads(body)
+        if not isinstance(data, dict):
+            raise ValueError("Update payload must be a JSON object")
+        return cls.from_dict(data)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "UpdateEnvelope":
+        kind = event = None
+        for field, value in data.items():
+            if field != "update_id" and isinstance(value, dict):
+                kind, event = field, value
+                break
+
+        user = chat = None
+        if event is not None:
+            user = event.get("from") or event.get("user")
+            chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        return cls(
+            data.get("update_id", 0),
+            kind,
+            user["id"] if user else None,
+            chat["id"] if chat else None,
+            user.get("language_code") if user else None,
+            data
+        )
+
+    @classmethod
+    def from_update(cls, update: Update) -> "UpdateEnvelope":
+        """Конверт для уже построенного Update (polling, бенчмарки)"""
+        event = update.event
+        user = getattr(event, "from_user", None)
+        chat = getattr(event, "chat", None)
+        if chat is None and getattr(event, "message", None) is not None:
+            chat = event.message.chat
+        return cls(
+            update.update_id,
+            update.event_type,
+            user.id if user else None,
+            chat.id if chat else None,
+            user.language_code if user else None,
+            update=update
+        )
+
+    @property
+    def ordering_key(self) -> int:
+        """Ключ упорядочивания: чат, затем пользователь, иначе само обновление"""
+        if self.chat_id is not None:
+            return self.chat_id
+        if self.user_id is not None:
+            return self.user_id
+        return self.update_id
+
+    @property
+    def is_message(self) -> bool:
+        return self.kind == "message"
+
+    def update(self, bot: Bot) -> Update:
+        """Модель Update, привязанная к боту (строится один раз)"""
+        if self._update is None:
+            self._update = Update.model_validate(self.data, context={"bot": bot})
+        return self._update
@@ -2,24 +2,60 @@
 
 from aiohttp import web
 from aiogram import Bot, Dispatcher
-from aiogram.types import Update
+from aiogram.client.telegram import TelegramAPIServer
 from bot.core.config import config
 from bot.infra.webhook.validator import validate_webhook_signature
+from bot.infra.webhook.envelope import UpdateEnvelope
+from bot.infra.webhook.startup import WorkerStartup
+from bot.infra.webhook.update_queue import UpdateQueue
+from bot.infra.metrics.instrumentation import BotApiTimingMiddleware, current_trace, new_trace, stage
+from bot.infra.metrics.profiler import LoopMonitor, profiler
+from bot.infra.metrics.prometheus import webhook_request_duration, webhook_requests_total, webhook_updates_dropped_total
+from bot.infra.cache.auction_feed import auction_feed_index
+from bot.infra.cache.counters import hot_counters
+from bot.infra.cache.leaderboard import leaderboards
+from bot.infra.cache.redis_client import warm_up_redis
+from bot.infra.cache.two_tier import invalidator
+from bot.infra.database.engine import database
+from bot.infra.outbound.broadcast import Broadcaster
+from bot.infra.outbound.sender import outbound_sender
+from bot.infra.outbound.session import ScheduledSession
+from typing import Optional
+import asyncio
 import logging
-import json
+import os
+import time
 
 logger = logging.getLogger(__name__)
 
 class WebhookHandler:
     """Обработчик вебхука Telegram"""
     
-    def __init__(self, bot: Bot, dp: Dispatcher):
+    def __init__(self, bot: Bot, dp: Dispatcher, queue: Optional[UpdateQueue] = None):
+        """
+        queue: очередь для fast-ack режима; без неё обновление
+               обрабатывается до ответа Telegram
+        """
         self.bot = bot
         self.dp = dp
+        self.queue = queue
+        self.context_loader = dp["context_loader"]
+        self._duration = webhook_request_duration.labels(endpoint="webhook")
     
     async def handle_update(self, request: web.Request) -> web.Response:
         """Обработать входящее обновление от Telegram"""
-        
+        started = time.perf_counter()
+        trace = new_trace()
+        token = current_trace.set(trace)
+        try:
+            response = await self._handle_update(request)
+        finally:
+            current_trace.reset(token)
+        self._duration.observe(time.perf_counter() - started)
+        webhook_requests_total.labels(method=request.method, endpoint="webhook", status=str(response.status)).inc()
+        return response
+    
+    async def _handle_update(self, request: web.Request) -> web.Response:
         try:
             # Валидируем подпись (если включена)
             if config.WEBHOOK_SECRET:
@@ -29,44 +65,184 @@ class WebhookHandler:
                     return web.Response(status=401, text="Unauthorized")
             
             # Читаем тело запроса
-            data = await request.json()
+            body = await request.read()
+            try:
+                # Модель Update строится позже и только если обновление не отброшено
+                with stage("decode"):
+                    envelope = UpdateEnvelope.parse(body)
+            except ValueError as e:
+                logger.warning(f"Malformed update payload: {e}")
+                return web.Response(status=400, text="Bad Request")
             
             # Логируем входящее событие
-            logger.debug(f"Received update: {data.get('update_id')}")
+            logger.debug(f"Received update: {envelope.update_id}")
             
-            # Конвертируем в Update объект
-            update = Update(**data)
+            trace = current_trace.get()
+            if self.queue is None:
+                # Отправляем диспетчеру для обработки
+                try:
+                    await self.context_loader.feed(self.bot, envelope, dedup=True)
+                finally:
+                    if trace is not None:
+                        trace.finish()
+                return web.Response(status=200, text="OK")
             
-            # Отправляем диспетчеру для обработки
-            await self.dp.feed_update(self.bot, update)
+            # Fast-ack: ставим в очередь и сразу отвечаем 200 OK; замер
+            # обновления допишет воркер очереди
+            if self.queue.put_nowait(envelope.ordering_key, envelope, trace):
+                return web.Response(status=200, text="OK")
             
-            # Сразу возвращаем 200 OK (asynchronously обрабатываем дальше)
-            return web.Response(status=200, text="OK")
+            return self._overloaded(envelope)
         
         except Exception as e:
             logger.exception(f"Error handling webhook: {e}")
             return web.Response(status=500, text="Internal Server Error")
     
-    async def health_check(self, request: web.Request) -> web.Response:
-        """Проверка здоровья (для балансировщика)"""
-        return web.Response(status=200, text="OK")
+    def _overloaded(self, update: UpdateEnvelope) -> web.Response:
+        """Ответ при переполненной очереди согласно WEBHOOK_OVERFLOW_POLICY"""
+        policy = config.WEBHOOK_OVERFLOW_POLICY
+        webhook_updates_dropped_total.labels(policy=policy).inc()
+        
+        if policy == "shed":
+            # Подтверждаем и отбрасываем - Telegram не будет повторять
+            logger.warning(f"Update queue is full, shedding update {update.update_id}")
+            return web.Response(status=200, text="OK")
+        
+        # Telegram повторит доставку позже
+        logger.warning(f"Update queue is full, rejecting update {update.update_id}")
+        return web.Response(status=503, text="Service Unavailable")
+    
+    async def profile(self, request: web.Request) -> web.Response:
+        """Стеки event loop этого воркера в формате folded (flamegraph.pl, speedscope)
+        
+        GET /debug/profile?seconds=10&interval=0.005; с несколькими
+        воркерами запрос попадает в один из них (pid - в X-Worker-Pid).
+        """
+        if config.PROFILER_TOKEN and request.headers.get("X-Profiler-Token") != config.PROFILER_TOKEN:
+            return web.Response(status=401, text="Unauthorized")
+        try:
+            seconds = float(request.query.get("seconds", 10))
+            interval = float(request.query.get("interval", 0.005))
+        except ValueError:
+            return web.Response(status=400, text="seconds and interval must be numbers")
+        
+        try:
+            stacks = await profiler.profile(seconds, interval)
+        except RuntimeError as e:
+            return web.Response(status=409, text=str(e))
+        
+        body = "\n".join(f"{stack} {count}" for stack, count in sorted(stacks.items(), key=lambda item: -item[1]))
+        return web.Response(text=body, headers={"X-Worker-Pid": str(os.getpid())})
 
-async def setup_webhook_app() -> web.Application:
-    """Создаём aiohttp приложение с вебхуком"""
+async def start_worker(startup: WorkerStartup) -> WebhookHandler:
+    """Создать бота и диспетчер, прогреть пулы и запустить компоненты
     
-    from bot.app.dispatcher import create_dispatcher
+    Вызывается в фоне, когда порт уже открыт (см. startup.py); остановка
+    каждого компонента регистрируется сразу после его запуска.
+    """
     
-    app = web.Application()
+    from bot.app.dispatcher import create_dispatcher
     
     # Создаём бота и диспетчер
-    bot = Bot(token=config.BOT_TOKEN)
+    # Адрес Bot API настраивается (локальная заглушка в бенчмарках).
+    # Ответы обработчиков идут через планировщик исходящих (outbound_sender)
+    session = ScheduledSession(api=TelegramAPIServer.from_base(config.TELEGRAM_API_URL))
+    if config.INSTRUMENTATION_ENABLED:
+        session.middleware(BotApiTimingMiddleware())
+    bot = Bot(token=config.BOT_TOKEN, session=session)
+    startup.on_cleanup(bot.session.close)
     dp = await create_dispatcher()
+    startup.bot = bot
+    startup.dp = dp
+    startup.mark("dispatcher")
     
-    # Создаём обработчик
-    handler = WebhookHandler(bot, dp)
+    # Пулы соединений БД и Redis: прогрев до первого обновления
+    startup.on_cleanup(database.dispose)
+    await asyncio.gather(database.warm_up(), warm_up_redis(config.STARTUP_REDIS_CONNECTIONS))
+    startup.mark("pools")
     
-    # Регистрируем маршруты
-    app.router.post(config.WEBHOOK_PATH, handler.handle_update)
-    app.router.get("/healthz", handler.health_check)
+    # Таблицы лидеров и индекс ленты аукционов потеряны (сброс Redis) -
+    # пересобрать в фоне, не задерживая старт
+    async def build_leaderboards() -> None:
+        try:
+            await leaderboards.ensure_built(database.read_session)
+        except Exception as e:
+            logger.exception(f"Leaderboards rebuild failed: {e}")
+        try:
+            await auction_feed_index.ensure_built(database.read_session)
+        except Exception as e:
+            logger.exception(f"Auction feed rebuild failed: {e}")
+    
+    build_task = asyncio.create_task(build_leaderboards())
+    
+    async def stop_leaderboards() -> None:
+        build_task.cancel()
+        await asyncio.gather(build_task, return_exceptions=True)
+    
+    startup.on_cleanup(stop_leaderboards)
+    
+    # Инвалидация L1-кэшей между воркерами
+    await invalidator.start()
+    startup.on_cleanup(invalidator.stop)
+    
+    # Исходящие сообщения: общий планировщик и пул соединений к Bot API
+    await outbound_sender.start()
+    startup.on_cleanup(outbound_sender.stop)
+    
+    # Рассылки: прерванные рестартом продолжаются с сохранённого курсора
+    # (ведёт один воркер; рассылку упавшего подхватит другой, когда истечёт
+    # ключ владельца); остановка - до отправителя
+    broadcaster = Broadcaster(outbound_sender, database.session_factory)
+    dp["broadcaster"] = broadcaster
+    startup.on_cleanup(broadcaster.stop)
+    resumed = await broadcaster.resume_all()
+    if resumed:
+        logger.info(f"Resumed broadcasts: {', '.join(resumed)}")
+    await broadcaster.start()
+    
+    # Анти-абьюз: обмен скетчами между воркерами
+    detector = dp.get("abuse_detector")
+    if detector is not None:
+        await detector.start()
+        startup.on_cleanup(detector.stop)
     
-    return app
+    # Write-behind счётчики: остановка дописывает дельты, после записи
+    # покупок (cleanup в обратном порядке) и до закрытия пула БД
+    await hot_counters.start()
+    startup.on_cleanup(hot_counters.stop)
+    
+    # Групповая запись покупок: при остановке дописывает накопленную пачку
+    # (до закрытия пула БД - cleanup идёт в обратном порядке)
+    auction_service = dp["auction_service"]
+    await auction_service.start()
+    startup.on_cleanup(auction_service.stop)
+    
+    # A/B тесты: набор экспериментов и буфер воздействий. Буфер
+    # дописывается после дренажа запросов и до закрытия пула БД
+    ab_tests = dp["ab_tests"]
+    await ab_tests.start()
+    startup.on_cleanup(ab_tests.stop)
+    
+    # Задержка event loop и стеки блокирующего кода
+    loop_monitor = LoopMonitor(config.LOOP_LAG_INTERVAL, config.SLOW_CALLBACK_THRESHOLD)
+    await loop_monitor.start()
+    startup.on_cleanup(loop_monitor.stop)
+    
+    # Fast-ack режим: обработка из очереди после ответа Telegram
+    context_loader = dp["context_loader"]
+    queue = None
+    if config.WEBHOOK_FAST_ACK:
+        queue = UpdateQueue(
+            lambda envelope: context_loader.feed(bot, envelope, dedup=True),
+            maxsize=config.WEBHOOK_QUEUE_SIZE,
+            workers=config.WEBHOOK_QUEUE_WORKERS
+        )
+        await queue.start()
+        
+        async def drain_queue() -> None:
+            await queue.stop(timeout=config.WEBHOOK_DRAIN_TIMEOUT)
+        
+        startup.on_shutdown(drain_queue)
+    
+    # Создаём обработчик
+    return WebhookHandler(bot, dp, queue)
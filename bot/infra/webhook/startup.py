@@ -0,0 +1,174 @@
+# bot/infra/webhook/startup.py
+"""
+Двухэтапный запуск воркера вебхука.
+
+Порт открывается и /healthz отвечает сразу: здесь импортируются только
+aiohttp и конфиг. Тяжёлое - aiogram с моделями pydantic, диспетчер,
+сервисы - импортируется в фоне, потоком, пока event loop уже отвечает
+на запросы; затем прогреваются пулы Redis и БД и стартуют компоненты.
+/readyz отвечает 200 только после этого. Обновления, пришедшие раньше,
+ждут готовности до STARTUP_WAIT секунд, потом получают 503 - Telegram
+повторит доставку.
+"""
+from typing import Awaitable, Callable, Dict, List, Optional
+from aiohttp import web
+from bot.core.config import config
+import asyncio
+import importlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Модули горячего пути: основная часть времени старта
+PRELOAD_MODULES = ("bot.infra.webhook.handler", "bot.app.dispatcher")
+
+Callback = Callable[[], Awaitable[None]]
+
+
+def preload() -> None:
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
+
+
+class WorkerStartup:
+    """Состояние запуска воркера: фоновая инициализация и готовность
+
+    Компоненты регистрируют остановку через on_shutdown/on_cleanup по
+    мере старта: сигналы aiohttp к этому моменту уже заморожены, а
+    останавливать нужно только то, что успело запуститься.
+    """
+
+    def __init__(self, started: Optional[float] = None):
+        self.started = started if started is not None else time.monotonic()
+        self.ready = asyncio.Event()
+        self.failed = asyncio.Event()
+        self.error: Optional[BaseException] = None
+        self.draining = False
+        # Заполняются в фоне; handler (WebhookHandler) - когда воркер готов
+        self.bot = None
+        self.dp = None
+        self.handler = None
+        self.stages: Dict[str, float] = {}  # этап -> секунды от старта процесса
+        self._task: Optional[asyncio.Task] = None
+        self._shutdown: List[Callback] = []
+        self._cleanup: List[Callback] = []
+        self._first_update = True
+
+    def on_shutdown(self, callback: Callback) -> None:
+        """Вызвать при остановке до закрытия соединений (дренаж)"""
+        self._shutdown.append(callback)
+
+    def on_cleanup(self, callback: Callback) -> None:
+        """Вызвать при остановке последним; порядок обратный регистрации"""
+        self._cleanup.append(callback)
+
+    def mark(self, stage: str) -> None:
+        from bot.infra.metrics.prometheus import worker_startup_seconds
+
+        elapsed = time.monotonic() - self.started
+        self.stages[stage] = elapsed
+        worker_startup_seconds.labels(stage=stage).observe(elapsed)
+        logger.info(f"Worker startup: {stage} at {elapsed:.2f}s")
+
+    async def run(self) -> None:
+        """Импорт, диспетчер, прогрев пулов и компонентов; затем ready"""
+        try:
+            # Импорт в потоке: GIL отпускается каждые несколько мс, и loop
+            # успевает отвечать на /healthz
+            await asyncio.to_thread(preload)
+            self.mark("import")
+
+            from bot.infra.webhook.handler import start_worker
+
+            self.handler = await start_worker(self)
+            self.mark("ready")
+            self.ready.set()
+        except Exception as e:
+            logger.exception(f"Worker startup failed: {e}")
+            self.error = e
+            self.failed.set()
+
+    async def wait(self) -> bool:
+        """Дождаться конца запуска; False - запуск не удался"""
+        waiters = [asyncio.ensure_future(event.wait()) for event in (self.ready, self.failed)]
+        try:
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+        return self.ready.is_set()
+
+    # Сигналы приложения aiohttp
+
+    async def start(self, app: web.Application) -> None:
+        self._task = asyncio.create_task(self.run())
+
+    async def shutdown(self, app: web.Application) -> None:
+        self.draining = True
+        if self._task is not None and not self._task.done():
+            # Остановка во время запуска: остановим то, что успело стартовать
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        await self._run_callbacks(self._shutdown)
+
+    async def cleanup(self, app: web.Application) -> None:
+        await self._run_callbacks(self._cleanup)
+
+    @staticmethod
+    async def _run_callbacks(callbacks: List[Callback]) -> None:
+        while callbacks:
+            callback = callbacks.pop()
+            try:
+                await callback()
+            except Exception as e:
+                logger.exception(f"Worker stop callback failed: {e}")
+
+    # Маршруты
+
+    async def health(self, request: web.Request) -> web.Response:
+        """Процесс жив (для перезапуска контейнера)"""
+        return web.Response(status=200, text="OK")
+
+    async def readiness(self, request: web.Request) -> web.Response:
+        """Готов принимать обновления (для балансировщика и rolling deploy)"""
+        if self.ready.is_set() and not self.draining:
+            return web.Response(status=200, text="OK")
+        return web.Response(status=503, text="Draining" if self.draining else "Starting")
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        if not self.ready.is_set():
+            try:
+                await asyncio.wait_for(self.ready.wait(), config.STARTUP_WAIT)
+            except asyncio.TimeoutError:
+                return web.Response(status=503, text="Starting")
+        response = await self.handler.handle_update(request)
+        if self._first_update:
+            self._first_update = False
+            self.mark("first_update")
+        return response
+
+    async def profile(self, request: web.Request) -> web.Response:
+        if not self.ready.is_set():
+            return web.Response(status=503, text="Starting")
+        return await self.handler.profile(request)
+
+
+async def setup_webhook_app(startup: Optional[WorkerStartup] = None) -> web.Application:
+    """Создаём aiohttp приложение с вебхуком; готовность - в app["startup"]"""
+    startup = startup or WorkerStartup()
+    app = web.Application()
+    app["startup"] = startup
+
+    app.on_startup.append(startup.start)
+    app.on_shutdown.append(startup.shutdown)
+    app.on_cleanup.append(startup.cleanup)
+
+    # Регистрируем маршруты
+    app.router.add_post(config.WEBHOOK_PATH, startup.handle_update)
+    app.router.add_get("/healthz", startup.health)
+    app.router.add_get("/readyz", startup.readiness)
+    if config.PROFILER_ENABLED:
+        app.router.add_get("/debug/profile", startup.profile)
+
+    return app
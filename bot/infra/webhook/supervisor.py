@@ -0,0 +1,191 @@
+# bot/infra/webhook/supervisor.py
+
+from typing import Dict, Optional
+from bot.core.config import config
+import asyncio
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+import time
+
+logger = logging.getLogger(__name__)
+
+# Перезапуск упавшего воркера: экспоненциальная пауза при частых падениях
+RESTART_BACKOFF_MAX = 30.0
+STABLE_UPTIME = 60.0  # столько проработал - считаем, что упал не из-за старта
+
+
+async def serve(reuse_port: bool = False, metrics: bool = True, started: Optional[float] = None) -> None:
+    """Обслуживать вебхук до SIGTERM/SIGINT, затем корректно остановиться
+
+    reuse_port: порт общий с другими воркерами (SO_REUSEPORT), ядро
+                распределяет соединения между ними
+    metrics: поднять /metrics в этом процессе (без супервизора)
+    started: time.monotonic() начала процесса - точка отсчёта этапов запуска
+    """
+    # Импорт здесь: воркер должен увидеть PROMETHEUS_MULTIPROC_DIR до
+    # создания метрик. Только лёгкие модули - aiogram и диспетчер грузятся
+    # в фоне, когда порт уже открыт (startup.py)
+    from aiohttp import web
+    from bot.infra.metrics.exporter import create_metrics_app
+    from bot.infra.webhook.startup import WorkerStartup, setup_webhook_app
+
+    startup = WorkerStartup(started)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    # on_startup приложения только запускает фоновую инициализацию
+    runner = web.AppRunner(await setup_webhook_app(startup), shutdown_timeout=config.WEBHOOK_DRAIN_TIMEOUT)
+    await runner.setup()
+    if config.WEBHOOK_STARTUP == "eager" and not await startup.wait():
+        # Прежнее поведение: порт открывается только готовым воркером
+        await runner.cleanup()
+        raise RuntimeError("Worker startup failed") from startup.error
+    await web.TCPSite(runner, config.WEB_HOST, config.WEBHOOK_PORT, reuse_port=reuse_port).start()
+    startup.mark("bind")
+
+    metrics_runner = None
+    if metrics:
+        metrics_runner = web.AppRunner(create_metrics_app())
+        await metrics_runner.setup()
+        await web.TCPSite(metrics_runner, config.WEB_HOST, config.METRICS_PORT).start()
+
+    logger.info(f"Worker {os.getpid()} serving on port {config.WEBHOOK_PORT}")
+    # Упавший запуск завершает воркер - супервизор перезапустит его
+    stopped = asyncio.ensure_future(stop.wait())
+    failed = asyncio.ensure_future(startup.failed.wait())
+    await asyncio.wait([stopped, failed], return_when=asyncio.FIRST_COMPLETED)
+    stopped.cancel()
+    failed.cancel()
+
+    # Перестаём принимать соединения, дообрабатываем начатое (on_shutdown
+    # дренирует очередь обновлений), закрываем ресурсы
+    logger.info(f"Worker {os.getpid()} draining")
+    await runner.cleanup()
+    if metrics_runner is not None:
+        await metrics_runner.cleanup()
+    if startup.error is not None:
+        raise RuntimeError("Worker startup failed") from startup.error
+
+
+def _worker_main(index: int) -> None:
+    started = time.monotonic()
+    logging.basicConfig(level=config.LOG_LEVEL, format=f"[worker {index}] %(levelname)s %(name)s: %(message)s")
+    asyncio.run(serve(reuse_port=True, metrics=False, started=started))
+
+
+class Supervisor:
+    """N процессов-воркеров на одном порту с перезапуском упавших
+
+    Каждый воркер - отдельный интерпретатор со своим event loop, поэтому
+    пропускная способность масштабируется по ядрам. Сам супервизор не
+    обрабатывает обновления: следит за воркерами и отдаёт /metrics,
+    собранные со всех процессов.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        # spawn, а не fork: воркер стартует с чистым состоянием (event loop,
+        # соединения Redis/БД, метрики в файловом режиме)
+        self.context = multiprocessing.get_context("spawn")
+        self.processes: Dict[int, multiprocessing.Process] = {}
+        self.started_at: Dict[int, float] = {}
+        self.backoff: Dict[int, float] = {}
+        self.restart_at: Dict[int, float] = {}
+
+    def _prepare_metrics_dir(self) -> None:
+        # Файлы прошлого запуска исказили бы счётчики
+        path = config.PROMETHEUS_MULTIPROC_DIR
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+
+    def _spawn(self, index: int) -> None:
+        process = self.context.Process(target=_worker_main, args=(index,), name=f"worker-{index}")
+        process.start()
+        self.processes[index] = process
+        self.started_at[index] = time.monotonic()
+        logger.info(f"Started worker {index} (pid {process.pid})")
+
+    def _reap(self, index: int, process: multiprocessing.Process) -> None:
+        """Воркер завершился сам - запланировать перезапуск"""
+        from bot.infra.metrics.exporter import mark_process_dead
+
+        mark_process_dead(process.pid)
+        del self.processes[index]
+
+        uptime = time.monotonic() - self.started_at[index]
+        if uptime >= STABLE_UPTIME:
+            self.backoff[index] = 0.0
+        delay = self.backoff.get(index, 0.0)
+        self.backoff[index] = min(RESTART_BACKOFF_MAX, max(1.0, delay * 2))
+        self.restart_at[index] = time.monotonic() + delay
+        logger.error(f"Worker {index} (pid {process.pid}) exited with {process.exitcode}, restart in {delay:.0f}s")
+
+    async def _shutdown(self) -> None:
+        """SIGTERM всем воркерам, ждём дренажа, оставшихся - SIGKILL"""
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+
+        deadline = time.monotonic() + config.WEBHOOK_DRAIN_TIMEOUT + 5
+        while time.monotonic() < deadline and any(p.is_alive() for p in self.processes.values()):
+            await asyncio.sleep(0.1)
+
+        for index, process in self.processes.items():
+            if process.is_alive():
+                logger.warning(f"Worker {index} (pid {process.pid}) did not stop in time, killing")
+                process.kill()
+            process.join()
+
+    async def run(self) -> None:
+        from aiohttp import web
+
+        self._prepare_metrics_dir()
+        # Метрики супервизора (только /metrics) читают файлы воркеров
+        from bot.infra.metrics.exporter import create_metrics_app
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+
+        metrics_runner = web.AppRunner(create_metrics_app())
+        await metrics_runner.setup()
+        await web.TCPSite(metrics_runner, config.WEB_HOST, config.METRICS_PORT).start()
+
+        for index in range(self.workers):
+            self._spawn(index)
+        logger.info(f"Supervisor {os.getpid()}: {self.workers} workers on port {config.WEBHOOK_PORT}")
+
+        while not stop.is_set():
+            now = time.monotonic()
+            for index, process in list(self.processes.items()):
+                if not process.is_alive():
+                    self._reap(index, process)
+            for index, restart_at in list(self.restart_at.items()):
+                if restart_at <= now:
+                    del self.restart_at[index]
+                    self._spawn(index)
+            try:
+                await asyncio.wait_for(stop.wait(), 0.5)
+            except asyncio.TimeoutError:
+                pass
+
+        logger.info("Supervisor stopping workers")
+        await self._shutdown()
+        await metrics_runner.cleanup()
+
+
+def run(workers: Optional[int] = None) -> None:
+    """Точка входа: один процесс или супервизор с воркерами"""
+    workers = workers or config.WEB_WORKERS
+    if workers <= 1:
+        os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+        asyncio.run(serve())
+    else:
+        asyncio.run(Supervisor(workers).run())
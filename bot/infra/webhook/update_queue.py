@@ -0,0 +1,123 @@
+# bot/infra/webhook/update_queue.py
+
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from collections import deque
+from bot.infra.webhook.envelope import UpdateEnvelope
+from bot.infra.metrics.instrumentation import UpdateTrace, current_trace
+from bot.infra.metrics.prometheus import webhook_queue_depth, webhook_queue_wait_time
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateQueue:
+    """Ограниченная очередь обновлений с сохранением порядка внутри чата
+
+    Обновления одного ключа (чата) выполняются строго по очереди, разные
+    ключи обрабатываются воркерами параллельно. Пока ключ в работе, новые
+    обновления копятся в его цепочке и не занимают других воркеров.
+    """
+
+    def __init__(
+        self,
+        process: Callable[[UpdateEnvelope], Awaitable[Any]],
+        maxsize: int = 10000,
+        workers: int = 64
+    ):
+        """
+        process: корутина обработки одного обновления
+        maxsize: максимум обновлений в очереди (включая обрабатываемые)
+        workers: количество параллельных воркеров
+        """
+        self.process = process
+        self.maxsize = maxsize
+        self.workers_count = workers
+
+        self._chains: Dict[int, Deque[Tuple[float, UpdateEnvelope, Optional[UpdateTrace]]]] = {}
+        self._ready: asyncio.Queue = asyncio.Queue()  # ключи, готовые к обработке
+        self._size = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._workers: List[asyncio.Task] = []
+        self._closed = False
+
+    def __len__(self) -> int:
+        return self._size
+
+    def put_nowait(self, key: int, update: UpdateEnvelope, trace: Optional[UpdateTrace] = None) -> bool:
+        """Поставить обновление в очередь. False - очередь переполнена или закрыта
+
+        trace: замер обновления, начатый при приёме; продолжается в воркере
+        """
+        if self._closed or self._size >= self.maxsize:
+            return False
+
+        self._size += 1
+        self._idle.clear()
+        webhook_queue_depth.set(self._size)
+
+        chain = self._chains.get(key)
+        if chain is None:
+            self._chains[key] = deque([(time.monotonic(), update, trace)])
+            self._ready.put_nowait(key)
+        else:
+            # Ключ уже ждёт или обрабатывается - порядок сохранит цепочка
+            chain.append((time.monotonic(), update, trace))
+        return True
+
+    async def start(self) -> None:
+        """Запустить воркеры"""
+        self._closed = False
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"update-worker-{i}")
+            for i in range(self.workers_count)
+        ]
+        logger.info(f"Update queue started: {self.workers_count} workers, maxsize {self.maxsize}")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Перестать принимать обновления, дообработать очередь и остановить воркеры"""
+        self._closed = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Update queue drain timed out, {self._size} updates lost")
+
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _worker(self) -> None:
+        while True:
+            key = await self._ready.get()
+            chain = self._chains[key]
+            enqueued_at, update, trace = chain[0]
+            waited = time.monotonic() - enqueued_at
+            webhook_queue_wait_time.observe(waited)
+
+            token = None
+            if trace is not None:
+                trace.add("queue", waited)
+                token = current_trace.set(trace)
+            try:
+                await self.process(update)
+            except Exception as e:
+                logger.exception(f"Error processing update {update.update_id}: {e}")
+            finally:
+                if trace is not None:
+                    current_trace.reset(token)
+                    trace.finish()
+                chain.popleft()
+                self._size -= 1
+                webhook_queue_depth.set(self._size)
+
+                if chain:
+                    # Следующее обновление чата - в конец, чтобы не голодали другие чаты
+                    self._ready.put_nowait(key)
+                else:
+                    del self._chains[key]
+
+                if self._size == 0:
+                    self._idle.set()
@@ -1,28 +1,25 @@
 """
 ZAVOD EMPIRE BOT - Main entry point
+
+    python -m bot.main               # WEB_WORKERS из конфига
+    python -m bot.main --workers 8   # 8 процессов на одном порту
 """
-import asyncio
+import argparse
 import logging
 from bot.core.config import config
-from bot.infra.webhook.handler import setup_webhook_app
-from aiohttp import web
+from bot.infra.webhook.supervisor import run
 
 logging.basicConfig(level=config.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
-async def main():
+def main():
     """Main application entry point"""
-    app = await setup_webhook_app()
-    runner = web.AppRunner(app)
-    await runner.setup()
-    site = web.TCPSite(runner, "0.0.0.0", config.WEBHOOK_PORT)
-    await site.start()
-    
-    logger.info(f"🤖 Bot started on {config.WEBHOOK_HOST}{config.WEBHOOK_PATH}")
+    parser = argparse.ArgumentParser(description="ZAVOD EMPIRE BOT")
+    parser.add_argument("--workers", type=int, default=None, help="процессов-воркеров (по умолчанию WEB_WORKERS)")
+    args = parser.parse_args()
     
-    # Keep running
-    while True:
-        await asyncio.sleep(3600)
+    logger.info(f"🤖 Bot starting on {config.WEBHOOK_HOST}{config.WEBHOOK_PATH}")
+    run(args.workers)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -0,0 +1,31 @@
+# bot/scripts/precompile.py
+"""
+Всё, что воркер иначе делал бы при каждом холодном старте: .mo из .po и
+байт-код пакета. Запускать при сборке образа (после установки зависимостей).
+
+    python -m bot.scripts.precompile
+"""
+from bot.core.config import config
+from bot.core.i18n import compile_catalogs
+import compileall
+import logging
+import os
+import time
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main() -> None:
+    started = time.perf_counter()
+    languages = compile_catalogs(config.LOCALES_DIR, force=True)
+    print(f"Compiled translations: {', '.join(languages) or 'nothing'}")
+
+    # workers=0 - по процессу на ядро
+    if not compileall.compile_dir(PACKAGE_DIR, quiet=1, workers=0):
+        raise SystemExit("Byte-compilation failed")
+    print(f"Byte-compiled {PACKAGE_DIR} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
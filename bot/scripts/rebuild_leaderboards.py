@@ -0,0 +1,25 @@
+# bot/scripts/rebuild_leaderboards.py
+"""
+Пересборка таблиц лидеров в Redis из Postgres.
+
+    python -m bot.scripts.rebuild_leaderboards
+"""
+from bot.infra.cache.leaderboard import leaderboards
+from bot.infra.cache.redis_client import redis_client
+from bot.infra.database.engine import database
+import asyncio
+import logging
+
+
+async def main() -> None:
+    try:
+        count = await leaderboards.rebuild(database.read_session)
+        print(f"Leaderboards rebuilt for {count} users")
+    finally:
+        await database.dispose()
+        await redis_client.aclose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
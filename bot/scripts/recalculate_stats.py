@@ -0,0 +1,243 @@
+# bot/scripts/recalculate_stats.py
+"""
+Пересчёт total_referrals / total_purchases / total_revenue пользователей.
+
+Пользователи идут по возрастанию user_id чанками: на каждый чанк свой
+keyset-запрос (user_id > последнего, LIMIT) в короткой транзакции - без
+долгого курсора, который держал бы снимок и мешал vacuum. Агрегаты чанка
+считаются и записываются одним SQL-запросом, меняются только строки с
+расхождениями. Позиция
+сохраняется в Redis после каждого чанка - прерванный запуск продолжается.
+
+    python -m bot.scripts.recalculate_stats                        # всё, в одном процессе
+    python -m bot.scripts.recalculate_stats --shards 8 --enqueue   # 8 задач RQ (очередь stats)
+    python -m bot.scripts.recalculate_stats --incremental          # только затронутые с прошлого запуска
+    python -m bot.scripts.recalculate_stats --restart              # начать заново, без чекпоинта
+"""
+from typing import Any, Dict, List, Optional, Set
+from datetime import datetime
+from sqlalchemy import select, text, union
+from bot.infra.cache.counters import BATCH_KEY, BATCHES_KEY, DIRTY_KEY
+from bot.infra.cache.redis_client import redis_client
+from bot.infra.database.engine import database
+from bot.infra.database.models import Purchase, ReferralAncestor, User
+import argparse
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_KEY = "stats_recalc:{}:{}/{}"  # режим, шард, всего шардов
+LAST_RUN_KEY = "stats_recalc:last_run:{}/{}"
+DEFERRED_KEY = "stats_recalc:deferred"  # отложенные пользователи (были незаписанные счётчики)
+JOB_TIMEOUT = 6 * 3600
+
+# Агрегаты чанка и запись только изменившихся строк - один запрос
+RECALCULATE_CHUNK = text("""
+WITH ids AS (
+    SELECT unnest(CAST(:ids AS integer[])) AS user_id
+),
+refs AS (
+    SELECT ancestor_id AS user_id, count(*) AS total
+    FROM referral_ancestors
+    WHERE ancestor_id = ANY(CAST(:ids AS integer[]))
+    GROUP BY ancestor_id
+),
+purchased AS (
+    SELECT user_id, count(*) AS total, coalesce(sum(price_paid), 0) AS revenue
+    FROM purchases
+    WHERE user_id = ANY(CAST(:ids AS integer[]))
+    GROUP BY user_id
+),
+calc AS (
+    SELECT ids.user_id,
+           coalesce(refs.total, 0) AS total_referrals,
+           coalesce(purchased.total, 0) AS total_purchases,
+           coalesce(purchased.revenue, 0) AS total_revenue
+    FROM ids
+    LEFT JOIN refs ON refs.user_id = ids.user_id
+    LEFT JOIN purchased ON purchased.user_id = ids.user_id
+)
+UPDATE users u
+SET total_referrals = calc.total_referrals,
+    total_purchases = calc.total_purchases,
+    total_revenue = calc.total_revenue
+FROM calc
+WHERE u.user_id = calc.user_id
+  AND (u.total_referrals, u.total_purchases, u.total_revenue)
+      IS DISTINCT FROM (calc.total_referrals, calc.total_purchases, calc.total_revenue)
+RETURNING u.user_id
+""").execution_options(query_type="stats_recalc_chunk")
+
+
+def _shard_filter(query, column, shard: int, shards: int):
+    if shards > 1:
+        query = query.where(column % shards == shard)
+    return query
+
+
+def _users_query(after: int, shard: int, shards: int, since: Optional[datetime], deferred: List[int]):
+    """user_id шарда по возрастанию, начиная после чекпоинта"""
+    if since is None:
+        query = select(User.user_id.label("user_id"))
+        column = User.user_id
+    else:
+        # Затронутые: покупки и новые рефералы в поддереве с прошлого запуска
+        touched = union(
+            select(Purchase.user_id.label("user_id")).where(Purchase.created_at >= since),
+            select(ReferralAncestor.ancestor_id.label("user_id"))
+            .join(User, User.user_id == ReferralAncestor.descendant_id)
+            .where(User.created_at >= since),
+            select(User.user_id.label("user_id")).where(User.user_id.in_(deferred or [-1])),
+        ).subquery()
+        query = select(touched.c.user_id)
+        column = touched.c.user_id
+
+    query = query.where(column > after).order_by(column)
+    return _shard_filter(query, column, shard, shards)
+
+
+async def _with_pending_counters(ids: List[int]) -> Set[int]:
+    """Пользователи с незаписанными write-behind дельтами: их значения
+    в БД ещё изменятся, пересчёт затёр бы разницу"""
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.smismember(DIRTY_KEY, ids)
+        pipe.smembers(BATCHES_KEY)
+        dirty, batch_ids = await pipe.execute()
+
+    pending = {user_id for user_id, flag in zip(ids, dirty) if flag}
+    for raw in batch_ids:
+        fields = await redis_client.hkeys(BATCH_KEY.format(raw.decode()))
+        pending.update(int(field.split(b":", 1)[0]) for field in fields)
+    return pending & set(ids)
+
+
+async def run_shard(
+    shard: int = 0,
+    shards: int = 1,
+    incremental: bool = False,
+    chunk_size: int = 1000,
+    restart: bool = False
+) -> Dict[str, Any]:
+    """Пересчитать шард; безопасно перезапускать - продолжит с чекпоинта"""
+    mode = "incremental" if incremental else "full"
+    checkpoint_key = CHECKPOINT_KEY.format(mode, shard, shards)
+    last_run_key = LAST_RUN_KEY.format(shard, shards)
+
+    if restart:
+        await redis_client.delete(checkpoint_key)
+
+    state = await redis_client.hgetall(checkpoint_key)
+    if state and state[b"status"] == b"running":
+        cursor = int(state[b"cursor"])
+        started_at = float(state[b"started_at"])
+        processed, updated = int(state[b"processed"]), int(state[b"updated"])
+        logger.info(f"Resuming {mode} shard {shard}/{shards} after user {cursor}")
+    else:
+        cursor, started_at, processed, updated = 0, time.time(), 0, 0
+        await redis_client.hset(checkpoint_key, mapping={
+            "cursor": cursor, "started_at": started_at, "processed": 0, "updated": 0, "status": "running",
+        })
+
+    since = None
+    deferred: List[int] = []
+    if incremental:
+        last_run = await redis_client.get(last_run_key)
+        since = datetime.utcfromtimestamp(float(last_run)) if last_run else datetime.utcfromtimestamp(0)
+        deferred = [int(user_id) for user_id in await redis_client.smembers(DEFERRED_KEY)]
+        deferred = [user_id for user_id in deferred if shards <= 1 or user_id % shards == shard]
+
+    skipped: Set[int] = set()
+    deferred_again: Set[int] = set()
+    try:
+        while True:
+            # Новый запрос на чанк: транзакция чтения живёт один запрос
+            async with database.read_session() as reader:
+                chunk = list((await reader.execute(
+                    _users_query(cursor, shard, shards, since, deferred)
+                    .limit(chunk_size)
+                    .execution_options(query_type="stats_recalc_scan")
+                )).scalars())
+            if not chunk:
+                break
+
+            pending = await _with_pending_counters(chunk)
+            if pending:
+                skipped |= pending
+                deferred_again |= pending
+            ids = [user_id for user_id in chunk if user_id not in pending]
+
+            changed = []
+            if ids:
+                async with database.session_factory() as session:
+                    async with session.begin():
+                        changed = (await session.execute(RECALCULATE_CHUNK, {"ids": ids})).scalars().all()
+
+            cursor = chunk[-1]
+            processed += len(chunk)
+            updated += len(changed)
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.hset(checkpoint_key, mapping={"cursor": cursor, "processed": processed, "updated": updated})
+                if skipped:
+                    pipe.sadd(DEFERRED_KEY, *skipped)
+                await pipe.execute()
+            skipped.clear()
+
+            if len(chunk) < chunk_size:
+                break
+
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.hset(checkpoint_key, "status", "done")
+            # Следующий инкрементальный запуск берёт изменения с начала этого
+            pipe.set(last_run_key, started_at)
+            done = set(deferred) - deferred_again
+            if done:
+                pipe.srem(DEFERRED_KEY, *done)
+            await pipe.execute()
+    finally:
+        # Задача RQ - свой event loop на каждый запуск, а пулы БД и Redis
+        # привязаны к loop: закрываем, следующий запуск откроет заново
+        await database.dispose()
+        await redis_client.connection_pool.disconnect()
+
+    summary = {"shard": shard, "shards": shards, "mode": mode, "processed": processed, "updated": updated}
+    logger.info(f"Stats recalculation done: {summary}")
+    return summary
+
+
+def enqueue(shards: int, incremental: bool, chunk_size: int) -> None:
+    from bot.infra.queue.jobs import STATS_QUEUE, recalculate_stats_shard
+    from bot.infra.queue.rq_client import get_queue
+
+    queue = get_queue(STATS_QUEUE)
+    for shard in range(shards):
+        job = queue.enqueue(
+            recalculate_stats_shard, shard, shards, incremental, chunk_size,
+            job_timeout=JOB_TIMEOUT
+        )
+        print(f"shard {shard}/{shards}: job {job.id}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--shard", type=int, default=None, help="запустить один шард в этом процессе")
+    parser.add_argument("--enqueue", action="store_true", help="поставить шарды в очередь RQ")
+    parser.add_argument("--incremental", action="store_true")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--restart", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.enqueue:
+        enqueue(args.shards, args.incremental, args.chunk_size)
+        return
+
+    shards = [args.shard] if args.shard is not None else range(args.shards)
+    for shard in shards:
+        print(asyncio.run(run_shard(shard, args.shards, args.incremental, args.chunk_size, args.restart)))
+
+
+if __name__ == "__main__":
+    main()
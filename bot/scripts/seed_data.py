@@ -0,0 +1,521 @@
+# bot/scripts/seed_data.py
+"""
+Синтетический набор данных для нагрузочных тестов: пользователи с
+реферальными деревьями (invited_by_id и closure table), аукционы,
+покупки, A/B тесты и показы.
+
+Каждое значение - чистая функция от (seed, номер строки), поэтому набор
+одинаков при любом числе процессов и размере чанков. Чанки пишутся
+через COPY (asyncpg, бинарный формат) параллельно из нескольких
+процессов. На время загрузки внешние ключи и неуникальные индексы
+засеваемых таблиц снимаются и строятся заново в конце, затем цены
+покупок и агрегаты (total_referrals, total_purchases, times_purchased)
+считаются SQL. Redis
+прогревается теми же ключами, что пишет бот: языки пользователей,
+таблицы лидеров, индекс ленты аукционов и состояние аукционов.
+
+Распределения:
+    пригласившие - степенной закон: чем раньше пришёл пользователь, тем
+                   больше у него рефералов (--referral-alpha)
+    покупки      - горячие аукционы: основная часть покупок приходится
+                   на немногие лоты (--auction-alpha); распроданные лоты
+                   покупок не получают, цена растёт с каждой покупкой лота
+
+    python -m bot.scripts.seed_data --users 5000000 --workers 8 --truncate
+    python -m bot.scripts.seed_data --users 100000 --seed 7 --no-redis
+"""
+from typing import Any, Iterator, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from redis.asyncio import Redis
+from sqlalchemy.engine import make_url
+from bot.app.context import USER_LANG_KEY, USER_LANG_TTL
+from bot.core.config import config
+from bot.domain.services.ab_test_service import assign_variant
+from bot.domain.services.auction_service import AUCTION_STATE_KEY
+import argparse
+import asyncio
+import asyncpg
+import json
+import logging
+import math
+import multiprocessing
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Как в benchmarks.updates: нагрузочный тест приходит от засеянных пользователей
+USER_ID_OFFSET = 1_800_000_000
+
+TABLES = ("users", "referral_ancestors", "auctions", "purchases", "ab_tests", "ab_test_exposures")
+
+USER_COLUMNS = (
+    "user_id", "username", "first_name", "language", "referral_code", "invited_by_id",
+    "factory_level", "factory_capacity", "workers_count", "factory_stock", "production_settled_at",
+    "soft_currency", "hard_currency", "total_referrals", "total_purchases", "total_revenue",
+    "is_premium", "is_banned", "created_at", "updated_at",
+)
+ANCESTOR_COLUMNS = ("ancestor_id", "descendant_id", "depth")
+AUCTION_COLUMNS = (
+    "id", "creator_id", "description", "characteristics", "base_price", "current_price",
+    "times_purchased", "is_active", "is_sold_out", "created_at", "updated_at",
+)
+PURCHASE_COLUMNS = ("id", "user_id", "auction_id", "price_paid", "idempotency_key", "created_at")
+AB_TEST_COLUMNS = ("id", "experiment_key", "variant_a_name", "variant_b_name", "is_active", "created_at")
+EXPOSURE_COLUMNS = ("id", "test_id", "user_id", "variant", "converted", "conversion_value", "created_at")
+
+# Потоки случайных чисел: у каждого поля свой, поля не коррелируют
+(
+    S_INVITE, S_INVITER, S_LANG, S_LEVEL, S_WORKERS, S_COINS, S_PREMIUM,
+    S_AUCTION, S_CREATOR, S_PRICE, S_SOLD_OUT, S_TRAIT,
+    S_PURCHASE, S_BUYER, S_LOT, S_PURCHASE_TIME,
+    S_TEST, S_EXPOSURE, S_EXPOSED, S_CONVERTED, S_VALUE,
+) = range(21)
+
+MASK64 = (1 << 64) - 1
+TRAITS = ("strength", "charm", "speed", "luck")
+
+# Цены и агрегаты засеянных строк - одним запросом на таблицу. Цена
+# покупки считается как в calculate_price: по её номеру в своём лоте
+FINALIZE_SQL = (
+    """
+    UPDATE purchases p
+    SET price_paid = a.base_price + (o.n - 1) * greatest(1, a.base_price * $3 / 100)
+    FROM (SELECT id, row_number() OVER (PARTITION BY auction_id ORDER BY created_at, id) AS n FROM purchases) o,
+         auctions a
+    WHERE p.id = o.id AND a.id = p.auction_id AND a.creator_id BETWEEN $1 AND $2
+    """,
+    """
+    UPDATE users u SET total_referrals = s.size
+    FROM (SELECT ancestor_id, count(*) AS size FROM referral_ancestors GROUP BY ancestor_id) s
+    WHERE u.user_id = s.ancestor_id AND u.user_id BETWEEN $1 AND $2
+    """,
+    """
+    UPDATE users u SET total_purchases = p.total, total_revenue = p.revenue
+    FROM (SELECT user_id, count(*) AS total, sum(price_paid) AS revenue FROM purchases GROUP BY user_id) p
+    WHERE u.user_id = p.user_id AND u.user_id BETWEEN $1 AND $2
+    """,
+    """
+    UPDATE auctions a
+    SET times_purchased = p.total,
+        current_price = a.base_price + p.total * greatest(1, a.base_price * $3 / 100)
+    FROM (SELECT auction_id, count(*) AS total FROM purchases GROUP BY auction_id) p
+    WHERE a.id = p.auction_id AND a.creator_id BETWEEN $1 AND $2
+    """,
+)
+
+
+def mix64(x: int) -> int:
+    """splitmix64: биекция на 64-битных числах с хорошим перемешиванием"""
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+def postgres_dsn() -> str:
+    """DATABASE_URL в формате asyncpg (без +asyncpg в схеме)"""
+    return make_url(config.DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+class Dataset:
+    """Строки набора как функции номера: любой чанк генерируется независимо"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.seed = args.seed
+        self.users = args.users
+        self.auctions = args.auctions
+        self.purchases = args.purchases
+        self.experiments = args.experiments
+        self.invite_ratio = args.invite_ratio
+        self.referral_alpha = args.referral_alpha
+        self.auction_alpha = args.auction_alpha
+        self.exposure_ratio = args.exposure_ratio
+        self.en_ratio = args.en_ratio
+        self.start = datetime.fromisoformat(args.start)
+        self.span = args.days * 86400
+        self._keys = [mix64((self.seed << 8) | stream) for stream in range(S_VALUE + 1)]
+        self._tests = [(self.uuid(S_TEST, e), self.experiment_key(e)) for e in range(self.experiments)]
+
+    def bits(self, stream: int, i: int) -> int:
+        return mix64(self._keys[stream] ^ i)
+
+    def uniform(self, stream: int, i: int) -> float:
+        """[0, 1) для (поток, номер)"""
+        return self.bits(stream, i) * 5.421010862427522e-20  # 2 ** -64
+
+    def uuid(self, stream: int, i: int) -> str:
+        # Строка напрямую - uuid.UUID заметно дороже на миллионах строк
+        h = f"{self.bits(stream, i):016x}{self.bits(stream, i + (1 << 62)):016x}"
+        return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+    # Пользователи
+
+    def user_created(self, i: int) -> datetime:
+        return self.start + timedelta(seconds=self.span * i / self.users)
+
+    def inviter(self, i: int) -> Optional[int]:
+        """Номер пригласившего (всегда раньше i) или None - пришёл сам"""
+        if i == 0 or self.uniform(S_INVITE, i) >= self.invite_ratio:
+            return None
+        return int(i * self.uniform(S_INVITER, i) ** self.referral_alpha)
+
+    def user_row(self, i: int) -> Tuple[Any, ...]:
+        user_id = USER_ID_OFFSET + i
+        inviter = self.inviter(i)
+        created = self.user_created(i)
+        # Уровень - экспонента, баланс - Парето: большинство маленькие, немного очень больших
+        level = min(100, 1 + int(-math.log(1.0 - self.uniform(S_LEVEL, i)) * 3))
+        capacity = level * 10
+        coins = min(10 ** 9, int(100 / (1.0 - self.uniform(S_COINS, i)) ** 0.9))
+        return (
+            user_id,
+            f"seed{user_id}",
+            f"Player {i}",
+            "en" if self.uniform(S_LANG, i) < self.en_ratio else "ru",
+            f"{mix64(user_id):016X}",  # биекция - коды уникальны
+            USER_ID_OFFSET + inviter if inviter is not None else None,
+            level,
+            capacity,
+            int(self.uniform(S_WORKERS, i) * capacity),
+            0.0,
+            created,
+            coins,
+            0,
+            0,
+            0,
+            0.0,
+            self.uniform(S_PREMIUM, i) < 0.05,
+            False,
+            created,
+            created,
+        )
+
+    def ancestor_rows(self, i: int) -> Iterator[Tuple[int, int, int]]:
+        """Строки closure table: все предки пользователя с глубиной"""
+        descendant, depth = USER_ID_OFFSET + i, 1
+        ancestor = self.inviter(i)
+        while ancestor is not None:
+            yield USER_ID_OFFSET + ancestor, descendant, depth
+            ancestor = self.inviter(ancestor)
+            depth += 1
+
+    # Аукционы и покупки
+
+    def auction_id(self, a: int) -> str:
+        return self.uuid(S_AUCTION, a)
+
+    def base_price(self, a: int) -> int:
+        return 50 + 10 * int(self.uniform(S_PRICE, a) * 95)
+
+    def sold_out(self, a: int) -> bool:
+        # Самый горячий лот не распродан: покупкам всегда есть куда уйти
+        return a > 0 and self.uniform(S_SOLD_OUT, a) < 0.05
+
+    def auction_row(self, a: int) -> Tuple[Any, ...]:
+        created = self.start + timedelta(seconds=self.span * a / self.auctions)
+        base_price = self.base_price(a)
+        traits = {trait: 1 + self.bits(S_TRAIT, a * len(TRAITS) + k) % 10 for k, trait in enumerate(TRAITS)}
+        return (
+            self.auction_id(a),
+            USER_ID_OFFSET + int(self.uniform(S_CREATOR, a) * self.users),
+            f"Lot #{a}",
+            json.dumps(traits),
+            base_price,
+            base_price,
+            0,
+            True,
+            self.sold_out(a),
+            created,
+            created,
+        )
+
+    def purchase_row(self, p: int) -> Tuple[Any, ...]:
+        buyer = int(self.uniform(S_BUYER, p) * self.users)
+        # Горячие лоты: степень сдвигает выбор к первым номерам
+        lot = int(self.auctions * self.uniform(S_LOT, p) ** self.auction_alpha)
+        while self.sold_out(lot):
+            lot -= 1
+        joined = self.user_created(buyer)
+        end = self.start + timedelta(seconds=self.span)
+        created = joined + (end - joined) * self.uniform(S_PURCHASE_TIME, p)
+        return (
+            self.uuid(S_PURCHASE, p),
+            USER_ID_OFFSET + buyer,
+            self.auction_id(lot),
+            self.base_price(lot),  # заменяется в finalize по порядку покупок лота
+            f"seed:{self.seed}:{p}",
+            created,
+        )
+
+    # A/B тесты
+
+    def experiment_key(self, e: int) -> str:
+        return f"seed_experiment_{e}"
+
+    def ab_test_row(self, e: int) -> Tuple[Any, ...]:
+        return (self.uuid(S_TEST, e), self.experiment_key(e), "control", "treatment", True, self.start)
+
+    def exposure_rows(self, i: int) -> Iterator[Tuple[Any, ...]]:
+        user_id = USER_ID_OFFSET + i
+        for e, (test_id, experiment_key) in enumerate(self._tests):
+            key = i * self.experiments + e
+            if self.uniform(S_EXPOSED, key) >= self.exposure_ratio:
+                continue
+            converted = self.uniform(S_CONVERTED, key) < 0.1
+            yield (
+                self.uuid(S_EXPOSURE, key),
+                test_id,
+                user_id,
+                assign_variant(experiment_key, user_id),
+                converted,
+                round(self.uniform(S_VALUE, key) * 500, 2) if converted else None,
+                self.user_created(i),
+            )
+
+
+async def _copy_chunk(args: argparse.Namespace, kind: str, start: int, stop: int) -> int:
+    """Сгенерировать и записать чанк; возвращает число строк"""
+    dataset = Dataset(args)
+    conn = await asyncpg.connect(postgres_dsn())
+    try:
+        if kind == "users":
+            users = [dataset.user_row(i) for i in range(start, stop)]
+            ancestors = [row for i in range(start, stop) for row in dataset.ancestor_rows(i)]
+            await conn.copy_records_to_table("users", records=users, columns=USER_COLUMNS)
+            await conn.copy_records_to_table("referral_ancestors", records=ancestors, columns=ANCESTOR_COLUMNS)
+            if args.redis:
+                await _warm_languages(users)
+            return len(users) + len(ancestors)
+        if kind == "purchases":
+            rows = [dataset.purchase_row(p) for p in range(start, stop)]
+            await conn.copy_records_to_table("purchases", records=rows, columns=PURCHASE_COLUMNS)
+            return len(rows)
+        if kind == "exposures":
+            rows = [row for i in range(start, stop) for row in dataset.exposure_rows(i)]
+            await conn.copy_records_to_table("ab_test_exposures", records=rows, columns=EXPOSURE_COLUMNS)
+            return len(rows)
+        raise ValueError(f"Unknown chunk kind: {kind}")
+    finally:
+        await conn.close()
+
+
+async def _warm_languages(users: List[Tuple[Any, ...]]) -> None:
+    """user_lang:<id> - ключ, который читает предзагрузка контекста"""
+    redis = Redis.from_url(config.REDIS_URL, db=config.REDIS_DB)
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            for row in users:
+                pipe.setex(USER_LANG_KEY.format(row[0]), USER_LANG_TTL, row[3])
+            await pipe.execute()
+    finally:
+        await redis.aclose()
+
+
+def copy_chunk(args: argparse.Namespace, kind: str, start: int, stop: int) -> int:
+    """Точка входа процесса пула: свой event loop и свои соединения"""
+    return asyncio.run(_copy_chunk(args, kind, start, stop))
+
+
+def _chunks(kind: str, total: int, size: int) -> Iterator[Tuple[str, int, int]]:
+    for start in range(0, total, size):
+        yield kind, start, min(start + size, total)
+
+
+async def prepare(args: argparse.Namespace) -> List[str]:
+    """Очистить таблицы (--truncate), снять FK и неуникальные индексы
+
+    Возвращает DDL для их восстановления.
+    """
+    conn = await asyncpg.connect(postgres_dsn())
+    try:
+        if args.truncate:
+            await conn.execute(f"TRUNCATE {', '.join(TABLES)} CASCADE")
+        if args.keep_indexes:
+            return []
+
+        foreign_keys = await conn.fetch(
+            """
+            SELECT conrelid::regclass::text AS tbl, conname, pg_get_constraintdef(oid) AS definition
+            FROM pg_constraint
+            WHERE contype = 'f' AND conrelid::regclass::text = ANY($1::text[])
+            """,
+            list(TABLES)
+        )
+        indexes = await conn.fetch(
+            """
+            SELECT indexrelid::regclass::text AS name, pg_get_indexdef(indexrelid) AS definition
+            FROM pg_index
+            WHERE indrelid::regclass::text = ANY($1::text[]) AND NOT indisprimary AND NOT indisunique
+            """,
+            list(TABLES)
+        )
+        restore = [row["definition"] for row in indexes]
+        restore += [
+            f'ALTER TABLE {row["tbl"]} ADD CONSTRAINT "{row["conname"]}" {row["definition"]}' for row in foreign_keys
+        ]
+
+        async with conn.transaction():
+            for row in foreign_keys:
+                await conn.execute(f'ALTER TABLE {row["tbl"]} DROP CONSTRAINT "{row["conname"]}"')
+            for row in indexes:
+                await conn.execute(f"DROP INDEX {row['name']}")
+        logger.info(f"Dropped {len(foreign_keys)} foreign keys and {len(indexes)} indexes for the load")
+        return restore
+    finally:
+        await conn.close()
+
+
+async def seed_small_tables(args: argparse.Namespace) -> None:
+    """Аукционы и тесты - немного строк, одним COPY"""
+    dataset = Dataset(args)
+    conn = await asyncpg.connect(postgres_dsn())
+    try:
+        await conn.copy_records_to_table(
+            "auctions", records=[dataset.auction_row(a) for a in range(args.auctions)], columns=AUCTION_COLUMNS
+        )
+        await conn.copy_records_to_table(
+            "ab_tests", records=[dataset.ab_test_row(e) for e in range(args.experiments)], columns=AB_TEST_COLUMNS
+        )
+    finally:
+        await conn.close()
+
+
+async def restore(statements: List[str], parallel: int) -> None:
+    """Индексы (параллельно, по соединению на индекс), затем внешние ключи"""
+    semaphore = asyncio.Semaphore(parallel)
+
+    async def run(statement: str) -> None:
+        async with semaphore:
+            conn = await asyncpg.connect(postgres_dsn())
+            try:
+                await conn.execute(statement)
+            finally:
+                await conn.close()
+
+    indexes = [s for s in statements if not s.startswith("ALTER TABLE")]
+    foreign_keys = [s for s in statements if s.startswith("ALTER TABLE")]
+    started = time.monotonic()
+    await asyncio.gather(*(run(s) for s in indexes))
+    await asyncio.gather(*(run(s) for s in foreign_keys))
+    elapsed = time.monotonic() - started
+    logger.info(f"Restored {len(indexes)} indexes and {len(foreign_keys)} foreign keys in {elapsed:.1f}s")
+
+
+async def finalize(args: argparse.Namespace) -> None:
+    """Агрегаты засеянных строк и статистика планировщика"""
+    conn = await asyncpg.connect(postgres_dsn())
+    try:
+        first, last = USER_ID_OFFSET, USER_ID_OFFSET + args.users - 1
+        for statement in FINALIZE_SQL:
+            if "$3" in statement:
+                await conn.execute(statement, first, last, config.AUCTION_PRICE_STEP_PERCENT)
+            else:
+                await conn.execute(statement, first, last)
+        await conn.execute(f"ANALYZE {', '.join(TABLES)}")
+    finally:
+        await conn.close()
+
+
+async def warm_redis(args: argparse.Namespace) -> None:
+    """Таблицы лидеров, индекс ленты и состояние аукционов - из засеянной БД"""
+    from bot.infra.cache.auction_feed import auction_feed_index
+    from bot.infra.cache.leaderboard import leaderboards
+    from bot.infra.cache.redis_client import redis_client
+    from bot.infra.database.engine import database
+
+    try:
+        await leaderboards.rebuild(database.read_session)
+        await auction_feed_index.rebuild(database.read_session)
+
+        dataset = Dataset(args)
+        ids = [dataset.auction_id(a) for a in range(args.auctions)]
+        conn = await asyncpg.connect(postgres_dsn())
+        try:
+            rows = await conn.fetch(
+                "SELECT id, base_price, times_purchased, is_sold_out OR NOT is_active AS sold_out "
+                "FROM auctions WHERE id = ANY($1::text[])",
+                ids
+            )
+        finally:
+            await conn.close()
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for row in rows:
+                key = AUCTION_STATE_KEY.format(row["id"])
+                pipe.delete(key)
+                pipe.hset(key, mapping={
+                    "base_price": row["base_price"], "sold": row["times_purchased"], "sold_out": int(row["sold_out"])
+                })
+            await pipe.execute()
+    finally:
+        await database.dispose()
+        await redis_client.aclose()
+
+
+def run(args: argparse.Namespace) -> None:
+    started = time.monotonic()
+    statements = asyncio.run(prepare(args))
+    try:
+        asyncio.run(seed_small_tables(args))
+        tasks = [
+            *_chunks("users", args.users, args.chunk_size),
+            *_chunks("purchases", args.purchases, args.chunk_size),
+            *_chunks("exposures", args.users, args.chunk_size),
+        ]
+        rows = 0
+        # spawn: у каждого процесса чистые соединения и event loop
+        with ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {pool.submit(copy_chunk, args, *task): task for task in tasks}
+            for done, future in enumerate(as_completed(futures), 1):
+                rows += future.result()
+                elapsed = time.monotonic() - started
+                logger.info(f"{done}/{len(tasks)} chunks, {rows} rows, {rows / elapsed:,.0f} rows/s")
+    finally:
+        if statements:
+            asyncio.run(restore(statements, args.workers))
+
+    asyncio.run(finalize(args))
+    if args.redis:
+        asyncio.run(warm_redis(args))
+    logger.info(f"Seeded {args.users} users, {args.auctions} auctions, {args.purchases} purchases "
+                f"in {time.monotonic() - started:.0f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--auctions", type=int, default=None, help="по умолчанию users / 1000")
+    parser.add_argument("--purchases", type=int, default=None, help="по умолчанию равно users")
+    parser.add_argument("--experiments", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--start", default="2024-01-01", help="дата первого пользователя (фиксирована ради детерминизма)"
+    )
+    parser.add_argument("--days", type=int, default=365, help="пользователи приходят равномерно за столько дней")
+    parser.add_argument("--invite-ratio", type=float, default=0.35, help="доля пришедших по приглашению")
+    parser.add_argument("--referral-alpha", type=float, default=3.0, help="больше - рефералы сильнее у ранних")
+    parser.add_argument("--auction-alpha", type=float, default=3.0, help="больше - покупки сильнее в горячих лотах")
+    parser.add_argument("--exposure-ratio", type=float, default=0.5, help="доля пользователей в каждом тесте")
+    parser.add_argument("--en-ratio", type=float, default=0.25)
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument(
+        "--truncate", action="store_true", help="очистить засеваемые таблицы (и ссылающиеся на них) перед загрузкой"
+    )
+    parser.add_argument("--keep-indexes", action="store_true", help="не снимать FK и индексы на время загрузки")
+    parser.add_argument("--no-redis", dest="redis", action="store_false", help="не прогревать Redis")
+    args = parser.parse_args()
+    if args.auctions is None:
+        args.auctions = max(1, args.users // 1000)
+    if args.purchases is None:
+        args.purchases = args.users
+    if args.users + USER_ID_OFFSET > 2 ** 31 - 1:
+        parser.error("users.user_id is int4: too many users for the seed id range")
+
+    logging.basicConfig(level=logging.INFO)
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
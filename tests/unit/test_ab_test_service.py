@@ -0,0 +1,106 @@
+# tests/unit/test_ab_test_service.py
+
+from redis.exceptions import ConnectionError
+from bot.domain.services.ab_test_service import ExposureBuffer, assign_variant
+from bot.infra.queue import streams, tasks
+import orjson
+import pytest
+
+
+class FakeQueue:
+    """Вместо tasks.log_exposures / log_conversions: запоминает отправленное"""
+
+    def __init__(self):
+        self.failures = 0
+        self.exposures = []
+        self.conversions = []
+
+    def sink(self, events: list):
+        async def log(chunk):
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("redis is down")
+            events.extend(chunk)
+        return log
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    queue = FakeQueue()
+    monkeypatch.setattr(tasks, "log_exposures", queue.sink(queue.exposures))
+    monkeypatch.setattr(tasks, "log_conversions", queue.sink(queue.conversions))
+    return queue
+
+
+async def test_failed_flush_restores_events(queue):
+    buffer = ExposureBuffer(flush_size=2)
+    for user_id in range(3):
+        buffer.add_exposure("t1", user_id, "A")
+    buffer.add_conversion("t1", 1, "A", 10.0)
+
+    queue.failures = 3
+    await buffer.flush()
+    assert len(buffer) == 4
+    assert queue.exposures == queue.conversions == []
+
+    # Повторное воздействие после неудачи не дублируется, конверсия суммируется
+    buffer.add_exposure("t1", 0, "A")
+    buffer.add_conversion("t1", 1, "A", 5.0)
+    assert len(buffer) == 4
+
+    await buffer.flush()
+    assert len(buffer) == 0
+    assert sorted(key for key, _ in queue.exposures) == [("t1", 0), ("t1", 1), ("t1", 2)]
+    assert queue.conversions == [(("t1", 1), ("A", 15.0))]
+
+
+async def test_restored_chunk_goes_before_newer_events(queue):
+    buffer = ExposureBuffer(flush_size=10)
+    buffer.add_exposure("t1", 1, "A")
+    queue.failures = 1
+    await buffer.flush()
+
+    buffer.add_exposure("t1", 2, "B")
+    assert list(buffer._exposures) == [("t1", 1), ("t1", 2)]
+
+
+async def test_sent_exposures_are_not_sent_again(queue):
+    buffer = ExposureBuffer()
+    buffer.add_exposure("t1", 1, "A")
+    await buffer.flush()
+    buffer.add_exposure("t1", 1, "A")
+    assert len(buffer) == 0
+
+
+async def test_stop_flushes_buffer(queue):
+    buffer = ExposureBuffer(flush_interval=60)
+    await buffer.start()
+    buffer.add_exposure("t1", 1, "A")
+    await buffer.stop()
+    assert queue.exposures == [(("t1", 1), "A")]
+
+
+async def test_flush_enqueues_one_job_per_event(redis, monkeypatch):
+    monkeypatch.setattr(streams, "redis_client", redis)
+    buffer = ExposureBuffer()
+    buffer.add_exposure("t1", 1, "A")
+    buffer.add_exposure("t1", 2, "B")
+    buffer.add_conversion("t1", 2, "B", None)
+    await buffer.flush()
+
+    exposures = await redis.xrange(streams.stream_key(tasks.AB_EXPOSURE))
+    conversions = await redis.xrange(streams.stream_key(tasks.AB_CONVERSION))
+    assert [orjson.loads(fields[b"payload"])["user_id"] for _, fields in exposures] == [1, 2]
+    assert orjson.loads(conversions[0][1][b"payload"]) == {"test_id": "t1", "user_id": 2, "variant": "B", "value": None}
+
+
+def test_conversions_merge_values():
+    assert tasks.merge_conversion(("A", None), ("A", 3.0)) == ("A", 3.0)
+    assert tasks.merge_conversion(("A", 2.0), ("A", None)) == ("A", 2.0)
+    assert tasks.merge_conversion(("A", 2.0), ("A", 3.0)) == ("A", 5.0)
+
+
+def test_variant_assignment_is_stable():
+    variants = {assign_variant("exp", user_id) for user_id in range(1000)}
+    assert variants == {"A", "B"}
+    assert all(assign_variant("exp", user_id) == assign_variant("exp", user_id) for user_id in range(100))
@@ -0,0 +1,104 @@
+# tests/unit/test_anti_abuse.py
+
+from bot.app.middlewares import anti_abuse
+from bot.app.middlewares.anti_abuse import FLAGGED_KEY, REFERRAL_HLL_KEY, SKETCHES_KEY, AbuseDetector
+from redis.exceptions import RedisError
+import fakeredis
+import pytest
+import time
+
+
+def make_detector(node: str = "node-1", **overrides) -> AbuseDetector:
+    params = dict(
+        callback_threshold=10, callback_half_life=600.0, referral_threshold=4, referral_window=3600,
+        ban_ttl=300, width=256, depth=4,
+    )
+    params.update(overrides)
+    detector = AbuseDetector(**params)
+    detector.node = node
+    return detector
+
+
+@pytest.fixture
+def patched_redis(redis, monkeypatch):
+    monkeypatch.setattr(anti_abuse, "redis_client", redis)
+    return redis
+
+
+def test_callback_flagged_above_threshold_with_error_margin():
+    detector = make_detector(exempt=(7,))
+    # Порог считается с запасом на завышение count-min
+    assert not any(detector.observe_callback(1) for _ in range(10))
+    assert detector.observe_callback(1)
+    assert not detector.observe_callback(2)
+    assert not any(detector.observe_callback(7) for _ in range(50))
+
+
+def test_referral_counts_distinct_invitees():
+    detector = make_detector()
+    assert not any(detector.observe_referral("code", 1) for _ in range(10))
+    assert not detector.observe_referral("code", 2)
+    assert not detector.observe_referral("code", 3)
+    assert detector.observe_referral("code", 4)
+    assert not detector.observe_referral("other", 4)
+
+
+async def test_sync_shares_referrals_and_callbacks_across_nodes(patched_redis):
+    first, second = make_detector("node-1"), make_detector("node-2")
+    for user_id in (1, 2):
+        first.observe_referral("code", user_id)
+    for user_id in (3, 4):
+        second.observe_referral("code", user_id)
+    for _ in range(6):
+        first.observe_callback(100)
+        second.observe_callback(100)
+
+    await first.sync()
+    await second.sync()
+    window = int(time.time() // 3600)
+    assert await patched_redis.pfcount(REFERRAL_HLL_KEY.format(window, "code")) == 4
+    assert set(await patched_redis.hkeys(SKETCHES_KEY)) == {b"node-1", b"node-2"}
+
+    # Второй процесс видит общий HyperLogLog и нажатия первого
+    assert second.observe_referral("code", 5)
+    assert second.observe_callback(100)
+    assert not first.observe_callback(100)
+
+
+async def test_sync_drops_stale_nodes(patched_redis):
+    detector = make_detector(sync_interval=5.0)
+    await patched_redis.hset(SKETCHES_KEY, "dead", f"{time.time() - 60}\n".encode() + b"\0" * 16)
+    await detector.sync()
+    assert await patched_redis.hkeys(SKETCHES_KEY) == [b"node-1"]
+
+
+async def test_failed_sync_keeps_pending_referrals(patched_redis, monkeypatch):
+    detector = make_detector()
+    detector.observe_referral("code", 1)
+    detector.observe_referral("code", 2)
+
+    down = fakeredis.FakeServer()
+    down.connected = False
+    monkeypatch.setattr(anti_abuse, "redis_client", fakeredis.FakeAsyncRedis(server=down))
+    with pytest.raises(RedisError):
+        await detector.sync()
+    detector.observe_referral("code", 3)
+    assert detector._pending_count == 3
+
+    monkeypatch.setattr(anti_abuse, "redis_client", patched_redis)
+    await detector.sync()
+    window = int(time.time() // 3600)
+    assert await patched_redis.pfcount(REFERRAL_HLL_KEY.format(window, "code")) == 3
+    assert detector._pending_count == 0
+
+
+async def test_ban_and_freeze_write_flags_once(patched_redis):
+    detector = make_detector()
+    await detector.ban_user(42, "callback_spam")
+    await detector.ban_user(42, "callback_spam")
+    await detector.freeze_code("code", "referral_farming")
+
+    assert await patched_redis.get("user_banned:42") == b"1"
+    assert 0 < await patched_redis.ttl("user_banned:42") <= 300
+    assert 0 < await patched_redis.ttl("referral_frozen:code") <= 3600
+    assert set(await patched_redis.hkeys(FLAGGED_KEY)) == {b"42", b"ref:code"}
@@ -0,0 +1,150 @@
+# tests/unit/test_auction_feed.py
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+from bot.domain.services.auction_feed_service import AuctionFeedService
+from bot.infra.cache import auction_feed
+from bot.infra.cache.auction_feed import READY_KEY, AuctionFeedIndex, parse_cursor
+from bot.infra.database.models import Auction, Base, User
+import pytest
+import uuid
+
+START = datetime(2024, 1, 1)
+
+
+def make_auction(n: int, price: int, **overrides) -> SimpleNamespace:
+    fields = dict(
+        id=str(uuid.UUID(int=n)),
+        created_at=START + timedelta(minutes=n),
+        current_price=price,
+        description=f"Lot {n}",
+    )
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+# Повторяющиеся цены: порядок внутри равных - по id
+AUCTIONS = [make_auction(n, price) for n, price in enumerate([300, 100, 200, 100, 500, 100, 200, 50], start=1)]
+
+
+def expected(sort: str):
+    if sort == "new":
+        ordered = sorted(AUCTIONS, key=lambda a: (a.created_at, a.id), reverse=True)
+    else:
+        ordered = sorted(AUCTIONS, key=lambda a: (a.current_price, a.id))
+    return [a.id for a in ordered]
+
+
+async def all_pages(page, sort: str, limit: int):
+    """Пройти ленту по курсорам: [(ids страницы, курсор следующей)]"""
+    pages, cursor = [], None
+    while True:
+        entries, cursor = await page(sort, cursor, limit)
+        pages.append(([entry.auction_id for entry in entries], cursor))
+        if cursor is None:
+            return pages
+
+
+@pytest.fixture
+def index(redis, monkeypatch):
+    monkeypatch.setattr(auction_feed, "redis_client", redis)
+    return AuctionFeedIndex()
+
+
+@pytest.fixture
+async def filled(index, redis):
+    for auction in AUCTIONS:
+        await index.add(auction)
+    await redis.set(READY_KEY, 1)
+    return index
+
+
+@pytest.fixture
+async def session_factory():
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[User.__table__, Auction.__table__])
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with factory() as session:
+        async with session.begin():
+            for auction in AUCTIONS:
+                session.add(Auction(
+                    id=auction.id, created_at=auction.created_at, current_price=auction.current_price,
+                    description=auction.description, is_active=True, is_sold_out=False,
+                ))
+            # Не попадают в ленту
+            session.add(Auction(id=str(uuid.UUID(int=100)), current_price=1, is_active=False, created_at=START))
+            session.add(Auction(id=str(uuid.UUID(int=101)), current_price=1, is_sold_out=True, created_at=START))
+    yield factory
+    await engine.dispose()
+
+
+async def test_page_is_none_until_index_is_ready(index, redis):
+    await index.add(AUCTIONS[0])
+    assert await index.page("new") is None
+    await redis.set(READY_KEY, 1)
+    entries, cursor = await index.page("new")
+    assert [entry.card for entry in entries] == [{"description": "Lot 1"}]
+    assert cursor is None
+
+
+@pytest.mark.parametrize("sort", ["new", "price"])
+@pytest.mark.parametrize("limit", [1, 3, 4, 8, 20])
+async def test_cursor_pages_cover_feed_once_in_order(filled, sort, limit):
+    pages = await all_pages(filled.page, sort, limit)
+    ids = [auction_id for page_ids, _ in pages for auction_id in page_ids]
+    assert ids == expected(sort)
+    assert all(len(page_ids) == limit for page_ids, _ in pages[:-1])
+    # Страница ровно на границе: has_more только при лишнем элементе
+    assert pages[-1][0], "последняя страница не пустая"
+    for page_ids, cursor in pages[:-1]:
+        assert parse_cursor(cursor)[1] == page_ids[-1]
+
+
+async def test_price_only_grows(filled):
+    cheapest = AUCTIONS[-1]
+    await filled.set_price(cheapest.id, 40)
+    entries, _ = await filled.page("price", limit=1)
+    assert (entries[0].auction_id, entries[0].price) == (cheapest.id, 50)
+
+    await filled.set_price(cheapest.id, 1000)
+    entries, _ = await filled.page("price", limit=len(AUCTIONS))
+    assert (entries[-1].auction_id, entries[-1].price) == (cheapest.id, 1000)
+    # Порядок по новизне не меняется
+    newest, _ = await filled.page("new", limit=1)
+    assert newest[0].auction_id == cheapest.id
+
+    await filled.set_price(str(uuid.UUID(int=999)), 10)
+    assert len((await filled.page("price", limit=20))[0]) == len(AUCTIONS)
+
+
+async def test_upsert_and_remove(filled, redis):
+    moved = AUCTIONS[0]
+    await filled.add(make_auction(1, 10, description="Updated"))
+    entries, _ = await filled.page("price", limit=1)
+    assert (entries[0].auction_id, entries[0].price, entries[0].card) == (moved.id, 10, {"description": "Updated"})
+
+    await filled.remove(moved.id)
+    for sort in ("new", "price"):
+        entries, _ = await filled.page(sort, limit=20)
+        assert moved.id not in [entry.auction_id for entry in entries]
+    assert await redis.zcard("auction_feed:new") == len(AUCTIONS) - 1
+
+
+@pytest.mark.parametrize("sort", ["new", "price"])
+async def test_database_pages_match_redis_pages(index, redis, session_factory, sort):
+    assert await index.rebuild(session_factory, chunk_size=3) == len(AUCTIONS)
+    feed = AuctionFeedService(session_factory)
+    for limit in (1, 3, 8):
+        from_redis = await all_pages(index.page, sort, limit)
+        from_db = await all_pages(feed._page_from_db, sort, limit)
+        assert from_db == from_redis
+        assert [i for page_ids, _ in from_db for i in page_ids] == expected(sort)
+
+
+def test_parse_cursor_rejects_foreign_values():
+    assert parse_cursor("0000000100:" + str(uuid.UUID(int=1))) is not None
+    assert parse_cursor("100:" + str(uuid.UUID(int=1))) is None
+    assert parse_cursor("0000000100:x' OR 1=1") is None
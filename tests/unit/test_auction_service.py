@@ -0,0 +1,274 @@
+# tests/unit/test_auction_service.py
+
+from types import SimpleNamespace
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql import Delete, Insert, Select
+from bot.domain.services import auction_service as service_module
+from bot.domain.services.auction_service import (
+    AUCTION_STATE_KEY, PURCHASE_IDEMPOTENCY_KEY, RELEASE_SCRIPT, RESERVE_SCRIPT,
+    AuctionService, PurchaseStatus, calculate_price
+)
+import asyncio
+import pytest
+
+STATE = AUCTION_STATE_KEY.format("lot")
+
+
+def idem(key: str) -> str:
+    return PURCHASE_IDEMPOTENCY_KEY.format(key)
+
+
+def rows_of(params, width):
+    flat = [params[f"param_{i}"] for i in range(1, len(params) + 1) if f"param_{i}" in params]
+    return [tuple(flat[i:i + width]) for i in range(0, len(flat), width)]
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def scalars(self):
+        return iter(self.rows)
+
+    def all(self):
+        return self.rows
+
+    def one_or_none(self):
+        return self.rows[0] if self.rows else None
+
+    def scalar_one(self):
+        return self.rows[0]
+
+
+class FakeSession:
+    """Запросы движка покупок над таблицами в памяти (SQL - для Postgres)"""
+
+    def __init__(self, db: "FakeDatabase"):
+        self.db = db
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def begin(self):
+        return self
+
+    async def execute(self, statement):
+        db = self.db
+        if db.down:
+            raise ConnectionError("database is down")
+        params = statement.compile(dialect=postgresql.dialect()).params
+        table = getattr(statement, "table", None)
+
+        if isinstance(statement, Insert):
+            inserted = []
+            for i in range(len(params)):
+                key = params.get(f"idempotency_key_m{i}")
+                if key is not None and key not in db.purchases:
+                    db.purchases[key] = {
+                        "user_id": params[f"user_id_m{i}"], "auction_id": params[f"auction_id_m{i}"], "price": None
+                    }
+                    inserted.append(key)
+            return FakeResult(inserted)
+
+        if isinstance(statement, Select):
+            if "user_id_1" in params:
+                return FakeResult([(u, db.users[u]) for u in sorted(params["user_id_1"]) if u in db.users])
+            if "auction_id_1" in params:
+                auction_id = params["auction_id_1"]
+                return FakeResult([sum(p["auction_id"] == auction_id for p in db.purchases.values())])
+            ids = params["id_1"]
+            if isinstance(ids, str):
+                return FakeResult([SimpleNamespace(**db.auctions[ids])] if ids in db.auctions else [])
+            return FakeResult([SimpleNamespace(id=i, **db.auctions[i]) for i in sorted(ids) if i in db.auctions])
+
+        if isinstance(statement, Delete):
+            for key in params["idempotency_key_1"]:
+                db.purchases.pop(key, None)
+        elif table.name == "purchases":
+            for key, price in rows_of(params, 2):
+                db.purchases[key]["price"] = price
+        elif table.name == "users":
+            for user_id, total in rows_of(params, 2):
+                db.users[user_id] -= total
+        elif "is_sold_out" in params:
+            db.auctions[params["id_1"]]["is_sold_out"] = True
+        else:
+            for auction_id, times, price in rows_of(params, 3):
+                db.auctions[auction_id].update(times_purchased=times, current_price=price)
+        return FakeResult([])
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.down = False
+        self.users = {}
+        self.purchases = {}
+        self.auctions = {}
+
+    def __call__(self):
+        return FakeSession(self)
+
+    def add_auction(self, auction_id="lot", base_price=100, times_purchased=0, **flags):
+        self.auctions[auction_id] = dict(
+            base_price=base_price, times_purchased=times_purchased,
+            current_price=calculate_price(base_price, times_purchased),
+            is_active=flags.get("is_active", True), is_sold_out=flags.get("is_sold_out", False),
+        )
+
+
+@pytest.fixture
+def db():
+    db = FakeDatabase()
+    db.add_auction()
+    db.users.update({1: 1000, 2: 1000, 3: 50})
+    return db
+
+
+@pytest.fixture
+async def service(redis, db, monkeypatch):
+    monkeypatch.setattr(service_module, "redis_client", redis)
+    prices, balances = [], []
+
+    async def set_price(auction_id, price):
+        prices.append((auction_id, price))
+
+    async def incr(user_id, metric, amount):
+        balances.append((user_id, amount))
+
+    monkeypatch.setattr(service_module.auction_feed_index, "set_price", set_price)
+    monkeypatch.setattr(service_module.leaderboards, "incr", incr)
+    service = AuctionService(db)
+    service.writer.flush_interval = 0.005
+    service.feed_prices, service.leaderboard = prices, balances
+    await service.start()
+    yield service
+    await service.stop()
+
+
+async def test_reserve_numbers_and_rejects_duplicates(redis):
+    assert await RESERVE_SCRIPT([STATE, idem("a")], [60]) == [-2]
+    await redis.hset(STATE, mapping={"base_price": 100, "sold": 3, "sold_out": 0})
+
+    assert await RESERVE_SCRIPT([STATE, idem("a")], [60]) == [3, 100]
+    assert await RESERVE_SCRIPT([STATE, idem("a")], [60]) == [-1]
+    assert await RESERVE_SCRIPT([STATE, idem("b")], [60]) == [4, 100]
+    assert 0 < await redis.ttl(idem("a")) <= 60
+
+    await redis.hset(STATE, "sold_out", 1)
+    assert await RESERVE_SCRIPT([STATE, idem("c")], [60]) == [-3]
+    assert await redis.exists(idem("c")) == 0
+
+
+async def test_release_returns_only_the_last_number(redis):
+    await redis.hset(STATE, mapping={"base_price": 100, "sold": 0, "sold_out": 0})
+    await RESERVE_SCRIPT([STATE, idem("a")], [60])
+    await RESERVE_SCRIPT([STATE, idem("b")], [60])
+
+    # После "a" резервировали - номер не возвращается, ключ удаляется
+    assert await RELEASE_SCRIPT([STATE, idem("a")], [0, 0]) == 0
+    assert await redis.hget(STATE, "sold") == b"2"
+    assert await redis.exists(idem("a")) == 0
+
+    # Дубликат из БД: ключ идемпотентности остаётся
+    assert await RELEASE_SCRIPT([STATE, idem("b")], [1, 1]) == 1
+    assert await redis.hget(STATE, "sold") == b"1"
+    assert await redis.exists(idem("b")) == 1
+
+
+async def test_purchases_in_one_batch_pay_rising_prices(service, db, redis):
+    results = await asyncio.gather(
+        service.purchase(1, "lot", "k1"),
+        service.purchase(2, "lot", "k2"),
+    )
+    # Порядок резервов - порядок цен внутри пачки
+    assert results == [(PurchaseStatus.OK, 100), (PurchaseStatus.OK, 110)]
+    assert db.auctions["lot"]["times_purchased"] == 2
+    assert db.auctions["lot"]["current_price"] == 120
+    assert (db.users[1], db.users[2]) == (900, 890)
+    assert {key: p["price"] for key, p in db.purchases.items()} == {"k1": 100, "k2": 110}
+    assert sorted(service.leaderboard) == [(1, -100), (2, -110)]
+    assert service.feed_prices[-1] == ("lot", 120)
+
+
+async def test_duplicate_key_is_answered_from_redis(service, db):
+    assert await service.purchase(1, "lot", "k1") == (PurchaseStatus.OK, 100)
+    db.down = True
+    assert await service.purchase(1, "lot", "k1") == (PurchaseStatus.DUPLICATE, None)
+    assert db.users[1] == 900
+
+
+async def test_lost_idempotency_key_is_caught_by_database(service, db, redis):
+    assert await service.purchase(1, "lot", "k1") == (PurchaseStatus.OK, 100)
+    await redis.delete(idem("k1"))
+    assert await service.purchase(1, "lot", "k1") == (PurchaseStatus.DUPLICATE, None)
+    assert db.users[1] == 900
+    # Ключ восстановлен, номер резерва возвращён
+    assert await redis.exists(idem("k1")) == 1
+    assert await redis.hget(STATE, "sold") == b"1"
+
+
+async def test_insufficient_funds_releases_reservation(service, db, redis):
+    assert await service.purchase(3, "lot", "poor") == (PurchaseStatus.INSUFFICIENT_FUNDS, None)
+    assert await redis.hget(STATE, "sold") == b"0"
+    assert await redis.exists(idem("poor")) == 0
+    assert "poor" not in db.purchases
+
+    # Тот же ключ после пополнения - обычная покупка
+    db.users[3] = 100
+    assert await service.purchase(3, "lot", "poor") == (PurchaseStatus.OK, 100)
+
+
+async def test_unpaid_reservation_does_not_skip_a_price_step(service, db):
+    results = await asyncio.gather(
+        service.purchase(3, "lot", "poor"),
+        service.purchase(1, "lot", "k1"),
+    )
+    assert results == [(PurchaseStatus.INSUFFICIENT_FUNDS, None), (PurchaseStatus.OK, 100)]
+    assert db.auctions["lot"]["times_purchased"] == 1
+
+
+async def test_missing_state_is_loaded_from_database(service, db, redis):
+    # times_purchased отстал от покупок: номер резерва - от большего
+    db.auctions["lot"]["times_purchased"] = 1
+    for key in ("old1", "old2", "old3"):
+        db.purchases[key] = {"user_id": 2, "auction_id": "lot", "price": 100}
+
+    assert await service.purchase(1, "lot", "k1") == (PurchaseStatus.OK, 110)
+    assert await redis.hgetall(STATE) == {b"base_price": b"100", b"sold": b"4", b"sold_out": b"0"}
+
+
+async def test_unknown_auction_is_not_found(service, db, redis):
+    assert await service.purchase(1, "missing", "k1") == (PurchaseStatus.NOT_FOUND, None)
+    assert await redis.exists(AUCTION_STATE_KEY.format("missing")) == 0
+
+
+async def test_sold_out_is_rejected_before_the_writer(service, db, redis, monkeypatch):
+    db.add_auction("gone", is_sold_out=True)
+    assert await service.purchase(1, "gone", "k1") == (PurchaseStatus.SOLD_OUT, None)
+
+    removed = []
+
+    async def remove(auction_id):
+        removed.append(auction_id)
+
+    monkeypatch.setattr(service_module.auction_feed_index, "remove", remove)
+    assert await service.purchase(1, "lot", "k2") == (PurchaseStatus.OK, 100)
+    await service.set_sold_out("lot")
+    assert await service.purchase(1, "lot", "k3") == (PurchaseStatus.SOLD_OUT, None)
+    assert db.auctions["lot"]["is_sold_out"] is True
+    assert removed == ["lot"]
+
+
+async def test_failed_batch_releases_reservation(service, db, redis):
+    await service.purchase(1, "lot", "k1")
+    db.down = True
+    with pytest.raises(ConnectionError):
+        await service.purchase(1, "lot", "k2")
+    assert await redis.hget(STATE, "sold") == b"1"
+    assert await redis.exists(idem("k2")) == 0
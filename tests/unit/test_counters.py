@@ -0,0 +1,171 @@
+# tests/unit/test_counters.py
+
+from collections import defaultdict
+from bot.infra.cache import counters as counters_module
+from bot.infra.cache.counters import BATCHES_KEY, COUNTER_COLUMNS, DIRTY_KEY, HotCounters
+import pytest
+
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar_one_or_none(self):
+        return self.value
+
+
+class FakeTransaction:
+    def __init__(self, db: "FakeDatabase"):
+        self.db = db
+        self.logged = set()
+        self.changes = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, *exc):
+        # Коммит - только если транзакция дошла до конца без ошибки
+        if exc_type is None:
+            self.db.logged |= self.logged
+            for user_id, deltas in self.changes:
+                for name, delta in deltas.items():
+                    self.db.users[user_id][name] += delta
+        return False
+
+
+class FakeSession:
+    def __init__(self, db: "FakeDatabase"):
+        self.db = db
+        self.tx = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def begin(self):
+        self.tx = FakeTransaction(self.db)
+        return self.tx
+
+    async def execute(self, statement):
+        if self.db.failures:
+            self.db.failures -= 1
+            raise ConnectionError("database is down")
+
+        params = statement.compile().params
+        if statement.table.name == "counter_flushes":
+            batch_id = params["batch_id"]
+            if batch_id in self.db.logged or batch_id in self.tx.logged:
+                return FakeResult(None)
+            self.tx.logged.add(batch_id)
+            return FakeResult(batch_id)
+
+        # UPDATE users ... FROM (VALUES (user_id, колонки...))
+        names = list(COUNTER_COLUMNS)
+        flat = [params[f"param_{i}"] for i in range(1, len(params)) if f"param_{i}" in params]
+        for i in range(0, len(flat), len(names) + 1):
+            user_id, *deltas = flat[i:i + len(names) + 1]
+            self.tx.changes.append((user_id, dict(zip(names, deltas))))
+        return FakeResult(None)
+
+
+class FakeDatabase:
+    """session_factory с журналом пачек и колонками users в памяти"""
+
+    def __init__(self):
+        self.failures = 0
+        self.logged = set()
+        self.users = defaultdict(lambda: defaultdict(int))
+
+    def __call__(self):
+        return FakeSession(self)
+
+
+@pytest.fixture
+def db():
+    return FakeDatabase()
+
+
+@pytest.fixture
+def counters(redis, db, monkeypatch):
+    monkeypatch.setattr(counters_module, "redis_client", redis)
+    return HotCounters(db, batch_size=2)
+
+
+async def test_flush_writes_summed_deltas_and_clears_redis(counters, db, redis):
+    for user_id in (1, 2, 3):
+        await counters.incr(user_id, {"soft_currency": 10, "total_revenue": 1.5})
+    await counters.incr(1, {"soft_currency": -4, "total_referrals": 1})
+
+    assert await counters.pending(1) == {"soft_currency": 6, "total_revenue": 1.5, "total_referrals": 1}
+    # Пачки по batch_size пользователей
+    assert await counters.flush() == 3
+    assert len(db.logged) == 2
+
+    assert db.users[1]["soft_currency"] == 6
+    assert db.users[1]["total_referrals"] == 1
+    assert db.users[3]["total_revenue"] == pytest.approx(1.5)
+    assert await counters.pending(1) == {}
+    assert await redis.smembers(BATCHES_KEY) == set()
+    assert await redis.smembers(DIRTY_KEY) == set()
+
+
+async def test_failed_write_keeps_claimed_batch(counters, db, redis, monkeypatch):
+    await counters.incr(1, {"soft_currency": 10})
+    db.failures = 1
+    assert await counters.flush() == 0
+
+    # Пачка забрана, но не подтверждена: данные в Redis и видны при чтении
+    assert len(await redis.smembers(BATCHES_KEY)) == 1
+    assert await counters.pending(1) == {"soft_currency": 10}
+    assert db.users[1]["soft_currency"] == 0
+
+    # Свежую пачку дописывает её процесс; устаревшую - следующий flush
+    await counters.flush()
+    assert db.users[1]["soft_currency"] == 0
+    monkeypatch.setattr(counters_module, "STALE_BATCH_AGE", -1)
+    await counters.flush()
+    assert db.users[1]["soft_currency"] == 10
+    assert await redis.smembers(BATCHES_KEY) == set()
+
+
+async def test_retry_of_written_batch_is_idempotent(counters, db, redis, monkeypatch):
+    await counters.incr(1, {"soft_currency": 10})
+    await counters.incr(2, {"hard_currency": 1})
+
+    # Запись прошла, а процесс упал до удаления пачки из Redis
+    async def lost_cleanup(batch_id):
+        raw = await redis.hgetall(counters_module.BATCH_KEY.format(batch_id))
+        rows = defaultdict(dict)
+        for field, value in raw.items():
+            user_id, name = field.decode().split(":", 1)
+            rows[int(user_id)][name] = counters_module._parse(name, value)
+        await counters._apply_batch(batch_id, dict(rows))
+        return False
+
+    counters._write_batch = lost_cleanup
+    await counters.flush()
+    assert db.users[1]["soft_currency"] == 10
+    del counters._write_batch
+
+    monkeypatch.setattr(counters_module, "STALE_BATCH_AGE", -1)
+    await counters.flush()
+    assert db.users[1]["soft_currency"] == 10
+    assert db.users[2]["hard_currency"] == 1
+    assert await redis.smembers(BATCHES_KEY) == set()
+
+
+async def test_flush_users_claims_only_given_users(counters, db, redis):
+    for user_id in (1, 2, 3):
+        await counters.incr(user_id, {"soft_currency": user_id})
+
+    await counters.flush_users([1, 3, 4])
+    assert (db.users[1]["soft_currency"], db.users[3]["soft_currency"]) == (1, 3)
+    assert db.users[2]["soft_currency"] == 0
+    assert await redis.smembers(DIRTY_KEY) == {b"2"}
+
+
+async def test_unknown_column_is_rejected(counters):
+    with pytest.raises(ValueError):
+        await counters.incr(1, {"factory_level": 1})
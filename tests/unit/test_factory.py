@@ -0,0 +1,84 @@
+# tests/unit/test_factory.py
+
+from datetime import datetime, timedelta
+from bot.domain.models.factory import FactoryState, level_capacity, production_rate
+import pytest
+
+START = datetime(2024, 1, 1)
+
+
+def simulate(state: FactoryState, seconds: int) -> FactoryState:
+    """Посекундный расчёт - то, что делал бы периодический пересчёт"""
+    level, capacity, stock = state.level, state.capacity, state.stock
+    upgrade_at = state.upgrade_at
+    for second in range(seconds):
+        now = state.settled_at + timedelta(seconds=second)
+        if upgrade_at is not None and upgrade_at <= now:
+            level += 1
+            capacity = max(capacity, level_capacity(level))
+            upgrade_at = None
+        stock = min(float(capacity), stock + production_rate(level, state.workers))
+    settled_at = state.settled_at + timedelta(seconds=seconds)
+    return FactoryState(level, capacity, state.workers, stock, settled_at, upgrade_at)
+
+
+def make_state(**overrides) -> FactoryState:
+    params = dict(level=1, capacity=level_capacity(1), workers=3, stock=0.0, settled_at=START)
+    params.update(overrides)
+    return FactoryState(**params)
+
+
+@pytest.mark.parametrize("capacity", [level_capacity(1), 10 ** 6])
+@pytest.mark.parametrize("seconds", [1, 59, 3600, 3 * 24 * 3600])
+def test_settle_matches_simulation(seconds, capacity):
+    expected = simulate(make_state(capacity=capacity), seconds)
+    state = make_state(capacity=capacity).settle(START + timedelta(seconds=seconds))
+    assert state.stock == pytest.approx(expected.stock)
+    assert state.stock <= state.capacity
+    assert state.settled_at == expected.settled_at
+
+
+@pytest.mark.parametrize("capacity", [level_capacity(1), 10 ** 6])
+@pytest.mark.parametrize("upgrade_after", [0, 1800, 5400])
+def test_settle_with_upgrade_inside_interval(upgrade_after, capacity):
+    state = dict(capacity=capacity, upgrade_at=START + timedelta(seconds=upgrade_after))
+    expected = simulate(make_state(**state), 7200)
+    settled = make_state(**state).settle(START + timedelta(seconds=7200))
+
+    assert settled.level == expected.level == 2
+    assert settled.capacity == expected.capacity
+    assert settled.upgrade_at is None
+    assert settled.stock == pytest.approx(expected.stock)
+
+
+def test_upgrade_in_future_keeps_old_rate():
+    upgrade_at = START + timedelta(hours=5)
+    state = make_state(capacity=10 ** 6, upgrade_at=upgrade_at).settle(START + timedelta(hours=1))
+    assert state.level == 1
+    assert state.upgrade_at == upgrade_at
+    assert state.stock == pytest.approx(production_rate(1, 3) * 3600)
+
+
+def test_settle_in_steps_equals_single_settle():
+    upgrade_at = START + timedelta(minutes=95)
+    stepwise = make_state(capacity=10 ** 6, upgrade_at=upgrade_at)
+    for minutes in range(7, 240, 13):
+        stepwise.settle(START + timedelta(minutes=minutes))
+    stepwise.settle(START + timedelta(minutes=240))
+
+    once = make_state(capacity=10 ** 6, upgrade_at=upgrade_at).settle(START + timedelta(minutes=240))
+    assert stepwise.level == once.level
+    assert stepwise.stock == pytest.approx(once.stock)
+
+
+def test_settle_in_past_changes_nothing():
+    state = make_state(stock=5.0, settled_at=START + timedelta(hours=1)).settle(START)
+    assert state.stock == 5.0
+    assert state.settled_at == START + timedelta(hours=1)
+
+
+def test_take_leaves_fraction_in_stock():
+    state = make_state(stock=12.75)
+    assert state.take() == 12
+    assert state.stock == pytest.approx(0.75)
+    assert state.take() == 0
@@ -0,0 +1,127 @@
+# tests/unit/test_fsm_storage.py
+
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+from bot.infra.cache.fsm_storage import CompactRedisStorage, pack_data, unpack_data
+import pytest
+
+KEY = StorageKey(bot_id=1, chat_id=10, user_id=20)
+OTHER = StorageKey(bot_id=1, chat_id=11, user_id=21, thread_id=5, destiny="quiz")
+
+
+class Form(StatesGroup):
+    name = State()
+
+
+class CallLog:
+    """Счётчик чтений и транзакций поверх клиента"""
+
+    def __init__(self, redis):
+        self.reads = 0
+        self.transactions = []
+        hmget, pipeline = redis.hmget, redis.pipeline
+
+        async def counting_hmget(*args, **kwargs):
+            self.reads += 1
+            return await hmget(*args, **kwargs)
+
+        def counting_pipeline(*args, **kwargs):
+            self.transactions.append(kwargs.get("transaction", True))
+            return pipeline(*args, **kwargs)
+
+        redis.hmget = counting_hmget
+        redis.pipeline = counting_pipeline
+
+
+@pytest.fixture
+def storage(redis):
+    return CompactRedisStorage(redis, ttl=60)
+
+
+@pytest.fixture
+def calls(redis):
+    return CallLog(redis)
+
+
+def test_redis_key_layout(storage):
+    assert storage.redis_key(KEY) == "fsm:10:20"
+    assert storage.redis_key(OTHER) == "fsm:11:5:21:quiz"
+
+
+async def test_primed_values_are_read_without_redis(storage, calls, redis):
+    async with storage.batch():
+        storage.prime(KEY, b"Form:name", pack_data({"step": 1}))
+        assert await storage.get_state(KEY) == "Form:name"
+        assert await storage.get_data(KEY) == {"step": 1}
+        assert await storage.update_data(KEY, {"name": "Bob"}) == {"step": 1, "name": "Bob"}
+        # Запись - только на выходе из batch
+        assert await redis.exists("fsm:10:20") == 0
+    assert calls.reads == 0
+    assert calls.transactions == [True]
+    assert unpack_data(await redis.hget("fsm:10:20", "d")) == {"step": 1, "name": "Bob"}
+    assert await redis.hget("fsm:10:20", "s") is None
+
+
+async def test_batch_reads_once_and_keeps_pending_changes(storage, calls, redis):
+    await redis.hset("fsm:10:20", mapping={"s": "Form:name", "d": pack_data({"step": 1})})
+    async with storage.batch():
+        await storage.set_state(KEY, None)
+        # Данные дочитываются, уже сменённое состояние не перетирается
+        assert await storage.get_data(KEY) == {"step": 1}
+        assert await storage.get_state(KEY) is None
+        assert await storage.get_data(KEY) == {"step": 1}
+    assert calls.reads == 1
+    assert await redis.hgetall("fsm:10:20") == {b"d": pack_data({"step": 1})}
+
+
+async def test_one_transaction_per_batch(storage, calls, redis):
+    async with storage.batch():
+        await storage.set_state(KEY, Form.name)
+        await storage.set_data(KEY, {"a": 1})
+        await storage.set_state(OTHER, "quiz:question")
+    assert calls.transactions == [True]
+    assert await redis.hget("fsm:10:20", "s") == b"Form:name"
+    assert await redis.hget("fsm:11:5:21:quiz", "s") == b"quiz:question"
+
+    # Только чтения - без записи
+    async with storage.batch():
+        await storage.get_state(KEY)
+    assert calls.transactions == [True]
+
+
+async def test_cleared_state_and_data_delete_the_hash(storage, redis):
+    await storage.set_state(KEY, Form.name)
+    await storage.set_data(KEY, {"a": 1})
+    async with storage.batch():
+        await storage.set_state(KEY, None)
+        await storage.set_data(KEY, {})
+    assert await redis.exists("fsm:10:20") == 0
+
+
+async def test_ttl_is_applied_on_write(storage, redis):
+    await storage.set_data(KEY, {"a": 1})
+    assert 0 < await redis.ttl("fsm:10:20") <= 60
+
+    no_ttl = CompactRedisStorage(redis)
+    await no_ttl.set_state(OTHER, "quiz:question")
+    assert await redis.ttl("fsm:11:5:21:quiz") == -1
+
+
+async def test_writes_outside_batch_go_straight_to_redis(storage, calls, redis):
+    await storage.set_state(KEY, Form.name)
+    assert await redis.hget("fsm:10:20", "s") == b"Form:name"
+    await storage.set_data(KEY, {"a": 1})
+    assert calls.transactions == [True, True]
+
+    # Без batch ничего не кэшируется
+    assert await storage.get_state(KEY) == "Form:name"
+    assert await storage.get_data(KEY) == {"a": 1}
+    assert calls.reads == 2
+
+
+async def test_batch_writes_even_if_handler_fails(storage, redis):
+    with pytest.raises(RuntimeError):
+        async with storage.batch():
+            await storage.set_state(KEY, Form.name)
+            raise RuntimeError("handler failed")
+    assert await redis.hget("fsm:10:20", "s") == b"Form:name"
@@ -0,0 +1,141 @@
+# tests/unit/test_job_queue.py
+
+from bot.core.config import config
+from bot.infra.queue import streams
+from bot.infra.queue.streams import DEAD_KEY, DELAYED_KEY, GROUP, JobQueue, stream_key
+import asyncio
+import pytest
+
+
+@pytest.fixture
+async def queue(redis, monkeypatch):
+    monkeypatch.setattr(streams, "redis_client", redis)
+    # Повторы и обслуживание - за миллисекунды
+    for name, value in {
+        "JOBS_RETRY_BASE": 0.01, "JOBS_RETRY_MAX": 0.05, "JOBS_POLL_INTERVAL": 0.01,
+        "JOBS_BLOCK_MS": 20, "JOBS_MAX_ATTEMPTS": 3, "JOBS_CLAIM_IDLE": 60000,
+    }.items():
+        monkeypatch.setattr(config, name, value)
+    queue = JobQueue(consumer="test")
+    yield queue
+    await queue.stop(timeout=1)
+
+
+async def wait_until(condition, timeout: float = 3.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not await condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+
+async def test_jobs_are_processed_in_batches_and_removed(queue, redis):
+    batches = []
+
+    @queue.handler("echo", batch_size=10)
+    async def echo(jobs):
+        batches.append([job.payload["n"] for job in jobs])
+
+    await queue.enqueue_many("echo", [{"n": n} for n in range(25)])
+    await queue.start()
+
+    async def done():
+        return sum(map(len, batches)) == 25
+    await wait_until(done)
+
+    assert max(map(len, batches)) == 10
+    assert sorted(n for batch in batches for n in batch) == list(range(25))
+    assert await redis.xlen(stream_key("echo")) == 0
+
+
+async def test_returned_jobs_are_retried_with_attempts(queue, redis):
+    seen = []
+
+    @queue.handler("flaky")
+    async def flaky(jobs):
+        seen.extend((job.payload, job.attempts) for job in jobs)
+        return [job for job in jobs if job.payload == "retry" and job.attempts == 0]
+
+    await queue.enqueue_many("flaky", ["ok", "retry"])
+    await queue.start()
+
+    async def done():
+        return len(seen) == 3
+    await wait_until(done)
+
+    assert sorted(seen) == [("ok", 0), ("retry", 0), ("retry", 1)]
+    assert await redis.zcard(DELAYED_KEY) == 0
+    assert await redis.xlen(DEAD_KEY) == 0
+
+
+async def test_failing_jobs_go_to_dead_letter_and_can_be_requeued(queue, redis):
+    calls = []
+
+    @queue.handler("broken")
+    async def broken(jobs):
+        calls.append([job.attempts for job in jobs])
+        raise RuntimeError("handler bug")
+
+    await queue.enqueue("broken", {"id": 1})
+    await queue.start()
+
+    async def dead():
+        return await redis.xlen(DEAD_KEY) == 1
+    await wait_until(dead)
+
+    # Исключение - повтор всей пачки; после max_attempts задача мёртвая
+    assert calls == [[0], [1], [2]]
+    [(_, fields)] = await redis.xrange(DEAD_KEY)
+    assert fields[b"type"] == b"broken"
+    assert fields[b"attempts"] == b"3"
+    assert b"handler bug" in fields[b"error"]
+
+    await queue.stop()
+    assert await queue.requeue_dead() == 1
+    assert await redis.xlen(DEAD_KEY) == 0
+    [(_, fields)] = await redis.xrange(stream_key("broken"))
+    assert fields[b"attempts"] == b"0"
+
+
+async def test_delayed_job_waits_for_its_time(queue, redis):
+    seen = []
+
+    @queue.handler("later")
+    async def later(jobs):
+        seen.extend(job.payload for job in jobs)
+
+    await queue.enqueue("later", "now")
+    await queue.enqueue("later", "later", delay=0.3)
+    await queue.start()
+
+    async def first():
+        return seen == ["now"]
+    await wait_until(first)
+    assert await redis.zcard(DELAYED_KEY) == 1
+
+    async def second():
+        return seen == ["now", "later"]
+    await wait_until(second)
+
+
+async def test_jobs_of_dead_worker_are_claimed(queue, redis, monkeypatch):
+    seen = []
+
+    @queue.handler("orphan")
+    async def orphan(jobs):
+        seen.extend((job.payload, job.attempts) for job in jobs)
+
+    await redis.xgroup_create(stream_key("orphan"), GROUP, id="0", mkstream=True)
+    await queue.enqueue("orphan", "stalled")
+    # Другой воркер прочитал задачу и упал, не подтвердив
+    await redis.xreadgroup(GROUP, "crashed", {stream_key("orphan"): ">"}, count=10)
+
+    monkeypatch.setattr(config, "JOBS_CLAIM_IDLE", 0)
+    await queue.start()
+
+    async def claimed():
+        return seen == [("stalled", 1)]
+    await wait_until(claimed)
+
+    async def acknowledged():
+        return await redis.xlen(stream_key("orphan")) == 0
+    await wait_until(acknowledged)
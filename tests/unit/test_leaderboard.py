@@ -0,0 +1,133 @@
+# tests/unit/test_leaderboard.py
+
+from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+from bot.domain.services.leaderboard_service import LeaderboardService
+from bot.infra.cache import leaderboard, two_tier
+from bot.infra.cache.leaderboard import LANG_KEY, LANG_SCRIPT, Leaderboards, current_week
+from bot.infra.database.models import Base, ReferralAncestor, User
+import pytest
+
+WEEK = f"lb:total_referrals:week:{current_week()}"
+
+
+@pytest.fixture
+def boards(redis, monkeypatch):
+    monkeypatch.setattr(leaderboard, "redis_client", redis)
+    return Leaderboards()
+
+
+@pytest.fixture
+async def session_factory():
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[User.__table__, ReferralAncestor.__table__])
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    now, old = datetime.utcnow(), datetime.utcnow() - timedelta(days=30)
+    async with factory() as session:
+        async with session.begin():
+            session.add_all([
+                User(user_id=1, first_name="Ann", language="en", factory_level=5, soft_currency=100,
+                     total_referrals=2, created_at=old),
+                User(user_id=2, username="bob", language="ru", factory_level=3, soft_currency=300,
+                     total_referrals=1, created_at=now),
+                User(user_id=3, language=None, factory_level=1, soft_currency=0, total_referrals=0, created_at=now),
+            ])
+            # 2 и 3 пришли на этой неделе, 3 - через 2
+            session.add_all([
+                ReferralAncestor(ancestor_id=1, descendant_id=2, depth=1),
+                ReferralAncestor(ancestor_id=2, descendant_id=3, depth=1),
+                ReferralAncestor(ancestor_id=1, descendant_id=3, depth=2),
+            ])
+    yield factory
+    await engine.dispose()
+
+
+async def scores(redis, key):
+    return {int(member): score for member, score in await redis.zrange(key, 0, -1, withscores=True)}
+
+
+async def test_update_script_applies_set_incr_and_weekly_gain(boards, redis):
+    await redis.hset(LANG_KEY, 1, "en")
+    await boards.record([
+        ("factory_level", 1, "set", 5, 1),
+        ("soft_currency", 1, "incr", 100, 100),
+        ("soft_currency", 1, "incr", -30, 0),
+        ("soft_currency", 2, "incr", 50, 50),
+    ])
+
+    assert await scores(redis, "lb:factory_level:global") == {1: 5}
+    assert await scores(redis, "lb:soft_currency:global") == {1: 70, 2: 50}
+    # Пользователь без языка - только в общей таблице
+    assert await scores(redis, "lb:soft_currency:lang:en") == {1: 70}
+    # В недельную идёт только прирост
+    weekly = f"lb:soft_currency:week:{current_week()}"
+    assert await scores(redis, weekly) == {1: 100, 2: 50}
+    assert 0 < await redis.ttl(weekly) <= 2 * 7 * 86400
+
+    await boards.set(1, "factory_level", 6, gained=1)
+    assert await scores(redis, "lb:factory_level:lang:en") == {1: 6}
+    assert await scores(redis, f"lb:factory_level:week:{current_week()}") == {1: 2}
+
+
+async def test_lang_script_moves_user_between_language_boards(boards, redis):
+    await boards.incr_many("soft_currency", {1: 40, 2: 10})
+    await boards.set_language(1, "ru")
+    assert await scores(redis, "lb:soft_currency:lang:ru") == {1: 40}
+
+    await boards.set_language(1, "en")
+    assert await scores(redis, "lb:soft_currency:lang:ru") == {}
+    assert await scores(redis, "lb:soft_currency:lang:en") == {1: 40}
+    # Нет очков - нет записи в языковой таблице
+    assert await redis.exists("lb:factory_level:lang:en") == 0
+    assert await redis.hget(LANG_KEY, 1) == b"en"
+
+    assert await LANG_SCRIPT([LANG_KEY], ["lb:", 1, "en", "soft_currency"]) == 0
+    # Дальнейшие изменения идут в таблицу нового языка
+    await boards.incr(1, "soft_currency", 5)
+    assert await scores(redis, "lb:soft_currency:lang:en") == {1: 45}
+
+
+async def test_rank_and_top(boards, redis):
+    await boards.incr_many("soft_currency", {1: 10, 2: 30, 3: 20, 4: 2.5})
+    assert await boards.top("soft_currency") == [(2, 30), (3, 20), (1, 10), (4, 2.5)]
+    assert await boards.top("soft_currency", offset=1, limit=2) == [(3, 20), (1, 10)]
+    assert await boards.rank("soft_currency", 1) == (3, 10, 4)
+    assert await boards.rank("soft_currency", 99) is None
+    with pytest.raises(ValueError):
+        boards.key("unknown")
+
+
+async def test_rebuild_replaces_boards_from_database(boards, redis, session_factory):
+    # Устаревшие данные и остатки прерванной пересборки
+    await redis.zadd("lb:factory_level:lang:de", {7: 1})
+    await redis.zadd("lb:factory_level:global", {7: 100})
+    await redis.zadd("lb:rebuild:lb:factory_level:global", {8: 1})
+
+    assert await boards.rebuild(session_factory, chunk_size=2) == 3
+
+    assert await scores(redis, "lb:factory_level:global") == {1: 5, 2: 3, 3: 1}
+    assert await scores(redis, "lb:soft_currency:lang:ru") == {2: 300, 3: 0}
+    assert await scores(redis, "lb:soft_currency:lang:en") == {1: 100}
+    assert await redis.hgetall(LANG_KEY) == {b"1": b"en", b"2": b"ru", b"3": b"ru"}
+    assert await scores(redis, WEEK) == {1: 2, 2: 1}
+    assert await redis.ttl(WEEK) > 0
+    assert await redis.exists("lb:factory_level:lang:de") == 0
+    assert [key async for key in redis.scan_iter(match="lb:rebuild:*")] == []
+    assert await boards.is_ready()
+
+
+async def test_service_pages_carry_names_and_position(boards, redis, session_factory, monkeypatch):
+    monkeypatch.setattr(two_tier, "redis_client", redis)
+    monkeypatch.setattr("bot.domain.services.leaderboard_service.leaderboards", boards)
+    await boards.rebuild(session_factory)
+    service = LeaderboardService(session_factory)
+
+    page = await service.top_page("soft_currency")
+    assert [(entry["rank"], entry["name"], entry["score"]) for entry in page] == [
+        (1, "bob", 300), (2, "Ann", 100), (3, "3", 0)
+    ]
+    assert await service.top_page("soft_currency", page=1) == []
+    assert await service.position(1, "soft_currency") == {"rank": 2, "score": 100, "total": 3}
+    assert await service.position(99, "soft_currency") is None
@@ -0,0 +1,158 @@
+# tests/unit/test_outbound.py
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from bot.infra.outbound import broadcast
+from bot.infra.outbound.broadcast import BROADCAST_KEY, BROADCAST_OWNER_KEY, BROADCASTS_ACTIVE_KEY, Broadcaster
+from bot.infra.outbound.scheduler import Priority
+from bot.infra.outbound.sender import TelegramAPIError
+from bot.infra.outbound.session import ScheduledSession
+import asyncio
+import json
+import pytest
+
+USERS = list(range(1, 8))
+
+
+class FakeSender:
+    """Отвечает сразу; chat_id из failing - ошибка Bot API"""
+
+    def __init__(self, failing=(), result=True):
+        self.session = object()
+        self.failing = set(failing)
+        self.result = result
+        self.submitted = []
+
+    def submit(self, chat_id, method, payload, priority=Priority.INTERACTIVE):
+        self.submitted.append((chat_id, method, payload, priority))
+        future = asyncio.get_running_loop().create_future()
+        if chat_id in self.failing:
+            future.set_exception(TelegramAPIError(400, "Bad Request: chat not found"))
+        else:
+            future.set_result(self.result)
+        return future
+
+
+async def recipients(after, limit):
+    return [user_id for user_id in USERS if user_id > after][:limit]
+
+
+async def total():
+    return len(USERS)
+
+
+@pytest.fixture
+def sender():
+    return FakeSender(failing={3})
+
+
+@pytest.fixture
+def broadcaster(redis, sender, monkeypatch):
+    monkeypatch.setattr(broadcast, "redis_client", redis)
+    return Broadcaster(sender, recipients=recipients, total=total, chunk_size=3)
+
+
+async def wait_status(broadcaster, broadcast_id, status):
+    for _ in range(200):
+        progress = await broadcaster.progress(broadcast_id)
+        if progress.get("status") == status:
+            return progress
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"broadcast {broadcast_id} is not {status}")
+
+
+async def test_broadcast_sends_every_chunk_and_finishes(broadcaster, sender, redis):
+    broadcast_id = await broadcaster.create("hello")
+    progress = await wait_status(broadcaster, broadcast_id, "done")
+
+    assert [chat_id for chat_id, *_ in sender.submitted] == USERS
+    assert all(priority == Priority.BULK for *_, priority in sender.submitted)
+    assert (progress["sent"], progress["failed"], progress["total"]) == (6, 1, 7)
+    assert await redis.hget(BROADCAST_KEY.format(broadcast_id), "cursor") == b"7"
+    assert await redis.smembers(BROADCASTS_ACTIVE_KEY) == set()
+    assert await redis.exists(BROADCAST_OWNER_KEY.format(broadcast_id)) == 0
+
+
+async def test_stale_owner_expires_and_broadcast_resumes(broadcaster, sender, redis):
+    # Рассылка упавшего воркера: прогресс после первого чанка и живой ключ владельца
+    broadcast_id = "crashed"
+    await redis.hset(BROADCAST_KEY.format(broadcast_id), mapping={
+        "payload": json.dumps({"text": "hello"}), "cursor": 3, "sent": 2, "failed": 1,
+        "total": 7, "active_seconds": 1, "status": "running",
+    })
+    await redis.sadd(BROADCASTS_ACTIVE_KEY, broadcast_id)
+    await redis.set(BROADCAST_OWNER_KEY.format(broadcast_id), 1, px=200)
+
+    broadcaster.resume_interval = 0.05
+    assert await broadcaster.resume_all() == [broadcast_id]
+    await asyncio.sleep(0.05)
+    assert sender.submitted == []
+
+    await broadcaster.start()
+    try:
+        progress = await wait_status(broadcaster, broadcast_id, "done")
+    finally:
+        await broadcaster.stop()
+    assert [chat_id for chat_id, *_ in sender.submitted] == [4, 5, 6, 7]
+    assert (progress["sent"], progress["failed"]) == (6, 1)
+
+
+async def test_cancelled_broadcast_is_not_resumed(broadcaster, sender, redis):
+    broadcast_id = "cancelled"
+    await redis.hset(BROADCAST_KEY.format(broadcast_id), mapping={"status": "cancelled"})
+    await redis.sadd(BROADCASTS_ACTIVE_KEY, broadcast_id)
+    await broadcaster.resume_all()
+    await asyncio.sleep(0.01)
+    assert await redis.smembers(BROADCASTS_ACTIVE_KEY) == set()
+    assert sender.submitted == []
+
+
+@pytest.fixture
+def direct(monkeypatch):
+    """Запросы, ушедшие мимо планировщика"""
+    calls = []
+
+    async def make_request(self, bot, method, timeout=None):
+        calls.append(method.__api_method__)
+        return True
+
+    monkeypatch.setattr(AiohttpSession, "make_request", make_request)
+    return calls
+
+
+MESSAGE = {"message_id": 5, "date": 0, "chat": {"id": 10, "type": "private"}, "text": "hi"}
+
+
+async def test_chat_requests_go_through_the_scheduler(direct):
+    sender = FakeSender(result=MESSAGE)
+    bot = Bot("1:test", session=ScheduledSession(sender))
+    markup = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="ok", callback_data="x")]])
+
+    message = await bot.send_message(10, "hi", reply_markup=markup)
+    assert message.message_id == 5
+    chat_id, method, payload, priority = sender.submitted[0]
+    assert (chat_id, method, priority) == (10, "sendMessage", Priority.INTERACTIVE)
+    assert payload["reply_markup"] == {"inline_keyboard": [[{"text": "ok", "callback_data": "x"}]]}
+
+    # Без чата - напрямую, но через ту же сессию
+    assert await bot.answer_callback_query("query") is True
+    assert direct == ["answerCallbackQuery"]
+    assert len(sender.submitted) == 1
+
+
+async def test_scheduler_errors_become_aiogram_errors(direct):
+    sender = FakeSender(failing={10})
+    bot = Bot("1:test", session=ScheduledSession(sender))
+    with pytest.raises(TelegramBadRequest):
+        await bot.edit_message_text("hi", chat_id=10, message_id=5)
+
+
+async def test_session_is_plain_until_sender_starts(direct):
+    sender = FakeSender()
+    sender.session = None
+    bot = Bot("1:test", session=ScheduledSession(sender))
+    await bot.send_message(10, "hi")
+    assert direct == ["sendMessage"]
+    assert sender.submitted == []
@@ -0,0 +1,86 @@
+# tests/unit/test_rate_limiter.py
+
+from bot.infra.cache.rate_limiter import (
+    SLIDING_WINDOW_SCRIPT, TOKEN_BUCKET_SCRIPT, LocalPreFilter, RateLimiter
+)
+import pytest
+
+
+async def token_bucket(now: int, capacity: int = 3, rate: float = 1.0, cost: int = 1):
+    return await TOKEN_BUCKET_SCRIPT(["tb:user"], [capacity, rate, now, cost])
+
+
+async def sliding_window(now: int, limit: int = 10, window: int = 1000, cost: int = 1):
+    return await SLIDING_WINDOW_SCRIPT(["sw:user"], [limit, window, now, cost])
+
+
+async def test_token_bucket_spends_capacity_then_refills(redis):
+    assert [await token_bucket(1000) for _ in range(3)] == [[1, 0]] * 3
+    # Пусто: токен появится через 1 / rate секунд
+    assert await token_bucket(1000) == [0, 1000]
+    assert await token_bucket(1500) == [0, 500]
+    assert await token_bucket(2000) == [1, 0]
+    assert await token_bucket(2000) == [0, 1000]
+
+
+async def test_token_bucket_refill_is_capped_and_clock_skew_ignored(redis):
+    await token_bucket(1000, cost=3)
+    # Простой дольше ёмкости не копит токены сверх capacity
+    assert await token_bucket(60_000, cost=3) == [1, 0]
+    assert await token_bucket(60_000) == [0, 1000]
+    # Часы другого процесса отстали - рефилла нет, но и ошибки тоже
+    assert await token_bucket(59_000) == [0, 1000]
+    assert 0 < await redis.pttl("tb:user") <= 3000 + 1000
+
+
+async def test_sliding_window_limits_current_window(redis):
+    assert [await sliding_window(100) for _ in range(10)] == [[1, 0]] * 10
+    # Переполнено текущее окно - ждать его конца
+    assert await sliding_window(100) == [0, 900]
+
+
+async def test_sliding_window_weights_previous_window(redis):
+    for _ in range(10):
+        await sliding_window(100)
+
+    # Середина следующего окна: прошлое весит 10 * 0.5, свободно 5
+    assert [await sliding_window(1500) for _ in range(5)] == [[1, 0]] * 5
+    assert await sliding_window(1500) == [0, 100]
+    assert await sliding_window(1600) == [1, 0]
+
+
+async def test_sliding_window_forgets_older_windows(redis):
+    for _ in range(10):
+        await sliding_window(100)
+    assert [await sliding_window(3500) for _ in range(10)] == [[1, 0]] * 10
+    assert await sliding_window(3500) == [0, 500]
+
+
+@pytest.mark.parametrize("policy", ["token_bucket", "sliding_window"])
+async def test_rate_limiter_acquire(redis, policy):
+    limiter = RateLimiter(2, 60, policy=policy)
+    assert (await limiter.acquire("1"))[0]
+    assert (await limiter.acquire("1"))[0]
+    allowed, retry_after = await limiter.acquire("1")
+    assert not allowed and retry_after > 0
+    # Ключи независимы
+    assert (await limiter.acquire("2"))[0]
+
+
+async def test_prefilter_rejects_flood_without_redis(redis):
+    limiter = RateLimiter(1, 60, prefilter=True, prefilter_factor=2)
+    results = [(await limiter.acquire("1"))[0] for _ in range(4)]
+    assert results == [True, False, False, False]
+    # В Redis дошли только запросы, пропущенные локальным bucket
+    assert await redis.hget(limiter.key("1"), "t") is not None
+    assert limiter.prefilter._buckets["1"][0] < 1
+
+
+def test_local_prefilter_evicts_least_recent_keys():
+    prefilter = LocalPreFilter(capacity=1, refill_rate=0.001, max_keys=2)
+    assert prefilter.allow("a") and prefilter.allow("b")
+    assert not prefilter.allow("a")
+    assert prefilter.allow("c")
+    # "b" вытеснен - начинает с полного bucket
+    assert list(prefilter._buckets) == ["a", "c"]
+    assert prefilter.allow("b")
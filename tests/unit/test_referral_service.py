@@ -0,0 +1,237 @@
+# tests/unit/test_referral_service.py
+
+from collections import defaultdict
+from datetime import datetime
+from redis.exceptions import RedisError
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql import Insert, Select, Update
+from bot.core.config import config
+from bot.domain.models.referral import level_rewards, welcome_bonus
+from bot.domain.repositories.referral_repository import ReferralRepository
+from bot.domain.services import referral_service as service_module
+from bot.domain.services.referral_service import REFERRAL_DAILY_KEY, REFERRAL_FROZEN_KEY, ReferralService
+import pytest
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalar_one_or_none(self):
+        return self.rows[0] if self.rows else None
+
+    def all(self):
+        return self.rows
+
+
+class FakeTransaction:
+    def __init__(self, session: "FakeSession"):
+        self.session = session
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.session.db.commit(self.session)
+        return False
+
+
+class FakeSession:
+    """Операции join над деревом в памяти; SQL компилируется для Postgres"""
+
+    def __init__(self, db: "FakeTree"):
+        self.db = db
+        self.attached = None
+        self.ancestors = []
+        self.changes = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def begin(self):
+        return FakeTransaction(self)
+
+    async def execute(self, statement):
+        params = statement.compile(dialect=postgresql.dialect()).params
+        db = self.db
+        if isinstance(statement, Select):
+            code = params["referral_code_1"]
+            return FakeResult([user_id for user_id, user_code in db.codes.items() if user_code == code])
+        if isinstance(statement, Insert):
+            user_id, referrer_id = self.attached
+            self.ancestors = [(ancestor, depth + 1) for ancestor, depth in db.upline(referrer_id)]
+            self.ancestors.append((referrer_id, 1))
+            return FakeResult(self.ancestors)
+        if isinstance(statement, Update) and "invited_by_id" in params:
+            user_id, referrer_id = params["user_id_1"], params["invited_by_id"]
+            if user_id in db.invited_by or any(a == user_id for a, _ in db.upline(referrer_id)):
+                return FakeResult([])
+            self.attached = (user_id, referrer_id)
+            return FakeResult([user_id])
+        # UPDATE users ... FROM (VALUES (user_id, рефералов, монет))
+        flat = [params[f"param_{i}"] for i in range(1, len(params)) if f"param_{i}" in params]
+        self.changes += [tuple(flat[i:i + 3]) for i in range(0, len(flat), 3)]
+        return FakeResult([])
+
+
+class FakeTree:
+    """users.invited_by_id, closure table и колонки счётчиков в памяти"""
+
+    def __init__(self):
+        self.codes = {}
+        self.invited_by = {}
+        self.closure = defaultdict(list)  # потомок -> [(предок, глубина)]
+        self.referrals = defaultdict(int)
+        self.balance = defaultdict(int)
+
+    def __call__(self):
+        return FakeSession(self)
+
+    def upline(self, user_id):
+        return self.closure[user_id]
+
+    def commit(self, session: FakeSession):
+        if session.attached is not None:
+            user_id, referrer_id = session.attached
+            self.invited_by[user_id] = referrer_id
+            self.closure[user_id] = list(session.ancestors)
+        for user_id, referrals, amount in session.changes:
+            self.referrals[user_id] += referrals
+            self.balance[user_id] += amount
+
+
+class FakeCounters:
+    def __init__(self, tree: FakeTree):
+        self.tree = tree
+        self.down = False
+
+    async def incr_many(self, changes):
+        if self.down:
+            raise RedisError("redis is down")
+        for user_id, deltas in changes.items():
+            self.tree.referrals[user_id] += deltas.get("total_referrals", 0)
+            self.tree.balance[user_id] += deltas.get("soft_currency", 0)
+
+
+@pytest.fixture
+def tree():
+    tree = FakeTree()
+    # Только реф-коды: дерево строят сами тесты
+    for user_id in (1, 2, 3, 4, 5):
+        tree.codes[user_id] = f"CODE{user_id}"
+    return tree
+
+
+@pytest.fixture
+def service(redis, tree, monkeypatch):
+    monkeypatch.setattr(service_module, "redis_client", redis)
+    records, notified = [], []
+
+    async def record(updates):
+        records.extend(updates)
+
+    async def notify(user_id, text):
+        notified.append(user_id)
+
+    monkeypatch.setattr(service_module.leaderboards, "record", record)
+    monkeypatch.setattr(service_module.tasks, "notify", notify)
+    service = ReferralService(ReferralRepository(tree))
+    service.records, service.notified = records, notified
+    return service
+
+
+def daily_key(user_id: int) -> str:
+    return REFERRAL_DAILY_KEY.format(user_id, datetime.utcnow().strftime("%Y%m%d"))
+
+
+def test_level_rewards_split_bonus_by_percent():
+    assert level_rewards(50, [100, 20, 5]) == {1: 50, 2: 10, 3: 2}
+    # Нулевые уровни опускаются
+    assert level_rewards(10, [100, 20, 5]) == {1: 10, 2: 2}
+    assert welcome_bonus(50) == 50 * config.REFERRAL_WELCOME_PERCENT // 100
+
+
+async def test_join_copies_upline_and_credits_every_level(service, tree, redis):
+    assert await service.process_referral_bonus("CODE1", 2) == 50
+    assert await service.process_referral_bonus("CODE2", 3) == 50
+    assert await service.process_referral_bonus("CODE3", 4) == 50
+
+    assert sorted(tree.closure[4], key=lambda row: row[1]) == [(3, 1), (2, 2), (1, 3)]
+    assert (tree.referrals[1], tree.referrals[2], tree.referrals[3]) == (3, 2, 1)
+    welcome = welcome_bonus(50)
+    # 1: 50 + 10 + 2, 2: 50 + 10 + welcome, 3: 50 + welcome
+    assert tree.balance[1] == 62
+    assert tree.balance[2] == 60 + welcome
+    assert tree.balance[3] == 50 + welcome
+    assert tree.balance[4] == welcome
+    assert await redis.get(daily_key(3)) == b"1"
+    assert ("total_referrals", 1, "incr", 1, 1) in service.records
+    assert sorted(set(service.notified)) == [1, 2, 3, 4]
+
+
+async def test_repeated_join_and_cycle_give_nothing(service, tree, redis):
+    await service.process_referral_bonus("CODE1", 2)
+    assert await service.process_referral_bonus("CODE3", 2) == 0
+    # Пригласивший не может стать рефералом своего реферала
+    assert await service.process_referral_bonus("CODE2", 1) == 0
+    assert tree.invited_by == {2: 1}
+    assert await redis.get(daily_key(3)) == b"0"
+    assert await redis.get(daily_key(2)) == b"0"
+
+
+async def test_daily_cap_joins_without_bonuses(service, tree, redis, monkeypatch):
+    monkeypatch.setattr(config, "REFERRAL_DAILY_CAP", 1)
+    assert await service.process_referral_bonus("CODE1", 2) == 50
+    assert await service.process_referral_bonus("CODE1", 3) == 0
+
+    assert tree.invited_by[3] == 1
+    assert tree.referrals[1] == 2
+    assert tree.balance[1] == 50
+    assert tree.balance[3] == 0
+
+
+async def test_frozen_code_joins_without_bonuses(service, tree, redis):
+    await redis.set(REFERRAL_FROZEN_KEY.format("CODE1"), 1)
+    assert await service.process_referral_bonus("CODE1", 2) == 0
+    assert tree.invited_by[2] == 1
+    assert tree.referrals[1] == 1
+    assert tree.balance[1] == tree.balance[2] == 0
+    assert service.notified == []
+
+
+async def test_failed_join_returns_daily_slot(service, tree, redis):
+    # Код читается из реплики, привязка падает на primary
+    def down():
+        raise ConnectionError("database is down")
+
+    service.repository.session_factory = down
+    with pytest.raises(ConnectionError):
+        await service.process_referral_bonus("CODE1", 2)
+    assert await redis.get(daily_key(1)) == b"0"
+
+
+async def test_unknown_code_is_ignored(service, tree, redis):
+    assert await service.process_referral_bonus("NOPE", 2) == 0
+    assert tree.invited_by == {}
+
+
+async def test_counters_take_credits_and_fall_back_to_database(tree):
+    counters = FakeCounters(tree)
+    repository = ReferralRepository(tree, counters=counters)
+    credits = await repository.join(2, 1, {1: 50, 2: 10}, welcome=25)
+    assert credits == [(1, 1, 50), (2, 0, 25)]
+    assert (tree.balance[1], tree.balance[2], tree.referrals[1]) == (50, 25, 1)
+
+    counters.down = True
+    credits = await repository.join(3, 2, {1: 50, 2: 10}, welcome=25)
+    assert credits == [(1, 2, 10), (2, 1, 50), (3, 0, 25)]
+    assert (tree.balance[1], tree.balance[2], tree.balance[3]) == (60, 75, 25)
+    assert (tree.referrals[1], tree.referrals[2]) == (2, 1)
+
+
+async def test_self_invite_is_rejected(tree):
+    assert await ReferralRepository(tree).join(1, 1, {1: 50}) == []
@@ -0,0 +1,101 @@
+# tests/unit/test_sketches.py
+
+from collections import Counter
+from bot.infra.cache.sketches import CountMinSketch, DecayedCounter, HyperLogLog
+import math
+import pytest
+import random
+
+
+def test_decayed_counter_halves_every_half_life():
+    counter = DecayedCounter(half_life=10.0, now=0.0)
+    assert counter.add(8.0, now=0.0) == 8.0
+    assert counter.get(now=10.0) == pytest.approx(4.0)
+    assert counter.add(1.0, now=20.0) == pytest.approx(3.0)
+
+
+def test_decayed_counter_rescale_keeps_value():
+    counter = DecayedCounter(half_life=1.0, now=0.0)
+    counter.add(4.0, now=0.0)
+    # Вес за 70 периодов больше предела - пересчёт относительно now
+    assert counter.add(1.0, now=70.0) == pytest.approx(1.0 + 4.0 * 2.0 ** -70)
+    assert counter.origin == 70.0
+    assert counter.get(now=71.0) == pytest.approx(0.5, rel=1e-6)
+
+
+def test_count_min_never_underestimates_and_error_is_bounded():
+    sketch = CountMinSketch(width=256, depth=4, half_life=1e9, now=0.0)
+    rng = random.Random(1)
+    truth = Counter()
+    for _ in range(20000):
+        key = str(int(rng.paretovariate(1.2)))
+        truth[key] += 1
+        sketch.add(key, now=0.0)
+
+    bound = sketch.error_bound(now=0.0)
+    assert bound == pytest.approx(math.e / 256 * 20000)
+    over = [sketch.estimate(key, now=0.0) - count for key, count in truth.items()]
+    assert min(over) >= -1e-6
+    # Превышение границы - с вероятностью не больше e^-depth на ключ
+    assert sum(value > bound for value in over) <= len(over) * 0.05
+
+
+def test_count_min_decays():
+    sketch = CountMinSketch(width=64, depth=2, half_life=10.0, now=0.0)
+    sketch.add("user", 8.0, now=0.0)
+    assert sketch.estimate("user", now=10.0) == pytest.approx(4.0)
+    assert sketch.total(now=20.0) == pytest.approx(2.0)
+
+
+def test_count_min_merge_replaces_remote_contribution():
+    local = CountMinSketch(width=64, depth=3, half_life=10.0, now=0.0)
+    remote = CountMinSketch(width=64, depth=3, half_life=10.0, now=0.0)
+    remote.add("user", 8.0, now=0.0)
+    local.add("user", 1.0, now=0.0)
+
+    # Снимок десятисекундной давности: вклад уже вдвое меньше
+    snapshot = remote.snapshot(now=0.0)
+    local.merge([(10.0, snapshot)], now=0.0)
+    assert local.estimate("user", now=0.0) == pytest.approx(1.0 + 4.0)
+    assert local.total(now=0.0) == pytest.approx(5.0)
+    assert local.add("user", now=0.0) == pytest.approx(2.0 + 4.0)
+
+    # Повторный merge заменяет, а не складывает
+    local.merge([(10.0, snapshot)], now=0.0)
+    assert local.estimate("user", now=0.0) == pytest.approx(2.0 + 4.0)
+
+
+def test_count_min_merge_skips_foreign_sizes():
+    local = CountMinSketch(width=64, depth=3, half_life=10.0, now=0.0)
+    other = CountMinSketch(width=32, depth=3, half_life=10.0, now=0.0)
+    other.add("user", 5.0, now=0.0)
+    local.merge([(0.0, other.snapshot(now=0.0))], now=0.0)
+    assert local.estimate("user", now=0.0) == 0.0
+    assert local.total(now=0.0) == 0.0
+
+
+@pytest.mark.parametrize("precision, items", [(8, 100), (8, 20000), (12, 100000)])
+def test_hyperloglog_accuracy(precision, items):
+    hll = HyperLogLog(precision)
+    for i in range(items):
+        hll.add(f"user:{i}")
+    # Четыре стандартные ошибки
+    error = 4 * 1.04 / math.sqrt(1 << precision)
+    assert abs(hll.count() - items) <= items * error
+
+
+def test_hyperloglog_duplicates_and_merge():
+    first, second = HyperLogLog(), HyperLogLog()
+    for i in range(300):
+        first.add(str(i))
+    assert not any(first.add(str(i)) for i in range(300))
+
+    for i in range(200, 600):
+        second.add(str(i))
+    first.merge(second)
+    assert abs(first.count() - 600) <= 600 * 4 * 0.065
+
+    with pytest.raises(ValueError):
+        first.merge(HyperLogLog(10))
+    with pytest.raises(ValueError):
+        HyperLogLog(3)
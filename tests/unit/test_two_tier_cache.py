@@ -0,0 +1,191 @@
+# tests/unit/test_two_tier_cache.py
+
+from bot.infra.cache import two_tier
+from bot.infra.cache.decorators import cached
+from bot.infra.cache.two_tier import INVALIDATION_CHANNEL, CacheInvalidator, LRUCache, TwoTierCache
+import asyncio
+import itertools
+import pytest
+
+_names = itertools.count()
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Loader:
+    """Источник: считает вызовы, отвечает после release"""
+
+    def __init__(self, value=None, slow: bool = False):
+        self.value = value
+        self.calls = 0
+        self.release = asyncio.Event()
+        if not slow:
+            self.release.set()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if isinstance(self.value, Exception):
+            raise self.value
+        return self.value
+
+
+@pytest.fixture
+def patched_redis(redis, monkeypatch):
+    monkeypatch.setattr(two_tier, "redis_client", redis)
+    return redis
+
+
+def make_cache(**kwargs) -> TwoTierCache:
+    return TwoTierCache(f"test-{next(_names)}", **kwargs)
+
+
+def test_lru_expires_by_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(two_tier.time, "monotonic", clock)
+    evicted = []
+    cache = LRUCache(maxsize=10, ttl=5, on_evict=evicted.append)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=20)
+
+    clock.now += 6
+    assert cache.get("a") == (False, None)
+    assert cache.get("b") == (True, 2)
+    assert evicted == ["ttl"]
+    assert len(cache) == 1
+
+
+def test_lru_evicts_least_recently_used():
+    evicted = []
+    cache = LRUCache(maxsize=2, ttl=60, on_evict=evicted.append)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.get("c") == (True, 3)
+    assert evicted == ["size"]
+
+
+async def test_concurrent_misses_load_once(patched_redis):
+    cache = make_cache()
+    loader = Loader({"level": 3}, slow=True)
+    waiters = [asyncio.create_task(cache.get_or_load("cache:k", loader)) for _ in range(5)]
+    await asyncio.sleep(0)
+    loader.release.set()
+
+    assert await asyncio.gather(*waiters) == [{"level": 3}] * 5
+    assert loader.calls == 1
+    assert await patched_redis.get("cache:k") == b'{"level": 3}'
+    assert 0 < await patched_redis.ttl("cache:k") <= 300
+
+
+async def test_loader_error_reaches_waiters_and_is_not_cached(patched_redis):
+    cache = make_cache()
+    loader = Loader(ValueError("source down"), slow=True)
+    waiters = [asyncio.create_task(cache.get_or_load("cache:k", loader)) for _ in range(3)]
+    await asyncio.sleep(0)
+    loader.release.set()
+
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    loader.value = "ok"
+    assert await cache.get_or_load("cache:k", loader) == "ok"
+    assert loader.calls == 2
+
+
+async def test_none_is_cached_for_negative_ttl(patched_redis):
+    cache = make_cache(l1_ttl=30, negative_ttl=10)
+    loader = Loader(None)
+    assert await cache.get_or_load("cache:none", loader) is None
+    assert await cache.get_or_load("cache:none", loader) is None
+    assert loader.calls == 1
+    assert await patched_redis.get("cache:none") == b""
+    assert 0 < await patched_redis.ttl("cache:none") <= 10
+
+    # L2 отдаёт закэшированный None другим воркерам
+    cache.evict_local()
+    assert await cache.get_or_load("cache:none", loader) is None
+    assert loader.calls == 1
+
+
+async def test_none_is_not_cached_without_negative_ttl(patched_redis):
+    cache = make_cache(negative_ttl=None)
+    loader = Loader(None)
+    await cache.get_or_load("cache:none", loader)
+    await cache.get_or_load("cache:none", loader)
+    assert loader.calls == 2
+    assert await patched_redis.exists("cache:none") == 0
+
+
+async def test_l2_hit_fills_l1(patched_redis):
+    cache = make_cache()
+    await patched_redis.set("cache:k", '{"a": 1}')
+    loader = Loader("unused")
+    assert await cache.get_or_load("cache:k", loader) == {"a": 1}
+    assert cache.l1.get("cache:k") == (True, {"a": 1})
+    assert loader.calls == 0
+
+
+async def test_invalidation_during_load_skips_stale_write(patched_redis):
+    cache = make_cache()
+    loader = Loader("stale", slow=True)
+    task = asyncio.create_task(cache.get_or_load("cache:k", loader))
+    await asyncio.sleep(0)
+    await cache.invalidate("cache:k")
+    loader.release.set()
+
+    assert await task == "stale"
+    assert cache.l1.get("cache:k") == (False, None)
+    assert await patched_redis.exists("cache:k") == 0
+
+
+async def test_pubsub_invalidation_evicts_other_workers_l1(patched_redis):
+    name = f"test-{next(_names)}"
+    local, remote = TwoTierCache(name), TwoTierCache(name)
+    listener = CacheInvalidator()
+    listener.register(local)
+    await listener.start()
+    try:
+        for _ in range(100):
+            if (await patched_redis.pubsub_numsub(INVALIDATION_CHANNEL))[0][1]:
+                break
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.01)
+
+        assert await local.get_or_load("cache:k", Loader(1)) == 1
+        await remote.invalidate("cache:k")
+        for _ in range(100):
+            if not local.l1.get("cache:k")[0]:
+                break
+            await asyncio.sleep(0.01)
+        assert local.l1.get("cache:k") == (False, None)
+        assert await local.get_or_load("cache:k", Loader(2)) == 2
+    finally:
+        await listener.stop()
+
+
+async def test_cached_decorator_keys_and_invalidates(patched_redis):
+    calls = []
+
+    @cached(namespace=f"test-{next(_names)}", ttl=60, l1_ttl=60)
+    async def load(user_id: int, lang: str = "ru"):
+        calls.append((user_id, lang))
+        return {"user_id": user_id, "lang": lang}
+
+    assert await load(1) == {"user_id": 1, "lang": "ru"}
+    assert await load(user_id=1) == {"user_id": 1, "lang": "ru"}
+    await load(1, "en")
+    assert calls == [(1, "ru"), (1, "en")]
+
+    await load.invalidate(1)
+    await load(1)
+    assert calls == [(1, "ru"), (1, "en"), (1, "ru")]
+    assert await patched_redis.exists(f"cache:{load.cache.name}:1:ru") == 1
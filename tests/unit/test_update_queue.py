@@ -0,0 +1,95 @@
+# tests/unit/test_update_queue.py
+
+from types import SimpleNamespace
+from bot.infra.webhook.update_queue import UpdateQueue
+import asyncio
+import random
+
+
+def make_update(update_id: int, chat_id: int) -> SimpleNamespace:
+    return SimpleNamespace(update_id=update_id, chat_id=chat_id)
+
+
+async def test_updates_of_one_chat_run_in_order_and_never_overlap():
+    processed = {}
+    running = set()
+    overlaps = []
+
+    async def process(update):
+        if update.chat_id in running:
+            overlaps.append(update.update_id)
+        running.add(update.chat_id)
+        await asyncio.sleep(random.uniform(0, 0.003))
+        running.discard(update.chat_id)
+        processed.setdefault(update.chat_id, []).append(update.update_id)
+
+    queue = UpdateQueue(process, maxsize=1000, workers=8)
+    await queue.start()
+    expected = {}
+    for update_id in range(300):
+        chat_id = update_id % 7
+        expected.setdefault(chat_id, []).append(update_id)
+        assert queue.put_nowait(chat_id, make_update(update_id, chat_id))
+    await queue.stop(timeout=5)
+
+    assert processed == expected
+    assert overlaps == []
+
+
+async def test_chats_are_processed_in_parallel():
+    started = asyncio.Event()
+    release = asyncio.Event()
+    seen = []
+
+    async def process(update):
+        seen.append(update.chat_id)
+        if update.chat_id == 1:
+            started.set()
+            await release.wait()
+
+    queue = UpdateQueue(process, workers=2)
+    await queue.start()
+    queue.put_nowait(1, make_update(1, 1))
+    queue.put_nowait(1, make_update(2, 1))
+    queue.put_nowait(2, make_update(3, 2))
+    await started.wait()
+    await asyncio.sleep(0.01)
+
+    # Второй воркер не ждёт занятый чат 1
+    assert seen == [1, 2]
+    release.set()
+    await queue.stop(timeout=1)
+    assert seen == [1, 2, 1]
+
+
+async def test_stop_drains_queue_and_rejects_new_updates():
+    processed = []
+
+    async def process(update):
+        await asyncio.sleep(0.001)
+        processed.append(update.update_id)
+
+    queue = UpdateQueue(process, workers=4)
+    await queue.start()
+    for update_id in range(50):
+        queue.put_nowait(update_id % 3, make_update(update_id, update_id % 3))
+    await queue.stop(timeout=5)
+
+    assert sorted(processed) == list(range(50))
+    assert len(queue) == 0
+    assert not queue.put_nowait(1, make_update(100, 1))
+
+
+async def test_full_queue_rejects_and_failed_update_frees_slot():
+    async def process(update):
+        raise RuntimeError("handler failed")
+
+    queue = UpdateQueue(process, maxsize=2, workers=1)
+    assert queue.put_nowait(1, make_update(1, 1))
+    assert queue.put_nowait(2, make_update(2, 2))
+    assert not queue.put_nowait(3, make_update(3, 3))
+
+    # Ошибка обработчика не останавливает воркер и освобождает место
+    await queue.start()
+    await queue.stop(timeout=1)
+    assert len(queue) == 0